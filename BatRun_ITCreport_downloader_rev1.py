@@ -13,31 +13,30 @@ ITC报表自动下载器（简化登录检测，优化日期参数）
    
 3. 推荐设置：
    - EMAIL_ENABLED = True, EMAIL_AUTO_SEND = False (预览后发送)
+
+启动: selenium、requests、Chrome_Driver_mgr 及下载模块在首次用到时才导入
 """
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
 import time
 import os
 import shutil
 import subprocess
 import platform
 import urllib.parse
-import requests
 import socket
 import re
-import zipfile
 import sys
-import socket
 from datetime import datetime, timedelta
-import pandas as pd
-import numpy as np
 import json
-from bs4 import BeautifulSoup
-import warnings
-import sys, io
+import io
+from config_registry import get_email_config
+from rawdata_manifest import RawDataManifest
+from rawdata_retention import compact_rawdata
+from report_runner import run_report
+from report_result import ReportResult
+from chrome_port_probe import find_debug_port, remember_port
+from itc_logging import get_logger
+from readiness import wait_for_devtools, wait_for_file_ready
 if sys.stdout.encoding.lower() != 'utf-8':
     try:
         sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
@@ -50,8 +49,10 @@ REPORT_PROCESSOR_SCRIPT_NAME = "pending_review_report.py"
 REPORT_PROCESSOR_SCRIPT = os.path.join(SCRIPT_DIR, REPORT_PROCESSOR_SCRIPT_NAME)
 
 # 报表下载参数（动态计算日期范围）
-BASE_REPORT_URL = "https://itc-tool.pg.com/RequestReport/GetRequestExportReport"
-ITC_LOGIN_URL = "https://itc-tool.pg.com/"  # ITC系统登录页面
+# ITC 站点地址，可用环境变量 ITC_BASE_URL 覆盖(例如指向 itc_standin_server 做离线测试/基准)
+ITC_BASE_URL = os.environ.get("ITC_BASE_URL", "https://itc-tool.pg.com").rstrip("/")
+BASE_REPORT_URL = f"{ITC_BASE_URL}/RequestReport/GetRequestExportReport"
+ITC_LOGIN_URL = f"{ITC_BASE_URL}/"  # ITC系统登录页面
 TIME_RANGE_DAYS = 365
 end_date = datetime.now()
 start_date = end_date - timedelta(days=TIME_RANGE_DAYS)
@@ -103,9 +104,42 @@ CHROME_USER_DATA_DIR = None  # 将动态分配
 # 运行参数
 LOGIN_TIMEOUT = 300  # 登录超时时间（5分钟）
 LOGIN_CHECK_INTERVAL = 5
+# 登录判定需要存在的 ITC Cookie 名称(为空时只要求 ITC 域名下存在 Cookie)，见 itc_login_watcher
+LOGIN_COOKIE_NAMES = []
 DOWNLOAD_TIMEOUT = 600
-POST_DOWNLOAD_WAIT = 10
+# 下载方式: auto(先 HTTP 直接下载，失败回退浏览器) / http / browser，见 report_fetcher
+DOWNLOAD_MODE = "auto"
+# 导出范围: full(每次下载完整 TIME_RANGE_DAYS) / incremental(只下载上次成功以来的窗口并与本地数据合并，
+# 仅 HTTP 下载方式可用，见 incremental_export)
+EXPORT_MODE = "full"
+# 增量窗口向前重叠的天数(覆盖近期请求的状态变化)
+INCREMENTAL_OVERLAP_DAYS = 3
+# 增量窗口至少覆盖最近的天数(近期请求被处理后从合并结果中移除)
+INCREMENTAL_RECENT_DAYS = 30
+# 距上次完整下载超过该天数时自动完整下载一次(较早请求的状态变化只能通过完整下载获得)
+INCREMENTAL_FULL_REFRESH_DAYS = 7
+# 分区并行下载(仅 HTTP 下载方式): None 关闭 / "date" 按日期均分 / "categoryId" 或 "areaId" 按取值拆分
+PARTITION_BY = None
+# 按日期分区时的分区数
+PARTITION_COUNT = 4
+# 按 categoryId/areaId 分区时的取值列表(须覆盖全部取值，否则会漏数据)
+PARTITION_VALUES = []
+# 并发下载数
+PARALLEL_DOWNLOADS = 4
+# RawData 保留: 根目录保留最近的 CSV 个数，其余按月压缩到 RawData/Archive (见 rawdata_retention)
+RAW_KEEP_HOT = 10
+# 归档时内容相同的文件只保留一份
+RAW_ARCHIVE_DEDUPE = True
+# 归档保留月数(None 表示不删除)
+RAW_ARCHIVE_KEEP_MONTHS = 12
+# 下载完成后等待文件稳定且 CSV 结尾完整的最长时间(秒)，就绪即继续
+FILE_READY_TIMEOUT = 30
+# 启动 Chrome 后等待调试接口(/json/version)应答的最长时间(秒)
+CHROME_START_TIMEOUT = 30
 SCRIPT_CALL_TIMEOUT = 600
+# 报表处理方式: inprocess(同进程调用 pending_review_report.run，省去解释器启动与 pandas 导入) /
+# subprocess(独立进程，崩溃隔离，受 SCRIPT_CALL_TIMEOUT 限制)，见 report_runner
+PROCESSOR_MODE = "inprocess"
 
 # 邮件发送控制（主配置）
 EMAIL_AUTO_SEND = True  # True=直接发送, False=预览后发送（推荐）
@@ -121,12 +155,13 @@ REUSE_EXISTING_CHROME = True   # True=重用已打开的Chrome窗口, False=总
 CLOSE_CHROME_ON_EXIT = False   # True=程序结束时关闭Chrome, False=保持Chrome打开
 
 # 简化登录检测元素（移除可能失效的XPATH）
+# 定位方式为 selenium By 常量的取值 (By.CSS_SELECTOR / By.LINK_TEXT)，避免导入时加载 selenium
 LOGGED_IN_ELEMENTS = [
-    By.CSS_SELECTOR, "#frmRequestAccess",  # 保留可靠的CSS选择器
-    By.LINK_TEXT, "退出登录"  # 保留退出登录链接检测
+    "css selector", "#frmRequestAccess",  # 保留可靠的CSS选择器
+    "link text", "退出登录"  # 保留退出登录链接检测
 ]
 # ITC系统域名（用于URL验证）
-ITC_DOMAIN = "itc-tool.pg.com"
+ITC_DOMAIN = urllib.parse.urlsplit(ITC_BASE_URL).hostname
 
 
 # 全局变量：驱动可执行文件名
@@ -152,24 +187,23 @@ def get_notification_settings():
     # 尝试从配置文件读取覆盖设置
     try:
         config_path = os.path.join(SCRIPT_DIR, "email_config.json")
-        if os.path.exists(config_path):
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                system_config = config.get('system_config', {})
+        config = get_email_config(config_path)
+        if config is not None:
+            system_config = config.get('system_config', {})
+            
+            # 配置文件可以覆盖主文件设置
+            if 'EMAIL_ENABLED' in system_config:
+                email_enabled = system_config['EMAIL_ENABLED']
+            if 'AUTO_SEND_EMAIL' in system_config:
+                auto_send = system_config['AUTO_SEND_EMAIL']
+            if 'SEND_COMPLETION_EMAIL' in system_config:
+                send_completion_email = system_config['SEND_COMPLETION_EMAIL']
+            if 'TEAMS_ENABLED' in system_config:
+                teams_enabled = system_config['TEAMS_ENABLED']
+            if 'TEAMS_SEND_COMPLETION' in system_config:
+                teams_send_completion = system_config['TEAMS_SEND_COMPLETION']
                 
-                # 配置文件可以覆盖主文件设置
-                if 'EMAIL_ENABLED' in system_config:
-                    email_enabled = system_config['EMAIL_ENABLED']
-                if 'AUTO_SEND_EMAIL' in system_config:
-                    auto_send = system_config['AUTO_SEND_EMAIL']
-                if 'SEND_COMPLETION_EMAIL' in system_config:
-                    send_completion_email = system_config['SEND_COMPLETION_EMAIL']
-                if 'TEAMS_ENABLED' in system_config:
-                    teams_enabled = system_config['TEAMS_ENABLED']
-                if 'TEAMS_SEND_COMPLETION' in system_config:
-                    teams_send_completion = system_config['TEAMS_SEND_COMPLETION']
-                    
-                log_message(f"📧 通知配置: 邮件={email_enabled}(自动={auto_send}), Teams={teams_enabled}, 完成通知(邮件={send_completion_email}, Teams={teams_send_completion}) (来源: 配置文件)")
+            log_message(f"📧 通知配置: 邮件={email_enabled}(自动={auto_send}), Teams={teams_enabled}, 完成通知(邮件={send_completion_email}, Teams={teams_send_completion}) (来源: 配置文件)")
         else:
             log_message(f"📧 通知配置: 邮件={email_enabled}(自动={auto_send}), Teams={teams_enabled}, 完成通知(邮件={send_completion_email}, Teams={teams_send_completion}) (来源: 主文件)")
             
@@ -197,14 +231,8 @@ def ensure_directory_exists(directory):
 
 
 def log_message(message):
-    ensure_directory_exists(LOG_DIR)
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    log_date = datetime.now().strftime('%Y%m%d')
-    log_file = os.path.join(LOG_DIR, f"itc_downloader_{log_date}.log")
-    
-    print(f"[{timestamp}] {message}")
-    with open(log_file, 'a', encoding='utf-8') as f:
-        f.write(f"[{timestamp}] {message}\n")
+    # 写入 LOG_DIR/itc_downloader_YYYYMMDD.log (及 .jsonl)，由 itc_logging 后台线程批量完成
+    get_logger("itc_downloader", LOG_DIR).log(message)
 
 
 def pre_check_report_script():
@@ -518,28 +546,20 @@ def send_email_notification(report_info, html_report_path=None):
     log_message("\n===== 开始发送邮件通知 =====")
     
     try:
-        # 检查是否有smtplib模块
-        try:
-            import smtplib
-            from email.mime.text import MIMEText
-            from email.mime.multipart import MIMEMultipart
-            from email.mime.application import MIMEApplication
-        except ImportError:
-            log_message("⚠️ 无法导入邮件模块，跳过邮件发送")
+        # 通过 email_sender 的 SMTP 通道发送(连接池复用已认证连接)
+        # 服务器与收件人在 email_config.json 的 system_config 中配置:
+        #   SMTP_HOST / SMTP_PORT / SMTP_USER / SMTP_PASSWORD(或 SMTP_PASSWORD_ENV) / SMTP_FROM
+        #   NOTIFICATION_RECIPIENTS: ["recipient1@pg.com", ...]
+        from email_sender import send_email
+
+        config = get_email_config(os.path.join(SCRIPT_DIR, "email_config.json")) or {}
+        system_config = config.get('system_config', {})
+        recipients = list(system_config.get('NOTIFICATION_RECIPIENTS', []))
+        if not system_config.get('SMTP_HOST') or not recipients:
+            log_message("⚠️ 未配置 SMTP_HOST 或 NOTIFICATION_RECIPIENTS，跳过邮件发送")
             return False
-        
-        # 邮件配置（需要根据实际情况修改）
-        SMTP_SERVER = "smtp.example.com"
-        SMTP_PORT = 587
-        SMTP_USER = "your_email@example.com"
-        SMTP_PASSWORD = "your_password"
-        RECIPIENTS = ["recipient1@example.com", "recipient2@example.com"]
-        
-        # 创建邮件
-        msg = MIMEMultipart()
-        msg['From'] = SMTP_USER
-        msg['To'] = ", ".join(RECIPIENTS)
-        msg['Subject'] = f"ITC报表下载完成通知 - {report_info.get('full_name', '未知报表')}"
+
+        subject = f"ITC报表下载完成通知 - {report_info.get('full_name', '未知报表')}"
         
         # 邮件正文
         body = f"""
@@ -569,22 +589,16 @@ def send_email_notification(report_info, html_report_path=None):
         </html>
         """
         
-        msg.attach(MIMEText(body, 'html', 'utf-8'))
-        
         # 添加HTML报告附件
-        if html_report_path and os.path.exists(html_report_path):
-            with open(html_report_path, 'rb') as f:
-                part = MIMEApplication(f.read(), Name=os.path.basename(html_report_path))
-                part['Content-Disposition'] = f'attachment; filename="{os.path.basename(html_report_path)}"'
-                msg.attach(part)
+        attachments = [html_report_path] if html_report_path and os.path.exists(html_report_path) else None
         
         # 发送邮件
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USER, SMTP_PASSWORD)
-            server.send_message(msg)
+        if not send_email(subject, body, recipients, attachments=attachments, transport="smtp"):
+            log_message("❌ SMTP 发送失败")
+            log_message("⚠️ 请检查邮件配置是否正确")
+            return False
         
-        log_message(f"✅ 邮件已发送至: {', '.join(RECIPIENTS)}")
+        log_message(f"✅ 邮件已发送至: {', '.join(recipients)}")
         log_message("===== 邮件通知发送完成 =====")
         
         return True
@@ -595,15 +609,18 @@ def send_email_notification(report_info, html_report_path=None):
         return False
 
 
-def get_processing_summary():
+def get_processing_summary(result=None, csv_path=None):
     """
-    分析pending_review_report的输出，获取处理结果摘要
+    获取报表处理结果摘要
+    优先使用本次调用返回的 ReportResult；没有时读取处理脚本写出的 a_results.json
+    (csv_path 给定时只接受处理该文件的结果，避免用到上一次运行的旧结果)
     """
     summary = {
         'total_records': 0,
         'urgent_pending': 0,
         'normal_pending': 0,
         'revoked_count': 0,
+        'revoked_categories': [],
         'excluded_long_term': 0,
         'has_urgent_issues': False,
         'has_pending_issues': False,
@@ -611,59 +628,17 @@ def get_processing_summary():
     }
     
     try:
-        # 读取最新的日志文件
-        log_files = []
-        if os.path.exists(LOG_DIR):
-            for file in os.listdir(LOG_DIR):
-                if file.endswith('.log'):
-                    log_path = os.path.join(LOG_DIR, file)
-                    log_files.append((log_path, os.path.getmtime(log_path)))
-        
-        if log_files:
-            # 获取最新的日志文件
-            latest_log = max(log_files, key=lambda x: x[1])[0]
-            
-            with open(latest_log, 'r', encoding='utf-8') as f:
-                log_content = f.read()
-                
-                # 解析日志内容
-                import re
-                
-                # 提取关键信息
-                if '没有剩余天数小于等于 10 天的待审核请求' in log_content:
-                    summary['normal_pending'] = 0
-                else:
-                    # 尝试提取具体数字
-                    pending_match = re.search(r'发现 (\d+) 条待审核请求', log_content)
-                    if pending_match:
-                        summary['normal_pending'] = int(pending_match.group(1))
-                
-                if '没有包含Revoked关键词的请求数据' in log_content:
-                    summary['revoked_count'] = 0
-                    summary['revoked_categories'] = []
-                else:
-                    revoked_match = re.search(r'发现 (\d+) 条Revoked请求', log_content)
-                    if revoked_match:
-                        summary['revoked_count'] = int(revoked_match.group(1))
-                    
-                    # 提取revoked请求涉及的Category信息
-                    categories_match = re.search(r'Revoked请求涉及的Category: (.+)', log_content)
-                    if categories_match:
-                        categories_str = categories_match.group(1).strip()
-                        summary['revoked_categories'] = [cat.strip() for cat in categories_str.split(',') if cat.strip()]
-                    else:
-                        summary['revoked_categories'] = []
-                
-                # 提取排除的记录数
-                excluded_match = re.search(r'已排除 (\d+) 条剩余天数超过 \d+ 天', log_content)
-                if excluded_match:
-                    summary['excluded_long_term'] = int(excluded_match.group(1))
-                
-                # 估算总记录数
-                summary['total_records'] = summary['normal_pending'] + summary['revoked_count'] + summary['excluded_long_term']
-                
+        if not isinstance(result, ReportResult):
+            result_path = os.path.join(os.path.dirname(REPORT_PROCESSOR_SCRIPT), "a_results.json")
+            result = ReportResult.load_results(result_path) if os.path.exists(result_path) else None
+            if result and csv_path and os.path.normcase(os.path.abspath(result.csv_path or "")) != \
+                    os.path.normcase(os.path.abspath(csv_path)):
+                log_message(f"⚠️ 处理结果不是针对本次下载的文件: {result.csv_path}")
+                result = None
+        if result and result.ok:
+            summary.update(result.processing_summary())
     except Exception as e:
-        log_message(f"⚠️ 解析处理结果时出错: {str(e)}")
+        log_message(f"⚠️ 读取处理结果时出错: {str(e)}")
     
     # 判断是否有需要关注的问题
     summary['has_urgent_issues'] = summary['urgent_pending'] > 0
@@ -689,43 +664,41 @@ def call_report_processor(downloaded_csv_path):
         return False
     
     try:
-        cmd = [sys.executable, REPORT_PROCESSOR_SCRIPT, "--csv-path", downloaded_csv_path, "--log-dir", LOG_DIR]
-        result = subprocess.run(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-            text=True, timeout=SCRIPT_CALL_TIMEOUT, cwd=SCRIPT_DIR
-        )
-        
-        if result.stdout:
-            log_message(f"📤 报表脚本输出:\n{result.stdout}")
-        if result.stderr:
-            log_message(f"⚠️ 报表脚本错误:\n{result.stderr}")
-        
-        return result.returncode == 0
-    except Exception as e:
-        log_message(f"❌ 调用脚本异常: {str(e)}")
-        return False
+        # 返回 ReportResult (结构化结果，bool 值表示是否成功)
+        return run_report(downloaded_csv_path, mode=PROCESSOR_MODE, log_dir=LOG_DIR,
+                          timeout=SCRIPT_CALL_TIMEOUT, log_callback=log_message,
+                          script=REPORT_PROCESSOR_SCRIPT)
     finally:
         log_message(f"===== 报表处理脚本调用结束 =====")
 
 
 # -------------------------- ChromeDriver管理 --------------------------
-# 导入Chrome Driver管理器
-try:
-    from Chrome_Driver_mgr import ChromeDriverManager, get_chromedriver_path as get_driver_path, get_chrome_path as get_browser_path
-    CHROME_DRIVER_MGR_AVAILABLE = True
-    log_message("✅ 成功导入Chrome Driver管理器")
-    
-    # 初始化Chrome Driver管理器
-    chrome_driver_manager = ChromeDriverManager(
-        script_dir=SCRIPT_DIR,
-        allow_insecure_ssl=ALLOW_INSECURE_SSL,
-        log_callback=log_message
-    )
-except ImportError as e:
-    log_message(f"⚠️ 无法导入Chrome Driver管理器: {str(e)}")
-    log_message("将使用简化的Driver管理功能")
-    CHROME_DRIVER_MGR_AVAILABLE = False
-    chrome_driver_manager = None
+# Chrome Driver管理器(依赖 requests/bs4)在首次需要 Chrome/ChromeDriver 路径时才导入，None 表示尚未导入
+CHROME_DRIVER_MGR_AVAILABLE = None
+chrome_driver_manager = None
+
+def load_chrome_driver_manager():
+    """导入并初始化Chrome Driver管理器(只执行一次)，不可用时返回 None"""
+    global CHROME_DRIVER_MGR_AVAILABLE, chrome_driver_manager
+    if CHROME_DRIVER_MGR_AVAILABLE is not None:
+        return chrome_driver_manager
+    try:
+        from Chrome_Driver_mgr import ChromeDriverManager
+        log_message("✅ 成功导入Chrome Driver管理器")
+        
+        # 初始化Chrome Driver管理器
+        chrome_driver_manager = ChromeDriverManager(
+            script_dir=SCRIPT_DIR,
+            allow_insecure_ssl=ALLOW_INSECURE_SSL,
+            log_callback=log_message
+        )
+        CHROME_DRIVER_MGR_AVAILABLE = True
+    except ImportError as e:
+        log_message(f"⚠️ 无法导入Chrome Driver管理器: {str(e)}")
+        log_message("将使用简化的Driver管理功能")
+        CHROME_DRIVER_MGR_AVAILABLE = False
+        chrome_driver_manager = None
+    return chrome_driver_manager
 
 # 动态端口管理函数
 def is_port_available(port):
@@ -744,31 +717,9 @@ def is_port_available(port):
         return False
 
 def check_existing_chrome_debug():
-    """检查是否已有可用的Chrome调试会话（只检查ITC端口范围）"""
-    existing_ports = []
-    
-    for port in range(ITC_PORT_RANGE['start'], ITC_PORT_RANGE['end'] + 1):
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                sock.settimeout(2)
-                if sock.connect_ex(("127.0.0.1", port)) == 0:
-                    # 验证是否是Chrome调试端口
-                    try:
-                        import requests
-                        response = requests.get(f"http://127.0.0.1:{port}/json", timeout=3)
-                        if response.status_code == 200:
-                            existing_ports.append(port)
-                            log_message(f"🔍 发现有效的Chrome调试会话 (端口: {port})")
-                    except:
-                        # 端口被占用但不是Chrome调试端口
-                        log_message(f"⚠️ 端口 {port} 被其他程序占用")
-        except Exception:
-            continue
-    
-    if existing_ports:
-        # 返回第一个可用的Chrome调试端口
-        return existing_ports[0]
-    return None
+    """检查是否已有可用的Chrome调试会话（只检查ITC端口范围，并发探测，优先尝试上次可用的端口）"""
+    return find_debug_port(range(ITC_PORT_RANGE['start'], ITC_PORT_RANGE['end'] + 1),
+                           project=ITC_PORT_RANGE['project_name'], log_callback=log_message)
 
 def allocate_debug_port():
     """动态分配可用的调试端口"""
@@ -799,6 +750,7 @@ def get_chrome_user_data_dir(debug_port):
 
 def get_chromedriver_path():
     """获取ChromeDriver路径"""
+    load_chrome_driver_manager()
     if CHROME_DRIVER_MGR_AVAILABLE and chrome_driver_manager:
         return chrome_driver_manager.get_chromedriver_path()
     else:
@@ -816,6 +768,7 @@ def get_chromedriver_path():
 # -------------------------- 浏览器管理 --------------------------
 def get_chrome_path():
     """获取Chrome浏览器路径"""
+    load_chrome_driver_manager()
     if CHROME_DRIVER_MGR_AVAILABLE and chrome_driver_manager:
         return chrome_driver_manager.get_chrome_path()
     else:
@@ -860,13 +813,20 @@ def get_chrome_path():
             chrome_path = "/usr/bin/google-chrome"
             return chrome_path if os.path.exists(chrome_path) else chrome_path
 
-CHROME_PATH = get_chrome_path()
+# 首次启动浏览器时由 resolve_chrome_path() 确定
+CHROME_PATH = None
+
+def resolve_chrome_path():
+    global CHROME_PATH
+    if CHROME_PATH is None:
+        CHROME_PATH = get_chrome_path()
+    return CHROME_PATH
 
 
 def start_chrome_debug_session():
     global DEBUG_PORT, CHROME_USER_DATA_DIR
     
-    if not os.path.exists(CHROME_PATH):
+    if not os.path.exists(resolve_chrome_path()):
         log_message(f"❌ Chrome路径无效: {CHROME_PATH}")
         return False
 
@@ -917,24 +877,17 @@ def start_chrome_debug_session():
             ITC_LOGIN_URL  # 启动时打开ITC系统登录页面
         ]
         
-        subprocess.Popen(chrome_args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        chrome_process = subprocess.Popen(chrome_args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         log_message("🔄 正在启动Chrome...")
-        time.sleep(8)
         
-        # 验证Chrome是否成功启动
-        try:
-            import requests
-            response = requests.get(f"http://127.0.0.1:{DEBUG_PORT}/json", timeout=10)
-            if response.status_code == 200:
-                log_message("✅ Chrome已启动并可访问调试接口，请在浏览器中登录ITC系统")
-                return True
-            else:
-                log_message("⚠️ Chrome已启动但调试接口不可访问")
-                return False
-        except Exception as e:
-            log_message(f"⚠️ 验证Chrome启动状态失败: {str(e)}")
-            log_message("💡 Chrome可能仍在启动中，请手动检查")
-            return True
+        # 轮询调试接口直到可用(替代固定等待)
+        if not wait_for_devtools(DEBUG_PORT, timeout=CHROME_START_TIMEOUT, process=chrome_process,
+                                 log_callback=log_message):
+            log_message("⚠️ Chrome已启动但调试接口不可访问")
+            return False
+        remember_port(DEBUG_PORT, project=ITC_PORT_RANGE['project_name'])
+        log_message("✅ Chrome已启动并可访问调试接口，请在浏览器中登录ITC系统")
+        return True
             
     except Exception as e:
         log_message(f"❌ 启动Chrome失败: {str(e)}")
@@ -979,6 +932,10 @@ def wait_for_itc_login():
     if not chromedriver_path or not os.path.exists(chromedriver_path):
         log_message("❌ 无法获取有效ChromeDriver路径")
         return None
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+    from itc_login_watcher import LoginWatcher
     
     driver = None
     try:
@@ -1002,6 +959,17 @@ def wait_for_itc_login():
         driver = webdriver.Chrome(service=Service(chromedriver_path), options=options)
         log_message("✅ 成功连接到Chrome调试会话")
         
+        # 优先通过 CDP 页面跳转/Cookie 事件检测登录，Cookie 出现即继续；CDP 不可用时退回下面的轮询
+        logged_in = LoginWatcher(DEBUG_PORT, ITC_DOMAIN, cookie_names=LOGIN_COOKIE_NAMES,
+                                 log_callback=log_message).wait(LOGIN_TIMEOUT)
+        if logged_in:
+            log_message("✅ 检测到ITC登录会话")
+            return driver
+        if logged_in is False:
+            log_message(f"❌ 登录超时（超过{LOGIN_TIMEOUT}秒）")
+            driver.quit()
+            return None
+        
         start_time = time.time()
         while time.time() - start_time < LOGIN_TIMEOUT:
             if is_itc_logged_in(driver):
@@ -1023,77 +991,85 @@ def wait_for_itc_login():
 
 
 # -------------------------- 报表下载与处理 --------------------------
+def download_incremental(driver):
+    """增量模式: 同一会话下载日期窗口并合并到本地数据集，返回合并后的 CSV 路径"""
+    from incremental_export import IncrementalExporter
+    from report_fetcher import open_browser_session, fetch_report
+    exporter = IncrementalExporter(RAW_DATA_DIR, BASE_REPORT_URL, REPORT_PARAMS, TIME_RANGE_DAYS,
+                                   overlap_days=INCREMENTAL_OVERLAP_DAYS,
+                                   full_refresh_days=INCREMENTAL_FULL_REFRESH_DAYS,
+                                   recent_days=INCREMENTAL_RECENT_DAYS,
+                                   log_callback=log_message)
+    with open_browser_session(BASE_REPORT_URL, debug_port=DEBUG_PORT, driver=driver,
+                              verify=not ALLOW_INSECURE_SSL) as session:
+        return exporter.run(lambda url, dest_dir: fetch_report(url, dest_dir, session,
+                                                               log_callback=log_message).path)
+
+
+def download_partitioned(driver):
+    """分区并行下载: 同一会话并发下载各分区后拼接，返回 CSV 路径"""
+    from partitioned_export import fetch_partitioned
+    from report_fetcher import open_browser_session
+    with open_browser_session(BASE_REPORT_URL, debug_port=DEBUG_PORT, driver=driver,
+                              verify=not ALLOW_INSECURE_SSL, pool_size=PARALLEL_DOWNLOADS) as session:
+        merged_path, _ = fetch_partitioned(BASE_REPORT_URL, REPORT_PARAMS, RAW_DATA_DIR, session,
+                                           partition_by=PARTITION_BY, parts=PARTITION_COUNT,
+                                           values=PARTITION_VALUES, workers=PARALLEL_DOWNLOADS,
+                                           log_callback=log_message)
+    return merged_path
+
+
 def download_report(driver):
+    # 下载相关模块(requests/urllib3、watchdog 等)只在实际下载时导入
+    from report_fetcher import download_via_http
+    from download_watcher import DownloadWatcher
     log_message(f"\n===== 开始下载任务: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} =====")
     log_message(f"📅 日期范围: {start_date.strftime('%Y-%m-%d')} 至 {end_date.strftime('%Y-%m-%d')}")
     log_message(f"🎯 目标目录: {RAW_DATA_DIR}")
     log_message(f"📤 下载请求URL: {REPORT_URL}")
     
-    download_paths = [
-        RAW_DATA_DIR,
+    if DOWNLOAD_MODE in ("auto", "http"):
+        try:
+            # 复用浏览器登录 Cookie，直接流式下载(耗时≈纯传输时间)
+            if EXPORT_MODE == "incremental":
+                merged_path = download_incremental(driver)
+                log_message(f"增量合并完成: {merged_path}")
+                return True, merged_path
+            if PARTITION_BY:
+                merged_path = download_partitioned(driver)
+                log_message(f"分区下载完成: {merged_path} 大小 {os.path.getsize(merged_path)/1024/1024:.2f} MB")
+                return True, merged_path
+            result = download_via_http(REPORT_URL, RAW_DATA_DIR, debug_port=DEBUG_PORT, driver=driver,
+                                       verify=not ALLOW_INSECURE_SSL, log_callback=log_message)
+            log_message(f"\n✅ 报表下载成功！(HTTP 直接下载)")
+            log_message(f"📄 文件名: {os.path.basename(result.path)}")
+            log_message(f"📁 保存路径: {result.path}")
+            return True, result.path
+        except Exception as e:
+            if DOWNLOAD_MODE == "http":
+                log_message(f"❌ HTTP 直接下载失败: {e}")
+                return False, None
+            log_message(f"⚠️ HTTP 直接下载失败，改用浏览器下载: {e}")
+
+    # Chrome 直接下载到 RawData，由浏览器下载事件/文件系统事件通知完成(见 download_watcher)
+    extra_dirs = [
         os.path.join(os.environ.get("USERPROFILE", ""), "Downloads"),
         os.path.join(os.environ.get("HOME", ""), "Downloads")
     ]
-    initial_files = {}
-    for path in download_paths:
-        if os.path.exists(path):
-            initial_files[path] = {
-                f: os.path.getmtime(os.path.join(path, f)) 
-                for f in os.listdir(path) 
-                if os.path.isfile(os.path.join(path, f)) and not f.endswith((".crdownload", ".tmp"))
-            }
-            log_message(f"记录初始文件: {path}（共{len(initial_files[path])}个文件）")
+    watcher = DownloadWatcher(RAW_DATA_DIR, debug_port=DEBUG_PORT, extra_dirs=extra_dirs,
+                              log_callback=log_message)
     
     try:
-        task_start = time.time()
+        watcher.start()
         driver.get(REPORT_URL)  # 直接访问下载链接
         log_message("🔄 已向ITC系统发送报表下载请求")
         
-        downloaded_path = None
-        while time.time() - task_start < DOWNLOAD_TIMEOUT:
-            for path in download_paths:
-                if not os.path.exists(path):
-                    continue
-                
-                for f in os.listdir(path):
-                    file_path = os.path.join(path, f)
-                    if (os.path.isfile(file_path) and 
-                        not f.endswith((".crdownload", ".tmp")) and 
-                        os.path.getsize(file_path) > 1024):
-                        
-                        is_new = (path not in initial_files or 
-                                 f not in initial_files[path] or 
-                                 os.path.getmtime(file_path) > task_start)
-                        
-                        if is_new:
-                            downloaded_path = file_path
-                            log_message(f"✅ 发现新下载文件: {downloaded_path}")
-                            break
-            
-            if downloaded_path:
-                break
-            
-            elapsed = int(time.time() - task_start)
-            if elapsed % 15 == 0:
-                log_message(f"   等待下载中...（已等待 {elapsed} 秒，超时时间 {DOWNLOAD_TIMEOUT} 秒）")
-            time.sleep(3)
+        downloaded_path = watcher.wait(DOWNLOAD_TIMEOUT)
         
         if not downloaded_path:
             log_message("❌ 报表下载超时，未找到下载文件")
             return False, None
         
-        if not downloaded_path.startswith(RAW_DATA_DIR):
-            target_name = os.path.basename(downloaded_path)
-            target_path = os.path.join(RAW_DATA_DIR, target_name)
-            if os.path.exists(target_path):
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                name, ext = os.path.splitext(target_name)
-                target_path = os.path.join(RAW_DATA_DIR, f"{name}_{timestamp}{ext}")
-            
-            shutil.move(downloaded_path, target_path)
-            log_message(f"已将文件从 {downloaded_path} 移动到 {target_path}")
-            downloaded_path = target_path
-        
         file_size = os.path.getsize(downloaded_path) / (1024 * 1024)
         log_message(f"\n✅ 报表下载成功！")
         log_message(f"📄 文件名: {os.path.basename(downloaded_path)}")
@@ -1105,6 +1081,7 @@ def download_report(driver):
         log_message(f"❌ 下载过程异常: {str(e)}")
         return False, None
     finally:
+        watcher.stop()
         log_message(f"===== 下载任务结束 =====")
 
 
@@ -1140,7 +1117,7 @@ if __name__ == "__main__":
             sys.exit(1)
         
         # 2. 检查Chrome路径
-        if not os.path.exists(CHROME_PATH):
+        if not os.path.exists(resolve_chrome_path()):
             log_message(f"❌ 程序终止: Chrome未找到（路径: {CHROME_PATH}）")
             sys.exit(1)
         
@@ -1156,13 +1133,26 @@ if __name__ == "__main__":
             sys.exit(1)
         
         # 5. 下载报表
+        t_download = time.perf_counter()
         download_success, downloaded_path = download_report(driver)
+        download_seconds = time.perf_counter() - t_download
         driver.quit()
         
         # 6. 报表分析和处理
+        if download_success and downloaded_path and not wait_for_file_ready(
+                downloaded_path, timeout=FILE_READY_TIMEOUT, log_callback=log_message):
+            log_message("❌ 下载文件未写入完成或内容不完整")
+            download_success = False
         if download_success and downloaded_path:
-            log_message(f"\n⏳ 等待{POST_DOWNLOAD_WAIT}秒，确保文件写入完成...")
-            time.sleep(POST_DOWNLOAD_WAIT)
+            
+            # 登记到 RawData 清单(哈希/行数/日期范围)，重复下载会在此被识别
+            try:
+                RawDataManifest(RAW_DATA_DIR, log_callback=log_message).record(
+                    downloaded_path, download_seconds, DOWNLOAD_MODE)
+            except Exception as e:
+                log_message(f"⚠️ 清单登记失败: {e}")
+            compact_rawdata(RAW_DATA_DIR, keep_hot=RAW_KEEP_HOT, dedupe=RAW_ARCHIVE_DEDUPE,
+                            keep_archive_months=RAW_ARCHIVE_KEEP_MONTHS, log_callback=log_message)
             
             # 6.1 分析报表名称
             report_info = analyze_report_name(downloaded_path)
@@ -1174,7 +1164,8 @@ if __name__ == "__main__":
             
             # 6.3 调用报表处理脚本
             log_message("\n===== 开始处理下载的报表数据 =====")
-            if call_report_processor(downloaded_path):
+            proc_result = call_report_processor(downloaded_path)
+            if proc_result:
                 log_message("✅ 报表处理完成！")
             else:
                 log_message("⚠️ 报表处理脚本调用失败，请手动运行脚本处理:")
@@ -1185,8 +1176,8 @@ if __name__ == "__main__":
             if report_info:
                 email_enabled, auto_send, send_completion_email, teams_enabled, teams_send_completion = get_notification_settings()
                 
-                # 获取处理结果摘要
-                log_summary = get_processing_summary()
+                # 获取处理结果摘要(结构化结果，不解析日志)
+                log_summary = get_processing_summary(proc_result, downloaded_path)
                 
                 # 邮件发送逻辑
                 if not email_enabled:
@@ -1207,9 +1198,6 @@ if __name__ == "__main__":
                             # 显示当前邮件配置状态
                             log_message(f"📧 当前邮件配置: 启用={email_enabled}, 自动发送={auto_send}")
                             
-                            # 读取最新的处理日志，获取具体处理结果
-                            log_summary = get_processing_summary()
-                            
                             if log_summary['has_urgent_issues']:
                                 subject = f"🚨 ITC报表发现紧急问题 - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
                                 urgency_style = "background-color: #ffebee; border-left: 4px solid #f44336;"
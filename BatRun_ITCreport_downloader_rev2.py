@@ -6,25 +6,25 @@ ITC报表自动下载器 (优化版)
 2. 若在复用窗口(< REUSE_WINDOW_HOURS)内已有最近成功CSV则直接复用, 跳过浏览器与再次下载
 3. 增强调用 pending_review_report.py 的日志归类 (OUT/ERR 保留, 增加开始/结束标记与汇总)
 4. 保持原整体结构和风格, 仅新增最少逻辑
+5. selenium / requests / Chrome_Driver_mgr 等只在需要浏览器或下载时导入，复用已有CSV时不加载
 """
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-
 import time
 import os
-import shutil
 import subprocess
 import platform
 import urllib.parse
-import requests
 import socket
-import json
 import sys
-import re
 from datetime import datetime, timedelta
+from rawdata_manifest import RawDataManifest
+from rawdata_retention import compact_rawdata
+from report_runner import run_report
+from chrome_port_probe import find_debug_port, remember_port
+from itc_logging import get_logger
+from itc_trace import trace_run, span
+from itc_resources import watch_pid, watch_cmdline
+from readiness import wait_for_devtools, wait_for_file_ready
 
 # -------------------------- 可配置参数 --------------------------
 # 下载报表日期范围(天)
@@ -43,8 +43,10 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 REPORT_PROCESSOR_SCRIPT_NAME = "pending_review_report.py"
 REPORT_PROCESSOR_SCRIPT = os.path.join(SCRIPT_DIR, REPORT_PROCESSOR_SCRIPT_NAME)
 
-BASE_REPORT_URL = "https://itc-tool.pg.com/RequestReport/GetRequestExportReport"
-ITC_LOGIN_URL = "https://itc-tool.pg.com/"
+# ITC 站点地址，可用环境变量 ITC_BASE_URL 覆盖(例如指向 itc_standin_server 做离线测试/基准)
+ITC_BASE_URL = os.environ.get("ITC_BASE_URL", "https://itc-tool.pg.com").rstrip("/")
+BASE_REPORT_URL = f"{ITC_BASE_URL}/RequestReport/GetRequestExportReport"
+ITC_LOGIN_URL = f"{ITC_BASE_URL}/"
 end_date = datetime.now()
 start_date = end_date - timedelta(days=TIME_RANGE_DAYS)
 REPORT_PARAMS = {
@@ -65,18 +67,52 @@ LOG_DIR = os.path.join(ITC_REPORT_DIR, "Log")
 
 LOGIN_TIMEOUT = 300
 LOGIN_CHECK_INTERVAL = 5
+# 登录判定需要存在的 ITC Cookie 名称(为空时只要求 ITC 域名下存在 Cookie)，见 itc_login_watcher
+LOGIN_COOKIE_NAMES = []
 DOWNLOAD_TIMEOUT = 600
-POST_DOWNLOAD_WAIT = 8
+# 下载方式: auto(先 HTTP 直接下载，失败回退浏览器) / http / browser，见 report_fetcher
+DOWNLOAD_MODE = "auto"
+# 导出范围: full(每次下载完整 TIME_RANGE_DAYS) / incremental(只下载上次成功以来的窗口并与本地数据合并，
+# 仅 HTTP 下载方式可用，见 incremental_export)
+EXPORT_MODE = "full"
+# 增量窗口向前重叠的天数(覆盖近期请求的状态变化)
+INCREMENTAL_OVERLAP_DAYS = 3
+# 增量窗口至少覆盖最近的天数(近期请求被处理后从合并结果中移除)
+INCREMENTAL_RECENT_DAYS = 30
+# 距上次完整下载超过该天数时自动完整下载一次(较早请求的状态变化只能通过完整下载获得)
+INCREMENTAL_FULL_REFRESH_DAYS = 7
+# 分区并行下载(仅 HTTP 下载方式): None 关闭 / "date" 按日期均分 / "categoryId" 或 "areaId" 按取值拆分
+PARTITION_BY = None
+# 按日期分区时的分区数
+PARTITION_COUNT = 4
+# 按 categoryId/areaId 分区时的取值列表(须覆盖全部取值，否则会漏数据)
+PARTITION_VALUES = []
+# 并发下载数
+PARALLEL_DOWNLOADS = 4
+# RawData 保留: 根目录保留最近的 CSV 个数，其余按月压缩到 RawData/Archive (见 rawdata_retention)
+RAW_KEEP_HOT = 10
+# 归档时内容相同的文件只保留一份
+RAW_ARCHIVE_DEDUPE = True
+# 归档保留月数(None 表示不删除)
+RAW_ARCHIVE_KEEP_MONTHS = 12
+# 下载完成后等待文件稳定且 CSV 结尾完整的最长时间(秒)，就绪即继续
+FILE_READY_TIMEOUT = 30
+# 启动 Chrome 后等待调试接口(/json/version)应答的最长时间(秒)
+CHROME_START_TIMEOUT = 30
 SCRIPT_CALL_TIMEOUT = 900
+# 报表处理方式: inprocess(同进程调用 pending_review_report.run，省去解释器启动与 pandas 导入) /
+# subprocess(独立进程，崩溃隔离，受 SCRIPT_CALL_TIMEOUT 限制)，见 report_runner
+PROCESSOR_MODE = "inprocess"
 
 REUSE_EXISTING_CHROME = True
 CLOSE_CHROME_ON_EXIT = False
 
+# (定位方式, 值)，定位方式为 selenium By 常量的取值 (By.CSS_SELECTOR / By.LINK_TEXT)，避免导入时加载 selenium
 LOGGED_IN_ELEMENTS = [
-    By.CSS_SELECTOR, "#frmRequestAccess",
-    By.LINK_TEXT, "退出登录"
+    "css selector", "#frmRequestAccess",
+    "link text", "退出登录"
 ]
-ITC_DOMAIN = "itc-tool.pg.com"
+ITC_DOMAIN = urllib.parse.urlsplit(ITC_BASE_URL).hostname
 
 DRIVER_EXECUTABLE = "chromedriver.exe" if os.name == 'nt' else "chromedriver"
 ALLOW_INSECURE_SSL = True
@@ -88,13 +124,8 @@ def ensure_directory_exists(d):
     return d
 
 def log_message(msg):
-    ensure_directory_exists(LOG_DIR)
-    ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    log_file = os.path.join(LOG_DIR, f"itc_downloader_{datetime.now().strftime('%Y%m%d')}.log")
-    line = f"[{ts}] {msg}"
-    print(line)
-    with open(log_file, 'a', encoding='utf-8') as f:
-        f.write(line + "\n")
+    # 文件写入由 itc_logging 后台线程批量完成
+    get_logger("itc_downloader", LOG_DIR).log(msg)
 
 def pre_check_report_script():
     log_message("预检查 pending_review_report.py")
@@ -105,21 +136,31 @@ def pre_check_report_script():
     return False
 
 # -------------------------- ChromeDriver 管理 --------------------------
-try:
-    from Chrome_Driver_mgr import ChromeDriverManager
-    CHROME_DRIVER_MGR_AVAILABLE = True
-    chrome_driver_manager = ChromeDriverManager(
-        script_dir=SCRIPT_DIR,
-        allow_insecure_ssl=ALLOW_INSECURE_SSL,
-        log_callback=log_message
-    )
-    log_message("已加载 Chrome_Driver_mgr")
-except ImportError:
-    CHROME_DRIVER_MGR_AVAILABLE = False
-    chrome_driver_manager = None
-    log_message("未找到 Chrome_Driver_mgr，使用简化模式")
+# Chrome_Driver_mgr (依赖 requests/bs4) 在首次需要 Chrome/ChromeDriver 路径时才加载，None 表示尚未加载
+CHROME_DRIVER_MGR_AVAILABLE = None
+chrome_driver_manager = None
+
+def load_chrome_driver_manager():
+    global CHROME_DRIVER_MGR_AVAILABLE, chrome_driver_manager
+    if CHROME_DRIVER_MGR_AVAILABLE is not None:
+        return chrome_driver_manager
+    try:
+        from Chrome_Driver_mgr import ChromeDriverManager
+        chrome_driver_manager = ChromeDriverManager(
+            script_dir=SCRIPT_DIR,
+            allow_insecure_ssl=ALLOW_INSECURE_SSL,
+            log_callback=log_message
+        )
+        CHROME_DRIVER_MGR_AVAILABLE = True
+        log_message("已加载 Chrome_Driver_mgr")
+    except ImportError:
+        CHROME_DRIVER_MGR_AVAILABLE = False
+        chrome_driver_manager = None
+        log_message("未找到 Chrome_Driver_mgr，使用简化模式")
+    return chrome_driver_manager
 
 def get_chromedriver_path():
+    load_chrome_driver_manager()
     if CHROME_DRIVER_MGR_AVAILABLE and chrome_driver_manager:
         return chrome_driver_manager.get_chromedriver_path()
     p = os.path.join(SCRIPT_DIR, DRIVER_EXECUTABLE)
@@ -130,6 +171,7 @@ def get_chromedriver_path():
     return None
 
 def get_chrome_path():
+    load_chrome_driver_manager()
     if CHROME_DRIVER_MGR_AVAILABLE and chrome_driver_manager:
         return chrome_driver_manager.get_chrome_path()
     system = platform.system()
@@ -148,7 +190,14 @@ def get_chrome_path():
             return c
     return candidates[0]
 
-CHROME_PATH = get_chrome_path()
+# 首次启动/连接浏览器时由 resolve_chrome_path() 确定
+CHROME_PATH = None
+
+def resolve_chrome_path():
+    global CHROME_PATH
+    if CHROME_PATH is None:
+        CHROME_PATH = get_chrome_path()
+    return CHROME_PATH
 
 # -------------------------- 调试端口管理 --------------------------
 try:
@@ -178,21 +227,8 @@ def is_port_available(port):
         return False
 
 def check_existing_chrome_debug():
-    found = []
-    for p in range(PORT_START, PORT_END + 1):
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(0.5)
-                if s.connect_ex(('127.0.0.1', p)) == 0:
-                    try:
-                        r = requests.get(f"http://127.0.0.1:{p}/json", timeout=2)
-                        if r.status_code == 200:
-                            found.append(p)
-                    except:
-                        pass
-        except:
-            pass
-    return found[0] if found else None
+    # 并发探测整个端口范围，优先尝试上次可用的端口(见 chrome_port_probe)
+    return find_debug_port(range(PORT_START, PORT_END + 1), project=PROJECT_NAME, log_callback=log_message)
 
 def allocate_port():
     for p in range(PORT_START, PORT_END + 1):
@@ -207,7 +243,7 @@ def get_user_data_dir(port):
 
 def start_chrome_debug_session():
     global DEBUG_PORT, CHROME_USER_DATA_DIR
-    if not os.path.exists(CHROME_PATH):
+    if not os.path.exists(resolve_chrome_path()):
         log_message(f"Chrome 不存在: {CHROME_PATH}")
         return False
 
@@ -217,6 +253,8 @@ def start_chrome_debug_session():
             DEBUG_PORT = existing
             CHROME_USER_DATA_DIR = get_user_data_dir(existing)
             log_message(f"重用 Chrome 调试端口: {existing}")
+            # 复用的 Chrome 按命令行找到进程，纳入阶段资源统计
+            watch_cmdline(f"--remote-debugging-port={existing}")
             return True
 
     p = allocate_port()
@@ -233,9 +271,12 @@ def start_chrome_debug_session():
         "--no-default-browser-check",
         ITC_LOGIN_URL
     ]
-    subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    proc = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    watch_pid(proc.pid)
     log_message(f"启动 Chrome 调试会话 端口={p} 目录={CHROME_USER_DATA_DIR}")
-    time.sleep(6)
+    if not wait_for_devtools(p, timeout=CHROME_START_TIMEOUT, process=proc, log_callback=log_message):
+        return False
+    remember_port(p, project=PROJECT_NAME)
     return True
 
 # -------------------------- 登录检测 --------------------------
@@ -261,6 +302,10 @@ def wait_for_itc_login():
     chromedriver_path = get_chromedriver_path()
     if not chromedriver_path:
         return None
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+    from itc_login_watcher import LoginWatcher
     driver = None
     try:
         opt = Options()
@@ -273,6 +318,14 @@ def wait_for_itc_login():
         }
         opt.add_experimental_option("prefs", prefs)
         driver = webdriver.Chrome(service=Service(chromedriver_path), options=opt)
+        # 优先通过 CDP 页面跳转/Cookie 事件检测登录，Cookie 出现即继续；CDP 不可用时退回下面的轮询
+        logged_in = LoginWatcher(DEBUG_PORT, ITC_DOMAIN, cookie_names=LOGIN_COOKIE_NAMES,
+                                 log_callback=log_message).wait(LOGIN_TIMEOUT)
+        if logged_in:
+            return driver
+        if logged_in is False:
+            driver.quit()
+            return None
         start = time.time()
         while time.time() - start < LOGIN_TIMEOUT:
             if is_itc_logged_in(driver):
@@ -292,82 +345,99 @@ def wait_for_itc_login():
         return None
 
 # -------------------------- 报表下载 --------------------------
+def download_incremental(driver):
+    """增量模式: 同一会话下载日期窗口并合并到本地数据集，返回合并后的 CSV 路径"""
+    from incremental_export import IncrementalExporter
+    from report_fetcher import open_browser_session, fetch_report
+    exporter = IncrementalExporter(RAW_DATA_DIR, BASE_REPORT_URL, REPORT_PARAMS, TIME_RANGE_DAYS,
+                                   overlap_days=INCREMENTAL_OVERLAP_DAYS,
+                                   full_refresh_days=INCREMENTAL_FULL_REFRESH_DAYS,
+                                   recent_days=INCREMENTAL_RECENT_DAYS,
+                                   log_callback=log_message)
+    with open_browser_session(BASE_REPORT_URL, debug_port=DEBUG_PORT, driver=driver,
+                              verify=not ALLOW_INSECURE_SSL) as session:
+        return exporter.run(lambda url, dest_dir: fetch_report(url, dest_dir, session,
+                                                               log_callback=log_message).path)
+
+def download_partitioned(driver):
+    """分区并行下载: 同一会话并发下载各分区后拼接，返回 CSV 路径"""
+    from partitioned_export import fetch_partitioned
+    from report_fetcher import open_browser_session
+    with open_browser_session(BASE_REPORT_URL, debug_port=DEBUG_PORT, driver=driver,
+                              verify=not ALLOW_INSECURE_SSL, pool_size=PARALLEL_DOWNLOADS) as session:
+        merged_path, _ = fetch_partitioned(BASE_REPORT_URL, REPORT_PARAMS, RAW_DATA_DIR, session,
+                                           partition_by=PARTITION_BY, parts=PARTITION_COUNT,
+                                           values=PARTITION_VALUES, workers=PARALLEL_DOWNLOADS,
+                                           log_callback=log_message)
+    return merged_path
+
 def download_report(driver):
+    # 下载相关模块(requests/urllib3、watchdog 等)只在实际下载时导入
+    from report_fetcher import download_via_http
+    from download_watcher import DownloadWatcher
     log_message("开始下载报表")
     log_message(f"访问 URL: {REPORT_URL}")
     ensure_directory_exists(RAW_DATA_DIR)
-    watch_dirs = [RAW_DATA_DIR]
-    user_dl = os.path.join(os.environ.get("USERPROFILE", ""), "Downloads")
-    if os.path.exists(user_dl):
-        watch_dirs.append(user_dl)
-    initial = {}
-    for d in watch_dirs:
-        initial[d] = {f: os.path.getmtime(os.path.join(d, f))
-                      for f in os.listdir(d)
-                      if os.path.isfile(os.path.join(d, f)) and not f.endswith((".crdownload", ".tmp"))}
+    if DOWNLOAD_MODE in ("auto", "http"):
+        try:
+            # 复用浏览器登录 Cookie，直接流式下载(耗时≈纯传输时间)
+            if EXPORT_MODE == "incremental":
+                merged_path = download_incremental(driver)
+                log_message(f"增量合并完成: {merged_path}")
+                return True, merged_path
+            if PARTITION_BY:
+                merged_path = download_partitioned(driver)
+                log_message(f"分区下载完成: {merged_path} 大小 {os.path.getsize(merged_path)/1024/1024:.2f} MB")
+                return True, merged_path
+            result = download_via_http(REPORT_URL, RAW_DATA_DIR, debug_port=DEBUG_PORT, driver=driver,
+                                       verify=not ALLOW_INSECURE_SSL, log_callback=log_message)
+            log_message(f"下载完成: {result.path} 大小 {result.size/1024/1024:.2f} MB")
+            return True, result.path
+        except Exception as e:
+            if DOWNLOAD_MODE == "http":
+                log_message(f"❌ HTTP 直接下载失败: {e}")
+                return False, None
+            log_message(f"⚠️ HTTP 直接下载失败，改用浏览器下载: {e}")
+
+    # Chrome 直接下载到 RawData，由浏览器下载事件/文件系统事件通知完成(见 download_watcher)
+    watcher = DownloadWatcher(RAW_DATA_DIR, debug_port=DEBUG_PORT,
+                              extra_dirs=[os.path.join(os.environ.get("USERPROFILE", ""), "Downloads")],
+                              log_callback=log_message)
 
     try:
-        t0 = time.time()
+        watcher.start()
         driver.get(REPORT_URL)
-        log_message("下载请求已发出，轮询文件系统...")
-        found = None
-        while time.time() - t0 < DOWNLOAD_TIMEOUT:
-            for d in watch_dirs:
-                for f in os.listdir(d):
-                    fp = os.path.join(d, f)
-                    if (os.path.isfile(fp) and
-                        not f.endswith((".crdownload", ".tmp")) and
-                        os.path.getsize(fp) > 1024):
-                        is_new = (f not in initial.get(d, {})) or (os.path.getmtime(fp) > t0)
-                        if is_new:
-                            found = fp
-                            break
-                if found:
-                    break
-            if found:
-                break
-            time.sleep(3)
+        log_message("下载请求已发出，等待下载完成事件...")
+        found = watcher.wait(DOWNLOAD_TIMEOUT)
 
         if not found:
             log_message("下载超时, 未发现新文件")
             return False, None
 
-        if not found.startswith(RAW_DATA_DIR):
-            target = os.path.join(RAW_DATA_DIR, os.path.basename(found))
-            if os.path.exists(target):
-                stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                name, ext = os.path.splitext(os.path.basename(found))
-                target = os.path.join(RAW_DATA_DIR, f"{name}_{stamp}{ext}")
-            shutil.move(found, target)
-            found = target
         log_message(f"下载完成: {found} 大小 {os.path.getsize(found)/1024/1024:.2f} MB")
         return True, found
     except Exception as e:
         log_message(f"下载异常: {e}")
         return False, None
+    finally:
+        watcher.stop()
 
 # -------------------------- 复用逻辑 --------------------------
 def find_recent_csv(reuse_hours, min_size_kb):
+    # 查 RawData 清单(只 stat 目录，新增/变化的文件才分析内容)，只考虑解析状态正常的文件
     if not os.path.isdir(RAW_DATA_DIR):
         return None
-    now = time.time()
-    cutoff = now - reuse_hours * 3600
-    candidates = []
-    for f in os.listdir(RAW_DATA_DIR):
-        if not f.lower().endswith(".csv"):
-            continue
-        full = os.path.join(RAW_DATA_DIR, f)
-        try:
-            stat = os.path.getmtime(full)
-            size_kb = os.path.getsize(full) / 1024.0
-            if stat >= cutoff and size_kb >= min_size_kb:
-                candidates.append((stat, full, size_kb))
-        except:
-            continue
-    if not candidates:
+    manifest = RawDataManifest(RAW_DATA_DIR, log_callback=log_message)
+    manifest.sync()
+    return manifest.latest(max_age_hours=reuse_hours, min_size_kb=min_size_kb)
+
+def record_download(csv_path, seconds, source):
+    """下载完成后登记到 RawData 清单，返回条目(失败返回 None，不影响后续处理)"""
+    try:
+        return RawDataManifest(RAW_DATA_DIR, log_callback=log_message).record(csv_path, seconds, source)
+    except Exception as e:
+        log_message(f"清单登记失败: {e}")
         return None
-    candidates.sort(key=lambda x: x[0], reverse=True)
-    return candidates[0][1]
 
 # -------------------------- 调用处理脚本 --------------------------
 def call_report_processor(csv_path):
@@ -378,46 +448,99 @@ def call_report_processor(csv_path):
     if not os.path.exists(csv_path):
         log_message("CSV 不存在")
         return False
-    cmd = [sys.executable, REPORT_PROCESSOR_SCRIPT, "--csv-path", csv_path]
-    log_message("执行命令: " + " ".join(cmd))
-    try:
-        r = subprocess.run(
-            cmd,
-            cwd=SCRIPT_DIR,
-            text=True,
-            encoding='utf-8',  # 显式指定 UTF-8 编码，避免系统默认 GBK 导致解码错误
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=SCRIPT_CALL_TIMEOUT
-        )
-        log_message("处理脚本输出开始 >>>")
-        if r.stdout:
-            for ln in r.stdout.splitlines():
-                log_message(f"[OUT] {ln}")
-        if r.stderr:
-            for ln in r.stderr.splitlines():
-                log_message(f"[ERR] {ln}")
-        log_message("处理脚本输出结束 <<<")
-        log_message(f"处理脚本返回码: {r.returncode}")
-        return r.returncode == 0
-    except subprocess.TimeoutExpired:
-        log_message("处理脚本执行超时")
-        return False
-    except Exception as e:
-        log_message(f"调用处理脚本异常: {e}")
-        return False
+    log_message("处理脚本输出开始 >>>")
+    # 返回 ReportResult (结构化结果，bool 值表示是否成功)
+    # inprocess 时处理脚本的阶段并入本次运行的计时树；subprocess 时子进程沿用 run_id 单独写计时树
+    with span("report", mode=PROCESSOR_MODE):
+        result = run_report(csv_path, mode=PROCESSOR_MODE, log_dir=LOG_DIR, timeout=SCRIPT_CALL_TIMEOUT,
+                            log_callback=log_message, script=REPORT_PROCESSOR_SCRIPT)
+    log_message("处理脚本输出结束 <<<")
+    log_message(f"处理脚本返回码: {result.exit_code}")
+    return result
 
 # -------------------------- 主流程 --------------------------
-if __name__ == "__main__":
+def refresh_report_window():
+    """按当前日期重算导出日期范围(常驻进程跨天运行时使用)"""
+    global end_date, start_date, REPORT_URL
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=TIME_RANGE_DAYS)
+    REPORT_PARAMS["dateRange"] = f"{start_date.strftime('%m/%d/%Y')} - {end_date.strftime('%m/%d/%Y')}"
+    REPORT_URL = f"{BASE_REPORT_URL}?{urllib.parse.urlencode(REPORT_PARAMS)}"
+
+def connect_logged_in_driver(driver=None):
+    """优先复用仍已登录的 driver；否则连接/启动调试 Chrome 并等待登录，失败返回 None"""
+    if driver is not None:
+        with span("login_check"):
+            logged_in = is_itc_logged_in(driver)
+        if logged_in:
+            log_message("复用已登录的浏览器会话")
+            return driver
+        try:
+            driver.quit()
+        except:
+            pass
+    chromedriver_path = get_chromedriver_path()
+    if not chromedriver_path:
+        log_message("无法获取 Chromedriver")
+        return None
+    if not os.path.exists(resolve_chrome_path()):
+        log_message(f"Chrome 不存在: {CHROME_PATH}")
+        return None
+    with span("chrome_launch"):
+        started = start_chrome_debug_session()
+    if not started:
+        log_message("启动调试会话失败")
+        return None
+    with span("login_wait"):
+        driver = wait_for_itc_login()
+    if not driver:
+        log_message("登录失败或超时")
+    return driver
+
+def close_chrome():
+    if CLOSE_CHROME_ON_EXIT and DEBUG_PORT is not None:
+        try:
+            if platform.system() == "Windows":
+                subprocess.run(['taskkill', '/F', '/IM', 'chrome.exe'], timeout=10)
+            else:
+                subprocess.run(['pkill', '-f', f'remote-debugging-port={DEBUG_PORT}'], timeout=10)
+            log_message(f"已尝试关闭 Chrome (端口 {DEBUG_PORT})")
+        except Exception as e:
+            log_message(f"关闭 Chrome 失败: {e}")
+    else:
+        if DEBUG_PORT is not None:
+            log_message(f"Chrome 调试会话保持运行 (端口 {DEBUG_PORT})")
+
+def run_once(force_download=None, driver=None, keep_driver=False):
+    """
+    执行一次 下载(或复用) -> 处理 -> 发送 流程，返回摘要 dict
+    driver: 常驻进程传入上次保留的 driver，仍登录时跳过端口探测与登录等待
+    keep_driver: True 时不关闭 driver，通过 summary["driver"] 返回供下次使用
+    各阶段耗时与资源写入 Log/trace_<run_id>_itc_run.txt 与 trace_history.jsonl (见 itc_trace)
+    """
+    with trace_run("itc_run", LOG_DIR, log_callback=log_message) as root:
+        summary = _run_once(force_download, driver, keep_driver)
+        root.set(exit_code=summary["exit_code"])
+    summary["run_id"] = root.run_id
+    # 各阶段 CPU/内存/IO 及 Chrome 进程资源
+    summary["resources"] = root.stage_resources()
+    return summary
+
+def _run_once(force_download, driver, keep_driver):
+    if force_download is None:
+        force_download = FORCE_NEW_DOWNLOAD
     start = datetime.now()
+    refresh_report_window()
     log_message("="*70)
     log_message("ITC 报表自动下载器 (优化版)")
     log_message(f"启动时间: {start.strftime('%Y-%m-%d %H:%M:%S')}")
-    log_message(f"配置: TIME_RANGE_DAYS={TIME_RANGE_DAYS} REUSE_WINDOW_HOURS={REUSE_WINDOW_HOURS} FORCE_NEW_DOWNLOAD={FORCE_NEW_DOWNLOAD}")
+    log_message(f"配置: TIME_RANGE_DAYS={TIME_RANGE_DAYS} REUSE_WINDOW_HOURS={REUSE_WINDOW_HOURS} FORCE_NEW_DOWNLOAD={force_download}")
     log_message("="*70)
+    summary = {"exit_code": 1, "proc_ok": False, "performed_download": False, "reused_csv": None,
+               "csv_path": None, "result": None, "driver": driver if keep_driver else None}
 
     if not pre_check_report_script():
-        sys.exit(1)
+        return summary
 
     ensure_directory_exists(ITC_REPORT_DIR)
     ensure_directory_exists(RAW_DATA_DIR)
@@ -425,7 +548,7 @@ if __name__ == "__main__":
 
     # 复用判定
     reused_csv = None
-    if not FORCE_NEW_DOWNLOAD:
+    if not force_download:
         reused_csv = find_recent_csv(REUSE_WINDOW_HOURS, MIN_CSV_SIZE_KB)
         if reused_csv:
             log_message(f"发现可复用CSV: {reused_csv} (修改时间<={REUSE_WINDOW_HOURS}h)")
@@ -434,73 +557,73 @@ if __name__ == "__main__":
 
     proc_ok = False
     performed_download = False
+    csv_file = None
 
-    if reused_csv and not FORCE_NEW_DOWNLOAD:
+    if reused_csv and not force_download:
         log_message("选择复用模式 -> 跳过下载阶段")
+        csv_file = reused_csv
         # 可选验证登录
         if VERIFY_LOGIN_WHEN_REUSE:
             log_message("复用模式下验证登录已开启，尝试连接 Chrome")
-            chromedriver_path = get_chromedriver_path()
-            if chromedriver_path and start_chrome_debug_session():
-                driver = wait_for_itc_login()
-                if driver:
-                    try:
-                        driver.quit()
-                    except:
-                        pass
+            driver = connect_logged_in_driver(driver)
+            if driver and not keep_driver:
+                try:
+                    driver.quit()
+                except:
+                    pass
+                driver = None
         proc_ok = call_report_processor(reused_csv)
     else:
-        chromedriver_path = get_chromedriver_path()
-        if not chromedriver_path:
-            log_message("无法获取 Chromedriver, 退出")
-            sys.exit(1)
-
-        if not os.path.exists(CHROME_PATH):
-            log_message(f"Chrome 不存在: {CHROME_PATH}")
-            sys.exit(1)
-
-        if not start_chrome_debug_session():
-            log_message("启动调试会话失败")
-            sys.exit(1)
-
-        driver = wait_for_itc_login()
+        driver = connect_logged_in_driver(driver)
         if not driver:
-            log_message("登录失败或超时")
-            sys.exit(1)
+            summary["driver"] = None
+            return summary
 
-        ok, csv_file = download_report(driver)
+        t_download = time.perf_counter()
+        with span("download", mode=DOWNLOAD_MODE):
+            ok, csv_file = download_report(driver)
+        download_seconds = time.perf_counter() - t_download
         performed_download = ok
-        try:
-            driver.quit()
-        except:
-            pass
+        if not keep_driver:
+            try:
+                driver.quit()
+            except:
+                pass
+            driver = None
 
         if ok and csv_file:
-            log_message(f"等待 {POST_DOWNLOAD_WAIT}s 确保文件稳定")
-            time.sleep(POST_DOWNLOAD_WAIT)
+            with span("file_ready"):
+                ready = wait_for_file_ready(csv_file, timeout=FILE_READY_TIMEOUT, log_callback=log_message)
+            if not ready:
+                log_message("下载文件未就绪，不调用处理脚本")
+                ok = False
+        if ok and csv_file:
+            with span("rawdata"):
+                record_download(csv_file, download_seconds, DOWNLOAD_MODE)
+                compact_rawdata(RAW_DATA_DIR, keep_hot=RAW_KEEP_HOT, dedupe=RAW_ARCHIVE_DEDUPE,
+                                keep_archive_months=RAW_ARCHIVE_KEEP_MONTHS, log_callback=log_message)
             proc_ok = call_report_processor(csv_file)
         else:
             log_message("下载失败，不调用处理脚本")
             proc_ok = False
 
-    # 可选关闭 Chrome
-    if CLOSE_CHROME_ON_EXIT and DEBUG_PORT is not None:
-        try:
-            if platform.system() == "Windows":
-                subprocess.run(['taskkill', '/F', '/IM', 'chrome.exe'], timeout=10)
-            else:
-                subprocess.run(['pkill', '-f', f'remote-debugging-port={DEBUG_PORT}'], timeout=10)
-            log_message(f"已尝试关闭 Chrome (端口 {DEBUG_PORT})")
-        except Exception as e:
-            log_message(f"关闭 Chrome 失败: {e}")
-    else:
-        if DEBUG_PORT is not None:
-            log_message(f"Chrome 调试会话保持运行 (端口 {DEBUG_PORT})")
-
     end = datetime.now()
     dur = (end - start).total_seconds()
     log_message(f"结束时间: {end.strftime('%Y-%m-%d %H:%M:%S')}")
     log_message(f"总耗时: {dur:.2f} 秒")
-    log_message(f"流程摘要: performed_download={performed_download} reused_csv={'YES' if reused_csv else 'NO'} proc_ok={proc_ok}")
+    log_message(f"流程摘要: performed_download={performed_download} reused_csv={'YES' if reused_csv else 'NO'} proc_ok={bool(proc_ok)}")
     log_message("="*70)
-    sys.exit(0 if proc_ok else 2)
\ No newline at end of file
+    summary.update({"exit_code": 0 if proc_ok else 2, "proc_ok": bool(proc_ok),
+                    "performed_download": performed_download, "reused_csv": reused_csv, "csv_path": csv_file,
+                    "result": proc_ok if proc_ok is not False else None, "seconds": dur,
+                    "driver": driver if keep_driver else None})
+    return summary
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="ITC 报表自动下载器: 下载(或复用最近的CSV) -> 处理 -> 发送")
+    parser.add_argument("--force", action="store_true", help="忽略复用窗口，强制重新下载")
+    args = parser.parse_args()
+    summary = run_once(force_download=True if args.force else None)
+    close_chrome()
+    sys.exit(summary["exit_code"])
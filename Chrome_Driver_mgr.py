@@ -17,6 +17,8 @@ import socket
 import tempfile
 from datetime import datetime
 from bs4 import BeautifulSoup
+from readiness import wait_for_devtools
+from itc_resources import watch_pid
 
 # 导入项目端口配置
 try:
@@ -223,11 +225,11 @@ class ChromeDriverManager:
                 shell=False
             )
             
-            # 等待Chrome启动
-            time.sleep(3)
+            # 等待调试接口可用(进程异常退出时立即返回)
+            ready = wait_for_devtools(self.remote_debug_port, process=chrome_process, log_callback=self.log)
             
             # 检查进程是否正常启动
-            if chrome_process.poll() is not None:
+            if not ready and chrome_process.poll() is not None:
                 stdout, stderr = chrome_process.communicate()
                 self.log(f"❌ Chrome启动失败")
                 self.log(f"   stdout: {stdout.decode('utf-8', errors='ignore')}")
@@ -235,6 +237,8 @@ class ChromeDriverManager:
                 return None
             
             self.log(f"✅ Chrome远程调试实例启动成功 [PID: {chrome_process.pid}]")
+            # Chrome 及其子进程的 CPU/内存计入当前阶段资源统计
+            watch_pid(chrome_process.pid)
             
             return {
                 'process': chrome_process,
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+报表处理热点函数的微基准 (pending_review_report)
+- 数据: synthetic_export 按行数/seed 生成的合成导出 (固定参考日期，结果可复现)
+- 每个用例在每种数据规模下重复 --repeat 次，记录 min/median/mean 及每行耗时
+- 结果 JSON 带机器信息 (Python/pandas/numpy 版本、平台、CPU)；--baseline 与保存的基线按中位数对比，
+  超过 --threshold 倍判为回归 (返回码 1)
+- 基准期间 log_message 静默 (不测控制台/日志写入)，cc1 使用内置的站点配置
+
+用法:
+    python bench_analysis.py --sizes 1000,10000,50000 --json bench.json
+    python bench_analysis.py --save-baseline bench_baseline.json
+    python bench_analysis.py --baseline bench_baseline.json --threshold 1.2
+    python bench_analysis.py --cases process_pending_requests,generate_email_html --sizes 20000
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import date, datetime
+
+import pandas as pd
+import numpy as np
+
+import pending_review_report as prr
+from synthetic_export import generate_export, AREAS
+
+RESULT_SCHEMA_VERSION = 1
+DEFAULT_SIZES = (1000, 10000, 50000)
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 1.2
+# 合成数据的参考日期 (到期日/剩余天数相对此日期)
+REFERENCE_DATE = date(2026, 1, 15)
+PENDING = "Pending review任务提醒"
+REVOKED = "Revoked状态任务提醒"
+
+BENCH_CONFIG = {
+    "reports": {
+        PENDING: {"recipients": ["itc.owner@pg.com"], "cc": ["itc.manager@pg.com"],
+                  "cc1": {site: [f"{site.lower()}.lead@pg.com"] for site, _ in AREAS}},
+        REVOKED: {"recipients": ["itc.owner@pg.com"], "cc": [],
+                  "cc1": {site: [f"{site.lower()}.lead@pg.com"] for site, _ in AREAS}},
+    },
+    "Teams": {"webhook_url": ""},
+}
+# 与 run(config=dict) 相同的合并方式；用例显式传入，不替换 prr.CONFIG
+CONFIG = prr._build_config(BENCH_CONFIG)
+
+
+def machine_info():
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "node": platform.node(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+    }
+
+
+# -------------------------- 用例 --------------------------
+# 每个用例: (准备函数, 计时函数)。准备函数在计时外执行一次，返回计时函数的输入；
+# 计时函数会修改输入时由 fresh 在每次重复前生成新副本(不计时)
+
+def _split(df):
+    """与 analyze_requests 相同的过滤"""
+    base = df["System/Solution"].notna() & df["Request For"].notna() & df["Category"].notna()
+    pending = df[(df["Status"] == "Pending Review") & base].copy()
+    revoked = df[df["Status"].str.contains("Revoked", case=False, na=False) & base].copy()
+    return pending, revoked
+
+
+class Dataset:
+    """一种规模的数据及各阶段中间结果(按需计算并缓存)"""
+
+    def __init__(self, rows, seed, work_dir):
+        self.rows = rows
+        self.raw_dir = os.path.join(work_dir, f"rows_{rows}", "RawData")
+        self.csv_path = os.path.join(self.raw_dir, f"bench_{rows}_s{seed}.csv")
+        self.stats = generate_export(self.csv_path, rows=rows, seed=seed, today=REFERENCE_DATE,
+                                     mojibake_ratio=0.02)
+        self._cache = {}
+
+    def get(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    @property
+    def df(self):
+        return self.get("df", lambda: prr.load_and_process_data(self.csv_path))
+
+    @property
+    def raw_df(self):
+        return self.get("raw_df", lambda: pd.read_csv(self.csv_path, encoding="utf-8-sig", dtype=str,
+                                                      na_values=["", " ", "NA"], keep_default_na=True))
+
+    @property
+    def pending_df(self):
+        return self.get("split", lambda: _split(self.df))[0]
+
+    @property
+    def revoked_df(self):
+        return self.get("split", lambda: _split(self.df))[1]
+
+    @property
+    def pending_report(self):
+        return self.get("pending_report",
+                        lambda: prr.process_pending_requests(self.pending_df.copy(), REFERENCE_DATE, CONFIG))
+
+    @property
+    def revoked_report(self):
+        return self.get("revoked_report",
+                        lambda: prr.process_revoked_requests(self.revoked_df.copy(), REFERENCE_DATE, CONFIG))
+
+
+def _first_rows(ds):
+    return ds.get("first_rows", lambda: [r for _, r in ds.df.groupby("request_group").head(1).iterrows()])
+
+
+def _email_html(report):
+    return prr.generate_email_html(report["table"], REFERENCE_DATE.isoformat(), report["total_count"],
+                                   report["type"], report["recipients"], report["cc"], CONFIG)
+
+
+CASES = {
+    "detect_file_encoding": {
+        "prepare": lambda ds: ds.csv_path,
+        "run": prr.detect_file_encoding,
+    },
+    "load_and_process_data": {
+        "prepare": lambda ds: ds.csv_path,
+        "run": prr.load_and_process_data,
+    },
+    "apply_mojibake_fix": {
+        "prepare": lambda ds: ds.raw_df,
+        "fresh": lambda df: df.copy(),
+        "run": prr.apply_mojibake_fix,
+    },
+    "extract_site_tokens": {
+        "prepare": _first_rows,
+        "run": lambda rows: [prr.extract_site_tokens(r) for r in rows],
+    },
+    "match_cc1_emails_by_sites": {
+        "prepare": lambda ds: [it["SiteTokens"] for it in ds.pending_report["items"] + ds.revoked_report["items"]],
+        "run": lambda tokens: [prr.match_cc1_emails_by_sites(t, PENDING, CONFIG) for t in tokens],
+    },
+    "process_pending_requests": {
+        "prepare": lambda ds: ds.pending_df,
+        "fresh": lambda df: df.copy(),
+        "run": lambda df: prr.process_pending_requests(df, REFERENCE_DATE, CONFIG),
+    },
+    "process_revoked_requests": {
+        "prepare": lambda ds: ds.revoked_df,
+        "fresh": lambda df: df.copy(),
+        "run": lambda df: prr.process_revoked_requests(df, REFERENCE_DATE, CONFIG),
+    },
+    "generate_email_html": {
+        "prepare": lambda ds: [ds.pending_report, ds.revoked_report],
+        "run": lambda reports: [_email_html(r) for r in reports],
+    },
+    "build_teams_markdown": {
+        "prepare": lambda ds: [ds.pending_report, ds.revoked_report],
+        "run": lambda reports: [prr.build_teams_markdown(r, r["type"], CONFIG) for r in reports],
+    },
+}
+
+
+def bench_case(name, ds, repeat):
+    case = CASES[name]
+    arg = case["prepare"](ds)
+    fresh = case.get("fresh")
+    times = []
+    for _ in range(repeat):
+        x = fresh(arg) if fresh else arg
+        t0 = time.perf_counter()
+        case["run"](x)
+        times.append(time.perf_counter() - t0)
+    median = statistics.median(times)
+    return {
+        "case": name,
+        "rows": ds.rows,
+        "repeat": repeat,
+        "min": round(min(times), 6),
+        "median": round(median, 6),
+        "mean": round(statistics.fmean(times), 6),
+        "per_row_us": round(median / ds.rows * 1e6, 3),
+    }
+
+
+def run(sizes=DEFAULT_SIZES, cases=None, repeat=DEFAULT_REPEAT, seed=0, progress=None):
+    """返回结果 dict (写 JSON 的内容)；progress(result) 在每个用例完成后调用"""
+    cases = list(cases or CASES)
+    saved_log = prr.log_message
+    work_dir = tempfile.mkdtemp(prefix="itc_bench_")
+    results = []
+    datasets = []
+    try:
+        prr.log_message = lambda msg, log_dir: None
+        for rows in sizes:
+            ds = Dataset(rows, seed, work_dir)
+            datasets.append({"rows": rows, "groups": ds.stats["groups"], "pending": ds.stats["pending"],
+                             "revoked": ds.stats["revoked"], "bytes": ds.stats["bytes"]})
+            for name in cases:
+                r = bench_case(name, ds, repeat)
+                results.append(r)
+                if progress:
+                    progress(r)
+    finally:
+        prr.log_message = saved_log
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "schema_version": RESULT_SCHEMA_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": machine_info(),
+        "seed": seed,
+        "repeat": repeat,
+        "datasets": datasets,
+        "results": results,
+    }
+
+
+# -------------------------- 基线对比 --------------------------
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """按 (用例, 行数) 对比中位数，返回 [(用例, 行数, 基线, 本次, 倍数, 是否回归)]，回归在前"""
+    base = {(r["case"], r["rows"]): r for r in baseline.get("results", [])}
+    rows = []
+    for r in report["results"]:
+        b = base.get((r["case"], r["rows"]))
+        if not b:
+            continue
+        ratio = r["median"] / b["median"] if b["median"] > 0 else float("inf")
+        rows.append((r["case"], r["rows"], b["median"], r["median"], ratio, ratio >= threshold))
+    rows.sort(key=lambda x: (not x[5], -x[4]))
+    return rows
+
+
+def machine_differences(report, baseline):
+    """影响可比性的机器信息差异 {字段: (基线, 本次)}"""
+    keys = ("python", "platform", "processor", "cpu_count", "pandas", "numpy")
+    a, b = baseline.get("machine", {}), report["machine"]
+    return {k: (a.get(k), b.get(k)) for k in keys if a.get(k) != b.get(k)}
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="pending_review_report 热点函数微基准")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="逗号分隔的 CSV 行数")
+    parser.add_argument("--cases", default="", help=f"逗号分隔，默认全部: {','.join(CASES)}")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="结果写入 JSON 文件")
+    parser.add_argument("--save-baseline", help="结果另存为基线文件")
+    parser.add_argument("--baseline", help="与基线文件对比")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="中位数超过基线该倍数判为回归")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()] or list(CASES)
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"未知用例: {unknown}")
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print(f"{'用例':<28}{'行数':>8}{'中位数(s)':>12}{'最小(s)':>12}{'µs/行':>10}")
+    report = run(sizes, cases, args.repeat, args.seed,
+                 progress=lambda r: print(f"{r['case']:<28}{r['rows']:>8}{r['median']:>12.4f}"
+                                          f"{r['min']:>12.4f}{r['per_row_us']:>10.2f}", flush=True))
+
+    for path in (args.json_path, args.save_baseline):
+        if path:
+            _write_json(path, report)
+            print(f"结果已写入: {os.path.abspath(path)}")
+
+    if baseline is None:
+        return 0
+    diffs = machine_differences(report, baseline)
+    if diffs:
+        print("⚠️ 与基线的运行环境不同，对比仅供参考:")
+        for k, (a, b) in diffs.items():
+            print(f"   {k}: {a} -> {b}")
+    rows = compare(report, baseline, args.threshold)
+    print(f"\n对比基线 {baseline.get('created_at', '')} (阈值 x{args.threshold:.2f}):")
+    for case, n, base_s, cur_s, ratio, regressed in rows:
+        flag = "❌" if regressed else ("✅" if ratio <= 1 / args.threshold else "  ")
+        print(f"{flag} {case:<28}{n:>8}  {base_s:10.4f}s -> {cur_s:10.4f}s  x{ratio:.2f}")
+    regressions = [r for r in rows if r[5]]
+    if regressions:
+        print(f"❌ {len(regressions)} 项回归")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+端到端流水线基准: 下载器 (rev2) -> 报表处理 -> 邮件/Teams 发送，全部在本机完成
+- ITC 站点: itc_standin_server (合成导出，可配置延迟与带宽)，通过 ITC_BASE_URL 指向替身
+- 浏览器: StandinBrowser 代替已登录的调试 Chrome (向替身服务器登录后提供 Cookie/User-Agent，
+  与下载器从 Chrome 取 Cookie 的 driver 接口一致)，下载方式固定为 http
+- 邮件: EMAIL_TRANSPORT=fake (outlook_fake)；Teams: Webhook 指向替身服务器
+- 代码复制到临时沙箱目录运行，email_config.json / teams_config.json / a_results.json / ITC report 均在沙箱内，
+  不影响本目录
+- 每个 worker 是一个新进程: 第 1 次运行为冷启动(导入 pandas、建立连接、首次加载配置)，之后为热运行
+- 各阶段耗时取自 itc_trace 计时树 (trace_history.jsonl)
+
+用法:
+    python bench_pipeline.py --rows 50000 --cold 3 --warm 3
+    python bench_pipeline.py --rows 200000 --latency 0.3 --bandwidth 4MB --processor subprocess --json pipe.json
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULT_MARKER = "BENCH_PIPELINE_RESULT "
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/130.0 bench_pipeline"
+
+
+# -------------------------- worker (沙箱子进程内) --------------------------
+class StandinBrowser:
+    """已登录调试 Chrome 的替身: 提供下载器用到的 driver 接口"""
+
+    def __init__(self, base_url, cookies):
+        self.current_url = base_url + "/RequestAccess"
+        self._cookies = cookies
+
+    def execute_cdp_cmd(self, cmd, params):
+        if cmd == "Network.getAllCookies":
+            return {"cookies": list(self._cookies)}
+        raise NotImplementedError(cmd)
+
+    def execute_script(self, script, *args):
+        return USER_AGENT
+
+    def find_element(self, by, value):
+        raise LookupError(value)
+
+    def get(self, url):
+        raise RuntimeError("StandinBrowser 不支持浏览器下载")
+
+    def quit(self):
+        pass
+
+
+def _browser_login(base_url):
+    """模拟用户在浏览器中登录替身站点，返回 Cookie 列表"""
+    import requests
+    from urllib.parse import urlsplit
+
+    with requests.Session() as s:
+        resp = s.post(base_url + "/Account/Login", data={"username": "bench", "password": ""},
+                      allow_redirects=False, timeout=30)
+        if resp.status_code != 302:
+            raise RuntimeError(f"替身服务器登录失败: HTTP {resp.status_code}")
+        host = urlsplit(base_url).hostname
+        return [{"name": c.name, "value": c.value, "domain": host, "path": c.path or "/"} for c in s.cookies]
+
+
+def worker(runs, processor):
+    t0 = time.perf_counter()
+    import BatRun_ITCreport_downloader_rev2 as dl
+    import_seconds = time.perf_counter() - t0
+    from itc_trace import load_history
+    from itc_logging import flush
+
+    dl.DOWNLOAD_MODE = "http"
+    dl.PROCESSOR_MODE = processor
+    t0 = time.perf_counter()
+    browser = StandinBrowser(dl.ITC_BASE_URL, _browser_login(dl.ITC_BASE_URL))
+    login_seconds = time.perf_counter() - t0
+    out = []
+    for i in range(runs):
+        t0 = time.perf_counter()
+        summary = dl.run_once(force_download=True, driver=browser, keep_driver=True)
+        wall = time.perf_counter() - t0
+        entry = next((e for e in load_history(dl.LOG_DIR, "itc_run") if e["run_id"] == summary["run_id"]), {})
+        result = summary.get("result")
+        out.append({"run": i, "kind": "cold" if i == 0 else "warm", "wall": round(wall, 4),
+                    "exit_code": summary["exit_code"], "stages": entry.get("stages", {}),
+                    "pending": getattr(result, "pending_count", None),
+                    "revoked": getattr(result, "revoked_count", None)})
+    flush()
+    print(RESULT_MARKER + json.dumps({"import_seconds": round(import_seconds, 4),
+                                      "login_seconds": round(login_seconds, 4), "runs": out}, ensure_ascii=False),
+          flush=True)
+    return 0 if all(r["exit_code"] == 0 for r in out) else 1
+
+
+# -------------------------- 沙箱 --------------------------
+def _write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+
+
+def prepare_sandbox(server, sandbox):
+    """复制代码并写入指向替身服务器/假邮件通道的配置"""
+    for path in glob.glob(os.path.join(SCRIPT_DIR, "*.py")):
+        shutil.copy2(path, sandbox)
+    with open(os.path.join(SCRIPT_DIR, "email_config.json.example"), "r", encoding="utf-8") as f:
+        email_cfg = json.load(f)
+    email_cfg.setdefault("system_config", {}).update({
+        "EMAIL_ENABLED": True, "EMAIL_TRANSPORT": "fake", "EMAIL_VERIFY_SENT": False,
+    })
+    email_cfg["Teams"] = {"webhook_url": server.webhook_url("fallback")}
+    _write_json(os.path.join(sandbox, "email_config.json"), email_cfg)
+    with open(os.path.join(SCRIPT_DIR, "teams_config.json.example"), "r", encoding="utf-8") as f:
+        teams_cfg = json.load(f)
+    teams_cfg["enabled"] = True
+    teams_cfg["webhooks"] = {name: server.webhook_url(name) for name in teams_cfg.get("webhooks", {})}
+    _write_json(os.path.join(sandbox, "teams_config.json"), teams_cfg)
+
+
+def run_worker(sandbox, base_url, runs, processor, timeout):
+    env = dict(os.environ, ITC_BASE_URL=base_url, PYTHONIOENCODING="utf-8")
+    env.pop("ITC_RUN_ID", None)
+    t0 = time.perf_counter()
+    r = subprocess.run([sys.executable, os.path.join(sandbox, "bench_pipeline.py"), "--worker",
+                        "--runs", str(runs), "--processor", processor],
+                       cwd=sandbox, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                       text=True, encoding="utf-8", errors="replace", timeout=timeout)
+    process_seconds = time.perf_counter() - t0
+    for ln in reversed(r.stdout.splitlines()):
+        if ln.startswith(RESULT_MARKER):
+            data = json.loads(ln[len(RESULT_MARKER):])
+            data["process_seconds"] = round(process_seconds, 4)
+            data["returncode"] = r.returncode
+            return data
+    tail = "\n".join((r.stdout + r.stderr).splitlines()[-20:])
+    raise RuntimeError(f"worker 未返回结果 (返回码 {r.returncode}):\n{tail}")
+
+
+def _stats(values):
+    return {"median": round(statistics.median(values), 4), "min": round(min(values), 4),
+            "max": round(max(values), 4), "n": len(values)}
+
+
+def aggregate(workers):
+    """按 冷/热 汇总各阶段耗时"""
+    out = {}
+    for kind in ("cold", "warm"):
+        runs = [r for w in workers for r in w["runs"] if r["kind"] == kind]
+        if not runs:
+            continue
+        stages = {}
+        for r in runs:
+            for stage, sec in r["stages"].items():
+                stages.setdefault(stage, []).append(sec)
+        out[kind] = {"runs": len(runs), "wall": _stats([r["wall"] for r in runs]),
+                     "stages": {k: _stats(v) for k, v in stages.items()}}
+    out["startup"] = {
+        "process": _stats([w["process_seconds"] - sum(r["wall"] for r in w["runs"]) for w in workers]),
+        "import_downloader": _stats([w["import_seconds"] for w in workers]),
+        "browser_login": _stats([w["login_seconds"] for w in workers]),
+    }
+    return out
+
+
+def run(rows=20000, seed=0, latency=0.0, bandwidth=None, cold=2, warm=2, processor="inprocess", timeout=1800,
+        progress=None):
+    from itc_standin_server import StandinITCServer
+
+    sandbox = tempfile.mkdtemp(prefix="itc_pipeline_")
+    try:
+        with StandinITCServer(rows=rows, seed=seed, latency=latency, bandwidth=bandwidth) as server:
+            server.export_body()
+            prepare_sandbox(server, sandbox)
+            workers = []
+            for i in range(cold):
+                w = run_worker(sandbox, server.base_url, 1 + warm, processor, timeout)
+                workers.append(w)
+                if progress:
+                    progress(i, w)
+            counters = {"logins": server.logins, "exports": server.exports, "bytes_sent": server.bytes_sent,
+                        "webhook_posts": len(server.webhook_posts)}
+            export_bytes = len(server.export_body()[0])
+    finally:
+        shutil.rmtree(sandbox, ignore_errors=True)
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "processor": platform.processor(), "cpu_count": os.cpu_count()},
+        "config": {"rows": rows, "seed": seed, "latency": latency, "bandwidth": bandwidth, "cold": cold,
+                   "warm": warm, "processor": processor, "export_bytes": export_bytes},
+        "server": counters,
+        "summary": aggregate(workers),
+        "workers": workers,
+    }
+
+
+def print_report(report):
+    s = report["summary"]
+    cfg = report["config"]
+    print(f"\n导出 {cfg['rows']} 行 ({cfg['export_bytes'] / 1048576:.1f} MB)，延迟 {cfg['latency']}s，"
+          f"限速 {cfg['bandwidth'] or '无'}，处理方式 {cfg['processor']}")
+    st = s["startup"]
+    print(f"进程启动+导入下载器: {st['process']['median']:.3f}s (其中导入 {st['import_downloader']['median']:.3f}s)，"
+          f"浏览器登录 {st['browser_login']['median']:.3f}s")
+    stages = list(dict.fromkeys(k for kind in ("cold", "warm") if kind in s for k in s[kind]["stages"]))
+    print(f"{'阶段':<60}{'冷(中位数)':>12}{'热(中位数)':>12}")
+    for stage in stages:
+        cells = []
+        for kind in ("cold", "warm"):
+            v = s.get(kind, {}).get("stages", {}).get(stage)
+            cells.append(f"{v['median']:>11.3f}s" if v else f"{'-':>12}")
+        depth = stage.count("/")
+        print(f"{'  ' * depth + stage.rsplit('/', 1)[-1]:<60}{''.join(cells)}")
+    srv = report["server"]
+    print(f"替身服务器: 登录 {srv['logins']} 次，导出 {srv['exports']} 次，发送 {srv['bytes_sent'] / 1048576:.1f} MB，"
+          f"Webhook {srv['webhook_posts']} 次")
+
+
+def main(argv=None):
+    from itc_standin_server import parse_bandwidth
+
+    parser = argparse.ArgumentParser(description="下载-处理-发送端到端基准 (本地 ITC 替身)")
+    parser.add_argument("--rows", type=int, default=20000, help="合成导出行数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="替身服务器每个请求的延迟(秒)")
+    parser.add_argument("--bandwidth", default=None, help="导出下载限速，例如 4MB (默认不限速)")
+    parser.add_argument("--cold", type=int, default=2, help="冷启动次数(每次一个新进程)")
+    parser.add_argument("--warm", type=int, default=2, help="每个进程内冷启动之后的热运行次数")
+    parser.add_argument("--processor", choices=("inprocess", "subprocess"), default="inprocess")
+    parser.add_argument("--timeout", type=int, default=1800, help="单个 worker 进程超时(秒)")
+    parser.add_argument("--json", dest="json_path", help="结果写入 JSON 文件")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--runs", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.worker:
+        return worker(args.runs, args.processor)
+
+    report = run(args.rows, args.seed, args.latency, parse_bandwidth(args.bandwidth), args.cold, args.warm,
+                 args.processor, args.timeout,
+                 progress=lambda i, w: print(f"worker {i + 1}/{args.cold}: 进程 {w['process_seconds']:.2f}s "
+                                             "运行 " + ", ".join(f"{r['wall']:.2f}s" for r in w["runs"]),
+                                             flush=True))
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {os.path.abspath(args.json_path)}")
+    failed = [r for w in report["workers"] for r in w["runs"] if r["exit_code"] != 0]
+    if failed:
+        print(f"❌ {len(failed)} 次运行失败 (exit_code != 0)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+邮件发送吞吐基准(基于 outlook_fake，无需 Windows/Outlook)
+对比三种发送方式的 封/秒 (均包含发送确认，即查询已发送邮件):
+- cold:    每封邮件新建发送通道并逐封确认(旧实现: 每次 Dispatch + 遍历 Store)
+- single:  复用同一发送通道，逐封发送并逐封确认(email_sender.send_email 的线程内复用)
+- batched: send_many 整批发送后一次性确认(email_sender.send_emails)，
+           差别主要在已发送邮件查询次数 (com_calls.restrict)
+基准期间 email_sender 日志静默 (不测控制台/日志写入)
+
+用法:
+    python bench_send_throughput.py --count 200
+    python bench_send_throughput.py --count 50 --profile com --json result.json
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+from datetime import datetime
+
+from mail_transport import MailMessage, create_transport
+from outlook_fake import FakeOutlookApplication
+import email_sender
+from email_sender import _verify_sent, _verify_sent_batch
+
+# 模拟的 COM 往返耗时(秒)
+LATENCY_PROFILES = {
+    "none": {},
+    # 本地 Outlook + Exchange 缓存模式下的大致量级
+    "com": {
+        "property_read": 0.002,
+        "get_folder": 0.005,
+        "items_add": 0.010,
+        "property_set": 0.001,
+        "attachment_add": 0.005,
+        "save": 0.010,
+        "send": 0.020,
+        "resolve": 0.020,
+        "restrict": 0.030,
+    },
+}
+# 发送确认的等待参数(模拟环境中邮件发送后立即出现在已发送邮件)
+VERIFY_MAX_WAIT = 5
+VERIFY_INTERVAL = 0.5
+
+SHARED_STORES = [f"Team_Mailbox_{i:02d} (shared)" for i in range(20)] + ["SharePoint Lists"]
+
+
+def _quiet_logger():
+    logger = logging.getLogger("bench_send_throughput")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    return logger
+
+
+def _make_messages(count, attachment=None):
+    return [
+        MailMessage(
+            subject=f"ITC Pending Review Reminder #{i}",
+            html_body="<html><body><p>benchmark</p></body></html>",
+            to_addrs=[f"user{i % 7}@pg.com"],
+            cc_addrs=["manager@pg.com"],
+            attachments=[attachment] if attachment else None,
+        )
+        for i in range(count)
+    ]
+
+
+def _new_app(latency):
+    return FakeOutlookApplication(latency=latency, shared_stores=SHARED_STORES)
+
+
+def _send_and_verify(transport, message):
+    send_time = datetime.now()
+    return transport.send(message) and _verify_sent(
+        transport.get_sent_folder(), message.subject, send_time, VERIFY_MAX_WAIT, VERIFY_INTERVAL)
+
+
+def bench_cold(messages, latency):
+    app = _new_app(latency)
+    t0 = time.perf_counter()
+    ok = 0
+    for m in messages:
+        transport = create_transport("fake", application=app, logger=_quiet_logger())
+        ok += bool(_send_and_verify(transport, m))
+        transport.close()
+    return time.perf_counter() - t0, ok, app
+
+
+def bench_single(messages, latency):
+    app = _new_app(latency)
+    transport = create_transport("fake", application=app, logger=_quiet_logger())
+    t0 = time.perf_counter()
+    ok = sum(1 for m in messages if _send_and_verify(transport, m))
+    elapsed = time.perf_counter() - t0
+    transport.close()
+    return elapsed, ok, app
+
+
+def bench_batched(messages, latency):
+    app = _new_app(latency)
+    transport = create_transport("fake", application=app, logger=_quiet_logger())
+    t0 = time.perf_counter()
+    send_time = datetime.now()
+    results = transport.send_many(messages)
+    verified = iter(_verify_sent_batch(transport.get_sent_folder(), [m.subject for m, r in zip(messages, results) if r],
+                                       send_time, VERIFY_MAX_WAIT, VERIFY_INTERVAL))
+    ok = sum(1 for r in results if r and next(verified))
+    elapsed = time.perf_counter() - t0
+    transport.close()
+    return elapsed, ok, app
+
+
+MODES = {
+    "cold": bench_cold,
+    "single": bench_single,
+    "batched": bench_batched,
+}
+
+
+def run(count, profile, modes, attachment=None):
+    latency = LATENCY_PROFILES[profile]
+    results = []
+    saved_log = email_sender.log
+    email_sender.log = lambda msg: None
+    try:
+        runs = [(mode, MODES[mode](_make_messages(count, attachment), latency)) for mode in modes]
+    finally:
+        email_sender.log = saved_log
+    for mode, (elapsed, ok, app) in runs:
+        delivered = app.sent_items.Count
+        results.append({
+            "mode": mode,
+            "messages": count,
+            "succeeded": ok,
+            "delivered": delivered,
+            "seconds": round(elapsed, 4),
+            "msgs_per_sec": round(count / elapsed, 2) if elapsed > 0 else None,
+            "com_calls": dict(app.latency.calls),
+        })
+    return {
+        "profile": profile,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="邮件发送吞吐基准(outlook_fake)")
+    parser.add_argument("--count", type=int, default=100, help="每种模式发送的邮件数")
+    parser.add_argument("--profile", choices=sorted(LATENCY_PROFILES), default="com", help="模拟 COM 延迟档位")
+    parser.add_argument("--modes", default="cold,single,batched", help="逗号分隔: cold,single,batched")
+    parser.add_argument("--attachment", help="附加到每封邮件的文件路径(可选)")
+    parser.add_argument("--json", dest="json_path", help="结果写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        parser.error(f"未知模式: {unknown}")
+
+    report = run(args.count, args.profile, modes, args.attachment)
+
+    print(f"延迟档位: {report['profile']}  邮件数: {args.count}")
+    print(f"{'模式':<10}{'耗时(s)':>10}{'封/秒':>10}{'成功':>8}{'DisplayName读取':>18}{'已发送查询':>12}")
+    for r in report["results"]:
+        print(f"{r['mode']:<10}{r['seconds']:>10.3f}{r['msgs_per_sec'] or 0:>10.1f}"
+              f"{r['succeeded']:>8}{r['com_calls']['property_read']:>18}{r['com_calls']['restrict']:>12}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {os.path.abspath(args.json_path)}")
+
+    failed = [r for r in report["results"] if r["succeeded"] != r["messages"] or r["delivered"] != r["messages"]]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+入口脚本启动耗时基准 (CLI 冷启动 / 复用路径的模块导入)
+- 每个场景在新解释器中以 -X importtime 运行 --repeat 次，记录墙钟时间与导入总耗时 (中位数)
+- 列出耗时最多的导入 (顶层及其直接子导入)，并检查不应在启动时加载的重依赖 (selenium / pandas / requests 等)
+- 解释器本身的启动 (python -c pass) 作为对照；出现不应加载的模块时返回码 1
+
+用法:
+    python bench_startup.py
+    python bench_startup.py --repeat 10 --json startup.json
+    python bench_startup.py --scenarios rev2_help,report_help --top 10
+注意: 场景在脚本目录中运行，与正常启动一样会创建 ITC report 目录
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULT_SCHEMA_VERSION = 1
+DEFAULT_REPEAT = 5
+DEFAULT_TOP = 5
+HEAVY = ("selenium", "pandas", "numpy", "requests", "urllib3", "bs4", "Chrome_Driver_mgr")
+
+# 名称: (参数, 不应加载的模块, 说明)
+SCENARIOS = {
+    "python": (["-c", "pass"], (), "解释器启动 (对照)"),
+    "report_help": (["pending_review_report.py", "--help"], HEAVY, "处理脚本 --help"),
+    "rev2_help": (["BatRun_ITCreport_downloader_rev2.py", "--help"], HEAVY, "下载器 rev2 --help"),
+    "daemon_help": (["itc_daemon.py", "--help"], HEAVY, "常驻服务 --help"),
+    "rev1_import": (["-c", "import BatRun_ITCreport_downloader_rev1"], HEAVY, "导入下载器 rev1"),
+    "rev2_import": (["-c", "import BatRun_ITCreport_downloader_rev2"], HEAVY, "导入下载器 rev2 (复用路径)"),
+    "report_import": (["-c", "import pending_review_report"], HEAVY, "导入处理模块 (下载器同进程调用)"),
+    "teams_import": (["-c", "import teams_sender"], ("requests", "urllib3"), "导入 Teams 发送模块"),
+}
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 输出，返回 [(模块, 自身微秒, 累计微秒, 层级)]"""
+    rows = []
+    for ln in stderr.splitlines():
+        if not ln.startswith("import time:"):
+            continue
+        parts = ln[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cum_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # 表头
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((name.strip(), self_us, cum_us, depth))
+    return rows
+
+
+def heaviest_imports(rows, top):
+    """顶层及其直接子导入中累计耗时最多的几项；site (解释器启动，见 python 对照场景) 及其子导入除外"""
+    picked, pending = [], []
+    # importtime 按完成顺序输出: 子导入在父导入之前，层级 1 的行归属于其后第一个层级 0 的行
+    for name, _, cum, depth in rows:
+        if depth == 1:
+            pending.append((name, cum))
+        elif depth == 0:
+            if name != "site":
+                picked.append((name, cum))
+                picked.extend(pending)
+            pending = []
+    picked.sort(key=lambda r: -r[1])
+    return [{"module": n, "cumulative": c / 1e6} for n, c in picked[:top]]
+
+
+def run_once(args):
+    env = dict(os.environ, PYTHONIOENCODING="utf-8")
+    t0 = time.perf_counter()
+    r = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=SCRIPT_DIR, env=env,
+                       stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                       encoding="utf-8", errors="replace")
+    wall = time.perf_counter() - t0
+    return wall, r.returncode, parse_importtime(r.stderr)
+
+
+def bench_scenario(name, repeat, top):
+    args, forbidden, desc = SCENARIOS[name]
+    walls, imports, last = [], [], []
+    code = 0
+    for _ in range(repeat):
+        wall, code, rows = run_once(args)
+        walls.append(wall)
+        imports.append(sum(r[1] for r in rows) / 1e6)
+        last = rows
+    loaded = {r[0] for r in last}
+    return {
+        "scenario": name,
+        "description": desc,
+        "returncode": code,
+        "wall_median": statistics.median(walls),
+        "wall_min": min(walls),
+        "import_median": statistics.median(imports),
+        "modules": len(loaded),
+        "heaviest": heaviest_imports(last, top),
+        "forbidden_loaded": sorted(m for m in forbidden if m in loaded),
+    }
+
+
+def machine_info():
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(), "cpu_count": os.cpu_count()}
+
+
+def print_report(results):
+    print(f"{'场景':<16}{'墙钟(中位数)':>14}{'导入':>10}{'模块数':>8}  说明")
+    for r in results:
+        flag = "❌" if r["forbidden_loaded"] or r["returncode"] != 0 else "  "
+        print(f"{flag}{r['scenario']:<14}{r['wall_median'] * 1000:12.1f}ms{r['import_median'] * 1000:8.1f}ms"
+              f"{r['modules']:>8}  {r['description']}")
+        heavy = ", ".join(f"{h['module']} {h['cumulative'] * 1000:.1f}ms" for h in r["heaviest"])
+        print(f"{'':16}最重的导入: {heavy}")
+        if r["forbidden_loaded"]:
+            print(f"{'':16}不应在启动时加载: {', '.join(r['forbidden_loaded'])}")
+        if r["returncode"] != 0:
+            print(f"{'':16}返回码 {r['returncode']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="入口脚本启动耗时与启动时导入的模块")
+    parser.add_argument("--scenarios", default="", help=f"逗号分隔，默认全部: {','.join(SCENARIOS)}")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="每个场景列出的最重导入数")
+    parser.add_argument("--json", dest="json_path", help="结果写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    names = [s.strip() for s in args.scenarios.split(",") if s.strip()] or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景: {', '.join(unknown)}")
+    results = []
+    for name in names:
+        print(f"运行 {name} x{args.repeat} ...", flush=True)
+        results.append(bench_scenario(name, max(1, args.repeat), args.top))
+    print()
+    print_report(results)
+
+    if args.json_path:
+        report = {"schema_version": RESULT_SCHEMA_VERSION, "created_at": datetime.now().isoformat(timespec="seconds"),
+                  "machine": machine_info(), "repeat": args.repeat, "results": results}
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果写入: {args.json_path}")
+    return 1 if any(r["forbidden_loaded"] or r["returncode"] != 0 for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
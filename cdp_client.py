@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+精简的 Chrome DevTools Protocol (CDP) 客户端(仅标准库)
+通过调试端口的 WebSocket 直接与浏览器通信，可接收事件
+(selenium 的 execute_cdp_cmd 只能发命令，收不到 Browser.downloadProgress 等事件)
+
+用法:
+    with CDPClient.from_debug_port(9233) as cdp:
+        cdp.on("Browser.downloadProgress", callback)
+        cdp.send("Browser.setDownloadBehavior", {...})
+"""
+
+import os
+import json
+import base64
+import socket
+import struct
+import threading
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+_OP_CONT, _OP_TEXT, _OP_BINARY, _OP_CLOSE, _OP_PING, _OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+class CDPError(Exception):
+    """CDP 命令返回错误或连接异常"""
+
+
+def get_browser_ws_url(port, host="127.0.0.1", timeout=3):
+    """从 /json/version 获取浏览器级 WebSocket 地址"""
+    with urllib.request.urlopen(f"http://{host}:{port}/json/version", timeout=timeout) as resp:
+        info = json.loads(resp.read().decode("utf-8"))
+    url = info.get("webSocketDebuggerUrl")
+    if not url:
+        raise CDPError(f"端口 {port} 未返回 webSocketDebuggerUrl")
+    return url
+
+
+def _apply_mask(payload, mask):
+    """按 4 字节掩码异或(整数运算，避免逐字节循环)"""
+    n = len(payload)
+    if not n:
+        return payload
+    key = (mask * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(n, "big")
+
+
+class _WebSocket:
+    """最小 WebSocket 客户端(RFC 6455，仅文本帧，客户端帧加掩码)"""
+
+    def __init__(self, url, timeout=10):
+        parsed = urllib.parse.urlparse(url)
+        if parsed.scheme != "ws":
+            raise CDPError(f"仅支持 ws:// 地址: {url}")
+        host, port = parsed.hostname, parsed.port or 80
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        key = base64.b64encode(os.urandom(16)).decode()
+        request = (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {host}:{port}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        )
+        self.sock.sendall(request.encode("ascii"))
+        header = b""
+        while b"\r\n\r\n" not in header:
+            chunk = self.sock.recv(1024)
+            if not chunk:
+                raise CDPError("WebSocket 握手失败: 连接被关闭")
+            header += chunk
+        head, _, self._buffer = header.partition(b"\r\n\r\n")
+        status = head.split(b"\r\n", 1)[0]
+        if b" 101 " not in status + b" ":
+            raise CDPError(f"WebSocket 握手失败: {status.decode('latin-1')}")
+        self.sock.settimeout(None)
+        self._send_lock = threading.Lock()
+
+    def _recv_exact(self, n):
+        while len(self._buffer) < n:
+            chunk = self.sock.recv(max(65536, n - len(self._buffer)))
+            if not chunk:
+                raise ConnectionError("WebSocket 连接已关闭")
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:n], self._buffer[n:]
+        return data
+
+    def _send_frame(self, opcode, payload):
+        header = bytearray([0x80 | opcode])
+        n = len(payload)
+        if n < 126:
+            header.append(0x80 | n)
+        elif n < 65536:
+            header.append(0x80 | 126)
+            header += struct.pack("!H", n)
+        else:
+            header.append(0x80 | 127)
+            header += struct.pack("!Q", n)
+        mask = os.urandom(4)
+        with self._send_lock:
+            self.sock.sendall(bytes(header) + mask + _apply_mask(payload, mask))
+
+    def send_text(self, text):
+        self._send_frame(_OP_TEXT, text.encode("utf-8"))
+
+    def recv_text(self):
+        """读取一条完整的文本消息；收到关闭帧时返回 None"""
+        parts = []
+        while True:
+            b1, b2 = self._recv_exact(2)
+            fin, opcode = b1 & 0x80, b1 & 0x0F
+            n = b2 & 0x7F
+            if n == 126:
+                n = struct.unpack("!H", self._recv_exact(2))[0]
+            elif n == 127:
+                n = struct.unpack("!Q", self._recv_exact(8))[0]
+            mask = self._recv_exact(4) if b2 & 0x80 else None
+            payload = self._recv_exact(n)
+            if mask:
+                payload = _apply_mask(payload, mask)
+            if opcode == _OP_PING:
+                self._send_frame(_OP_PONG, payload)
+                continue
+            if opcode == _OP_PONG:
+                continue
+            if opcode == _OP_CLOSE:
+                return None
+            parts.append(payload)
+            if fin:
+                return b"".join(parts).decode("utf-8")
+
+    def close(self):
+        try:
+            self._send_frame(_OP_CLOSE, b"")
+        except Exception:
+            pass
+        try:
+            self.sock.close()
+        except Exception:
+            pass
+
+
+class CDPClient:
+    """CDP 连接: send() 同步等待命令结果，on() 注册事件回调(在后台读线程中调用)"""
+
+    def __init__(self, ws_url, timeout=10, log_callback=None):
+        self.ws_url = ws_url
+        self.timeout = timeout
+        self.log_callback = log_callback
+        self._ws = _WebSocket(ws_url, timeout=timeout)
+        self._next_id = 0
+        self._id_lock = threading.Lock()
+        self._pending = {}
+        self._listeners = defaultdict(list)
+        self._closed = threading.Event()
+        self._reader = threading.Thread(target=self._read_loop, name="cdp-reader", daemon=True)
+        self._reader.start()
+
+    @classmethod
+    def from_debug_port(cls, port, host="127.0.0.1", timeout=10, log_callback=None):
+        return cls(get_browser_ws_url(port, host), timeout=timeout, log_callback=log_callback)
+
+    def log(self, message):
+        if self.log_callback:
+            try:
+                self.log_callback(message)
+            except Exception:
+                pass
+
+    @property
+    def closed(self):
+        return self._closed.is_set()
+
+    def _read_loop(self):
+        try:
+            while True:
+                text = self._ws.recv_text()
+                if text is None:
+                    break
+                try:
+                    msg = json.loads(text)
+                except ValueError:
+                    continue
+                if "id" in msg:
+                    waiter = self._pending.pop(msg["id"], None)
+                    if waiter is not None:
+                        waiter[1].append(msg)
+                        waiter[0].set()
+                elif "method" in msg:
+                    for cb in list(self._listeners.get(msg["method"], ())):
+                        try:
+                            cb(msg.get("params", {}))
+                        except Exception as e:
+                            self.log(f"CDP 事件回调异常 {msg['method']}: {e}")
+        except Exception as e:
+            if not self.closed:
+                self.log(f"CDP 连接中断: {e}")
+        finally:
+            self._closed.set()
+            for event, box in list(self._pending.values()):
+                event.set()
+            self._pending.clear()
+
+    def send(self, method, params=None, timeout=None, session_id=None):
+        """发送命令并等待结果，返回 result 字典；失败抛出 CDPError"""
+        if self.closed:
+            raise CDPError("CDP 连接已关闭")
+        with self._id_lock:
+            self._next_id += 1
+            msg_id = self._next_id
+        payload = {"id": msg_id, "method": method, "params": params or {}}
+        if session_id:
+            payload["sessionId"] = session_id
+        done, box = threading.Event(), []
+        self._pending[msg_id] = (done, box)
+        self._ws.send_text(json.dumps(payload))
+        if not done.wait(timeout or self.timeout):
+            self._pending.pop(msg_id, None)
+            raise CDPError(f"CDP 命令超时: {method}")
+        if not box:
+            raise CDPError(f"CDP 连接已关闭: {method}")
+        reply = box[0]
+        if "error" in reply:
+            raise CDPError(f"{method} 失败: {reply['error'].get('message')}")
+        return reply.get("result", {})
+
+    def on(self, event, callback):
+        self._listeners[event].append(callback)
+
+    def off(self, event, callback):
+        try:
+            self._listeners[event].remove(callback)
+        except ValueError:
+            pass
+
+    def close(self):
+        self._closed.set()
+        self._ws.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
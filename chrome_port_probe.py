@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+并发探测 Chrome 调试端口
+- 线程池同时探测整个端口范围: 本机关闭的端口立即被拒绝，被过滤的端口也只等待很短的连接超时
+- 连通的端口再请求 /json/version (需要标签页时请求 /json) 确认是 Chrome
+- find_debug_port() 先尝试缓存的上次可用端口，命中时通常只需几毫秒
+"""
+
+import os
+import json
+import time
+import socket
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+CONNECT_TIMEOUT = 0.05
+HTTP_TIMEOUT = 0.5
+DEFAULT_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ITC report", "chrome_port_cache.json")
+
+
+def _http_json(host, port, path, timeout):
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request("GET", path)
+        resp = conn.getresponse()
+        if resp.status != 200:
+            return None
+        return json.loads(resp.read().decode("utf-8"))
+    finally:
+        conn.close()
+
+
+def probe_port(port, host="127.0.0.1", connect_timeout=CONNECT_TIMEOUT, http_timeout=HTTP_TIMEOUT,
+               fetch_tabs=False):
+    """
+    返回 None (端口未监听) 或 {"port", "chrome", "browser", "tabs", "seconds"}
+    chrome=False 表示端口被占用但不是 Chrome 调试端口
+    """
+    t0 = time.perf_counter()
+    try:
+        with socket.create_connection((host, port), timeout=connect_timeout):
+            pass
+    except OSError:
+        return None
+    info = {"port": port, "chrome": False, "browser": None, "tabs": None}
+    try:
+        version = _http_json(host, port, "/json/version", http_timeout)
+        if version and "webSocketDebuggerUrl" in version:
+            info["chrome"] = True
+            info["browser"] = version.get("Browser")
+            if fetch_tabs:
+                info["tabs"] = _http_json(host, port, "/json", http_timeout) or []
+    except (OSError, ValueError, http.client.HTTPException):
+        pass
+    info["seconds"] = time.perf_counter() - t0
+    return info
+
+
+def probe_ports(ports, host="127.0.0.1", connect_timeout=CONNECT_TIMEOUT, http_timeout=HTTP_TIMEOUT,
+                fetch_tabs=False, workers=None):
+    """并发探测，返回按端口排序的已监听端口信息列表"""
+    ports = list(ports)
+    if not ports:
+        return []
+    workers = workers or min(32, len(ports))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="port-probe") as pool:
+        results = pool.map(lambda p: probe_port(p, host, connect_timeout, http_timeout, fetch_tabs), ports)
+        found = [r for r in results if r]
+    return sorted(found, key=lambda r: r["port"])
+
+
+def _load_cache(cache_file):
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache_file, key, port):
+    data = _load_cache(cache_file)
+    if data.get(key) == port:
+        return
+    data[key] = port
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp = cache_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, cache_file)
+    except OSError:
+        pass
+
+
+def find_debug_port(ports, project="ITC", host="127.0.0.1", cache_file=DEFAULT_CACHE_FILE, log_callback=None):
+    """
+    返回范围内第一个可用的 Chrome 调试端口(没有返回 None)
+    先探测缓存的上次可用端口，未命中再并发扫描整个范围并更新缓存
+    """
+    def log(msg):
+        if log_callback:
+            log_callback(msg)
+
+    ports = list(ports)
+    t0 = time.perf_counter()
+    cached = _load_cache(cache_file).get(project) if cache_file else None
+    if cached in ports:
+        info = probe_port(cached, host)
+        if info and info["chrome"]:
+            log(f"🔍 缓存端口 {cached} 可用 ({(time.perf_counter() - t0) * 1000:.0f} ms)")
+            return cached
+    found = probe_ports(ports, host)
+    for info in found:
+        if not info["chrome"]:
+            log(f"⚠️ 端口 {info['port']} 被其他程序占用")
+    chrome = [info["port"] for info in found if info["chrome"]]
+    elapsed = (time.perf_counter() - t0) * 1000
+    if not chrome:
+        log(f"🔍 端口 {ports[0]}-{ports[-1]} 未发现 Chrome 调试会话 ({elapsed:.0f} ms)")
+        return None
+    if cache_file:
+        _save_cache(cache_file, project, chrome[0])
+    log(f"🔍 发现 Chrome 调试会话: 端口 {chrome} ({elapsed:.0f} ms)")
+    return chrome[0]
+
+
+def remember_port(port, project="ITC", cache_file=DEFAULT_CACHE_FILE):
+    """新启动 Chrome 后记录端口，下次优先探测"""
+    if cache_file:
+        _save_cache(cache_file, project, port)
+
+
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class _Chrome(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path == "/json/version":
+                payload = {"Browser": "Chrome/130.0", "webSocketDebuggerUrl": "ws://127.0.0.1/devtools/browser/x"}
+            elif self.path == "/json":
+                payload = [{"id": "1", "url": "https://itc-tool.pg.com/"}]
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    chrome = ThreadingHTTPServer(("127.0.0.1", 0), _Chrome)
+    threading.Thread(target=chrome.serve_forever, daemon=True).start()
+    other = socket.socket()
+    other.bind(("127.0.0.1", 0))
+    other.listen()
+    threading.Thread(target=lambda: [other.accept()[0].close() for _ in iter(int, 1)], daemon=True).start()
+    closed = []
+    for _ in range(8):
+        s = socket.socket()
+        s.bind(("127.0.0.1", 0))
+        closed.append(s.getsockname()[1])
+        s.close()
+    chrome_port, other_port = chrome.server_address[1], other.getsockname()[1]
+    ports = sorted(closed + [chrome_port, other_port])
+
+    tmp = tempfile.mkdtemp()
+    try:
+        cache = os.path.join(tmp, "cache.json")
+        found = probe_ports(ports, fetch_tabs=True)
+        assert [(f["port"], f["chrome"]) for f in found] == sorted([(chrome_port, True), (other_port, False)])
+        assert next(f for f in found if f["chrome"])["tabs"][0]["url"].startswith("https://itc-tool")
+        t0 = time.perf_counter()
+        assert find_debug_port(ports, cache_file=cache, log_callback=print) == chrome_port
+        scan_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        assert find_debug_port(ports, cache_file=cache, log_callback=print) == chrome_port
+        cached_ms = (time.perf_counter() - t0) * 1000
+        print(f"完整扫描 {len(ports)} 个端口 {scan_ms:.1f} ms，缓存命中 {cached_ms:.1f} ms")
+        assert scan_ms < 100 and cached_ms < 100
+        chrome.shutdown()
+        chrome.server_close()
+        assert find_debug_port(ports, cache_file=cache) is None
+        print("✅ chrome_port_probe 自测通过")
+    finally:
+        shutil.rmtree(tmp)
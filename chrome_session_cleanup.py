@@ -4,70 +4,63 @@ Chrome会话清理工具
 用于清理冲突的Chrome调试会话，确保项目间端口隔离
 """
 
-import socket
 import requests
 import subprocess
 import sys
 from chrome_port_config import EVPChromeConfig, ITCChromeConfig
+from chrome_port_probe import probe_ports
 
 def get_chrome_sessions():
-    """获取所有Chrome调试会话"""
+    """获取所有Chrome调试会话（并发探测两个项目的端口范围）"""
     sessions = []
     
     # 检查所有可能的端口范围
     all_ports = list(range(EVPChromeConfig.PORT_START, EVPChromeConfig.PORT_END + 1)) + \
                 list(range(ITCChromeConfig.PORT_START, ITCChromeConfig.PORT_END + 1))
     
-    for port in all_ports:
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                sock.settimeout(2)
-                if sock.connect_ex(("127.0.0.1", port)) == 0:
-                    # 检查是否是Chrome调试端口
-                    try:
-                        response = requests.get(f"http://127.0.0.1:{port}/json", timeout=3)
-                        if response.status_code == 200:
-                            tabs = response.json()
-                            
-                            # 分析标签页内容
-                            project = "Unknown"
-                            urls = [tab.get('url', '') for tab in tabs]
-                            
-                            if any('itc-tool.pg.com' in url for url in urls):
-                                if EVPChromeConfig.PORT_START <= port <= EVPChromeConfig.PORT_END:
-                                    project = "ITC-on-EVP-Port ⚠️"  # 问题会话
-                                else:
-                                    project = "ITC"
-                            elif any('evp' in url.lower() for url in urls):
-                                if ITCChromeConfig.PORT_START <= port <= ITCChromeConfig.PORT_END:
-                                    project = "EVP-on-ITC-Port ⚠️"  # 问题会话
-                                else:
-                                    project = "EVP"
-                            else:
-                                # 根据端口范围推断
-                                if EVPChromeConfig.PORT_START <= port <= EVPChromeConfig.PORT_END:
-                                    project = "EVP-Range"
-                                else:
-                                    project = "ITC-Range"
-                            
-                            sessions.append({
-                                'port': port,
-                                'project': project,
-                                'tab_count': len(tabs),
-                                'urls': urls[:3],  # 只保留前3个URL
-                                'is_conflict': '⚠️' in project
-                            })
-                    except Exception:
-                        # 端口被占用但不是Chrome
-                        sessions.append({
-                            'port': port,
-                            'project': 'Non-Chrome',
-                            'tab_count': 0,
-                            'urls': [],
-                            'is_conflict': False
-                        })
-        except Exception:
+    for info in probe_ports(all_ports, http_timeout=1.0, fetch_tabs=True):
+        port = info['port']
+        if not info['chrome']:
+            # 端口被占用但不是Chrome
+            sessions.append({
+                'port': port,
+                'project': 'Non-Chrome',
+                'tab_count': 0,
+                'urls': [],
+                'is_conflict': False
+            })
             continue
+        
+        tabs = info['tabs'] or []
+        
+        # 分析标签页内容
+        project = "Unknown"
+        urls = [tab.get('url', '') for tab in tabs]
+        
+        if any('itc-tool.pg.com' in url for url in urls):
+            if EVPChromeConfig.PORT_START <= port <= EVPChromeConfig.PORT_END:
+                project = "ITC-on-EVP-Port ⚠️"  # 问题会话
+            else:
+                project = "ITC"
+        elif any('evp' in url.lower() for url in urls):
+            if ITCChromeConfig.PORT_START <= port <= ITCChromeConfig.PORT_END:
+                project = "EVP-on-ITC-Port ⚠️"  # 问题会话
+            else:
+                project = "EVP"
+        else:
+            # 根据端口范围推断
+            if EVPChromeConfig.PORT_START <= port <= EVPChromeConfig.PORT_END:
+                project = "EVP-Range"
+            else:
+                project = "ITC-Range"
+        
+        sessions.append({
+            'port': port,
+            'project': project,
+            'tab_count': len(tabs),
+            'urls': urls[:3],  # 只保留前3个URL
+            'is_conflict': '⚠️' in project
+        })
     
     return sessions
 
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+配置注册中心 - 进程内统一的 JSON 配置缓存
+用于替代各模块各自重复读取 email_config.json / teams_config.json:
+- 每个配置文件只解析一次，之后直接返回缓存快照
+- 仅当文件 mtime/大小 变化时才重新读取(长驻进程仍支持热更新)
+- 读取后可挂接校验函数，校验失败时保留上一次有效快照
+- 返回不可变快照(dict -> MappingProxyType, list -> tuple)，防止调用方意外修改共享缓存
+  需要可修改副本时使用 thaw()
+"""
+
+import os
+import json
+import threading
+from types import MappingProxyType
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+EMAIL_CONFIG_PATH = os.path.join(SCRIPT_DIR, "email_config.json")
+TEAMS_CONFIG_PATH = os.path.join(SCRIPT_DIR, "teams_config.json")
+
+
+def freeze(obj):
+    """递归转换为不可变结构"""
+    if isinstance(obj, (dict, MappingProxyType)):
+        return MappingProxyType({k: freeze(v) for k, v in obj.items()})
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj):
+    """递归转换为普通可修改的 dict / list (深拷贝)"""
+    if isinstance(obj, (dict, MappingProxyType)):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [thaw(v) for v in obj]
+    return obj
+
+
+# -------------------------- 校验函数 --------------------------
+def validate_email_config(data):
+    """email_config.json 基本结构校验"""
+    if not isinstance(data, dict):
+        raise ValueError("email_config 顶层必须是对象")
+    reports = data.get("reports", {})
+    if not isinstance(reports, dict):
+        raise ValueError("reports 必须是对象")
+    for name, rpt in reports.items():
+        if not isinstance(rpt, dict):
+            raise ValueError(f"reports.{name} 必须是对象")
+        for field in ("recipients", "cc"):
+            if field in rpt and not isinstance(rpt[field], list):
+                raise ValueError(f"reports.{name}.{field} 必须是列表")
+        if "cc1" in rpt and not isinstance(rpt["cc1"], dict):
+            raise ValueError(f"reports.{name}.cc1 必须是对象")
+    if "system_config" in data and not isinstance(data["system_config"], dict):
+        raise ValueError("system_config 必须是对象")
+
+
+def validate_teams_config(data):
+    """teams_config.json 基本结构校验"""
+    if not isinstance(data, dict):
+        raise ValueError("teams_config 顶层必须是对象")
+    if "webhooks" in data and not isinstance(data["webhooks"], dict):
+        raise ValueError("webhooks 必须是对象")
+    if "notification_rules" in data and not isinstance(data["notification_rules"], dict):
+        raise ValueError("notification_rules 必须是对象")
+
+
+class _Entry:
+    __slots__ = ("path", "default", "validator", "stamp", "snapshot", "version", "error")
+
+    def __init__(self, path, default, validator):
+        self.path = path
+        self.default = freeze(default) if default is not None else None
+        self.validator = validator
+        self.stamp = None
+        self.snapshot = None
+        self.version = 0
+        self.error = None
+
+
+class ConfigRegistry:
+    """按文件路径缓存 JSON 配置，mtime 变化时自动重新加载"""
+
+    def __init__(self, log_callback=None):
+        self._entries = {}
+        self._lock = threading.RLock()
+        self.log_callback = log_callback
+
+    def log(self, message):
+        if self.log_callback:
+            try:
+                self.log_callback(message)
+            except Exception:
+                pass
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def register(self, path, default=None, validator=None):
+        """登记配置文件(可重复调用，已登记时只更新默认值与校验函数)"""
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                entry = _Entry(path, default, validator)
+                self._entries[path] = entry
+            else:
+                if default is not None:
+                    entry.default = freeze(default)
+                if validator is not None:
+                    entry.validator = validator
+            return entry
+
+    def get(self, path, default=None, validator=None):
+        """
+        获取配置快照
+        文件不存在: 返回 default 快照(未提供则为 None)
+        解析/校验失败: 保留上一次有效快照，否则返回 default
+        """
+        entry = self.register(path, default, validator)
+        stamp = self._stamp(entry.path)
+        with self._lock:
+            if entry.snapshot is not None and stamp == entry.stamp:
+                return entry.snapshot
+            if stamp is None:
+                entry.stamp = None
+                entry.snapshot = None
+                return entry.default
+            try:
+                with open(entry.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if entry.validator:
+                    entry.validator(data)
+                entry.snapshot = freeze(data)
+                entry.stamp = stamp
+                entry.version += 1
+                entry.error = None
+                self.log(f"配置已加载: {entry.path} (版本 {entry.version})")
+            except Exception as e:
+                entry.error = str(e)
+                # 记录本次 stamp，避免同一个损坏文件被反复解析
+                entry.stamp = stamp
+                self.log(f"配置加载失败，保留上一次有效配置: {entry.path} - {e}")
+                if entry.snapshot is None:
+                    return entry.default
+            return entry.snapshot
+
+    def version(self, path):
+        """返回配置当前版本号(每次成功重新加载 +1)，用于判断是否需要刷新派生数据"""
+        entry = self._entries.get(os.path.abspath(path))
+        return entry.version if entry else 0
+
+    def last_error(self, path):
+        entry = self._entries.get(os.path.abspath(path))
+        return entry.error if entry else None
+
+    def invalidate(self, path=None):
+        """强制下次读取时重新加载(path=None 时清空全部)"""
+        with self._lock:
+            if path is None:
+                for entry in self._entries.values():
+                    entry.stamp = None
+                    entry.snapshot = None
+            else:
+                entry = self._entries.get(os.path.abspath(path))
+                if entry:
+                    entry.stamp = None
+                    entry.snapshot = None
+
+
+# 进程级共享实例
+REGISTRY = ConfigRegistry()
+
+
+def get_config(path, default=None, validator=None):
+    """便捷函数: 从共享注册中心读取配置快照"""
+    return REGISTRY.get(path, default=default, validator=validator)
+
+
+def get_email_config(path=None, default=None):
+    return REGISTRY.get(path or EMAIL_CONFIG_PATH, default=default, validator=validate_email_config)
+
+
+def get_teams_config(path=None, default=None):
+    return REGISTRY.get(path or TEAMS_CONFIG_PATH, default=default, validator=validate_teams_config)
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    with tempfile.TemporaryDirectory() as tmp:
+        p = os.path.join(tmp, "cfg.json")
+        with open(p, "w", encoding="utf-8") as f:
+            json.dump({"reports": {"A": {"recipients": ["a@pg.com"]}}}, f)
+        reg = ConfigRegistry(log_callback=print)
+        s1 = reg.get(p, validator=validate_email_config)
+        s2 = reg.get(p, validator=validate_email_config)
+        assert s1 is s2, "未变化时应返回同一快照"
+        try:
+            s1["reports"]["B"] = {}
+            raise AssertionError("快照应不可修改")
+        except TypeError:
+            pass
+        time.sleep(0.01)
+        with open(p, "w", encoding="utf-8") as f:
+            json.dump({"reports": {"A": {"recipients": ["b@pg.com", "c@pg.com"]}}}, f)
+        s3 = reg.get(p)
+        assert s3["reports"]["A"]["recipients"] == ("b@pg.com", "c@pg.com")
+        with open(p, "w", encoding="utf-8") as f:
+            f.write("{broken")
+        assert reg.get(p) is s3, "损坏文件应保留上一次有效快照"
+        assert isinstance(thaw(s3)["reports"]["A"]["recipients"], list)
+        print("✅ config_registry 自测通过")
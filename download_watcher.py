@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+下载完成检测(事件驱动)
+替代"每 3 秒 listdir RawData + 用户 Downloads 并逐个 getsize/getmtime"的轮询:
+1. 通过 CDP Browser.setDownloadBehavior 让 Chrome 直接下载到 RawData，
+   并开启下载事件 Browser.downloadWillBegin / Browser.downloadProgress，
+   state=completed 时立即得到结果(无轮询延迟)
+2. 同时监听下载目录的文件系统事件(安装了 watchdog 时)，
+   未安装时退化为只对比目录文件名集合的 scandir 轮询(间隔 0.25 秒，只对新文件取 stat)
+3. CDP 不可用(旧版本 Chrome/端口异常)时仍可通过文件系统检测完成
+
+用法:
+    watcher = DownloadWatcher(RAW_DATA_DIR, debug_port=DEBUG_PORT, log_callback=log_message)
+    watcher.start()
+    driver.get(REPORT_URL)
+    path = watcher.wait(timeout=600)
+    watcher.stop()
+"""
+
+import os
+import re
+import stat
+import time
+import threading
+from datetime import datetime
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except Exception:
+    Observer = None
+    FileSystemEventHandler = object
+
+PARTIAL_SUFFIXES = (".crdownload", ".tmp", ".part", ".partial")
+# allowAndName 模式下 Chrome 以 guid 命名下载中的文件
+_GUID_NAME = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$")
+# 未收到 downloadWillBegin(没有建议文件名)时，完成的下载按此前缀重命名为 .csv
+FALLBACK_PREFIX = "ITC_RequestExportReport"
+
+
+def _is_partial(name):
+    return name.lower().endswith(PARTIAL_SUFFIXES)
+
+
+def _download_name(name, guid):
+    """建议文件名；缺失(只知道 guid)或没有扩展名时使用 FALLBACK_PREFIX_<时间戳>.csv"""
+    if not name or name == guid or not os.path.splitext(name)[1]:
+        return f"{FALLBACK_PREFIX}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    return name
+
+
+def unique_target(directory, name):
+    """目标文件已存在时追加时间戳，避免覆盖"""
+    target = os.path.join(directory, name)
+    if os.path.exists(target):
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        base, ext = os.path.splitext(name)
+        target = os.path.join(directory, f"{base}_{stamp}{ext}")
+    return target
+
+
+class _FSHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher._on_fs_file(event.src_path)
+
+    def on_moved(self, event):
+        # Chrome 下载完成时把 .crdownload 重命名为最终文件名
+        if not event.is_directory:
+            self.watcher._on_fs_file(event.dest_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher._on_fs_file(event.src_path)
+
+
+class DownloadWatcher:
+    """
+    监视一次下载任务
+    download_dir: 期望的下载目录(RawData)
+    debug_port:   Chrome 调试端口(用于 CDP 下载事件，可选)
+    extra_dirs:   CDP 设置下载目录失败时额外监视的目录(如用户 Downloads)
+    """
+
+    def __init__(self, download_dir, debug_port=None, extra_dirs=None, min_size=1024,
+                 poll_interval=0.25, log_callback=None, cdp=None):
+        self.download_dir = os.path.abspath(download_dir)
+        self.debug_port = debug_port
+        self.extra_dirs = [os.path.abspath(d) for d in (extra_dirs or []) if d and os.path.isdir(d)]
+        self.min_size = min_size
+        self.poll_interval = poll_interval
+        self.log_callback = log_callback
+        self._cdp = cdp
+        self._own_cdp = False
+        self._cdp_active = False
+        self._downloads = {}
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._result = None
+        self._error = None
+        self._dirs = []
+        self._initial = {}
+        self._observer = None
+        self._poller = None
+        self._stopping = threading.Event()
+        self.started_at = None
+        self.mode = None
+
+    def log(self, message):
+        if self.log_callback:
+            try:
+                self.log_callback(message)
+            except Exception:
+                pass
+
+    # ---------------- 启动/停止 ----------------
+    def start(self):
+        os.makedirs(self.download_dir, exist_ok=True)
+        self.started_at = time.time()
+        self._cdp_active = self._start_cdp()
+        self._dirs = [self.download_dir]
+        if not self._cdp_active:
+            # 无法指定下载目录时，文件会落在浏览器默认目录
+            self._dirs += [d for d in self.extra_dirs if d != self.download_dir]
+        # 只记录文件名集合(不逐个 stat)
+        for d in self._dirs:
+            try:
+                with os.scandir(d) as it:
+                    self._initial[d] = {e.name for e in it}
+            except OSError:
+                self._initial[d] = set()
+        self._start_fs_watch()
+        modes = ["CDP事件"] if self._cdp_active else []
+        modes.append("watchdog" if self._observer else "scandir")
+        self.mode = "+".join(modes)
+        self.log(f"下载监视已启动 (方式: {self.mode}, 目录: {', '.join(self._dirs)})")
+        return self
+
+    def _start_cdp(self):
+        if self._cdp is None and self.debug_port:
+            try:
+                from cdp_client import CDPClient
+                self._cdp = CDPClient.from_debug_port(self.debug_port, log_callback=self.log_callback)
+                self._own_cdp = True
+            except Exception as e:
+                self.log(f"CDP 连接失败，改用文件系统检测: {e}")
+                return False
+        if self._cdp is None:
+            return False
+        try:
+            self._cdp.on("Browser.downloadWillBegin", self._on_will_begin)
+            self._cdp.on("Browser.downloadProgress", self._on_progress)
+            # allowAndName: 按 guid 命名保存，完成后由本模块重命名为建议文件名
+            self._cdp.send("Browser.setDownloadBehavior", {
+                "behavior": "allowAndName",
+                "downloadPath": self.download_dir,
+                "eventsEnabled": True,
+            })
+            return True
+        except Exception as e:
+            self.log(f"设置 Chrome 下载目录失败，改用文件系统检测: {e}")
+            return False
+
+    def _start_fs_watch(self):
+        if Observer is not None:
+            try:
+                self._observer = Observer()
+                handler = _FSHandler(self)
+                for d in self._dirs:
+                    self._observer.schedule(handler, d, recursive=False)
+                self._observer.start()
+            except Exception as e:
+                self.log(f"watchdog 启动失败，改用 scandir 轮询: {e}")
+                self._observer = None
+        if self._observer is None:
+            self._poller = threading.Thread(target=self._poll_loop, name="download-poller", daemon=True)
+            self._poller.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._observer is not None:
+            try:
+                self._observer.stop()
+                self._observer.join(timeout=2)
+            except Exception:
+                pass
+            self._observer = None
+        if self._cdp is not None:
+            self._cdp.off("Browser.downloadWillBegin", self._on_will_begin)
+            self._cdp.off("Browser.downloadProgress", self._on_progress)
+            if self._cdp_active:
+                try:
+                    self._cdp.send("Browser.setDownloadBehavior", {"behavior": "default"}, timeout=3)
+                except Exception:
+                    pass
+            if self._own_cdp:
+                self._cdp.close()
+                self._cdp = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------------- 结果 ----------------
+    def wait(self, timeout, progress_interval=15):
+        """等待下载完成，返回最终文件路径；超时或取消返回 None"""
+        deadline = time.time() + timeout
+        next_report = time.time() + progress_interval
+        while not self._done.is_set():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                self.log(f"下载等待超时 ({timeout} 秒)")
+                return None
+            self._done.wait(min(remaining, max(0.05, next_report - time.time())))
+            if not self._done.is_set() and time.time() >= next_report:
+                next_report += progress_interval
+                self.log(f"   等待下载中...（已等待 {int(time.time() - self.started_at)} 秒）{self._progress_text()}")
+        if self._error:
+            self.log(self._error)
+        return self._result
+
+    def _progress_text(self):
+        with self._lock:
+            items = list(self._downloads.values())
+        if not items:
+            return ""
+        d = items[-1]
+        total = d.get("total") or 0
+        received = d.get("received") or 0
+        if total:
+            return f" 进度 {received / total:.0%} ({received / 1024 / 1024:.1f}/{total / 1024 / 1024:.1f} MB)"
+        return f" 已接收 {received / 1024 / 1024:.1f} MB"
+
+    def _finish(self, path=None, error=None):
+        with self._lock:
+            if self._done.is_set():
+                return
+            self._result = path
+            self._error = error
+            self._done.set()
+
+    # ---------------- CDP 事件 ----------------
+    def _on_will_begin(self, params):
+        guid = params.get("guid")
+        name = params.get("suggestedFilename") or guid
+        with self._lock:
+            self._downloads[guid] = {"name": name, "received": 0, "total": 0, "progress_events": 0}
+        self.log(f"浏览器开始下载: {name}")
+
+    def _on_progress(self, params):
+        guid = params.get("guid")
+        state = params.get("state")
+        with self._lock:
+            info = self._downloads.setdefault(guid, {"name": guid})
+            info["received"] = params.get("receivedBytes", 0)
+            info["total"] = params.get("totalBytes", 0)
+            info["progress_events"] = info.get("progress_events", 0) + 1
+        if state == "completed":
+            src = os.path.join(self.download_dir, guid)
+            if not os.path.exists(src):
+                # 部分版本在 allowAndName 下仍使用建议文件名
+                src = os.path.join(self.download_dir, info["name"])
+            target = src
+            if os.path.basename(src) == guid:
+                target = unique_target(self.download_dir, _download_name(info["name"], guid))
+                try:
+                    os.replace(src, target)
+                except OSError as e:
+                    self._finish(error=f"下载文件重命名失败: {e}")
+                    return
+            self.log(f"浏览器下载完成: {os.path.basename(target)} ({info['received'] / 1024 / 1024:.2f} MB)")
+            self._finish(target)
+        elif state == "canceled":
+            self._finish(error=f"浏览器下载已取消: {info.get('name')}")
+
+    # ---------------- 文件系统 ----------------
+    def _is_new(self, path):
+        d, name = os.path.split(os.path.abspath(path))
+        if _is_partial(name) or name in self._initial.get(d, ()):
+            return False
+        # CDP 模式下 guid 命名的文件由 downloadProgress 处理
+        if self._cdp_active and _GUID_NAME.match(name):
+            return False
+        with self._lock:
+            if name in self._downloads:
+                return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return stat.S_ISREG(st.st_mode) and st.st_size > self.min_size and st.st_mtime >= self.started_at - 1
+
+    def _on_fs_file(self, path):
+        if self._done.is_set() or not self._is_new(path):
+            return
+        if self._cdp_active:
+            # 以 CDP completed 事件为准，文件系统事件只作为兜底(事件丢失时)
+            # 已开始但还没有进度事件的下载(received/total 均为 0)同样视为进行中
+            with self._lock:
+                pending = any(not v.get("progress_events") or v.get("received", 0) < (v.get("total") or 0)
+                              for v in self._downloads.values())
+            if pending:
+                return
+        self.log(f"发现新下载文件: {path}")
+        self._finish(self._move_into_place(path))
+
+    def _move_into_place(self, path):
+        if os.path.dirname(os.path.abspath(path)) == self.download_dir:
+            return path
+        target = unique_target(self.download_dir, os.path.basename(path))
+        try:
+            os.replace(path, target)
+        except OSError:
+            import shutil
+            shutil.move(path, target)
+        self.log(f"已将文件从 {path} 移动到 {target}")
+        return target
+
+    def _poll_loop(self):
+        while not self._stopping.is_set() and not self._done.is_set():
+            for d in self._dirs:
+                try:
+                    with os.scandir(d) as it:
+                        names = [e.name for e in it if e.name not in self._initial[d]]
+                except OSError:
+                    continue
+                for name in names:
+                    self._on_fs_file(os.path.join(d, name))
+                    if self._done.is_set():
+                        return
+            self._stopping.wait(self.poll_interval)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as raw, tempfile.TemporaryDirectory() as dl:
+        with open(os.path.join(dl, "old.csv"), "wb") as f:
+            f.write(b"x" * 4096)
+
+        # 1. 文件系统检测(无 CDP)，文件落在额外监视目录
+        watcher = DownloadWatcher(raw, extra_dirs=[dl], log_callback=print).start()
+
+        def _simulate_chrome():
+            time.sleep(0.3)
+            part = os.path.join(dl, "report.csv.crdownload")
+            with open(part, "wb") as f:
+                f.write(b"a" * 8192)
+            os.replace(part, os.path.join(dl, "report.csv"))
+
+        t0 = time.perf_counter()
+        threading.Thread(target=_simulate_chrome).start()
+        path = watcher.wait(timeout=5)
+        watcher.stop()
+        assert path == os.path.join(raw, "report.csv"), path
+        print(f"✅ 文件系统检测通过，完成后 {(time.perf_counter() - t0 - 0.3) * 1000:.0f} ms 内发现")
+
+        # 2. CDP 事件(模拟)
+        class _FakeCDP:
+            def __init__(self):
+                self.listeners = {}
+
+            def on(self, ev, cb):
+                self.listeners[ev] = cb
+
+            def off(self, ev, cb):
+                self.listeners.pop(ev, None)
+
+            def send(self, method, params=None, timeout=None):
+                return {}
+
+        cdp = _FakeCDP()
+        watcher = DownloadWatcher(raw, cdp=cdp, log_callback=print).start()
+        with open(os.path.join(raw, "guid-123"), "wb") as f:
+            f.write(b"b" * 4096)
+        cdp.listeners["Browser.downloadWillBegin"]({"guid": "guid-123", "suggestedFilename": "report.csv"})
+        cdp.listeners["Browser.downloadProgress"]({"guid": "guid-123", "state": "completed",
+                                                    "receivedBytes": 4096, "totalBytes": 4096})
+        path = watcher.wait(timeout=2)
+        watcher.stop()
+        assert path and os.path.basename(path).startswith("report_") and os.path.exists(path), path
+        print("✅ CDP 下载事件检测通过")
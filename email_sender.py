@@ -14,10 +14,15 @@
 import os
 import json
 import time
+import atexit
+import threading
 import traceback
 from datetime import datetime, timedelta
 
-import sys
+from config_registry import REGISTRY, EMAIL_CONFIG_PATH, get_email_config
+from mail_transport import MailMessage, DEFAULT_PUBLIC_MAILBOX, create_transport
+from itc_logging import get_logger
+from itc_trace import traced
 
 try:
     import win32com.client
@@ -27,37 +32,17 @@ except Exception:
     pythoncom = None
 
 # ---------------- 日志 ----------------
-def _log_dir():
-    base = os.path.dirname(os.path.abspath(__file__))
-    itc_dir = os.path.join(base, "ITC report")
-    log_dir = os.path.join(itc_dir, "Log")
-    os.makedirs(log_dir, exist_ok=True)
-    return log_dir
-
-def _log_file():
-    return os.path.join(_log_dir(), f"email_sender_{datetime.now().strftime('%Y%m%d')}.log")
+# ITC report/Log/email_sender_YYYYMMDD.log，由 itc_logging 后台线程写入
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ITC report", "Log")
 
 def log(msg):
-    line = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}"
-    try:
-        print(line, flush=True)
-    except (UnicodeEncodeError, ValueError):
-        try:
-            sys.stdout.buffer.write((line + "\n").encode("utf-8", "ignore"))
-            sys.stdout.buffer.flush()
-        except Exception:
-            pass
-    try:
-        with open(_log_file(), "a", encoding="utf-8") as f:
-            f.write(line + "\n")
-    except Exception:
-        pass
+    get_logger("email_sender", LOG_DIR).log(msg)
 
 # ---------------- 配置 ----------------
 # 日志写入到 ITC report\Log\email_sender_YYYYMMDD.log
 # 配置项(可在 email_config.json 的 system_config 中增加):
 # EMAIL_ENABLED (默认 True)
-# EMAIL_VERIFY_SENT (默认 True，关闭则不扫描已发送文件夹)
+# EMAIL_VERIFY_SENT (默认 False，开启后按 主题+发送时间 过滤查询已发送文件夹确认)
 # EMAIL_MAX_WAIT_SECONDS (默认 40)
 # EMAIL_RETRY_INTERVAL_SECONDS (默认 5)
 # EMAIL_SUBJECT_PREFIX (可选前缀)
@@ -65,9 +50,10 @@ def log(msg):
 # EMAIL_SIGNATURE_HTML (自定义签名)
 # EMAIL_DRAFT_ON_FAIL (默认 True，失败保存草稿)
 # EMAIL_TRIM_EMPTY (默认 True，过滤空地址)
+# EMAIL_TRANSPORT (默认 outlook；fake 为进程内 Outlook 模拟；smtp 为 SMTP 连接池，SMTP_* 配置见 smtp_transport)
 # 支持附件: 通过 kwargs 传 attachments=[r'c:\path\file1.txt', ...]
 # 超时与重试逻辑更清晰，阻塞时间可控
-# 避免多次 CoInitialize/Uninitialize 反复调用
+# 避免多次 CoInitialize/Uninitialize 反复调用(同一线程复用发送通道，见 _get_transport)
 # 出错时继续进入后续流程(返回 False)而不抛出阻塞异常
 DEFAULT_CFG = {
     "system_config": {
@@ -79,28 +65,27 @@ DEFAULT_CFG = {
         "EMAIL_APPEND_SIGNATURE": True,
         "EMAIL_SIGNATURE_HTML": "<div style='font-size:12px;color:#555;'>-- ITC 自动提醒系统</div>",
         "EMAIL_DRAFT_ON_FAIL": True,
-        "EMAIL_TRIM_EMPTY": True
+        "EMAIL_TRIM_EMPTY": True,
+        "EMAIL_TRANSPORT": "outlook"
     }
 }
 
 def load_email_config(config_path=None):
+    """读取 email_config.json 并合并 system_config 默认值(文件内容由 config_registry 缓存)"""
     if not config_path:
-        config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "email_config.json")
+        config_path = EMAIL_CONFIG_PATH
     if not os.path.exists(config_path):
         log(f"配置文件不存在，使用默认配置: {config_path}")
         return DEFAULT_CFG
-    try:
-        with open(config_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        if "system_config" not in data:
-            data["system_config"] = {}
-        merged = DEFAULT_CFG["system_config"].copy()
-        merged.update(data["system_config"])
-        data["system_config"] = merged
-        return data
-    except Exception as e:
-        log(f"读取配置失败，使用默认: {e}")
+    data = get_email_config(config_path)
+    if data is None:
+        log(f"读取配置失败，使用默认: {REGISTRY.last_error(config_path)}")
         return DEFAULT_CFG
+    merged = DEFAULT_CFG["system_config"].copy()
+    merged.update(data.get("system_config", {}))
+    cfg = dict(data)
+    cfg["system_config"] = merged
+    return cfg
 
 # ---------------- 工具 ----------------
 def _sanitize_addresses(addrs):
@@ -129,34 +114,125 @@ def _attach_files(mail, attachments):
     if ok_files:
         log(f"附件添加完成 数量={len(ok_files)}")
 
+def _outlook_filter_time(dt):
+    """Outlook Restrict(Jet) 过滤使用的本地时间格式，精度到分钟"""
+    return dt.strftime("%m/%d/%Y %I:%M %p")
+
+def _build_sent_filter(subject, cutoff):
+    """构造服务器端过滤条件: 发送时间窗口 + 主题精确匹配(单引号需双写转义)"""
+    subject_escaped = (subject or "").replace("'", "''")
+    return f"[SentOn] >= '{_outlook_filter_time(cutoff)}' AND [Subject] = '{subject_escaped}'"
+
 def _find_sent_item(sent_items, subject, send_time, lookback_seconds):
     """
     在已发送邮件中查找匹配主题且发送时间在窗口内的邮件
-    安全版本：添加异常处理防止COM崩溃
+    使用 Items.Restrict 由 Outlook/Exchange 端按索引过滤，只读取命中的邮件，
+    耗时与"已发送邮件"文件夹大小无关(原实现逐封读取 Subject/SentOn)
     """
     cutoff = send_time - timedelta(seconds=lookback_seconds)
     try:
-        for item in sent_items:
-            try:
-                # 防止 COM 对象访问导致崩溃
-                if hasattr(item, 'Subject') and hasattr(item, 'SentOn'):
-                    subject_val = str(item.Subject) if item.Subject else ""
-                    sent_on_val = item.SentOn
-                    if subject_val == subject and sent_on_val >= cutoff:
-                        return item
-            except Exception as item_err:
-                # 单个项目读取失败，继续下一个
-                log(f"读取邮件项异常(跳过): {item_err}")
-                continue
+        matches = sent_items.Restrict(_build_sent_filter(subject, cutoff))
+        if matches.Count == 0:
+            return None
+        matches.Sort("[SentOn]", True)
+        return matches.GetFirst()
     except Exception as e:
         log(f"查询已发送邮件列表异常(返回None): {e}")
     return None
 
+def _verify_sent(sent_folder, subject, send_time, max_wait, interval, lookback_seconds=300):
+    """
+    轮询已发送邮件确认发送结果(每轮一次过滤查询)，最长等待 max_wait 秒
+    返回 True/False
+    """
+    deadline = time.time() + max_wait
+    attempt = 0
+    while True:
+        attempt += 1
+        item = _find_sent_item(sent_folder.Items, subject, send_time, lookback_seconds)
+        if item is not None:
+            log(f"✅ 已发送邮件确认成功 (第{attempt}次查询)")
+            return True
+        if time.time() >= deadline:
+            log(f"⚠️ {max_wait}秒内未在已发送邮件中找到: {subject}")
+            return False
+        time.sleep(max(0.0, min(interval, deadline - time.time())))
+
+def _verify_sent_batch(sent_folder, subjects, send_time, max_wait, interval, lookback_seconds=300):
+    """
+    批量发送确认: 每轮只做一次按发送时间窗口的过滤查询，按主题计数匹配整批邮件(同主题多封按数量确认)
+    返回与 subjects 对应的 True/False 列表
+    """
+    from collections import Counter
+    cutoff = send_time - timedelta(seconds=lookback_seconds)
+    time_filter = f"[SentOn] >= '{_outlook_filter_time(cutoff)}'"
+    wanted = Counter(subjects)
+    found = Counter()
+    deadline = time.time() + max_wait
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            found = Counter(it.Subject for it in sent_folder.Items.Restrict(time_filter) if it.Subject in wanted)
+        except Exception as e:
+            log(f"查询已发送邮件列表异常: {e}")
+        missing = wanted - found
+        if not missing:
+            log(f"✅ 已发送邮件批量确认成功 {len(subjects)} 封 (第{attempt}次查询)")
+            break
+        if time.time() >= deadline:
+            log(f"⚠️ {max_wait}秒内未在已发送邮件中找到 {sum(missing.values())} 封: {sorted(missing)}")
+            break
+        time.sleep(max(0.0, min(interval, deadline - time.time())))
+    # 同主题的邮件按出现顺序依次认领已找到的数量
+    results = []
+    for s in subjects:
+        results.append(found[s] > 0)
+        found[s] -= 1
+    return results
+
 # ---------------- 主发送函数 ----------------
+def _prepare_message(subject, html_content, to_addrs, cc_addrs, scfg, attachments=None):
+    """按 system_config 处理地址/主题前缀，构造 MailMessage"""
+    prefix = scfg.get("EMAIL_SUBJECT_PREFIX", "") or ""
+    trim = bool(scfg.get("EMAIL_TRIM_EMPTY", True))
+
+    if cc_addrs is None:
+        cc_addrs = []
+
+    if trim:
+        to_addrs = _sanitize_addresses(to_addrs)
+        cc_addrs = _sanitize_addresses(cc_addrs)
+
+    if not to_addrs:
+        raise ValueError("收件人列表不能为空")
+
+    final_subject = f"{prefix}{subject}" if prefix else subject
+    return MailMessage(final_subject, html_content or "", to_addrs, cc_addrs, attachments)
+
+def _resolve_transport(scfg, transport):
+    """
+    选择发送通道: 显式传入的 transport 实例优先；传入名称或未传时按 EMAIL_TRANSPORT 取当前线程复用的通道
+    返回 None 表示当前环境无法发送
+    """
+    if transport is not None and not isinstance(transport, str):
+        return transport
+    name = transport or scfg.get("EMAIL_TRANSPORT", "outlook") or "outlook"
+    # Outlook COM 环境检查
+    if name == "outlook" and (win32com is None or pythoncom is None):
+        log("win32com / pythoncom 不可用，无法使用本地 Outlook 发送。")
+        return None
+    try:
+        return _get_transport(name, scfg)
+    except Exception as e:
+        log(f"❌ 创建发送通道失败({name}): {type(e).__name__}: {e}")
+        return None
+
+@traced("email_send")
 def send_email(subject, html_content, to_addrs, cc_addrs=None,
                config_path=None, max_retries=2, **kwargs):
     """
-    发送邮件(Outlook)
+    发送邮件(Outlook 通道始终从公共邮箱 ChinaPD_Cybersecurity_Robot 发送)
     subject: 标题
     html_content: HTML正文
     to_addrs: 收件人列表
@@ -164,7 +240,7 @@ def send_email(subject, html_content, to_addrs, cc_addrs=None,
     max_retries: 发送确认扫描失败时的重试次数
     kwargs 支持:
         attachments = [filepath1, filepath2]
-        use_public_mailbox = True (默认使用公共邮箱 ChinaPD_Cybersecurity_Robot)
+        transport = MailTransport 实例或通道名称(可选，默认按 EMAIL_TRANSPORT 创建并在线程内复用)
     返回 True/False
     """
     cfg = load_email_config(config_path)
@@ -176,86 +252,180 @@ def send_email(subject, html_content, to_addrs, cc_addrs=None,
     verify_sent = bool(scfg.get("EMAIL_VERIFY_SENT", True))
     max_wait = int(scfg.get("EMAIL_MAX_WAIT_SECONDS", 40))
     interval = int(scfg.get("EMAIL_RETRY_INTERVAL_SECONDS", 5))
-    prefix = scfg.get("EMAIL_SUBJECT_PREFIX", "") or ""
-    append_sig = bool(scfg.get("EMAIL_APPEND_SIGNATURE", True))
-    signature_html = scfg.get("EMAIL_SIGNATURE_HTML", "")
-    draft_on_fail = bool(scfg.get("EMAIL_DRAFT_ON_FAIL", True))
-    trim = bool(scfg.get("EMAIL_TRIM_EMPTY", True))
 
     attachments = kwargs.get("attachments")  # list or None
-    use_public_mailbox = kwargs.get("use_public_mailbox", True)  # 默认使用公共邮箱
-
-    if cc_addrs is None:
-        cc_addrs = []
-
-    if trim:
-        to_addrs = _sanitize_addresses(to_addrs)
-        cc_addrs = _sanitize_addresses(cc_addrs)
 
-    if not to_addrs:
-        raise ValueError("收件人列表不能为空")
-
-    final_subject = f"{prefix}{subject}" if prefix else subject
+    message = _prepare_message(subject, html_content, to_addrs, cc_addrs, scfg, attachments)
 
-    # Outlook COM 环境检查
-    if win32com is None or pythoncom is None:
-        log("win32com / pythoncom 不可用，无法使用本地 Outlook 发送。")
+    transport = _resolve_transport(scfg, kwargs.get("transport"))
+    if transport is None:
         return False
 
-        # ========== COM 初始化 ==========
-    pythoncom.CoInitialize()
-    
     try:
         # 【简化版】直接使用公共邮箱发送，不要回退到个人账户
-        from public_mailbox_sender import PublicMailboxAutoSender
-        
-        outlook = win32com.client.Dispatch("Outlook.Application")
-        
-        # 简单的 logger 适配器
-        class SimpleLogger:
-            def info(self, msg):
-                log(msg)
-            def error(self, msg):
-                log(f"❌ {msg}")
-            def warning(self, msg):
-                log(f"⚠️  {msg}")
-            def debug(self, msg):
-                log(f"🔍 {msg}")
-        
-        sender = PublicMailboxAutoSender(outlook, SimpleLogger())
-        log(f"✅ 使用公共邮箱发送: ChinaPD_Cybersecurity_Robot")
-        log(f"   收件人: {to_addrs}")
-        
-        success = sender.send_from_public_mailbox(
-            mailbox_name="ChinaPD_Cybersecurity_Robot",
-            to_addresses=to_addrs,
-            cc_addresses=cc_addrs,
-            subject=final_subject,
-            html_body=html_content or "",
-            attachments=attachments,
-            save_draft_only=False
-        )
-        
+        # 同一线程内复用发送通道(含Store/Drafts缓存)
+        if transport.name == "smtp":
+            log(f"✅ 使用SMTP发送: {transport.sender}")
+        else:
+            log(f"✅ 使用公共邮箱发送: {DEFAULT_PUBLIC_MAILBOX} (通道: {transport.name})")
+        log(f"   收件人: {message.to_addrs}")
+
+        send_time = datetime.now()
+        success = transport.send(message)
+
         if success:
-            log("✅ 邮件已成功通过公共邮箱发送！")
+            log("✅ 邮件已成功通过SMTP发送！" if transport.name == "smtp" else "✅ 邮件已成功通过公共邮箱发送！")
+            if verify_sent:
+                sent_folder = transport.get_sent_folder()
+                if sent_folder is None:
+                    log("⚠️ 当前通道不支持发送确认，跳过")
+                    return True
+                return _verify_sent(sent_folder, message.subject, send_time, max_wait, interval)
             return True
         else:
-            log("❌ 公共邮箱发送失败")
+            log("❌ SMTP发送失败" if transport.name == "smtp" else "❌ 公共邮箱发送失败")
+            # 发送失败时丢弃会话，下次重新创建
+            if not _is_explicit(kwargs.get("transport")):
+                _discard_transport(transport)
             return False
-    
+
     except Exception as e:
         log(f"❌ 错误: {type(e).__name__}: {e}")
         log(traceback.format_exc())
+        if not _is_explicit(kwargs.get("transport")):
+            _discard_transport(transport)
         return False
-    
-    finally:
-        # ========== COM 反初始化 ==========
-        try:
-            pythoncom.CoUninitialize()
-        except Exception as e:
-            log(f"COM反初始化异常: {e}")
 
-    return False
+@traced("email_send_batch")
+def send_emails(messages, config_path=None, transport=None):
+    """
+    批量发送: messages 为 dict 列表(subject, html_content, to_addrs, cc_addrs, attachments)
+    所有邮件在同一发送通道会话内依次发送，只解析一次配置与 Store/Drafts；
+    EMAIL_VERIFY_SENT 开启时整批发送后一次性确认(每轮一次已发送邮件查询，而非每封轮询)
+    返回与 messages 对应的 True/False 列表
+    """
+    cfg = load_email_config(config_path)
+    scfg = cfg.get("system_config", {})
+    if not scfg.get("EMAIL_ENABLED", True):
+        log("EMAIL_ENABLED=False 跳过发送。")
+        return [True] * len(messages)
+
+    prepared = []
+    for m in messages:
+        prepared.append(_prepare_message(
+            m.get("subject", ""), m.get("html_content", ""), m.get("to_addrs"),
+            m.get("cc_addrs"), scfg, m.get("attachments")))
+
+    active = _resolve_transport(scfg, transport)
+    if active is None:
+        return [False] * len(prepared)
+
+    t0 = time.perf_counter()
+    send_time = datetime.now()
+    try:
+        results = active.send_many(prepared)
+        if scfg.get("EMAIL_VERIFY_SENT", True) and any(results):
+            sent_folder = active.get_sent_folder()
+            if sent_folder is None:
+                log("⚠️ 当前通道不支持发送确认，跳过")
+            else:
+                sent = [m.subject for m, ok in zip(prepared, results) if ok]
+                verified = iter(_verify_sent_batch(
+                    sent_folder, sent, send_time,
+                    int(scfg.get("EMAIL_MAX_WAIT_SECONDS", 40)), int(scfg.get("EMAIL_RETRY_INTERVAL_SECONDS", 5))))
+                results = [ok and next(verified) for ok in results]
+    except Exception as e:
+        log(f"❌ 批量发送错误: {type(e).__name__}: {e}")
+        log(traceback.format_exc())
+        if not _is_explicit(transport):
+            _discard_transport(active)
+        return [False] * len(prepared)
+    elapsed = time.perf_counter() - t0
+    log(f"📬 批量发送完成: 成功 {sum(1 for r in results if r)}/{len(results)}，耗时 {elapsed:.2f}s")
+    return results
+
+# ---------------- 发送通道复用 ----------------
+# 每个线程只创建一次发送通道(Outlook 通道内只 CoInitialize / Dispatch 一次)，
+# PublicMailboxAutoSender 的 Store/Drafts/地址缓存在多封邮件之间共享；进程退出或出错时释放
+# 各线程的通道登记在 _SESSIONS 中，进程退出时(atexit 只在主线程执行)统一释放所有线程的通道
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+class _SenderLogger:
+    """PublicMailboxAutoSender 所需的 logger 适配器"""
+    def info(self, msg):
+        log(msg)
+    def error(self, msg):
+        log(f"❌ {msg}")
+    def warning(self, msg):
+        log(f"⚠️  {msg}")
+    def debug(self, msg):
+        log(f"🔍 {msg}")
+
+def _is_explicit(transport):
+    """调用方自行传入的通道实例由调用方负责释放"""
+    return transport is not None and not isinstance(transport, str)
+
+def _session_transports():
+    """当前线程的 {通道名称: (配置键, 通道)}，不同通道(如 smtp 与 outlook)交替使用时各自保留"""
+    thread = threading.current_thread()
+    with _SESSIONS_LOCK:
+        transports = _SESSIONS.get(thread)
+        if transports is not None:
+            return transports
+        transports = _SESSIONS[thread] = {}
+        # 顺带清理已结束线程遗留的通道(线程未调用 close_outlook_session 即退出)
+        dead = [t for t in _SESSIONS if not t.is_alive()]
+        orphaned = [_SESSIONS.pop(t) for t in dead]
+    for cached in orphaned:
+        for _, transport in list(cached.values()):
+            _close_transport(transport)
+    return transports
+
+def _close_transport(transport):
+    try:
+        transport.close()
+    except Exception as e:
+        log(f"发送通道释放异常: {e}")
+
+def _get_transport(name="outlook", scfg=None):
+    # 该通道的配置变化(如 SMTP_HOST 修改)时重建
+    key = tuple(sorted((k, str(v)) for k, v in (scfg or {}).items() if k.startswith("SMTP_")))
+    transports = _session_transports()
+    cached = transports.get(name)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    if cached is not None:
+        _close_transport(cached[1])
+    transport = create_transport(name, system_config=scfg, logger=_SenderLogger())
+    transports[name] = (key, transport)
+    return transport
+
+def _discard_transport(transport):
+    """发送失败时丢弃当前线程中的该通道，下次重新创建；其它通道不受影响"""
+    transports = _session_transports()
+    for name, (_, cached) in list(transports.items()):
+        if cached is transport:
+            del transports[name]
+            _close_transport(cached)
+
+def close_outlook_session(all_threads=False):
+    """
+    释放当前线程的所有发送通道(Outlook 通道会做 COM 反初始化)
+    all_threads: 释放所有线程登记的通道(进程退出时)；其它线程的 COM 反初始化只能由该线程自己完成，这里只释放对象
+    """
+    thread = threading.current_thread()
+    with _SESSIONS_LOCK:
+        if all_threads:
+            sessions = list(_SESSIONS.values())
+            _SESSIONS.clear()
+        else:
+            sessions = [_SESSIONS.pop(thread, {})]
+    for transports in sessions:
+        for _, transport in list(transports.values()):
+            _close_transport(transport)
+
+atexit.register(close_outlook_session, all_threads=True)
 
 # 简单自测
 if __name__ == "__main__":
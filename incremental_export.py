@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+增量导出: 本地维护合并后的数据集，每次只下载最近的日期窗口
+- 状态文件 RawData/.incremental/state.json 记录上次成功的窗口结束日期、合并文件路径、表头
+- 窗口 = [min(上次结束日期 - 重叠天数, 今天 - recent_days), 今天]，重叠用于覆盖迟到/状态变化的请求；
+  近期请求的状态变化最频繁，每次至少刷新最近 recent_days 天
+- 导出按 requestStatus 过滤，请求处理后不再出现在导出中: 窗口结果对其 [起点, 终点] 日期范围是权威的，
+  合并时丢弃该范围内窗口未返回的旧组，避免对已处理的请求继续提醒
+- 按请求组(Requester 非空行开始，后续日志行属于同一组)整体 upsert，保证组内行不被拆散
+  组键为 Request ID；导出中没有该列或为空时用 (Requester, Request For, Requested Date, System/Solution, Category)
+- 丢弃 Requested Date 超出 TIME_RANGE_DAYS 的组，使合并结果等价于一次完整导出
+- 以下情况自动做完整下载: 无状态/合并文件丢失、表头变化、查询参数变化、距上次完整下载超过 full_refresh_days
+  合并规则版本变化时也做一次完整下载(旧版本合并结果中可能残留已处理的请求)
+  (窗口之外的请求状态变化只能通过完整下载获得，需按实际情况设置 recent_days / full_refresh_days)
+输出仍是 pending_review_report 读取的 CSV(utf-8-sig)
+"""
+
+import os
+import csv
+import json
+import time
+import urllib.parse
+from datetime import datetime, timedelta, date
+
+from itc_csv import detect_encoding
+
+STATE_DIR_NAME = ".incremental"
+MERGED_PREFIX = "ITC_RequestExportReport_merged"
+MERGE_VERSION = 2
+GROUP_FALLBACK_COLUMNS = ("Requester", "Request For", "Requested Date", "System/Solution", "Category")
+_DATE_FORMATS = ("%m/%d/%Y %I:%M:%S %p", "%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M", "%m/%d/%Y",
+                 "%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%d/%m/%Y")
+
+
+class DateParser:
+    """解析导出中的日期；同一导出文件内格式一致，每个实例记住上一次成功的格式先试"""
+
+    def __init__(self):
+        self.last_format = _DATE_FORMATS[0]
+
+    def __call__(self, text):
+        text = (text or "").strip()
+        if not text:
+            return None
+        for fmt in (self.last_format,) + _DATE_FORMATS:
+            try:
+                d = datetime.strptime(text, fmt).date()
+            except ValueError:
+                continue
+            self.last_format = fmt
+            return d
+        return None
+
+
+def parse_date(text):
+    return DateParser()(text)
+
+
+def read_groups(path):
+    """
+    读取导出 CSV，返回 (header, groups)
+    groups: [(key, [row, ...])]，顺序与文件一致
+    """
+    with open(path, "rb") as f:
+        encoding = detect_encoding(f.read(4096))
+    with open(path, "r", encoding=encoding, errors="replace", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            return [], []
+        header = [h.strip() for h in header]
+        idx = {name: i for i, name in enumerate(header)}
+        requester_i = idx.get("Requester")
+        groups = []
+        current = None
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            if len(row) < len(header):
+                row = row + [""] * (len(header) - len(row))
+            starts_group = requester_i is None or row[requester_i].strip() != ""
+            if starts_group or current is None:
+                current = []
+                groups.append(current)
+            current.append(row)
+    return header, [(_group_key(rows, idx), rows) for rows in groups]
+
+
+def _group_key(rows, idx):
+    rid_i = idx.get("Request ID")
+    if rid_i is not None:
+        for row in rows:
+            rid = row[rid_i].strip()
+            if rid and rid.upper() != "N/A":
+                return "id:" + rid
+    first = rows[0]
+    return "k:" + "\x1f".join(first[idx[c]].strip() if c in idx else "" for c in GROUP_FALLBACK_COLUMNS)
+
+
+def _group_date(rows, idx, parse=parse_date):
+    i = idx.get("Requested Date")
+    if i is None:
+        return None
+    for row in rows:
+        d = parse(row[i])
+        if d:
+            return d
+    return None
+
+
+def write_groups(path, header, groups):
+    """原子写入合并后的 CSV"""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for _, rows in groups:
+            writer.writerows(rows)
+    os.replace(tmp, path)
+
+
+def merge_groups(header, base_groups, window_groups, min_date=None, window_range=None):
+    """
+    以窗口数据 upsert 基础数据: 同键的组整体替换(保持原位置)，新组追加在末尾
+    min_date: Requested Date 早于该日期的组被丢弃
+    window_range: 窗口的 (起点, 终点) 日期；基础数据中 Requested Date 落在该范围内而窗口未返回的组
+                  (请求已处理，不再被导出)被丢弃。无法解析日期的组保留到下一次完整下载
+    返回 (groups, stats)
+    """
+    idx = {name: i for i, name in enumerate(header)}
+    window = {}
+    for key, rows in window_groups:
+        window[key] = rows
+    parse = DateParser()
+    merged = []
+    stats = {"updated": 0, "added": 0, "unchanged": 0, "removed": 0, "expired": 0}
+    for key, rows in base_groups:
+        if key in window:
+            new_rows = window.pop(key)
+            stats["updated" if new_rows != rows else "unchanged"] += 1
+            rows = new_rows
+        else:
+            d = window_range and _group_date(rows, idx, parse)
+            if d and window_range[0] <= d <= window_range[1]:
+                stats["removed"] += 1
+                continue
+            stats["unchanged"] += 1
+        merged.append((key, rows))
+    for key, rows in window_groups:
+        if key in window:
+            merged.append((key, window.pop(key)))
+            stats["added"] += 1
+    if min_date is not None:
+        kept = []
+        for key, rows in merged:
+            d = _group_date(rows, idx, parse)
+            if d is not None and d < min_date:
+                stats["expired"] += 1
+                continue
+            kept.append((key, rows))
+        merged = kept
+    return merged, stats
+
+
+class IncrementalExporter:
+    """
+    增量导出流程
+        exporter = IncrementalExporter(RAW_DATA_DIR, BASE_REPORT_URL, REPORT_PARAMS, TIME_RANGE_DAYS)
+        merged_csv = exporter.run(lambda url, dest_dir: fetch_report(url, dest_dir, session).path)
+    """
+
+    def __init__(self, raw_dir, base_url, base_params, time_range_days=365, overlap_days=3,
+                 full_refresh_days=7, recent_days=30, log_callback=None):
+        self.raw_dir = os.path.abspath(raw_dir)
+        self.state_dir = os.path.join(self.raw_dir, STATE_DIR_NAME)
+        self.state_path = os.path.join(self.state_dir, "state.json")
+        self.base_url = base_url
+        self.base_params = {k: v for k, v in dict(base_params).items() if k != "dateRange"}
+        self.time_range_days = int(time_range_days)
+        self.overlap_days = max(0, int(overlap_days))
+        self.full_refresh_days = full_refresh_days
+        self.recent_days = max(0, int(recent_days or 0))
+        self.log_callback = log_callback
+
+    def log(self, message):
+        if self.log_callback:
+            try:
+                self.log_callback(message)
+            except Exception:
+                pass
+
+    # ---------------- 状态 ----------------
+    def load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_state(self, state):
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.state_path)
+
+    def _params_key(self):
+        return json.dumps(self.base_params, sort_keys=True)
+
+    # ---------------- 计划 ----------------
+    def plan(self, today=None):
+        """返回 (mode, start_date, end_date, reason)，mode 为 full 或 incremental"""
+        today = today or date.today()
+        full_start = today - timedelta(days=self.time_range_days)
+        state = self.load_state()
+        if not state:
+            return "full", full_start, today, "无增量状态"
+        merged = state.get("merged_path")
+        if not merged or not os.path.exists(merged):
+            return "full", full_start, today, "合并文件不存在"
+        if state.get("params_key") != self._params_key():
+            return "full", full_start, today, "查询参数已变化"
+        last_full = datetime.fromisoformat(state["last_full_refresh"]).date()
+        if self.full_refresh_days is not None and (today - last_full).days >= self.full_refresh_days:
+            return "full", full_start, today, f"距上次完整下载已 {(today - last_full).days} 天"
+        if state.get("merge_version") != MERGE_VERSION:
+            return "full", full_start, today, "合并规则已更新"
+        last_end = date.fromisoformat(state["last_end_date"])
+        start = max(full_start, last_end - timedelta(days=self.overlap_days))
+        reason = f"上次结束 {last_end}，重叠 {self.overlap_days} 天"
+        recent_start = max(full_start, today - timedelta(days=self.recent_days))
+        if recent_start < start:
+            start = recent_start
+            reason += f"，至少覆盖最近 {self.recent_days} 天"
+        return "incremental", start, today, reason
+
+    def build_url(self, start, end):
+        params = dict(self.base_params)
+        params["dateRange"] = f"{start.strftime('%m/%d/%Y')} - {end.strftime('%m/%d/%Y')}"
+        return f"{self.base_url}?{urllib.parse.urlencode(params)}"
+
+    # ---------------- 执行 ----------------
+    def run(self, fetch, today=None, force_full=False):
+        """
+        fetch(url, dest_dir) -> 下载得到的 CSV 路径
+        返回合并后的 CSV 路径(位于 RawData，供 pending_review_report 使用)
+        """
+        today = today or date.today()
+        mode, start, end, reason = self.plan(today)
+        if force_full and mode != "full":
+            mode, start, reason = "full", today - timedelta(days=self.time_range_days), "强制完整下载"
+        self.log(f"📦 导出模式: {'完整' if mode == 'full' else '增量'} {start} ~ {end} ({reason})")
+        os.makedirs(self.state_dir, exist_ok=True)
+        t0 = time.perf_counter()
+        window_path = fetch(self.build_url(start, end), self.state_dir)
+        fetch_seconds = time.perf_counter() - t0
+        window_size = os.path.getsize(window_path)
+
+        header, window_groups = read_groups(window_path)
+        if not header:
+            raise ValueError(f"下载的导出文件为空: {window_path}")
+        state = self.load_state() or {}
+        if mode == "incremental":
+            base_header, base_groups = read_groups(state["merged_path"])
+            if base_header != header:
+                # 表头变化时增量数据无法与旧数据对齐，本次窗口不足以替代完整数据
+                self.log("⚠️ 导出表头已变化，改为完整下载")
+                return self.run(fetch, today=today, force_full=True)
+        else:
+            base_groups = []
+
+        min_date = today - timedelta(days=self.time_range_days)
+        merged, stats = merge_groups(header, base_groups, window_groups, min_date=min_date,
+                                     window_range=(start, end))
+
+        merged_path = os.path.join(self.raw_dir, f"{MERGED_PREFIX}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        write_groups(merged_path, header, merged)
+        old = state.get("merged_path")
+        if old and os.path.abspath(old) != merged_path and os.path.exists(old):
+            # 合并文件是派生数据，只保留最新一份
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        try:
+            os.remove(window_path)
+        except OSError:
+            pass
+
+        now_iso = datetime.now().isoformat(timespec="seconds")
+        state.update({
+            "merge_version": MERGE_VERSION,
+            "merged_path": merged_path,
+            "last_end_date": end.isoformat(),
+            "last_run": now_iso,
+            "last_mode": mode,
+            "params_key": self._params_key(),
+            "columns": header,
+            "groups": len(merged),
+            "last_window": {"start": start.isoformat(), "end": end.isoformat(), "bytes": window_size,
+                            "groups": len(window_groups), "seconds": round(fetch_seconds, 2), **stats},
+        })
+        if mode == "full":
+            state["last_full_refresh"] = now_iso
+        self._save_state(state)
+        self.log(f"📦 合并完成: 窗口 {len(window_groups)} 组 ({window_size / 1024:.0f} KB, {fetch_seconds:.1f}s)，"
+                 f"更新 {stats['updated']} / 新增 {stats['added']} / 已处理 {stats['removed']} / 过期 {stats['expired']}，"
+                 f"共 {len(merged)} 组")
+        return merged_path
+
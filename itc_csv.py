@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+ITC 导出 CSV 的公共定义与完整性校验
+- 处理脚本必需的列
+- 编码探测(与 pending_review_report.detect_file_encoding 一致的候选顺序)
+- CsvTrailerCheck: 流式校验文件是否被截断(引号未闭合、最后一条记录字段数不足、缺少表头列)
+  逐块 feed，无需把整个文件读入内存，可在下载/解压的同时完成
+"""
+
+import csv
+import io
+
+REQUIRED_COLUMNS = ("Status", "System/Solution", "Request For", "Category")
+ENCODING_CANDIDATES = ("utf-8-sig", "utf-8", "gbk", "cp936", "latin1")
+
+
+class CsvIntegrityError(Exception):
+    """CSV 内容不完整或结构异常"""
+
+
+def detect_encoding(raw):
+    """根据开头字节猜测编码"""
+    for enc in ENCODING_CANDIDATES:
+        try:
+            raw.decode(enc)
+            return enc
+        except UnicodeDecodeError:
+            # 样本末尾可能截断了多字节字符，去掉最后几个字节再试
+            try:
+                raw[:-3].decode(enc)
+                return enc
+            except UnicodeDecodeError:
+                continue
+    return "latin1"
+
+
+def _parse_record(raw, encoding):
+    text = raw.decode(encoding, errors="replace").rstrip("\r")
+    rows = list(csv.reader(io.StringIO(text)))
+    return rows[0] if rows else []
+
+
+class CsvTrailerCheck:
+    """
+    流式 CSV 完整性校验
+        check = CsvTrailerCheck()
+        for chunk in chunks: check.feed(chunk)
+        info = check.finish()   # 失败抛出 CsvIntegrityError
+    按换行切分并跟踪双引号奇偶，只保留表头、最后一条完整记录和当前未结束的记录
+    """
+
+    def __init__(self, required_columns=REQUIRED_COLUMNS):
+        self.required_columns = tuple(required_columns or ())
+        self._quote_parity = 0
+        self._current = []
+        self._carry = b""
+        self._header = None
+        self._last = None
+        self._head_sample = b""
+        self.records = 0
+        self.bytes = 0
+
+    def feed(self, chunk):
+        if not chunk:
+            return
+        self.bytes += len(chunk)
+        if len(self._head_sample) < 4096:
+            self._head_sample += chunk[:4096 - len(self._head_sample)]
+        segments = chunk.split(b"\n")
+        # 上一块末尾未换行的部分与本块开头属于同一行
+        segments[0] = self._carry + segments[0]
+        self._carry = segments.pop()
+        for seg in segments:
+            self._quote_parity ^= seg.count(b'"') & 1
+            self._current.append(seg)
+            if not self._quote_parity:
+                self._complete()
+
+    def _complete(self):
+        record = b"\n".join(self._current)
+        self._current = []
+        if not record.strip():
+            return
+        if self._header is None:
+            self._header = record
+        else:
+            self._last = record
+            self.records += 1
+
+    def finish(self):
+        """返回 {"encoding", "columns", "records"}；文件被截断时抛出 CsvIntegrityError"""
+        if self._carry:
+            self._quote_parity ^= self._carry.count(b'"') & 1
+            self._current.append(self._carry)
+            self._carry = b""
+        if self._current:
+            if self._quote_parity:
+                raise CsvIntegrityError("文件结尾处引号未闭合(下载可能被截断)")
+            self._complete()
+        if self._header is None:
+            raise CsvIntegrityError("文件为空或缺少表头")
+        encoding = detect_encoding(self._head_sample)
+        columns = [c.strip() for c in _parse_record(self._header, encoding)]
+        missing = [c for c in self.required_columns if c not in columns]
+        if missing:
+            raise CsvIntegrityError(f"表头缺少必需列: {missing}")
+        if self._last is not None:
+            fields = _parse_record(self._last, encoding)
+            if len(fields) < len(columns):
+                raise CsvIntegrityError(
+                    f"最后一条记录字段数 {len(fields)} 少于表头 {len(columns)} (下载可能被截断)")
+        return {"encoding": encoding, "columns": columns, "records": self.records}
+
+
+def check_file(path, chunk_size=1024 * 1024, required_columns=REQUIRED_COLUMNS):
+    """校验磁盘上的 CSV 文件，返回 CsvTrailerCheck.finish() 的结果"""
+    check = CsvTrailerCheck(required_columns)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            check.feed(chunk)
+    return check.finish()
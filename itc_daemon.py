@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+ITC 报表常驻服务
+与计划任务每次冷启动 BatRun_ITCreport_downloader_rev2.py 相比，常驻进程保持:
+- 已登录的调试 Chrome 与 selenium driver (跳过端口探测、chromedriver 检查与登录等待)
+- 已导入的 pandas/numpy 与 pending_review_report (报表处理同进程调用)
+- 配置缓存(config_registry)、RawData 清单等
+
+按内部计划运行 下载 -> 处理 -> 发送，另提供本机触发:
+    python itc_daemon.py                     # 启动服务(计划时间见 --at / --interval-minutes)
+    python itc_daemon.py --trigger [--force] [--wait]
+    python itc_daemon.py --status
+    python itc_daemon.py --stop
+HTTP 只监听 127.0.0.1，端口与令牌写在 "ITC report/daemon.json"，请求需带 X-ITC-Token 头
+(防止浏览器页面跨站请求 localhost)
+"""
+
+import os
+import sys
+import json
+import time
+import secrets
+import argparse
+import importlib
+import threading
+import traceback
+import urllib.request
+import urllib.error
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = os.path.join(SCRIPT_DIR, "ITC report", "daemon.json")
+DEFAULT_PORT = 8765
+DEFAULT_SCHEDULE = ["08:30"]
+TOKEN_HEADER = "X-ITC-Token"
+
+
+def next_run_time(now, at_times=None, interval_minutes=None):
+    """计算下一次计划运行时间: interval_minutes 优先，否则取 at_times(HH:MM) 中下一个时刻"""
+    if interval_minutes:
+        return now + timedelta(minutes=interval_minutes)
+    candidates = []
+    for t in at_times or DEFAULT_SCHEDULE:
+        hh, mm = [int(x) for x in t.split(":")]
+        at = now.replace(hour=hh, minute=mm, second=0, microsecond=0)
+        if at <= now:
+            at += timedelta(days=1)
+        candidates.append(at)
+    return min(candidates)
+
+
+class ITCDaemon:
+    """单工作线程执行运行请求(selenium driver 非线程安全)，HTTP/计划只负责投递请求"""
+
+    def __init__(self, at_times=None, interval_minutes=None, port=DEFAULT_PORT, run_on_start=False):
+        self.at_times = at_times or DEFAULT_SCHEDULE
+        self.interval_minutes = interval_minutes
+        self.port = port
+        self.token = secrets.token_urlsafe(24)
+        self.run_on_start = run_on_start
+        self.downloader = None
+        self.driver = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = None          # {"force": bool, "reason": str}
+        self._run_seq = 0
+        self._done = threading.Condition(self._lock)
+        self.running = False
+        self.last = None
+        self.next_run = None
+        self.started_at = datetime.now()
+        self.server = None
+
+    def log(self, msg):
+        if self.downloader:
+            self.downloader.log_message(f"[daemon] {msg}")
+        else:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [daemon] {msg}", flush=True)
+
+    # ---------------- 预热 ----------------
+    def warm_up(self):
+        t0 = time.perf_counter()
+        import BatRun_ITCreport_downloader_rev2 as downloader
+        self.downloader = downloader
+        # 常驻进程中同进程调用处理脚本，pandas 只导入一次
+        downloader.PROCESSOR_MODE = "inprocess"
+        # 下载器与处理模块的重依赖都是延迟导入的，常驻进程在预热时一次导入，首次运行不再付出该开销
+        # requests/urllib3 与 selenium 等；只需导入，不使用模块对象
+        for module in ("report_fetcher", "download_watcher", "itc_login_watcher", "selenium.webdriver"):
+            importlib.import_module(module)
+        t1 = time.perf_counter()
+        import pending_review_report
+        pending_review_report.load_dependencies()  # 预先导入分析依赖 (pandas/numpy)
+        t2 = time.perf_counter()
+        self.log(f"预热完成: 下载器 {t1 - t0:.2f}s，处理模块 {t2 - t1:.2f}s")
+
+    # ---------------- 运行 ----------------
+    def request_run(self, force=False, reason="trigger"):
+        """
+        投递一次运行请求(未开始的请求合并为一次)，返回该请求对应的运行序号
+        已有运行在执行时，请求排在它之后: 序号为当前运行的下一个
+        """
+        with self._lock:
+            if self._pending:
+                self._pending["force"] = self._pending["force"] or force
+            else:
+                self._pending = {"force": force, "reason": reason}
+            # running 与取出 _pending 在同一把锁内设置，正在执行的运行序号为 _run_seq + 1
+            target = self._run_seq + (2 if self.running else 1)
+        self._wake.set()
+        return target
+
+    def wait_for_run(self, seq, timeout=None):
+        with self._done:
+            self._done.wait_for(lambda: self._run_seq >= seq, timeout=timeout)
+            return self.last if self._run_seq >= seq else None
+
+    def _run(self, force, reason):
+        t0 = time.perf_counter()
+        self.log(f"开始运行 (原因={reason} force={force})")
+        record = {"reason": reason, "force": force, "started": datetime.now().isoformat(timespec="seconds")}
+        try:
+            summary = self.downloader.run_once(force_download=force, driver=self.driver, keep_driver=True)
+            self.driver = summary.pop("driver", None)
+            result = summary.pop("result", None)
+            record.update({k: v for k, v in summary.items() if isinstance(v, (int, float, str, bool, type(None)))})
+            if summary.get("resources"):
+                record["resources"] = summary["resources"]
+            if result is not None and hasattr(result, "to_dict"):
+                r = result.to_dict()
+                record["report"] = {k: r[k] for k in ("pending_count", "revoked_count", "urgency_counts",
+                                                     "revoked_categories", "error", "timings", "resources")}
+        except Exception as e:
+            self.log(f"运行异常: {e}\n{traceback.format_exc()}")
+            record.update({"exit_code": 1, "error": str(e)})
+            self.driver = None
+        record["seconds"] = round(time.perf_counter() - t0, 2)
+        self.log(f"运行结束: exit_code={record.get('exit_code')} 耗时 {record['seconds']}s")
+        with self._done:
+            self.running = False
+            self.last = record
+            self._run_seq += 1
+            self._done.notify_all()
+
+    def _worker(self):
+        try:
+            self._worker_loop()
+        finally:
+            # 发送通道(Outlook COM)属于本线程，须在本线程内释放；atexit 在主线程执行，无法对本线程反初始化
+            from email_sender import close_outlook_session
+            close_outlook_session()
+
+    def _worker_loop(self):
+        if self.run_on_start:
+            self.request_run(reason="startup")
+        while not self._stop.is_set():
+            now = datetime.now()
+            self.next_run = next_run_time(now, self.at_times, self.interval_minutes) \
+                if self.next_run is None or self.next_run <= now else self.next_run
+            timeout = max(0.0, (self.next_run - datetime.now()).total_seconds())
+            self._wake.wait(timeout)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            with self._lock:
+                pending, self._pending = self._pending, None
+                due = pending is None and datetime.now() >= self.next_run
+                # 取出请求与标记运行中必须原子完成，否则 request_run 会把新请求算到这次运行上
+                self.running = bool(pending) or due
+            if pending:
+                self._run(pending["force"], pending["reason"])
+            elif due:
+                self.next_run = None
+                self._run(False, "schedule")
+
+    # ---------------- HTTP ----------------
+    def status(self):
+        with self._lock:
+            running, pending, runs, last = self.running, bool(self._pending), self._run_seq, self.last
+        return {
+            "pid": os.getpid(),
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "running": running,
+            "pending": pending,
+            "runs": runs,
+            "next_run": self.next_run.isoformat(timespec="seconds") if self.next_run else None,
+            "driver_warm": self.driver is not None,
+            "last": last,
+        }
+
+    def _make_handler(self):
+        daemon = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, code, payload):
+                body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _authorized(self):
+                if secrets.compare_digest(self.headers.get(TOKEN_HEADER, ""), daemon.token):
+                    return True
+                self._reply(403, {"error": "invalid token"})
+                return False
+
+            def do_GET(self):
+                if not self._authorized():
+                    return
+                if urlparse(self.path).path == "/status":
+                    self._reply(200, daemon.status())
+                else:
+                    self._reply(404, {"error": "not found"})
+
+            def do_POST(self):
+                if not self._authorized():
+                    return
+                url = urlparse(self.path)
+                q = parse_qs(url.query)
+                if url.path == "/run":
+                    seq = daemon.request_run(force=q.get("force", ["0"])[0] == "1", reason="http")
+                    if q.get("wait", ["0"])[0] == "1":
+                        timeout = float(q.get("timeout", ["1800"])[0])
+                        self._reply(200, {"run": seq, "result": daemon.wait_for_run(seq, timeout)})
+                    else:
+                        self._reply(202, {"run": seq, "queued": True})
+                elif url.path == "/stop":
+                    self._reply(200, {"stopping": True})
+                    threading.Thread(target=daemon.stop, daemon=True).start()
+                else:
+                    self._reply(404, {"error": "not found"})
+
+        return _Handler
+
+    def _write_state(self):
+        os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+        tmp = STATE_FILE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"port": self.server.server_address[1], "token": self.token, "pid": os.getpid()}, f)
+        os.replace(tmp, STATE_FILE)
+
+    def serve(self, warm=True):
+        if warm:
+            self.warm_up()
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.port), self._make_handler())
+        self._write_state()
+        worker = threading.Thread(target=self._worker, name="itc-daemon-worker", daemon=True)
+        worker.start()
+        self.log(f"服务已启动: http://127.0.0.1:{self.server.server_address[1]} "
+                 f"计划={'每 %s 分钟' % self.interval_minutes if self.interval_minutes else ','.join(self.at_times)}")
+        try:
+            self.server.serve_forever(poll_interval=0.5)
+        finally:
+            self._stop.set()
+            self._wake.set()
+            worker.join(timeout=5)
+            try:
+                os.remove(STATE_FILE)
+            except OSError:
+                pass
+            if self.driver is not None:
+                try:
+                    self.driver.quit()
+                except Exception:
+                    pass
+            if self.downloader:
+                self.downloader.close_chrome()
+            self.log("服务已停止")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self.server:
+            self.server.shutdown()
+
+
+# ---------------- 客户端 ----------------
+def _client_request(method, path, timeout=10):
+    try:
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        raise SystemExit(f"未找到运行中的服务 ({STATE_FILE})")
+    req = urllib.request.Request(f"http://127.0.0.1:{state['port']}{path}", method=method,
+                                 headers={TOKEN_HEADER: state["token"]}, data=b"" if method == "POST" else None)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+    except urllib.error.URLError as e:
+        raise SystemExit(f"无法连接服务: {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ITC 报表常驻服务 / 触发客户端")
+    parser.add_argument("--at", action="append", help="每日计划运行时间 HH:MM，可重复 (默认 08:30)")
+    parser.add_argument("--interval-minutes", type=float, default=None, help="按固定间隔运行(优先于 --at)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--run-now", action="store_true", help="服务启动后立即运行一次")
+    parser.add_argument("--trigger", action="store_true", help="请求运行中的服务立即运行一次")
+    parser.add_argument("--force", action="store_true", help="与 --trigger 一起使用: 忽略复用窗口强制下载")
+    parser.add_argument("--wait", action="store_true", help="与 --trigger 一起使用: 等待运行结束并输出结果")
+    parser.add_argument("--status", action="store_true")
+    parser.add_argument("--stop", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.trigger:
+        path = f"/run?force={int(args.force)}&wait={int(args.wait)}"
+        reply = _client_request("POST", path, timeout=1900 if args.wait else 10)
+        print(json.dumps(reply, ensure_ascii=False, indent=2))
+        result = reply.get("result")
+        return 0 if not args.wait or (result and result.get("exit_code") == 0) else 2
+    if args.status:
+        print(json.dumps(_client_request("GET", "/status"), ensure_ascii=False, indent=2))
+        return 0
+    if args.stop:
+        print(json.dumps(_client_request("POST", "/stop"), ensure_ascii=False))
+        return 0
+    ITCDaemon(at_times=args.at, interval_minutes=args.interval_minutes, port=args.port,
+              run_on_start=args.run_now).serve()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+共享日志后端
+- 调用方只做一次队列 put (控制台输出仍同步，保证与 print 顺序一致)
+- 后台线程批量写文件: 队列积压的记录一次写入后 flush；文件句柄保持打开，空闲时关闭
+- 按日期分文件 (<name>_YYYYMMDD.log)，超过 MAX_BYTES 时轮转为 .1/.2 ... (保留 BACKUP_COUNT 个)
+- 每条记录同时写入 JSON-lines (<name>_YYYYMMDD.jsonl: ts/level/logger/msg/pid/thread 及附加字段)，
+  .log 中是原有的 "[时间] 消息" 格式，可由 format_record 从 jsonl 重新生成:
+    python itc_logging.py "ITC report/Log/itc_downloader_20250101.jsonl"
+用法:
+    log = get_logger("itc_downloader", LOG_DIR)
+    log("开始下载")                       # 等价于 log.log(msg)
+    log.log("下载完成", seconds=3.2)      # 附加字段只写入 jsonl
+进程退出时(atexit)自动写完队列；需要立即落盘时调用 flush()
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import threading
+from datetime import datetime
+
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+# 同时写 JSON-lines 结构化记录
+STRUCTURED = True
+# 队列空闲多久后关闭文件句柄(秒)，避免长时间占用文件(Windows 下影响移动/删除)
+IDLE_CLOSE_SECONDS = 5.0
+# 一批最多写入的记录数
+BATCH_SIZE = 500
+
+
+def format_record(record):
+    """人类可读格式: [YYYY-mm-dd HH:MM:SS] 消息 (与原 log_message 输出一致)"""
+    ts = record["ts"][:19].replace("T", " ")
+    level = record.get("level", "INFO")
+    prefix = "" if level == "INFO" else f"[{level}] "
+    return f"[{ts}] {prefix}{record['msg']}"
+
+
+class _Target:
+    """一个日志目录 + 名称对应的 .log / .jsonl 文件"""
+
+    def __init__(self, log_dir, name):
+        self.log_dir = log_dir
+        self.name = name
+        self.day = None
+        self.files = {}
+
+    def path(self, ext):
+        return os.path.join(self.log_dir, f"{self.name}_{self.day}{ext}")
+
+    def _open(self, ext):
+        f = self.files.get(ext)
+        if f is None:
+            os.makedirs(self.log_dir, exist_ok=True)
+            f = self.files[ext] = open(self.path(ext), "a", encoding="utf-8")
+        return f
+
+    def close(self):
+        for f in self.files.values():
+            try:
+                f.close()
+            except OSError:
+                pass
+        self.files = {}
+
+    def _rotate(self, ext):
+        self.files.pop(ext).close()
+        base = self.path(ext)
+        try:
+            for i in range(BACKUP_COUNT - 1, 0, -1):
+                if os.path.exists(f"{base}.{i}"):
+                    os.replace(f"{base}.{i}", f"{base}.{i + 1}")
+            os.replace(base, f"{base}.1")
+        except OSError:
+            # 其他进程占用时继续追加到原文件
+            pass
+
+    def write(self, records):
+        for rec in records:
+            day = rec["ts"][:10].replace("-", "")
+            if day != self.day:
+                self.close()
+                self.day = day
+            self._open(".log").write(format_record(rec) + "\n")
+            if STRUCTURED:
+                self._open(".jsonl").write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+        for ext in list(self.files):
+            f = self.files[ext]
+            f.flush()
+            if MAX_BYTES and f.tell() >= MAX_BYTES:
+                self._rotate(ext)
+
+
+class LogWriter:
+    """进程内唯一的后台写线程"""
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._targets = {}
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.records = 0
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._loop, name="itc-log-writer", daemon=True)
+                    self._thread.start()
+
+    def put(self, log_dir, name, record):
+        self._ensure_thread()
+        self._queue.put((log_dir, name, record))
+
+    def flush(self, timeout=5.0):
+        """等待此前放入队列的记录全部写入文件"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _loop(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=IDLE_CLOSE_SECONDS)
+            except queue.Empty:
+                for target in self._targets.values():
+                    target.close()
+                continue
+            batch, events = {}, []
+            count = 0
+            while True:
+                if isinstance(item, threading.Event):
+                    events.append(item)
+                else:
+                    log_dir, name, record = item
+                    batch.setdefault((log_dir, name), []).append(record)
+                    count += 1
+                if count >= BATCH_SIZE:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            for key, records in batch.items():
+                target = self._targets.get(key)
+                if target is None:
+                    target = self._targets[key] = _Target(*key)
+                try:
+                    target.write(records)
+                except Exception as e:
+                    target.close()
+                    try:
+                        sys.stderr.write(f"日志写入失败 {key}: {e}\n")
+                    except Exception:
+                        pass
+            self.batches += 1
+            self.records += count
+            for ev in events:
+                ev.set()
+
+    def close(self, timeout=5.0):
+        self.flush(timeout)
+        for target in self._targets.values():
+            target.close()
+
+
+_WRITER = LogWriter()
+atexit.register(_WRITER.close)
+
+
+class Logger:
+    def __init__(self, name, log_dir, echo=True):
+        self.name = name
+        self.log_dir = log_dir
+        self.echo = echo
+
+    def log(self, msg, level="INFO", **fields):
+        now = datetime.now()
+        record = {"ts": now.isoformat(timespec="milliseconds"), "level": level, "logger": self.name,
+                  "msg": str(msg), "pid": os.getpid(), "thread": threading.current_thread().name}
+        if fields:
+            record.update(fields)
+        if self.echo:
+            _echo(format_record(record))
+        _WRITER.put(self.log_dir, self.name, record)
+
+    __call__ = log
+
+    def warning(self, msg, **fields):
+        self.log(msg, level="WARNING", **fields)
+
+    def error(self, msg, **fields):
+        self.log(msg, level="ERROR", **fields)
+
+
+def _echo(line):
+    try:
+        print(line, flush=True)
+    except (UnicodeEncodeError, ValueError):
+        try:
+            sys.stdout.buffer.write((line + "\n").encode("utf-8", "ignore"))
+            sys.stdout.buffer.flush()
+        except Exception:
+            pass
+
+
+_LOGGERS = {}
+
+
+def get_logger(name, log_dir, echo=True):
+    """按 (name, log_dir) 缓存，重复调用开销只是一次字典查找"""
+    key = (name, log_dir, echo)
+    logger = _LOGGERS.get(key)
+    if logger is None:
+        logger = _LOGGERS[key] = Logger(name, log_dir, echo)
+    return logger
+
+
+def flush(timeout=5.0):
+    return _WRITER.flush(timeout)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "r", encoding="utf-8") as f:
+            for ln in f:
+                if ln.strip():
+                    _echo(format_record(json.loads(ln)))
+        sys.exit(0)
+
+    import time
+    import shutil
+    import tempfile
+
+    tmp = tempfile.mkdtemp()
+    try:
+        log = get_logger("selftest", tmp, echo=False)
+        assert get_logger("selftest", tmp, echo=False) is log
+        n = 20000
+        t0 = time.perf_counter()
+        for i in range(n):
+            log(f"第 {i} 行 ✅")
+        put_us = (time.perf_counter() - t0) / n * 1e6
+        assert flush()
+        total_us = (time.perf_counter() - t0) / n * 1e6
+        day = datetime.now().strftime("%Y%m%d")
+        with open(os.path.join(tmp, f"selftest_{day}.log"), encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        assert len(lines) == n and lines[-1].endswith(f"第 {n - 1} 行 ✅"), lines[-1]
+        with open(os.path.join(tmp, f"selftest_{day}.jsonl"), encoding="utf-8") as f:
+            recs = [json.loads(x) for x in f]
+        assert format_record(recs[5]) == lines[5]
+        print(f"每行 {put_us:.1f} µs (入队) / {total_us:.1f} µs (含写入)，{_WRITER.batches} 批")
+
+        # 对比: 每行打开/关闭文件
+        legacy = os.path.join(tmp, "legacy.log")
+        t0 = time.perf_counter()
+        for i in range(2000):
+            os.makedirs(tmp, exist_ok=True)
+            with open(legacy, "a", encoding="utf-8") as f:
+                f.write(f"[x] 第 {i} 行\n")
+        print(f"每行打开文件 {(time.perf_counter() - t0) / 2000 * 1e6:.1f} µs")
+
+        log.warning("结构化", seconds=1.5)
+        flush()
+        with open(os.path.join(tmp, f"selftest_{day}.jsonl"), encoding="utf-8") as f:
+            last = json.loads(f.read().splitlines()[-1])
+        assert last["level"] == "WARNING" and last["seconds"] == 1.5
+
+        # 按大小轮转
+        MAX_BYTES = 4096
+        small = get_logger("rotate", tmp, echo=False)
+        for i in range(600):
+            small(f"rotate {i:04d} " + "x" * 40)
+        flush()
+        names = sorted(x for x in os.listdir(tmp) if x.startswith("rotate_") and x.endswith((".log", ".1", ".2")))
+        assert any(x.endswith(".log.1") for x in names) and len(names) <= 1 + BACKUP_COUNT * 2, names
+        print("✅ itc_logging 自测通过")
+    finally:
+        _WRITER.close()
+        shutil.rmtree(tmp)
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+基于 CDP 事件的 ITC 登录检测
+- Target.setDiscoverTargets 订阅页面 URL 变化(Target.targetCreated/targetInfoChanged)，
+  页面跳回 ITC 域名时立即检查 Cookie (Storage.getCookies)，不经过 WebDriver
+- 没有事件时按自适应间隔兜底检查: 0.25s 起，每次无变化乘 1.5，最长 2s；有事件后重置
+- 登录判定: 存在 ITC 域名的页面，且浏览器中有该域名的 Cookie
+  (配置了 cookie_names 时要求这些 Cookie 全部存在)
+CDP 不可用时返回 None，由调用方退回 WebDriver 轮询
+"""
+
+import time
+import threading
+
+MIN_POLL = 0.25
+MAX_POLL = 2.0
+BACKOFF = 1.5
+
+
+def _domain_matches(cookie_domain, host):
+    cookie_domain = (cookie_domain or "").lstrip(".").lower()
+    host = host.lower()
+    return host == cookie_domain or host.endswith("." + cookie_domain)
+
+
+class LoginWatcher:
+    """
+    等待 ITC 登录完成
+        watcher = LoginWatcher(DEBUG_PORT, "itc-tool.pg.com", log_callback=log_message)
+        ok = watcher.wait(LOGIN_TIMEOUT)   # True/False；CDP 不可用时为 None
+    """
+
+    def __init__(self, debug_port=None, domain="itc-tool.pg.com", cookie_names=None, log_callback=None,
+                 cdp=None, progress_interval=15):
+        self.debug_port = debug_port
+        self.domain = domain
+        self.cookie_names = set(cookie_names or ())
+        self.log_callback = log_callback
+        self.progress_interval = progress_interval
+        self._cdp = cdp
+        self._own_cdp = False
+        self._urls = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self.checks = 0
+        self.events = 0
+
+    def log(self, message):
+        if self.log_callback:
+            try:
+                self.log_callback(message)
+            except Exception:
+                pass
+
+    def _on_target(self, params):
+        info = params.get("targetInfo") or {}
+        if info.get("type") != "page":
+            return
+        with self._lock:
+            self._urls[info.get("targetId")] = info.get("url", "")
+        self.events += 1
+        self._changed.set()
+
+    def _on_destroyed(self, params):
+        with self._lock:
+            self._urls.pop(params.get("targetId"), None)
+
+    def _on_itc_page(self):
+        with self._lock:
+            urls = list(self._urls.values())
+        return any(self.domain in (u or "") for u in urls)
+
+    def is_logged_in(self):
+        """一次 CDP 往返检查 Cookie；页面不在 ITC 域名时不发请求"""
+        if not self._on_itc_page():
+            return False
+        self.checks += 1
+        cookies = self._cdp.send("Storage.getCookies").get("cookies", [])
+        names = {c.get("name") for c in cookies if _domain_matches(c.get("domain"), self.domain)}
+        if not names:
+            return False
+        return self.cookie_names.issubset(names) if self.cookie_names else True
+
+    def _connect(self):
+        if self._cdp is None:
+            if not self.debug_port:
+                return False
+            try:
+                from cdp_client import CDPClient
+                self._cdp = CDPClient.from_debug_port(self.debug_port, log_callback=self.log_callback)
+                self._own_cdp = True
+            except Exception as e:
+                self.log(f"CDP 连接失败，改用 WebDriver 轮询检测登录: {e}")
+                return False
+        try:
+            self._cdp.on("Target.targetCreated", self._on_target)
+            self._cdp.on("Target.targetInfoChanged", self._on_target)
+            self._cdp.on("Target.targetDestroyed", self._on_destroyed)
+            self._cdp.send("Target.setDiscoverTargets", {"discover": True})
+            # 已存在的页面(setDiscoverTargets 也会发 targetCreated，这里主动取一次避免事件先于注册)
+            for info in self._cdp.send("Target.getTargets").get("targetInfos", []):
+                self._on_target({"targetInfo": info})
+            return True
+        except Exception as e:
+            self.log(f"订阅 CDP 页面事件失败，改用 WebDriver 轮询检测登录: {e}")
+            return False
+
+    def close(self):
+        if self._cdp is None:
+            return
+        for ev, cb in (("Target.targetCreated", self._on_target), ("Target.targetInfoChanged", self._on_target),
+                       ("Target.targetDestroyed", self._on_destroyed)):
+            try:
+                self._cdp.off(ev, cb)
+            except Exception:
+                pass
+        if self._own_cdp:
+            try:
+                self._cdp.close()
+            except Exception:
+                pass
+            self._cdp = None
+
+    def wait(self, timeout):
+        """登录成功返回 True，超时返回 False，CDP 不可用返回 None"""
+        if not self._connect():
+            self.close()
+            return None
+        t0 = time.perf_counter()
+        deadline = t0 + timeout
+        next_progress = t0 + self.progress_interval
+        interval = MIN_POLL
+        try:
+            while True:
+                self._changed.clear()
+                try:
+                    if self.is_logged_in():
+                        self.log(f"登录检测通过 (CDP 事件，耗时 {time.perf_counter() - t0:.1f}s，"
+                                 f"Cookie 检查 {self.checks} 次)")
+                        return True
+                except Exception as e:
+                    if getattr(self._cdp, "closed", False):
+                        self.log(f"CDP 连接中断，改用 WebDriver 轮询检测登录: {e}")
+                        return None
+                now = time.perf_counter()
+                if now >= deadline:
+                    self.log(f"登录超时 ({timeout}s)")
+                    return False
+                if now >= next_progress:
+                    next_progress = now + self.progress_interval
+                    self.log(f"等待登录中 {now - t0:.0f}s / {timeout}s")
+                triggered = self._changed.wait(min(interval, deadline - now))
+                interval = MIN_POLL if triggered else min(interval * BACKOFF, MAX_POLL)
+        finally:
+            self.close()
+
+
+if __name__ == "__main__":
+    class _FakeCDP:
+        """模拟浏览器: 先停在 SSO 登录页，随后跳回 ITC 并写入会话 Cookie"""
+
+        def __init__(self):
+            self.listeners = {}
+            self.cookies = []
+            self.calls = {"Storage.getCookies": 0}
+            self.closed = False
+
+        def on(self, ev, cb):
+            self.listeners.setdefault(ev, []).append(cb)
+
+        def off(self, ev, cb):
+            self.listeners.get(ev, []).remove(cb)
+
+        def emit(self, ev, params):
+            for cb in list(self.listeners.get(ev, [])):
+                cb(params)
+
+        def send(self, method, params=None, timeout=None):
+            if method == "Target.getTargets":
+                return {"targetInfos": [{"targetId": "T1", "type": "page",
+                                         "url": "https://login.microsoftonline.com/oauth2"}]}
+            if method == "Storage.getCookies":
+                self.calls[method] += 1
+                return {"cookies": list(self.cookies)}
+            return {}
+
+    cdp = _FakeCDP()
+
+    def _simulate_login():
+        time.sleep(1.0)
+        cdp.cookies.append({"name": "ASP.NET_SessionId", "domain": "itc-tool.pg.com"})
+        cdp.emit("Target.targetInfoChanged", {"targetInfo": {"targetId": "T1", "type": "page",
+                                                             "url": "https://itc-tool.pg.com/RequestAccess"}})
+
+    threading.Thread(target=_simulate_login).start()
+    t0 = time.perf_counter()
+    ok = LoginWatcher(domain="itc-tool.pg.com", cdp=cdp, log_callback=print).wait(timeout=5)
+    lag = time.perf_counter() - t0 - 1.0
+    assert ok is True and lag < 0.1, (ok, lag)
+    # 页面不在 ITC 域名时不查询 Cookie
+    assert cdp.calls["Storage.getCookies"] == 1, cdp.calls
+    print(f"✅ 事件到达后 {lag * 1000:.0f} ms 检测到登录")
+
+    cdp2 = _FakeCDP()
+    cdp2.cookies.append({"name": "other", "domain": "itc-tool.pg.com"})
+    cdp2.send = (lambda orig: lambda m, p=None, timeout=None: (
+        {"targetInfos": [{"targetId": "T1", "type": "page", "url": "https://itc-tool.pg.com/"}]}
+        if m == "Target.getTargets" else orig(m, p, timeout)))(cdp2.send)
+    w = LoginWatcher(domain="itc-tool.pg.com", cookie_names=["ASP.NET_SessionId"], cdp=cdp2)
+    assert w.wait(timeout=1.5) is False and 3 <= cdp2.calls["Storage.getCookies"] <= 8, cdp2.calls
+    assert LoginWatcher(debug_port=None).wait(1) is None
+    print("✅ itc_login_watcher 自测通过")
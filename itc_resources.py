@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+阶段资源统计 (CPU / 内存 / I/O)，供 itc_trace 的 span 使用
+- 本进程: Linux 读取 resource.getrusage 与 /proc/self/status、/proc/self/io；
+  其他平台装有 psutil 时用 psutil，否则只有 os.times() 的 CPU 时间
+- Chrome: watch_pid() 登记 ChromeDriverManager / 下载器启动的 Chrome 进程，
+  采样时连同其全部子进程(渲染/GPU 进程)一起统计 CPU 与 RSS
+- 字段: cpu_user / cpu_sys (秒)，rss_mb (结束时)，peak_rss_delta_mb (阶段内进程峰值 RSS 的增长)，
+  read_mb / write_mb (含缓存命中的读写字节，/proc/self/io 的 rchar/wchar)；
+  chrome_cpu (秒)，chrome_rss_mb (结束时全部 Chrome 进程 RSS 之和)，chrome_procs
+"""
+
+import os
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+_PROC = os.path.isdir("/proc/self")
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") and _PROC else 100
+_PAGE_KB = (os.sysconf("SC_PAGE_SIZE") // 1024) if hasattr(os, "sysconf") and _PROC else 4
+
+# 登记的 Chrome 根进程 {pid: label}
+_WATCHED = {}
+
+
+def _read_kv(path):
+    out = {}
+    try:
+        with open(path, "r") as f:
+            for ln in f:
+                k, _, v = ln.partition(":")
+                out[k.strip()] = v.strip()
+    except OSError:
+        pass
+    return out
+
+
+def _kb(value):
+    try:
+        return int(value.split()[0])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def snapshot():
+    """本进程当前的累计资源计数"""
+    snap = {"t": time.perf_counter()}
+    if resource is not None:
+        ru = resource.getrusage(resource.RUSAGE_SELF)
+        snap["cpu_user"], snap["cpu_sys"] = ru.ru_utime, ru.ru_stime
+    else:
+        t = os.times()
+        snap["cpu_user"], snap["cpu_sys"] = t.user, t.system
+    if _PROC:
+        status = _read_kv("/proc/self/status")
+        snap["rss_kb"], snap["peak_rss_kb"] = _kb(status.get("VmRSS")), _kb(status.get("VmHWM"))
+        io = _read_kv("/proc/self/io")
+        if io:
+            snap["read_bytes"], snap["write_bytes"] = int(io.get("rchar", 0)), int(io.get("wchar", 0))
+    elif psutil is not None:
+        p = psutil.Process()
+        mem = p.memory_info()
+        snap["rss_kb"] = mem.rss // 1024
+        # Windows 的 peak_wset 即峰值工作集
+        peak = getattr(mem, "peak_wset", None)
+        snap["peak_rss_kb"] = peak // 1024 if peak else None
+        try:
+            io = p.io_counters()
+            snap["read_bytes"], snap["write_bytes"] = io.read_bytes, io.write_bytes
+        except (AttributeError, psutil.Error):
+            pass
+    if _WATCHED:
+        snap.update(sample_watched())
+    return snap
+
+
+def delta(before, after):
+    """两次 snapshot 之间的资源消耗"""
+    d = {"cpu_user": round(after["cpu_user"] - before["cpu_user"], 3),
+         "cpu_sys": round(after["cpu_sys"] - before["cpu_sys"], 3)}
+    if after.get("rss_kb") is not None:
+        d["rss_mb"] = round(after["rss_kb"] / 1024, 1)
+    if after.get("peak_rss_kb") is not None and before.get("peak_rss_kb") is not None:
+        d["peak_rss_delta_mb"] = round((after["peak_rss_kb"] - before["peak_rss_kb"]) / 1024, 1)
+    if "read_bytes" in after and "read_bytes" in before:
+        d["read_mb"] = round((after["read_bytes"] - before["read_bytes"]) / 1048576, 2)
+        d["write_mb"] = round((after["write_bytes"] - before["write_bytes"]) / 1048576, 2)
+    if "chrome_cpu" in after:
+        # 阶段开始时尚未启动的 Chrome 从 0 计；阶段内有 Chrome 进程退出时累计值会变小，按 0 计
+        d["chrome_cpu"] = round(max(0.0, after["chrome_cpu"] - before.get("chrome_cpu", 0.0)), 3)
+        d["chrome_rss_mb"] = round(after["chrome_rss_kb"] / 1024, 1)
+        d["chrome_procs"] = after["chrome_procs"]
+    return d
+
+
+# -------------------------- Chrome 进程 --------------------------
+def watch_pid(pid, label="chrome"):
+    """登记需要采样的进程(其子进程自动包含)"""
+    if pid:
+        _WATCHED[int(pid)] = label
+
+
+def unwatch_pid(pid):
+    _WATCHED.pop(int(pid), None)
+
+
+def watch_cmdline(fragment, label="chrome"):
+    """按命令行片段登记已在运行的进程(例如复用的调试 Chrome: "--remote-debugging-port=9233")，返回登记的 PID"""
+    table = _process_table()
+    found = [pid for pid, (_, cmd) in table.items() if fragment in cmd and pid != os.getpid()]
+    # 只登记最上层的匹配进程，其子进程采样时自动包含
+    roots = [p for p in found if table[p][0] not in found]
+    for pid in roots:
+        watch_pid(pid, label)
+    return roots
+
+
+def _process_table():
+    """{pid: (ppid, cmdline)}"""
+    table = {}
+    if _PROC:
+        for name in os.listdir("/proc"):
+            if not name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{name}/stat", "r") as f:
+                    stat = f.read()
+                with open(f"/proc/{name}/cmdline", "rb") as f:
+                    cmd = f.read().replace(b"\0", b" ").decode("utf-8", "replace")
+            except OSError:
+                continue
+            # comm 可能含空格/括号，从最后一个 ')' 之后解析
+            fields = stat[stat.rfind(")") + 2:].split()
+            table[int(name)] = (int(fields[1]), cmd)
+    elif psutil is not None:
+        for p in psutil.process_iter(["pid", "ppid", "cmdline"]):
+            table[p.info["pid"]] = (p.info["ppid"], " ".join(p.info["cmdline"] or []))
+    return table
+
+
+def _descendants(roots, table):
+    children = {}
+    for pid, (ppid, _) in table.items():
+        children.setdefault(ppid, []).append(pid)
+    out, stack = set(), [r for r in roots if r in table]
+    while stack:
+        pid = stack.pop()
+        if pid in out:
+            continue
+        out.add(pid)
+        stack.extend(children.get(pid, ()))
+    return out
+
+
+def _proc_usage(pid):
+    """(cpu 秒, rss KB)；进程已退出返回 None"""
+    if _PROC:
+        try:
+            with open(f"/proc/{pid}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            return None
+        fields = stat[stat.rfind(")") + 2:].split()
+        # 相对 state 字段: utime=11 stime=12 rss(页)=21
+        return (int(fields[11]) + int(fields[12])) / _CLK_TCK, int(fields[21]) * _PAGE_KB
+    if psutil is not None:
+        try:
+            p = psutil.Process(pid)
+            t = p.cpu_times()
+            return t.user + t.system, p.memory_info().rss // 1024
+        except psutil.Error:
+            return None
+    return None
+
+
+def sample_watched():
+    """登记的进程及其子进程的 CPU 与 RSS 合计；登记的进程全部退出后自动移除"""
+    table = _process_table()
+    for pid in [p for p in _WATCHED if p not in table]:
+        _WATCHED.pop(pid, None)
+    cpu, rss, n = 0.0, 0, 0
+    for pid in _descendants(list(_WATCHED), table):
+        usage = _proc_usage(pid)
+        if usage:
+            cpu += usage[0]
+            rss += usage[1]
+            n += 1
+    return {"chrome_cpu": cpu, "chrome_rss_kb": rss, "chrome_procs": n}
+
+
+def format_resources(res):
+    """计时树中的简短显示"""
+    if not res:
+        return ""
+    parts = [f"cpu={res['cpu_user'] + res['cpu_sys']:.2f}s"]
+    if "peak_rss_delta_mb" in res:
+        parts.append(f"peak+{res['peak_rss_delta_mb']:.0f}MB")
+    if "read_mb" in res:
+        parts.append(f"io={res['read_mb']:.1f}/{res['write_mb']:.1f}MB")
+    if res.get("chrome_procs"):
+        parts.append(f"chrome cpu={res['chrome_cpu']:.2f}s rss={res['chrome_rss_mb']:.0f}MB")
+    return "[" + " ".join(parts) + "]"
+
+
+if __name__ == "__main__":
+    import sys
+    import shutil
+    import tempfile
+    import subprocess
+
+    before = snapshot()
+    blob = bytearray(80 * 1024 * 1024)
+    for i in range(0, len(blob), 4096):
+        blob[i] = 1
+    sum(range(3_000_000))
+    tmp = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(tmp, "x.bin"), "wb") as f:
+            f.write(bytes(5 * 1024 * 1024))
+    finally:
+        shutil.rmtree(tmp)
+    d = delta(before, snapshot())
+    print(d, format_resources(d))
+    assert d["cpu_user"] + d["cpu_sys"] > 0
+    if _PROC:
+        assert d["peak_rss_delta_mb"] >= 70 and d["write_mb"] >= 5, d
+    del blob
+
+    # 模拟 Chrome: 父进程 + 一个忙碌的子进程
+    child_code = "import subprocess,sys,time; c=subprocess.Popen([sys.executable,'-c','x=bytearray(50*2**20)\\nwhile 1: sum(range(10**5))']); time.sleep(30)"
+    proc = subprocess.Popen([sys.executable, "-c", child_code, "--remote-debugging-port=65001"])
+    try:
+        time.sleep(0.3)
+        if _PROC or psutil is not None:
+            assert watch_cmdline("--remote-debugging-port=65001") == [proc.pid]
+            s0 = snapshot()
+            time.sleep(0.5)
+            d = delta(s0, snapshot())
+            print(format_resources(d))
+            assert d["chrome_procs"] == 2 and d["chrome_cpu"] > 0.2 and d["chrome_rss_mb"] > 50, d
+    finally:
+        for pid in _descendants([proc.pid], _process_table()):
+            try:
+                os.kill(pid, 9)
+            except OSError:
+                pass
+        proc.wait()
+    time.sleep(0.1)
+    s = snapshot()
+    assert "chrome_cpu" not in s or s["chrome_procs"] == 0
+    print("✅ itc_resources 自测通过")
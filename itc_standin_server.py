@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+"""
+本地 ITC 替身服务器(仅标准库，用法类似 smtp_standin)
+模拟 itc-tool.pg.com 与下载相关的部分，用于离线测量下载路径:
+- GET  /                     未登录 302 到 /Account/Login；已登录返回含 #frmRequestAccess 与「退出登录」的页面
+- GET  /Account/Login        登录页；?auto=1 直接登录(手动用浏览器访问时免输入)
+- POST /Account/Login        校验 username/password(未设置时任意值)，下发 ASP.NET_SessionId 与 .ASPXAUTH Cookie
+- GET  /Account/Logout       注销当前会话
+- GET  /RequestReport/GetRequestExportReport
+                             已登录返回 synthetic_export 生成的合成导出(Content-Disposition、ETag、Accept-Ranges，
+                             客户端接受时 gzip 传输，支持 Range/If-Range 续传)；未登录返回登录页 HTML
+- POST /webhook/<name>       Teams Webhook 替身，请求体保存在 server.webhook_posts
+- latency: 每个请求响应前的延迟(秒)，bandwidth: 导出下载的限速(字节/秒，None 不限速)
+导出内容按 (rows, seed, today) 生成一次后缓存在内存中
+
+用法:
+    with StandinITCServer(rows=50000, latency=0.2, bandwidth=2 * 1024 * 1024) as server:
+        ... ITC_BASE_URL=server.base_url ...
+    python itc_standin_server.py --port 8765 --rows 50000 --latency 0.2 --bandwidth 2MB
+"""
+
+import io
+import re
+import gzip
+import json
+import time
+import secrets
+import tempfile
+import threading
+import urllib.parse
+from datetime import date, datetime
+from http.cookies import SimpleCookie
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from synthetic_export import generate_export
+
+SESSION_COOKIE = "ASP.NET_SessionId"
+AUTH_COOKIE = ".ASPXAUTH"
+EXPORT_PATH = "/RequestReport/GetRequestExportReport"
+LOGIN_PATH = "/Account/Login"
+# 限速时每次写出的块大小
+THROTTLE_CHUNK = 64 * 1024
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>ITC Tool - Sign in</title></head>
+<body><form id="frmLogin" method="post" action="/Account/Login">
+<input name="username"><input name="password" type="password"><button type="submit">Sign in</button>
+</form></body></html>"""
+
+HOME_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>ITC Tool</title></head>
+<body><div class="navbar"><span>{user}</span> <a href="/Account/Logout">退出登录</a></div>
+<form id="frmRequestAccess" method="post" action="/RequestAccess"><select name="siteId"><option value="193">China PD</option></select></form>
+<a href="/RequestReport/GetRequestExportReport">Export</a></body></html>"""
+
+
+def parse_bandwidth(text):
+    """'2MB' / '512KB' / '1000000' -> 字节/秒；空或 0 表示不限速"""
+    if text in (None, "", "0"):
+        return None
+    m = re.fullmatch(r"\s*([\d.]+)\s*([KMG]?)B?(?:/S)?\s*", str(text).upper())
+    if not m:
+        raise ValueError(f"无法解析带宽: {text}")
+    return int(float(m.group(1)) * {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}[m.group(2)])
+
+
+class _ITCHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    # -------------------------- 工具 --------------------------
+    def _session(self):
+        cookie = SimpleCookie(self.headers.get("Cookie") or "")
+        token = cookie[SESSION_COOKIE].value if SESSION_COOKIE in cookie else None
+        auth = cookie[AUTH_COOKIE].value if AUTH_COOKIE in cookie else None
+        session = self.server.owner.sessions.get(token)
+        if session and session["auth"] == auth:
+            return token, session
+        return None, None
+
+    def _send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or []):
+            self.send_header(k, v)
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _redirect(self, location, headers=None):
+        self._send(302, b"", headers=[("Location", location)] + list(headers or []))
+
+    def _read_body(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(n) if n else b""
+
+    def _login(self, user):
+        owner = self.server.owner
+        token, auth = secrets.token_hex(12), secrets.token_hex(16)
+        with owner.lock:
+            owner.sessions[token] = {"user": user, "auth": auth, "created": time.time()}
+            owner.logins += 1
+        return [("Set-Cookie", f"{SESSION_COOKIE}={token}; Path=/; HttpOnly"),
+                ("Set-Cookie", f"{AUTH_COOKIE}={auth}; Path=/; HttpOnly")]
+
+    # -------------------------- 路由 --------------------------
+    def do_GET(self):
+        owner = self.server.owner
+        if owner.latency:
+            time.sleep(owner.latency)
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        token, session = self._session()
+        if url.path in ("/", "/RequestAccess"):
+            if not session:
+                return self._redirect(LOGIN_PATH)
+            return self._send(200, HOME_PAGE.format(user=session["user"]))
+        if url.path == LOGIN_PATH:
+            if query.get("auto") and not owner.username:
+                return self._redirect("/RequestAccess", headers=self._login("standin"))
+            return self._send(200, LOGIN_PAGE)
+        if url.path == "/Account/Logout":
+            if token:
+                with owner.lock:
+                    owner.sessions.pop(token, None)
+            return self._redirect(LOGIN_PATH)
+        if url.path == EXPORT_PATH:
+            if not session:
+                # 与真实站点一样: 会话失效时返回登录页而不是 401
+                with owner.lock:
+                    owner.unauthorized += 1
+                return self._send(200, LOGIN_PAGE)
+            return self._export(query)
+        return self._send(404, "not found", "text/plain; charset=utf-8")
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        owner = self.server.owner
+        if owner.latency:
+            time.sleep(owner.latency)
+        path = urllib.parse.urlsplit(self.path).path
+        body = self._read_body()
+        if path == LOGIN_PATH:
+            form = urllib.parse.parse_qs(body.decode("utf-8", "replace"))
+            user = (form.get("username") or ["standin"])[0]
+            password = (form.get("password") or [""])[0]
+            if owner.username and (user != owner.username or password != owner.password):
+                return self._send(200, LOGIN_PAGE.replace("<form", "<p class='error'>Invalid login</p><form", 1))
+            return self._redirect("/RequestAccess", headers=self._login(user))
+        if path.startswith("/webhook/"):
+            try:
+                payload = json.loads(body.decode("utf-8")) if body else None
+            except ValueError:
+                payload = body.decode("utf-8", "replace")
+            with owner.lock:
+                owner.webhook_posts.append({"name": path[len("/webhook/"):], "payload": payload})
+            # Teams Incoming Webhook 成功时返回 200 "1"
+            return self._send(200, "1", "text/plain; charset=utf-8")
+        return self._send(404, "not found", "text/plain; charset=utf-8")
+
+    # -------------------------- 导出 --------------------------
+    def _export(self, query):
+        owner = self.server.owner
+        raw, gz = owner.export_body()
+        use_gzip = owner.gzip and "gzip" in (self.headers.get("Accept-Encoding") or "")
+        data = gz if use_gzip else raw
+        etag = f'"{owner.export_etag}{"-gz" if use_gzip else ""}"'
+        start = 0
+        rng = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        headers = [("Content-Disposition", f'attachment; filename="{owner.export_filename()}"'),
+                   ("ETag", etag), ("Accept-Ranges", "bytes")]
+        if use_gzip:
+            headers.append(("Content-Encoding", "gzip"))
+        m = re.fullmatch(r"bytes=(\d+)-", rng or "")
+        if m and (if_range is None or if_range == etag):
+            start = int(m.group(1))
+            if start >= len(data):
+                return self._send(416, b"", "text/csv", [("Content-Range", f"bytes */{len(data)}")])
+            status = 206
+            headers.append(("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}"))
+        else:
+            status = 200
+        self.send_response(status)
+        self.send_header("Content-Type", "text/csv; charset=utf-8")
+        self.send_header("Content-Length", str(len(data) - start))
+        for k, v in headers:
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        with owner.lock:
+            owner.exports += 1
+        self._write_throttled(memoryview(data)[start:])
+
+    def _write_throttled(self, view):
+        owner = self.server.owner
+        if not owner.bandwidth:
+            self.wfile.write(view)
+            self._count(len(view))
+            return
+        t0 = time.perf_counter()
+        sent = 0
+        while sent < len(view):
+            chunk = view[sent:sent + THROTTLE_CHUNK]
+            self.wfile.write(chunk)
+            sent += len(chunk)
+            self._count(len(chunk))
+            ahead = sent / owner.bandwidth - (time.perf_counter() - t0)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    def _count(self, n):
+        with self.server.owner.lock:
+            self.server.owner.bytes_sent += n
+
+
+class StandinITCServer:
+    """本地 ITC 替身；base_url 即下载器的 ITC_BASE_URL"""
+
+    def __init__(self, host="127.0.0.1", port=0, rows=10000, seed=0, today=None, latency=0.0, bandwidth=None,
+                 gzip_enabled=True, username=None, password=None, export_kwargs=None):
+        self.host = host
+        self.rows = rows
+        self.seed = seed
+        self.today = today or date.today()
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.gzip = gzip_enabled
+        self.username = username
+        self.password = password
+        self.export_kwargs = dict(export_kwargs or {})
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.webhook_posts = []
+        self.logins = 0
+        self.exports = 0
+        self.unauthorized = 0
+        self.bytes_sent = 0
+        self.export_etag = None
+        self._export = None
+        self._export_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _ITCHandler)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self.port = self._server.server_address[1]
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def export_url(self):
+        return self.base_url + EXPORT_PATH
+
+    def webhook_url(self, name="itc_notifications"):
+        return f"{self.base_url}/webhook/{name}"
+
+    def export_filename(self):
+        return f"ITC_RequestExportReport_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+
+    def export_body(self):
+        """(原始字节, gzip 字节)，首次调用时生成"""
+        with self._export_lock:
+            if self._export is None:
+                with tempfile.TemporaryDirectory() as tmp:
+                    path = f"{tmp}/export.csv"
+                    self.export_stats = generate_export(path, rows=self.rows, seed=self.seed, today=self.today,
+                                                        **self.export_kwargs)
+                    with open(path, "rb") as f:
+                        raw = f.read()
+                buf = io.BytesIO()
+                with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=6, mtime=0) as gz:
+                    gz.write(raw)
+                self._export = (raw, buf.getvalue())
+                self.export_etag = f"{self.rows}-{self.seed}-{self.today:%Y%m%d}"
+            return self._export
+
+    def login(self, session, username=None, password=None):
+        """用 requests.Session 登录(模拟用户在浏览器中登录)，返回 Cookie 列表(CDP Cookie 对象格式)"""
+        resp = session.post(self.base_url + LOGIN_PATH, allow_redirects=False,
+                            data={"username": username or self.username or "standin",
+                                  "password": password or self.password or ""})
+        if resp.status_code != 302:
+            raise RuntimeError(f"替身服务器登录失败: HTTP {resp.status_code}")
+        return [{"name": c.name, "value": c.value, "domain": self.host, "path": c.path or "/",
+                 "httpOnly": True, "secure": False} for c in session.cookies]
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, name="itc-standin", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地 ITC 替身服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rows", type=int, default=10000, help="合成导出行数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的响应延迟(秒)")
+    parser.add_argument("--bandwidth", default=None, help="导出下载限速，例如 2MB / 512KB (默认不限速)")
+    parser.add_argument("--no-gzip", action="store_true", help="禁用 gzip 传输")
+    parser.add_argument("--username", default=None, help="要求的登录用户名(默认任意)")
+    parser.add_argument("--password", default=None)
+    args = parser.parse_args(argv)
+    server = StandinITCServer(args.host, args.port, rows=args.rows, seed=args.seed, latency=args.latency,
+                              bandwidth=parse_bandwidth(args.bandwidth), gzip_enabled=not args.no_gzip,
+                              username=args.username, password=args.password)
+    server.export_body()
+    print(f"ITC 替身服务器: {server.base_url}  (ITC_BASE_URL={server.base_url})")
+    print(f"导出 {args.rows} 行 {len(server.export_body()[0]) / 1048576:.1f} MB，"
+          f"延迟 {args.latency}s，限速 {args.bandwidth or '无'}；Ctrl+C 退出")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1:
+        sys.exit(main())
+
+    import shutil
+    import requests
+    from report_fetcher import build_session, fetch_report, ReportFetchError
+    from itc_csv import check_file
+
+    tmp = tempfile.mkdtemp()
+    try:
+        with StandinITCServer(rows=5000, seed=3, latency=0.01) as server:
+            s = requests.Session()
+            r = s.get(server.base_url + "/", allow_redirects=False)
+            assert r.status_code == 302 and r.headers["Location"] == LOGIN_PATH
+            cookies = server.login(s)
+            assert {c["name"] for c in cookies} == {SESSION_COOKIE, AUTH_COOKIE}
+            assert 'id="frmRequestAccess"' in s.get(server.base_url + "/").text
+            # 未登录下载: 返回登录页，report_fetcher 判为认证失效
+            with build_session([]) as anon:
+                try:
+                    fetch_report(server.export_url, tmp, anon)
+                    raise AssertionError("应判为未登录")
+                except ReportFetchError as e:
+                    print(f"未登录: {e}")
+            with build_session(cookies) as sess:
+                res = fetch_report(server.export_url + "?siteId=193", tmp, sess, log_callback=print)
+            assert res.content_encoding == "gzip" and res.records == 5000 == check_file(res.path)["records"]
+            with open(res.path, "rb") as f:
+                assert f.read() == server.export_body()[0]
+            # Range 续传
+            raw_len = len(server.export_body()[0])
+            r = s.get(server.export_url, headers={"Range": "bytes=100-", "Accept-Encoding": "identity"})
+            assert r.status_code == 206 and len(r.content) == raw_len - 100
+            # Webhook
+            assert requests.post(server.webhook_url(), json={"text": "hi"}).text == "1"
+            assert server.webhook_posts[-1] == {"name": "itc_notifications", "payload": {"text": "hi"}}
+            assert server.logins == 1 and server.unauthorized == 1
+
+        # 限速: 约 1 MB 以 2 MB/s 传输应接近 0.5s
+        with StandinITCServer(rows=6000, bandwidth=2 * 1024 * 1024, gzip_enabled=False) as server:
+            size = len(server.export_body()[0])
+            s = requests.Session()
+            server.login(s)
+            t0 = time.perf_counter()
+            assert len(s.get(server.export_url).content) == size
+            elapsed = time.perf_counter() - t0
+            expected = size / (2 * 1024 * 1024)
+            print(f"限速下载 {size / 1048576:.2f} MB 耗时 {elapsed:.2f}s (理论 {expected:.2f}s)")
+            assert expected * 0.9 <= elapsed <= expected + 0.5
+        assert parse_bandwidth("512KB") == 524288 and parse_bandwidth("2MB/s") == 2097152
+        print("✅ itc_standin_server 自测通过")
+    finally:
+        shutil.rmtree(tmp)
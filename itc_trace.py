@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+轻量级阶段计时 (trace)
+    with trace_run("itc_run", LOG_DIR):          # 一次运行的根: 结束时写计时树并追加历史
+        with span("download", mode="http"):
+            ...
+    @traced("email_send")
+    def send_email(...): ...
+
+- span 通过 contextvars 嵌套，同一运行内共享 run_id；不在任何运行中时 span 只计时不记录
+- trace_run 已处于某个运行中时退化为普通子 span (处理脚本被下载器同进程调用时并入下载器的树)
+- run_id 取环境变量 ITC_RUN_ID，没有则生成；运行期间设置该变量，子进程(subprocess 方式的处理脚本)沿用同一 run_id
+- 每个 span 同时记录资源消耗 (CPU、峰值 RSS 增长、读写字节、登记的 Chrome 进程，见 itc_resources)
+- 输出到日志目录: trace_<run_id>_<name>.txt (计时树) 与 trace_history.jsonl (每次运行一行，含各阶段耗时)
+  python itc_trace.py [--last 10] 对比最近几次运行各阶段耗时
+注意: contextvars 不会传入线程池中的线程，线程内的 span 不会被记录
+"""
+
+import os
+import sys
+import json
+import time
+import secrets
+import argparse
+import functools
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+import itc_resources
+
+RUN_ID_ENV = "ITC_RUN_ID"
+HISTORY_FILE = "trace_history.jsonl"
+DEFAULT_LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ITC report", "Log")
+# 每个 span 开始/结束时采样资源 (每次采样约数十微秒，登记了 Chrome 进程时需遍历进程表，约数毫秒)
+RESOURCE_ACCOUNTING = True
+
+_current = contextvars.ContextVar("itc_trace_span", default=None)
+
+
+def new_run_id():
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(2)}"
+
+
+class Span:
+    def __init__(self, name, run_id=None, parent=None, attrs=None):
+        self.name = name
+        self.run_id = run_id
+        self.parent = parent
+        self.attrs = dict(attrs or {})
+        self.children = []
+        self.started_at = datetime.now()
+        self.resources = None
+        self._usage0 = itc_resources.snapshot() if RESOURCE_ACCOUNTING else None
+        self.start = time.perf_counter()
+        self.seconds = None
+        self.error = None
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.start
+        if self._usage0 is not None:
+            try:
+                self.resources = itc_resources.delta(self._usage0, itc_resources.snapshot())
+            except Exception:
+                self.resources = None
+
+    @property
+    def elapsed(self):
+        return self.seconds if self.seconds is not None else time.perf_counter() - self.start
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self):
+        d = {"name": self.name, "started_at": self.started_at.isoformat(timespec="milliseconds"),
+             "seconds": round(self.elapsed, 4)}
+        if self.attrs:
+            d["attrs"] = self.attrs
+        if self.resources:
+            d["resources"] = self.resources
+        if self.error:
+            d["error"] = self.error
+        if self.children:
+            d["children"] = [c.to_dict() for c in self.children]
+        return d
+
+    def stages(self, prefix=""):
+        """扁平化为 {"itc_run/download": 秒}，同名阶段累加"""
+        path = f"{prefix}/{self.name}" if prefix else self.name
+        out = {path: self.elapsed}
+        for c in self.children:
+            for k, v in c.stages(path).items():
+                out[k] = out.get(k, 0.0) + v
+        return out
+
+    def stage_resources(self, prefix=""):
+        """{"itc_run/download": 资源}，同名阶段取最后一次"""
+        path = f"{prefix}/{self.name}" if prefix else self.name
+        out = {path: self.resources} if self.resources else {}
+        for c in self.children:
+            out.update(c.stage_resources(path))
+        return out
+
+
+def current_span():
+    return _current.get()
+
+
+def current_run_id():
+    sp = _current.get()
+    return sp.run_id if sp else os.environ.get(RUN_ID_ENV)
+
+
+@contextmanager
+def span(name, **attrs):
+    """计时一个阶段；处于运行中时挂到当前 span 下"""
+    parent = _current.get()
+    sp = Span(name, run_id=parent.run_id if parent else None, parent=parent, attrs=attrs)
+    if parent is not None:
+        parent.children.append(sp)
+    token = _current.set(sp)
+    try:
+        yield sp
+    except BaseException as e:
+        sp.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        sp.finish()
+        _current.reset(token)
+
+
+def traced(name=None):
+    """装饰器形式的 span"""
+    def deco(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+@contextmanager
+def trace_run(name, log_dir=None, run_id=None, log_callback=None, **attrs):
+    """
+    一次运行的根 span；结束时把计时树写到 log_dir (默认 ITC report/Log) 并追加历史
+    已处于运行中时等同于 span(name)
+    """
+    if _current.get() is not None:
+        with span(name, **attrs) as sp:
+            yield sp
+        return
+    run_id = run_id or os.environ.get(RUN_ID_ENV) or new_run_id()
+    saved_env = os.environ.get(RUN_ID_ENV)
+    os.environ[RUN_ID_ENV] = run_id
+    root = Span(name, run_id=run_id, attrs=attrs)
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        root.finish()
+        _current.reset(token)
+        if saved_env is None:
+            os.environ.pop(RUN_ID_ENV, None)
+        else:
+            os.environ[RUN_ID_ENV] = saved_env
+        try:
+            path = write_report(root, log_dir or DEFAULT_LOG_DIR)
+            if log_callback:
+                log_callback(f"⏱️ 阶段耗时 (run_id={run_id}):\n{render_tree(root)}\n计时树: {path}")
+        except Exception as e:
+            if log_callback:
+                log_callback(f"⚠️ 写入计时树失败: {e}")
+
+
+def render_tree(root):
+    total = root.elapsed or 1e-9
+    lines = []
+
+    def walk(sp, depth):
+        attrs = " ".join(f"{k}={v}" for k, v in sp.attrs.items())
+        err = f" ❌ {sp.error}" if sp.error else ""
+        res = itc_resources.format_resources(sp.resources)
+        lines.append(f"{'    ' * depth}{sp.name:<{max(1, 28 - 4 * depth)}} {sp.elapsed:9.3f}s "
+                     f"{sp.elapsed / total * 100:5.1f}%  {res} {attrs}{err}".rstrip())
+        for c in sp.children:
+            walk(c, depth + 1)
+
+    walk(root, 0)
+    return "\n".join(lines)
+
+
+def write_report(root, log_dir):
+    """写 trace_<run_id>_<name>.txt 并向 trace_history.jsonl 追加一行，返回计时树路径"""
+    os.makedirs(log_dir, exist_ok=True)
+    path = os.path.join(log_dir, f"trace_{root.run_id}_{root.name}.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"run_id={root.run_id} name={root.name} started={root.started_at.isoformat(timespec='seconds')} "
+                f"pid={os.getpid()}\n")
+        f.write(render_tree(root) + "\n")
+    entry = {"run_id": root.run_id, "name": root.name, "started_at": root.started_at.isoformat(timespec="seconds"),
+             "seconds": round(root.elapsed, 4), "ok": root.error is None,
+             "stages": {k: round(v, 4) for k, v in root.stages().items()},
+             "resources": root.stage_resources(), "tree": root.to_dict()}
+    with open(os.path.join(log_dir, HISTORY_FILE), "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+    return path
+
+
+def load_history(log_dir=None, name=None, last=None):
+    entries = []
+    try:
+        with open(os.path.join(log_dir or DEFAULT_LOG_DIR, HISTORY_FILE), "r", encoding="utf-8") as f:
+            for ln in f:
+                try:
+                    e = json.loads(ln)
+                except ValueError:
+                    continue
+                if name is None or e.get("name") == name:
+                    entries.append(e)
+    except OSError:
+        pass
+    return entries[-last:] if last else entries
+
+
+def compare(entries):
+    """最近一次运行与之前各次的中位数对比，返回 [(阶段, 最近, 中位数, 倍数)]，按倍数从大到小"""
+    if len(entries) < 2:
+        return []
+    latest, previous = entries[-1]["stages"], entries[:-1]
+    rows = []
+    for stage, sec in latest.items():
+        hist = sorted(e["stages"][stage] for e in previous if stage in e["stages"])
+        if not hist:
+            continue
+        median = hist[len(hist) // 2]
+        rows.append((stage, sec, median, sec / median if median > 0 else float("inf")))
+    rows.sort(key=lambda r: -r[3])
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查看 ITC 运行阶段耗时历史")
+    parser.add_argument("--log-dir", default=DEFAULT_LOG_DIR)
+    parser.add_argument("--name", default="itc_run", help="运行名称 (itc_run / pending_review_report)")
+    parser.add_argument("--last", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=1.5, help="超过历史中位数该倍数时标记为变慢")
+    args = parser.parse_args(argv)
+    entries = load_history(args.log_dir, args.name, args.last)
+    if not entries:
+        print(f"没有运行记录: {os.path.join(args.log_dir, HISTORY_FILE)}")
+        return 1
+    for e in entries:
+        print(f"{e['started_at']}  {e['run_id']}  {e['seconds']:8.2f}s  {'OK' if e.get('ok') else 'ERROR'}")
+    rows = compare(entries)
+    if rows:
+        print(f"\n最近一次 vs 之前 {len(entries) - 1} 次中位数:")
+        for stage, sec, median, ratio in rows:
+            flag = "⚠️ " if ratio >= args.threshold else "   "
+            print(f"{flag}{stage:<50} {sec:9.3f}s  中位数 {median:9.3f}s  x{ratio:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(main())
+
+    import shutil
+    import tempfile
+    import threading
+
+    tmp = tempfile.mkdtemp()
+    try:
+        assert current_span() is None
+        with span("outside") as sp:
+            pass
+        assert sp.seconds is not None and sp.run_id is None
+
+        @traced("email_send")
+        def _send():
+            time.sleep(0.02)
+
+        logs = []
+        for i in range(3):
+            with trace_run("itc_run", tmp, log_callback=logs.append) as root:
+                run_id = root.run_id
+                assert os.environ[RUN_ID_ENV] == run_id and current_run_id() == run_id
+                with span("chrome_launch"):
+                    time.sleep(0.01)
+                with span("download", mode="http"):
+                    time.sleep(0.03 if i < 2 else 0.12)
+                # 同进程调用处理脚本: trace_run 并入当前树
+                with trace_run("pending_review_report", tmp) as child:
+                    assert child.run_id == run_id and child.parent is root
+                    with span("csv_read"):
+                        time.sleep(0.01)
+                    _send()
+                    _send()
+                # 线程中的 span 不记录
+                threading.Thread(target=lambda: span("thread").__enter__()).start()
+            assert RUN_ID_ENV not in os.environ
+        assert root.resources and "cpu_user" in root.children[1].resources, root.to_dict()
+        names = [c.name for c in root.children]
+        assert names == ["chrome_launch", "download", "pending_review_report"], names
+        stages = root.stages()
+        assert abs(stages["itc_run/pending_review_report/email_send"] - 0.04) < 0.02, stages
+        print(logs[-1])
+        hist = load_history(tmp)
+        assert len(hist) == 3 and hist[-1]["run_id"] == run_id
+        assert os.path.exists(os.path.join(tmp, f"trace_{run_id}_itc_run.txt"))
+        top = compare(hist)[0]
+        assert top[0] == "itc_run/download" and top[3] > 2, top
+        try:
+            with trace_run("failing", tmp):
+                with span("boom"):
+                    raise RuntimeError("x")
+        except RuntimeError:
+            pass
+        last = load_history(tmp, name="failing")[-1]
+        assert not last["ok"] and last["tree"]["children"][0]["error"] == "RuntimeError: x"
+        main(["--log-dir", tmp])
+        print("✅ itc_trace 自测通过")
+    finally:
+        shutil.rmtree(tmp)
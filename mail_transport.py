@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+邮件发送通道(Transport)接口
+email_sender.send_email 通过 Transport 发送，便于替换底层实现:
+- outlook: 本地 Outlook COM + 公共邮箱(PublicMailboxAutoSender)
+- fake:    outlook_fake 中的进程内 Outlook 模拟(Linux/CI 测试与基准)
+- smtp:    smtp_transport 中的 SMTP 连接池(配置见 SMTP_* 项)
+新通道通过 register_transport(name, factory) 注册，factory 接收 system_config 及其它关键字参数，
+由 email_config.json 的 system_config.EMAIL_TRANSPORT 选择(默认 outlook)
+"""
+
+import logging
+import threading
+
+DEFAULT_PUBLIC_MAILBOX = "ChinaPD_Cybersecurity_Robot"
+
+
+class MailMessage:
+    """待发送的一封邮件"""
+
+    def __init__(self, subject, html_body, to_addrs, cc_addrs=None, attachments=None):
+        self.subject = subject
+        self.html_body = html_body or ""
+        self.to_addrs = list(to_addrs or [])
+        self.cc_addrs = list(cc_addrs or [])
+        self.attachments = list(attachments or [])
+
+    def __repr__(self):
+        return f"MailMessage(subject={self.subject!r}, to={len(self.to_addrs)}, cc={len(self.cc_addrs)})"
+
+
+class MailTransport:
+    """发送通道基类"""
+
+    name = "base"
+
+    def send(self, message):
+        """发送单封邮件，返回 True/False"""
+        raise NotImplementedError
+
+    def send_many(self, messages):
+        """批量发送，返回与 messages 对应的结果列表；默认逐封调用 send，子类可按通道特点合并"""
+        return [self.send(m) for m in messages]
+
+    def get_sent_folder(self):
+        """返回已发送邮件文件夹(用于发送确认)；不支持时返回 None"""
+        return None
+
+    def close(self):
+        """释放底层连接/会话"""
+
+
+class OutlookTransport(MailTransport):
+    """
+    通过 Outlook 对象模型从公共邮箱发送
+    application_factory: 返回 Outlook.Application 对象的可调用对象；
+                         默认使用 win32com Dispatch(需要 pywin32)
+    """
+
+    name = "outlook"
+
+    def __init__(self, application_factory=None, mailbox_name=DEFAULT_PUBLIC_MAILBOX,
+                 logger=None, com_init=None):
+        self.mailbox_name = mailbox_name
+        self.logger = logger or logging.getLogger(__name__)
+        self._application_factory = application_factory
+        # 仅在使用真实 COM 时需要 CoInitialize
+        self._com_init = (application_factory is None) if com_init is None else com_init
+        self._pythoncom = None
+        self._com_thread = None
+        self._sender = None
+        self._lock = threading.Lock()
+
+    def _default_application(self):
+        import win32com.client
+        return win32com.client.Dispatch("Outlook.Application")
+
+    def _get_sender(self):
+        if self._sender is not None:
+            return self._sender
+        from public_mailbox_sender import PublicMailboxAutoSender
+        if self._com_init and self._pythoncom is None:
+            import pythoncom
+            pythoncom.CoInitialize()
+            self._pythoncom = pythoncom
+            self._com_thread = threading.get_ident()
+        factory = self._application_factory or self._default_application
+        self._sender = PublicMailboxAutoSender(factory(), self.logger)
+        return self._sender
+
+    @property
+    def sender(self):
+        return self._get_sender()
+
+    def send(self, message):
+        with self._lock:
+            sender = self._get_sender()
+            ok = sender.send_from_public_mailbox(
+                mailbox_name=self.mailbox_name,
+                to_addresses=message.to_addrs,
+                cc_addresses=message.cc_addrs,
+                subject=message.subject,
+                html_body=message.html_body,
+                attachments=message.attachments,
+                save_draft_only=False
+            )
+            if not ok:
+                # 发送失败时丢弃会话，下次重新获取 Outlook 对象
+                self._sender = None
+            return ok
+
+    def send_many(self, messages):
+        """
+        批量发送: 整批只加锁、取发送器、解析个人 Drafts 与公共邮箱地址一次，逐封创建并发送
+        不做发送确认，由调用方在整批结束后一次查询已发送邮件 (email_sender.send_emails)
+        单封失败时发送器已清空自身缓存，后续邮件重新解析后继续发送；整批有失败时结束后丢弃会话
+        """
+        messages = list(messages)
+        if not messages:
+            return []
+        with self._lock:
+            sender = self._get_sender()
+            sender.prepare_public_mailbox(self.mailbox_name)
+            results = []
+            for m in messages:
+                results.append(sender.send_from_public_mailbox(
+                    mailbox_name=self.mailbox_name,
+                    to_addresses=m.to_addrs,
+                    cc_addresses=m.cc_addrs,
+                    subject=m.subject,
+                    html_body=m.html_body,
+                    attachments=m.attachments,
+                    save_draft_only=False
+                ))
+            if not all(results):
+                self._sender = None
+            return results
+
+    def get_sent_folder(self):
+        return self._get_sender().get_sent_folder()
+
+    def close(self):
+        self._sender = None
+        if self._pythoncom is not None:
+            # CoUninitialize 必须与 CoInitialize 在同一线程；在其它线程释放(进程退出时)只丢弃对象
+            if self._com_thread == threading.get_ident():
+                try:
+                    self._pythoncom.CoUninitialize()
+                except Exception:
+                    pass
+            self._pythoncom = None
+            self._com_thread = None
+
+
+def _outlook_factory(system_config=None, **kwargs):
+    return OutlookTransport(**kwargs)
+
+
+def _fake_factory(system_config=None, **kwargs):
+    from outlook_fake import FakeOutlookApplication
+    latency = kwargs.pop("latency", None)
+    app = kwargs.pop("application", None) or FakeOutlookApplication(latency=latency)
+    transport = OutlookTransport(application_factory=lambda: app, com_init=False, **kwargs)
+    transport.name = "fake"
+    transport.application = app
+    return transport
+
+
+def _smtp_factory(system_config=None, **kwargs):
+    from smtp_transport import from_config
+    return from_config(system_config, **kwargs)
+
+
+_FACTORIES = {
+    "outlook": _outlook_factory,
+    "fake": _fake_factory,
+    "smtp": _smtp_factory,
+}
+
+
+def register_transport(name, factory):
+    """注册发送通道: factory(system_config=None, **kwargs) -> MailTransport"""
+    _FACTORIES[name] = factory
+
+
+def available_transports():
+    return sorted(_FACTORIES)
+
+
+def create_transport(name="outlook", system_config=None, **kwargs):
+    """按名称创建发送通道；system_config 为 email_config.json 的 system_config(可选)"""
+    if name not in _FACTORIES:
+        raise ValueError(f"未知的邮件发送通道: {name} (可选: {', '.join(available_transports())})")
+    return _FACTORIES[name](system_config=system_config, **kwargs)
@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+"""
+Outlook COM 对象模型的进程内模拟(用于无 win32com 的环境测试与基准)
+覆盖本项目使用到的部分:
+- Application.GetNamespace("MAPI")
+- Namespace.Stores / GetDefaultFolder / CreateRecipient
+- Store.DisplayName / GetDefaultFolder(3=Drafts, 5=Sent Items)
+- Items 集合: Count / 迭代 / Add / Restrict(Jet 过滤子集) / Sort / GetFirst / GetNext
+- MailItem: Subject / HTMLBody / To / CC / PropertyAccessor / Attachments / Save / Send
+可注入延迟(秒)模拟 COM 往返开销，键见 DEFAULT_LATENCY
+"""
+
+import os
+import re
+import time
+import threading
+from datetime import datetime
+
+OL_FOLDER_DRAFTS_STORE = 3
+OL_FOLDER_SENT_MAIL = 5
+OL_FOLDER_DRAFTS = 16
+
+# 各类操作的模拟耗时(秒)，默认全部为 0
+DEFAULT_LATENCY = {
+    "property_read": 0.0,   # Store.DisplayName 等属性读取
+    "get_folder": 0.0,      # GetDefaultFolder
+    "items_add": 0.0,       # Items.Add 创建邮件
+    "property_set": 0.0,    # PropertyAccessor.SetProperty / GetProperty
+    "attachment_add": 0.0,  # Attachments.Add
+    "save": 0.0,            # MailItem.Save
+    "send": 0.0,            # MailItem.Send
+    "resolve": 0.0,         # Recipient.Resolve
+    "restrict": 0.0,        # 文件夹 Items.Restrict 过滤查询
+}
+
+
+class _Latency:
+    """按操作类型注入延迟并统计调用次数"""
+
+    def __init__(self, latency=None):
+        self.values = dict(DEFAULT_LATENCY)
+        if latency:
+            unknown = set(latency) - set(DEFAULT_LATENCY)
+            if unknown:
+                raise ValueError(f"未知的延迟类型: {sorted(unknown)}")
+            self.values.update(latency)
+        self.calls = {k: 0 for k in DEFAULT_LATENCY}
+        self._lock = threading.Lock()
+
+    def __call__(self, kind):
+        with self._lock:
+            self.calls[kind] += 1
+        delay = self.values.get(kind, 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+
+_JET_CLAUSE = re.compile(r"\[(\w+)\]\s*(>=|<=|<>|=|>|<)\s*'((?:[^']|'')*)'")
+_JET_TIME_FORMATS = ("%m/%d/%Y %I:%M %p", "%m/%d/%Y %H:%M", "%m/%d/%Y")
+
+
+def _parse_jet_value(raw):
+    value = raw.replace("''", "'")
+    for fmt in _JET_TIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return value
+
+
+def parse_jet_filter(filter_text):
+    """
+    解析 Items.Restrict 使用的 Jet 过滤子集: [Prop] op 'value' [AND ...]
+    返回 [(prop, op, value)]
+    """
+    clauses = []
+    pos = 0
+    text = filter_text.strip()
+    while pos < len(text):
+        m = _JET_CLAUSE.match(text, pos)
+        if not m:
+            raise ValueError(f"不支持的过滤条件: {filter_text}")
+        clauses.append((m.group(1), m.group(2), _parse_jet_value(m.group(3))))
+        pos = m.end()
+        rest = text[pos:].lstrip()
+        if not rest:
+            break
+        if not rest.upper().startswith("AND "):
+            raise ValueError(f"仅支持 AND 连接: {filter_text}")
+        pos = len(text) - len(rest) + 4
+        while pos < len(text) and text[pos] == " ":
+            pos += 1
+    return clauses
+
+
+def _compare(left, op, right):
+    if isinstance(right, datetime) and isinstance(left, datetime):
+        # Jet 日期比较精度为分钟
+        left = left.replace(second=0, microsecond=0)
+    if op == "=":
+        return left == right
+    if op == "<>":
+        return left != right
+    if left is None:
+        return False
+    if op == ">=":
+        return left >= right
+    if op == "<=":
+        return left <= right
+    if op == ">":
+        return left > right
+    return left < right
+
+
+class FakeItems:
+    """模拟 Outlook Items 集合"""
+
+    def __init__(self, items=None, owner=None):
+        self._items = list(items or [])
+        self._owner = owner
+        self._cursor = 0
+        self.restrict_calls = 0
+
+    @property
+    def Count(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+    def Item(self, index):
+        # COM 集合下标从 1 开始
+        return self._items[index - 1]
+
+    def append(self, item):
+        self._items.append(item)
+
+    def remove(self, item):
+        self._items.remove(item)
+
+    def Add(self, item_type=0):
+        """在所属文件夹中创建新邮件(仅支持 MailItem)"""
+        if self._owner is None:
+            raise RuntimeError("该 Items 集合不支持 Add")
+        self._owner.latency("items_add")
+        mail = FakeMailItem(self._owner)
+        self._items.append(mail)
+        return mail
+
+    def Restrict(self, filter_text):
+        if self._owner is not None:
+            self._owner.latency("restrict")
+        self.restrict_calls += 1
+        clauses = parse_jet_filter(filter_text)
+        matched = [
+            it for it in self._items
+            if all(_compare(getattr(it, prop, None), op, val) for prop, op, val in clauses)
+        ]
+        return FakeItems(matched)
+
+    def Sort(self, prop, descending=False):
+        key = prop.strip("[]")
+        self._items.sort(key=lambda it: getattr(it, key, None) or datetime.min, reverse=bool(descending))
+
+    def GetFirst(self):
+        self._cursor = 0
+        return self.GetNext()
+
+    def GetNext(self):
+        if self._cursor >= len(self._items):
+            return None
+        item = self._items[self._cursor]
+        self._cursor += 1
+        return item
+
+
+class FakeSentItem:
+    """已发送邮件项(仅包含验证所需属性)"""
+
+    def __init__(self, subject, sent_on):
+        self.Subject = subject
+        self.SentOn = sent_on
+
+
+PR_MESSAGE_FLAGS = "http://schemas.microsoft.com/mapi/proptag/0x0E070003"
+
+
+class FakePropertyAccessor:
+    def __init__(self, latency):
+        self._latency = latency
+        self.properties = {PR_MESSAGE_FLAGS: 0}
+
+    def GetProperty(self, schema_name):
+        self._latency("property_set")
+        if schema_name not in self.properties:
+            raise KeyError(f"属性不存在: {schema_name}")
+        return self.properties[schema_name]
+
+    def SetProperty(self, schema_name, value):
+        self._latency("property_set")
+        self.properties[schema_name] = value
+
+
+class FakeAttachments:
+    def __init__(self, latency):
+        self._latency = latency
+        self.paths = []
+
+    @property
+    def Count(self):
+        return len(self.paths)
+
+    def Add(self, path):
+        self._latency("attachment_add")
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.paths.append(path)
+
+
+class FakeMailItem:
+    """模拟 MailItem；Send 后移动到所属 Store 的已发送邮件"""
+
+    def __init__(self, folder):
+        self._folder = folder
+        self.latency = folder.latency
+        self.Subject = ""
+        self.HTMLBody = ""
+        self.To = ""
+        self.CC = ""
+        self.SentOn = None
+        self.Saved = False
+        self.Sent = False
+        self.PropertyAccessor = FakePropertyAccessor(self.latency)
+        self.Attachments = FakeAttachments(self.latency)
+
+    def Save(self):
+        self.latency("save")
+        self.Saved = True
+
+    def Send(self):
+        self.latency("send")
+        if self.Sent:
+            raise RuntimeError("邮件已发送，不能重复发送")
+        if not self.To:
+            raise ValueError("收件人为空")
+        self.Sent = True
+        self.SentOn = datetime.now()
+        self._folder.store.deliver(self)
+
+
+class FakeFolder:
+    def __init__(self, name, items=None, store=None, latency=None):
+        self.Name = name
+        self.store = store
+        self.latency = latency or _Latency()
+        self.Items = FakeItems(items, owner=self)
+
+
+class FakeStore:
+    """模拟 Store；DisplayName 每次读取都计入 property_read 延迟"""
+
+    def __init__(self, display_name, latency):
+        self._display_name = display_name
+        self.latency = latency
+        self.folders = {
+            OL_FOLDER_DRAFTS_STORE: FakeFolder("Drafts", store=self, latency=latency),
+            OL_FOLDER_SENT_MAIL: FakeFolder("Sent Items", store=self, latency=latency),
+        }
+
+    @property
+    def DisplayName(self):
+        self.latency("property_read")
+        return self._display_name
+
+    def GetDefaultFolder(self, folder_type):
+        self.latency("get_folder")
+        if folder_type == OL_FOLDER_DRAFTS:
+            folder_type = OL_FOLDER_DRAFTS_STORE
+        return self.folders[folder_type]
+
+    def deliver(self, mail):
+        drafts = self.folders[OL_FOLDER_DRAFTS_STORE].Items
+        if mail in drafts._items:
+            drafts.remove(mail)
+        self.folders[OL_FOLDER_SENT_MAIL].Items.append(mail)
+
+    @property
+    def sent_items(self):
+        return self.folders[OL_FOLDER_SENT_MAIL].Items
+
+
+class FakeAddressEntry:
+    def __init__(self, name):
+        self.Name = name
+        self.Address = f"{name}@shared.pg.com"
+
+
+class FakeRecipient:
+    def __init__(self, name, latency, resolvable=True):
+        self.Name = name
+        self._latency = latency
+        self._resolvable = resolvable
+        self.Resolved = False
+        self.AddressEntry = None
+
+    def Resolve(self):
+        self._latency("resolve")
+        self.Resolved = self._resolvable
+        if self.Resolved:
+            self.AddressEntry = FakeAddressEntry(self.Name)
+        return self.Resolved
+
+
+class FakeNamespace:
+    def __init__(self, latency=None, personal_store="someone@pg.com", shared_stores=None):
+        self.latency = latency or _Latency()
+        names = list(shared_stores or [])
+        stores = [FakeStore(n, self.latency) for n in names]
+        # 真实环境中共享邮箱常排在个人账号前面，逐个比较 DisplayName 才能找到个人账号
+        self.personal_store = FakeStore(personal_store, self.latency)
+        stores.append(self.personal_store)
+        self.Stores = stores
+        self.folders = {
+            OL_FOLDER_SENT_MAIL: self.personal_store.folders[OL_FOLDER_SENT_MAIL],
+            OL_FOLDER_DRAFTS: self.personal_store.folders[OL_FOLDER_DRAFTS_STORE],
+        }
+
+    def GetDefaultFolder(self, folder_type):
+        self.latency("get_folder")
+        return self.folders[folder_type]
+
+    def CreateRecipient(self, name):
+        return FakeRecipient(name, self.latency)
+
+
+class FakeOutlookApplication:
+    """
+    模拟 Outlook.Application
+    latency: {操作类型: 秒}，见 DEFAULT_LATENCY
+    shared_stores: 排在个人账号之前的共享邮箱 Store 名称
+    """
+
+    def __init__(self, latency=None, personal_store="someone@pg.com", shared_stores=None):
+        self.latency = _Latency(latency)
+        if shared_stores is None:
+            shared_stores = ["ChinaPD_Cybersecurity_Robot (shared)", "SharePoint Lists"]
+        self._namespace = FakeNamespace(self.latency, personal_store, shared_stores)
+
+    def GetNamespace(self, name):
+        if name != "MAPI":
+            raise ValueError(f"不支持的命名空间: {name}")
+        return self._namespace
+
+    @property
+    def sent_items(self):
+        return self._namespace.personal_store.sent_items
+
+
+if __name__ == "__main__":
+    from datetime import timedelta
+    import email_sender
+
+    ns = FakeNamespace()
+    sent = ns.GetDefaultFolder(OL_FOLDER_SENT_MAIL)
+    now = datetime.now()
+    for i in range(20000):
+        sent.Items.append(FakeSentItem(f"历史邮件 {i}", now - timedelta(days=1 + i % 300)))
+    sent.Items.append(FakeSentItem("O'Brien 报告 - 测试", now))
+
+    t0 = time.perf_counter()
+    found = email_sender._find_sent_item(sent.Items, "O'Brien 报告 - 测试", now, 300)
+    assert found is not None and found.Subject == "O'Brien 报告 - 测试"
+    assert email_sender._find_sent_item(sent.Items, "不存在", now, 300) is None
+    assert email_sender._verify_sent(sent, "O'Brien 报告 - 测试", now, max_wait=1, interval=0.1)
+    print(f"✅ 已发送邮件过滤查询自测通过 ({(time.perf_counter() - t0) * 1000:.1f} ms, Restrict 调用 {sent.Items.restrict_calls} 次)")
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+分区并行导出: 把一次大的导出按日期子区间或 categoryId/areaId 拆成多个分区，
+在同一个已登录的 requests 会话上并发下载，再按分区顺序拼接成一个 CSV
+- 每个分区走 report_fetcher.fetch_report (可续传 + 完整性校验)，中间文件放在 dest_dir/.partitions
+- 拼接时以请求组为单位(见 incremental_export.read_groups)，组内行顺序不变；
+  相邻日期分区边界上重复出现的组只保留第一次
+- 任一分区失败即整体失败(抛出 ReportFetchError)，由调用方回退到单次下载
+"""
+
+import os
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from report_fetcher import fetch_report, ReportFetchError, DEFAULT_FILENAME_PREFIX
+from incremental_export import read_groups, write_groups
+from download_watcher import unique_target
+
+PARTITION_DIR_NAME = ".partitions"
+PARTITION_KEYS = ("date", "categoryId", "areaId")
+_DATE_FMT = "%m/%d/%Y"
+
+
+def parse_date_range(text):
+    """'mm/dd/YYYY - mm/dd/YYYY' -> (start, end) date"""
+    start, end = [datetime.strptime(x.strip(), _DATE_FMT).date() for x in text.split(" - ")]
+    return start, end
+
+
+def date_partitions(start, end, parts):
+    """把闭区间 [start, end] 切成 parts 个互不重叠的连续闭区间(按日期升序)"""
+    total = (end - start).days + 1
+    parts = max(1, min(int(parts), total))
+    ranges = []
+    cursor = start
+    for i in range(parts):
+        days = total // parts + (1 if i < total % parts else 0)
+        last = cursor + timedelta(days=days - 1)
+        ranges.append((cursor, last))
+        cursor = last + timedelta(days=1)
+    return ranges
+
+
+def build_partitions(params, partition_by="date", parts=4, values=None):
+    """
+    返回 [(label, params), ...]
+    partition_by=date: 按 dateRange 均分为 parts 段
+    partition_by=categoryId/areaId: 每个 values 中的取值一个分区(原参数必须为 -1 即"全部")
+    """
+    if partition_by not in PARTITION_KEYS:
+        raise ValueError(f"不支持的分区方式: {partition_by} (可选 {PARTITION_KEYS})")
+    partitions = []
+    if partition_by == "date":
+        start, end = parse_date_range(params["dateRange"])
+        for s, e in date_partitions(start, end, parts):
+            p = dict(params)
+            p["dateRange"] = f"{s.strftime(_DATE_FMT)} - {e.strftime(_DATE_FMT)}"
+            partitions.append((f"{s:%Y-%m-%d}~{e:%Y-%m-%d}", p))
+    else:
+        if str(params.get(partition_by, "-1")) != "-1":
+            raise ValueError(f"{partition_by} 已限定为 {params[partition_by]}，无法再按其分区")
+        if not values:
+            raise ValueError(f"按 {partition_by} 分区需要提供取值列表")
+        for v in values:
+            p = dict(params)
+            p[partition_by] = str(v)
+            partitions.append((f"{partition_by}={v}", p))
+    return partitions
+
+
+class PartitionTiming:
+    def __init__(self, index, label, url):
+        self.index = index
+        self.label = label
+        self.url = url
+        self.path = None
+        self.size = 0
+        self.seconds = 0.0
+        self.groups = 0
+        self.error = None
+
+
+def fetch_partitioned(base_url, params, dest_dir, session, partition_by="date", parts=4, values=None,
+                      workers=4, log_callback=None, **fetch_kwargs):
+    """
+    并发下载各分区并拼接，返回 (merged_path, [PartitionTiming, ...])
+    session 的连接池大小应不小于 workers (open_browser_session(..., pool_size=workers))
+    """
+    def log(msg):
+        if log_callback:
+            log_callback(msg)
+
+    partitions = build_partitions(params, partition_by, parts, values)
+    part_dir = os.path.join(dest_dir, PARTITION_DIR_NAME)
+    os.makedirs(part_dir, exist_ok=True)
+    timings = [PartitionTiming(i, label, f"{base_url}?{urllib.parse.urlencode(p)}")
+               for i, (label, p) in enumerate(partitions)]
+    workers = max(1, min(int(workers), len(timings)))
+    log(f"🧩 分区下载: 按 {partition_by} 拆分为 {len(timings)} 个分区，并发 {workers}")
+
+    def run(t):
+        t0 = time.perf_counter()
+        try:
+            result = fetch_report(t.url, part_dir, session, filename=f"part_{t.index:02d}.csv",
+                                  progress_interval=30.0, **fetch_kwargs)
+            t.path, t.size = result.path, result.size
+        finally:
+            t.seconds = time.perf_counter() - t0
+        return t
+
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="itc-partition") as pool:
+        futures = {pool.submit(run, t): t for t in timings}
+        for fut in as_completed(futures):
+            t = futures[fut]
+            try:
+                fut.result()
+                log(f"   分区 {t.index + 1}/{len(timings)} [{t.label}] 完成: "
+                    f"{t.size / 1024 / 1024:.2f} MB, {t.seconds:.1f}s")
+            except Exception as e:
+                t.error = e
+                log(f"   分区 {t.index + 1}/{len(timings)} [{t.label}] 失败: {e}")
+                for f in futures:
+                    f.cancel()
+    download_seconds = time.perf_counter() - t_start
+
+    failed = [t for t in timings if t.error or not t.path]
+    if failed:
+        # 已完成分区的文件删除；未完成分区的 .part 保留供下次续传
+        for t in timings:
+            _remove(t.path)
+        raise ReportFetchError(f"{len(failed)} 个分区下载失败: " +
+                               "; ".join(f"[{t.label}] {t.error or '已取消'}" for t in failed))
+
+    t0 = time.perf_counter()
+    header, merged, seen, duplicates = None, [], set(), 0
+    for t in timings:
+        part_header, groups = read_groups(t.path)
+        t.groups = len(groups)
+        if not part_header:
+            continue
+        if header is None:
+            header = part_header
+        elif part_header != header:
+            raise ReportFetchError(f"分区 [{t.label}] 表头与其它分区不一致")
+        for key, rows in groups:
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            merged.append((key, rows))
+    if header is None:
+        raise ReportFetchError("所有分区均为空")
+    merged_path = unique_target(dest_dir, f"{DEFAULT_FILENAME_PREFIX}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    write_groups(merged_path, header, merged)
+    for t in timings:
+        _remove(t.path)
+    log(f"🧩 分区拼接完成: {len(merged)} 组 (重复 {duplicates})，下载 {download_seconds:.1f}s / "
+        f"拼接 {time.perf_counter() - t0:.1f}s，"
+        f"分区耗时合计 {sum(t.seconds for t in timings):.1f}s -> {merged_path}")
+    return merged_path, timings
+
+
+def _remove(path):
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
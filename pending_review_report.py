@@ -7,15 +7,19 @@ Pending / Revoked 报表处理、邮件生成与 Teams 通知
 - 高视觉邮件模板(徽章/统计卡片)
 - Teams 发送(卡片 + fallback 简单文本)
 - JSON 结果输出 (处理 numpy / datetime)
+pandas/numpy/requests 在首次处理或发送时才导入 (load_dependencies)，--help 与只读取配置的调用方不付出该开销
 """
 
-import os, sys, json, re, argparse, traceback, requests
-import pandas as pd
-import numpy as np
+import os, sys, json, re, argparse, traceback, copy, time
+_IMPORT_T0 = time.perf_counter()
 from datetime import datetime, date
-import faulthandler
-faulthandler.enable()
 os.environ.setdefault("PANDAS_ARROW_DISABLED", "1")
+from config_registry import REGISTRY, get_email_config, get_teams_config, thaw
+from rawdata_manifest import latest_csv
+from rawdata_retention import resolve_csv
+from report_result import ReportResult
+from itc_logging import get_logger
+from itc_trace import trace_run, span
 
 DEFAULT_CONFIG = {
     "reports": {
@@ -42,55 +46,79 @@ DEFAULT_CONFIG = {
     "Teams": {"webhook_url": ""}
 }
 
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "email_config.json")
+
+def _build_config(user):
+    cfg = copy.deepcopy(DEFAULT_CONFIG)
+    if not user:
+        return cfg
+    user = thaw(user)
+    if "reports" in user:
+        for k, v in user["reports"].items():
+            if k not in cfg["reports"]:
+                cfg["reports"][k] = {
+                    "recipients": [], "cc": [], "cc1": {},
+                    "system_config": copy.deepcopy(DEFAULT_CONFIG["reports"]["Pending review任务提醒"]["system_config"])
+                }
+            for field in ["recipients", "cc", "cc1", "system_config"]:
+                if field in v:
+                    cfg["reports"][k][field] = v[field]
+    if "Teams" in user:
+        cfg["Teams"] = user["Teams"]
+    base_levels = DEFAULT_CONFIG["reports"]["Pending review任务提醒"]["system_config"]["URGENCY_LEVELS"]
+    levels = cfg["reports"]["Pending review任务提醒"].setdefault("system_config", {}).setdefault("URGENCY_LEVELS", {})
+    for lvl, val in base_levels.items():
+        if lvl not in levels:
+            levels[lvl] = val
+    return cfg
+
 def load_config(path=None):
+    """
+    读取 email_config.json 并与 DEFAULT_CONFIG 合并
+    文件内容由 config_registry 缓存，mtime 未变化时不会重复解析
+    """
     if not path:
-        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "email_config.json")
+        path = DEFAULT_CONFIG_PATH
     if not os.path.exists(path):
         with open(path, "w", encoding="utf-8") as f:
             json.dump(DEFAULT_CONFIG, f, ensure_ascii=False, indent=4)
-        return DEFAULT_CONFIG.copy()
+        return copy.deepcopy(DEFAULT_CONFIG)
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            user = json.load(f)
-        cfg = DEFAULT_CONFIG.copy()
-        if "reports" in user:
-            for k, v in user["reports"].items():
-                if k not in cfg["reports"]:
-                    cfg["reports"][k] = {
-                        "recipients": [], "cc": [], "cc1": {},
-                        "system_config": DEFAULT_CONFIG["reports"]["Pending review任务提醒"]["system_config"].copy()
-                    }
-                for field in ["recipients", "cc", "cc1", "system_config"]:
-                    if field in v:
-                        cfg["reports"][k][field] = v[field]
-        if "Teams" in user:
-            cfg["Teams"] = user["Teams"]
-        base_levels = DEFAULT_CONFIG["reports"]["Pending review任务提醒"]["system_config"]["URGENCY_LEVELS"]
-        for lvl, val in base_levels.items():
-            if lvl not in cfg["reports"]["Pending review任务提醒"]["system_config"]["URGENCY_LEVELS"]:
-                cfg["reports"]["Pending review任务提醒"]["system_config"]["URGENCY_LEVELS"][lvl] = val
-        return cfg
+        return _build_config(get_email_config(path))
     except Exception:
-        return DEFAULT_CONFIG.copy()
+        return copy.deepcopy(DEFAULT_CONFIG)
 
 CONFIG = load_config()
+_CONFIG_VERSION = REGISTRY.version(DEFAULT_CONFIG_PATH)
 _SYS = CONFIG["reports"]["Pending review任务提醒"]["system_config"]
 
-def get_cfg(key):
-    return CONFIG["reports"]["Pending review任务提醒"]["system_config"].get(
+def refresh_config():
+    """长驻进程中调用: email_config.json 有变化时重新合并 CONFIG"""
+    global CONFIG, _SYS, _CONFIG_VERSION
+    get_email_config(DEFAULT_CONFIG_PATH)
+    ver = REGISTRY.version(DEFAULT_CONFIG_PATH)
+    if ver != _CONFIG_VERSION:
+        CONFIG = load_config()
+        _SYS = CONFIG["reports"]["Pending review任务提醒"]["system_config"]
+        _CONFIG_VERSION = ver
+    return CONFIG
+
+def get_cfg(key, config=None):
+    """config: run() 选定的本次运行配置；为空时使用模块级 CONFIG"""
+    return (config or CONFIG)["reports"]["Pending review任务提醒"]["system_config"].get(
         key,
         DEFAULT_CONFIG["reports"]["Pending review任务提醒"]["system_config"].get(key)
     )
 
-def cfg_values():
+def cfg_values(config=None):
     return {
-        "MAX_REMAINING_DAYS_FOR_REPORT": get_cfg("MAX_REMAINING_DAYS_FOR_REPORT"),
-        "URGENCY_LEVELS": get_cfg("URGENCY_LEVELS"),
-        "EMAIL_SUBJECT_PENDING": get_cfg("EMAIL_SUBJECT_PENDING"),
-        "EMAIL_SUBJECT_REVOKED": get_cfg("EMAIL_SUBJECT_REVOKED"),
-        "ITC_SYSTEM_LINK": get_cfg("ITC_SYSTEM_LINK"),
-        "EMAIL_ExitForm_REVOKED": get_cfg("EMAIL_ExitForm_REVOKED"),
-        "EMAIL_RoleChange_REVOKED": get_cfg("EMAIL_RoleChange_REVOKED"),
+        "MAX_REMAINING_DAYS_FOR_REPORT": get_cfg("MAX_REMAINING_DAYS_FOR_REPORT", config),
+        "URGENCY_LEVELS": get_cfg("URGENCY_LEVELS", config),
+        "EMAIL_SUBJECT_PENDING": get_cfg("EMAIL_SUBJECT_PENDING", config),
+        "EMAIL_SUBJECT_REVOKED": get_cfg("EMAIL_SUBJECT_REVOKED", config),
+        "ITC_SYSTEM_LINK": get_cfg("ITC_SYSTEM_LINK", config),
+        "EMAIL_ExitForm_REVOKED": get_cfg("EMAIL_ExitForm_REVOKED", config),
+        "EMAIL_RoleChange_REVOKED": get_cfg("EMAIL_RoleChange_REVOKED", config),
     }
 
 def ensure_directory_exists(p):
@@ -98,25 +126,20 @@ def ensure_directory_exists(p):
         os.makedirs(p, exist_ok=True)
     return p
 
+def load_dependencies():
+    """导入 pandas/numpy，返回本次导入耗时 (已导入时为 0)"""
+    if "pandas" in sys.modules and "numpy" in sys.modules:
+        return 0.0
+    t0 = time.perf_counter()
+    import numpy, pandas
+    return time.perf_counter() - t0
+
 def log_message(msg, log_dir):
-    ensure_directory_exists(log_dir)
-    lf = os.path.join(log_dir, f"process_{datetime.now().strftime('%Y%m%d')}.log")
-    line = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}"
-    try:
-        print(line, flush=True)
-    except (UnicodeEncodeError, ValueError):
-        try:
-            sys.stdout.buffer.write((line + "\n").encode("utf-8", "ignore"))
-            sys.stdout.buffer.flush()
-        except Exception:
-            pass
-    try:
-        with open(lf, "a", encoding="utf-8") as f:
-            f.write(line + "\n")
-    except Exception:
-        pass
+    # 写入 log_dir/process_YYYYMMDD.log 由后台线程完成 (itc_logging)
+    get_logger("process", os.path.abspath(log_dir)).log(msg)
 
 def ensure_pg_email(email, username=None):
+    import pandas as pd
     if pd.isna(email) or str(email).strip() == "":
         if username:
             return f"{username.strip().lower().replace(' ', '.')}@pg.com"
@@ -168,36 +191,41 @@ def detect_file_encoding(path, sample_size=4096):
     return "latin1"
 
 def load_and_process_data(csv_file_path):
+    import pandas as pd
+    import numpy as np
     base_log_dir = os.path.join(os.path.dirname(csv_file_path), "..")
     log_message(f"开始读取CSV: {csv_file_path}", base_log_dir)
-    enc_guess = detect_file_encoding(csv_file_path)
-    log_message(f"初步编码猜测: {enc_guess}", base_log_dir)
-    df = None
-    tried = []
-    for enc in [enc_guess, "utf-8-sig", "utf-8", "gbk", "cp936", "latin1"]:
-        if enc in tried: continue
-        tried.append(enc)
-        try:
-            df = pd.read_csv(csv_file_path, encoding=enc, dtype=str,
-                             na_values=["", " ", "NA"], keep_default_na=True,
-                             on_bad_lines="skip")
-            log_message(f"使用编码 {enc} 读取成功。", base_log_dir)
-            break
-        except Exception as e:
-            log_message(f"编码 {enc} 失败: {e}", base_log_dir)
+    with span("csv_read") as sp:
+        enc_guess = detect_file_encoding(csv_file_path)
+        log_message(f"初步编码猜测: {enc_guess}", base_log_dir)
+        df = None
+        tried = []
+        for enc in [enc_guess, "utf-8-sig", "utf-8", "gbk", "cp936", "latin1"]:
+            if enc in tried: continue
+            tried.append(enc)
+            try:
+                df = pd.read_csv(csv_file_path, encoding=enc, dtype=str,
+                                 na_values=["", " ", "NA"], keep_default_na=True,
+                                 on_bad_lines="skip")
+                log_message(f"使用编码 {enc} 读取成功。", base_log_dir)
+                sp.set(encoding=enc, rows=len(df))
+                break
+            except Exception as e:
+                log_message(f"编码 {enc} 失败: {e}", base_log_dir)
     if df is None:
         raise RuntimeError("无法读取CSV。")
-    # 禁用 pandas future warning
-    pd.set_option('future.no_silent_downcasting', True)
-    df = df.replace(r'^\s*$', np.nan, regex=True)
-    try:
-        df = df.infer_objects(copy=False)
-    except Exception:
-        pass
-    df = apply_mojibake_fix(df)
-    for col in ["Requested Date", "Expiration Date", "Log Date"]:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors="coerce")
+    with span("csv_clean"):
+        # 禁用 pandas future warning
+        pd.set_option('future.no_silent_downcasting', True)
+        df = df.replace(r'^\s*$', np.nan, regex=True)
+        try:
+            df = df.infer_objects(copy=False)
+        except Exception:
+            pass
+        df = apply_mojibake_fix(df)
+        for col in ["Requested Date", "Expiration Date", "Log Date"]:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], errors="coerce")
     df["is_new_request"] = df["Requester"].notna().astype(int) if "Requester" in df.columns else 0
     df["request_group"] = df["is_new_request"].cumsum()
     fill_cols = [
@@ -206,15 +234,17 @@ def load_and_process_data(csv_file_path):
         "Access Type","Temporary Access?","Privileged?","Status","Confirmed?","Reason","Remark/Role","Employee Status",
         "Log Actor","Log Status","Log Date","Request ID"
     ]
-    for col in fill_cols:
-        if col in df.columns:
-            df[col] = df.groupby("request_group")[col].transform(lambda x: x.ffill().bfill())
+    with span("fill_down"):
+        for col in fill_cols:
+            if col in df.columns:
+                df[col] = df.groupby("request_group")[col].transform(lambda x: x.ffill().bfill())
     log_message(f"读取完成: 行数={len(df)} 列数={len(df.columns)}", base_log_dir)
     return df
 
 SITE_COLUMNS_PRIORITY = ["Site", "Site ID", "SiteID", "Site_Id", "Area", "Category"]
 
 def extract_site_tokens(row):
+    import pandas as pd
     for col in SITE_COLUMNS_PRIORITY:
         if col in row.index and pd.notna(row[col]) and str(row[col]).strip():
             raw = str(row[col]).strip()
@@ -224,8 +254,8 @@ def extract_site_tokens(row):
                 return toks
     return []
 
-def match_cc1_emails_by_sites(site_tokens, report_type):
-    cc1_cfg = CONFIG["reports"].get(report_type, {}).get("cc1", {})
+def match_cc1_emails_by_sites(site_tokens, report_type, config=None):
+    cc1_cfg = (config or CONFIG)["reports"].get(report_type, {}).get("cc1", {})
     found = set()
     for token in site_tokens:
         for key, emails in cc1_cfg.items():
@@ -235,28 +265,31 @@ def match_cc1_emails_by_sites(site_tokens, report_type):
                     found.add(ensure_pg_email(e))
     return sorted(found)
 
-def analyze_requests(df):
+def analyze_requests(df, config=None):
     log_message("开始分析数据", os.getcwd())
     for col in ["Status", "System/Solution", "Request For", "Category"]:
         if col not in df.columns:
             raise ValueError(f"缺少列: {col}")
     pending_df = df[(df["Status"] == "Pending Review") & df["System/Solution"].notna() & df["Request For"].notna() & df["Category"].notna()].copy()
-    revoked_df = df[(df["Status"].str.contains("Revoked", case=False, na=False)) & df["System/Solution"].notna() & df["Request For"].notna() & df["Category"].notna()].copy()
+    # 只有表头的导出读入后各列为全空(非字符串)列，.str 需要先转为字符串
+    revoked_df = df[(df["Status"].fillna("").astype(str).str.contains("Revoked", case=False)) & df["System/Solution"].notna() & df["Request For"].notna() & df["Category"].notna()].copy()
     log_message(f"Pending Review 行: {len(pending_df)} Revoked 行: {len(revoked_df)}", os.getcwd())
     today = date.today()
     return {
-        "pending": process_pending_requests(pending_df, today),
-        "revoked": process_revoked_requests(revoked_df, today)
+        "pending": process_pending_requests(pending_df, today, config),
+        "revoked": process_revoked_requests(revoked_df, today, config)
     }
 
-def process_pending_requests(pending_df, current_date):
+def process_pending_requests(pending_df, current_date, config=None):
+    import pandas as pd
+    config = config or CONFIG
     rpt = "Pending review任务提醒"
-    cv = cfg_values()
+    cv = cfg_values(config)
     max_days = cv["MAX_REMAINING_DAYS_FOR_REPORT"]
     urgency = cv["URGENCY_LEVELS"]
     if pending_df.empty:
         empty = pd.DataFrame(columns=["Action Owner","Action Owner Email","System Name","Category","剩余天数","紧急程度","Pending_review数量"])
-        return {"table": empty, "total_count": 0, "recipients": CONFIG["reports"][rpt].get("recipients", []), "cc": CONFIG["reports"][rpt].get("cc", []), "type": rpt, "items": []}
+        return {"table": empty, "total_count": 0, "recipients": config["reports"][rpt].get("recipients", []), "cc": config["reports"][rpt].get("cc", []), "type": rpt, "items": []}
     pending_df["expiration_date_only"] = pending_df["Expiration Date"].dt.date if "Expiration Date" in pending_df.columns else pd.NaT
     def remaining(row):
         if pd.notna(row["expiration_date_only"]):
@@ -264,9 +297,11 @@ def process_pending_requests(pending_df, current_date):
         return max_days
     pending_df["剩余天数"] = pending_df.apply(remaining, axis=1).astype(int)
     filtered = pending_df[pending_df["剩余天数"] <= max_days].copy()
+    # 剩余天数超过 max_days 的请求不提醒，只计数写入结果
+    excluded = int(pending_df["request_group"].nunique() - filtered["request_group"].nunique())
     if filtered.empty:
         empty = pd.DataFrame(columns=["Action Owner","Action Owner Email","System Name","Category","剩余天数","紧急程度","Pending_review数量"])
-        return {"table": empty, "total_count": 0, "recipients": CONFIG["reports"][rpt].get("recipients", []), "cc": CONFIG["reports"][rpt].get("cc", []), "type": rpt, "items": []}
+        return {"table": empty, "total_count": 0, "recipients": config["reports"][rpt].get("recipients", []), "cc": config["reports"][rpt].get("cc", []), "type": rpt, "items": [], "excluded_count": excluded}
     def mark(d):
         if d <= urgency["非常紧急"]: return "非常紧急"
         if d <= urgency["紧急"]: return "紧急"
@@ -301,24 +336,26 @@ def process_pending_requests(pending_df, current_date):
     agg.rename(columns={"System/Solution": "System Name"}, inplace=True)
     total = int(agg["Pending_review数量"].sum())
     agg = pd.concat([agg, pd.DataFrame([{"Action Owner": "总计","Action Owner Email":"","System Name":"","Category":"","剩余天数":"","紧急程度":"","Pending_review数量": total}])], ignore_index=True)
-    config_rec = CONFIG["reports"][rpt].get("recipients", [])
-    config_cc = CONFIG["reports"][rpt].get("cc", [])
+    config_rec = config["reports"][rpt].get("recipients", [])
+    config_cc = config["reports"][rpt].get("cc", [])
     data_rec = df_owner["Action Owner Email"].dropna().unique().tolist()
     all_site_tokens = set(t for toks in df_owner["SiteTokens"] for t in toks)
-    cc1_emails = match_cc1_emails_by_sites(all_site_tokens, rpt)
+    cc1_emails = match_cc1_emails_by_sites(all_site_tokens, rpt, config)
     recipients = sorted(list(set([ensure_pg_email(e) for e in config_rec + data_rec if e])))
     cc_all = sorted(list(set([ensure_pg_email(e) for e in config_cc + cc1_emails if e])))
     cc_all = [e for e in cc_all if e not in recipients]
-    return {"table": agg, "total_count": total, "recipients": recipients, "cc": cc_all, "type": rpt, "items": rows}
+    return {"table": agg, "total_count": total, "recipients": recipients, "cc": cc_all, "type": rpt, "items": rows, "excluded_count": excluded}
 
-def process_revoked_requests(revoked_df, current_date):
+def process_revoked_requests(revoked_df, current_date, config=None):
+    import pandas as pd
+    config = config or CONFIG
     rpt = "Revoked状态任务提醒"
-    cv = cfg_values()
+    cv = cfg_values(config)
     exit_note = cv["EMAIL_ExitForm_REVOKED"]
     role_note = cv["EMAIL_RoleChange_REVOKED"]
     if revoked_df.empty:
         empty = pd.DataFrame(columns=["Action Owner","Action Owner Email","System Name","Category","状态","状态说明","Revoked数量"])
-        return {"table": empty, "total_count": 0, "recipients": CONFIG["reports"][rpt].get("recipients", []), "cc": CONFIG["reports"][rpt].get("cc", []), "type": rpt, "items": []}
+        return {"table": empty, "total_count": 0, "recipients": config["reports"][rpt].get("recipients", []), "cc": config["reports"][rpt].get("cc", []), "type": rpt, "items": []}
     def status_note(st):
         if pd.isna(st): return ""
         s = str(st).lower()
@@ -359,17 +396,18 @@ def process_revoked_requests(revoked_df, current_date):
     agg.rename(columns={"System/Solution": "System Name"}, inplace=True)
     total = int(agg["Revoked数量"].sum())
     agg = pd.concat([agg, pd.DataFrame([{"Action Owner":"总计","Action Owner Email":"","System Name":"","Category":"","Status":"","状态说明":"","Revoked数量": total}])], ignore_index=True)
-    config_rec = CONFIG["reports"][rpt].get("recipients", [])
-    config_cc = CONFIG["reports"][rpt].get("cc", [])
+    config_rec = config["reports"][rpt].get("recipients", [])
+    config_cc = config["reports"][rpt].get("cc", [])
     data_rec = df_owner["Action Owner Email"].dropna().unique().tolist()
     all_site_tokens = set(t for toks in df_owner["SiteTokens"] for t in toks)
-    cc1_emails = match_cc1_emails_by_sites(all_site_tokens, rpt)
+    cc1_emails = match_cc1_emails_by_sites(all_site_tokens, rpt, config)
     recipients = sorted(list(set([ensure_pg_email(e) for e in config_rec + data_rec if e])))
     cc_all = sorted(list(set([ensure_pg_email(e) for e in config_cc + cc1_emails if e])))
     cc_all = [e for e in cc_all if e not in recipients]
     return {"table": agg, "total_count": total, "recipients": recipients, "cc": cc_all, "type": rpt, "items": rows}
 
 def dataframe_to_markdown(df):
+    import pandas as pd
     if df.empty: return "_无数据_"
     headers = df.columns.tolist()
     lines = [
@@ -380,8 +418,8 @@ def dataframe_to_markdown(df):
         lines.append("| " + " | ".join("" if pd.isna(r[h]) else str(r[h]) for h in headers) + " |")
     return "\n".join(lines)
 
-def build_teams_markdown(report_data, subject):
-    cv = cfg_values()
+def build_teams_markdown(report_data, subject, config=None):
+    cv = cfg_values(config)
     if report_data["type"] == "Pending review任务提醒":
         # 计算紧急程度统计
         df_body = report_data["table"][report_data["table"]["Action Owner"] != "总计"].copy()
@@ -556,8 +594,8 @@ def _compute_pending_urgency_stats(table_data):
     return stats
 # ...existing code...
 
-def generate_email_html(table_data, current_date, total_count, report_type, recipients, cc):
-    cv = cfg_values()
+def generate_email_html(table_data, current_date, total_count, report_type, recipients, cc, config=None):
+    cv = cfg_values(config)
     link = cv["ITC_SYSTEM_LINK"]
     cn_date = format_cn_date(current_date)
     to_str = ", ".join(recipients) if recipients else "无"
@@ -781,23 +819,22 @@ a{{color:#0f4c81;text-decoration:none}}a:hover{{text-decoration:underline}}
 </body></html>"""
     return html, subject
 
-def send_to_teams_simple_markdown(subject, markdown_content, log_dir):
+def send_to_teams_simple_markdown(subject, markdown_content, log_dir, config=None):
+    config = config or CONFIG
     try:
-        tc_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "teams_config.json")
         url = ""
-        if os.path.exists(tc_path):
-            with open(tc_path, "r", encoding="utf-8") as f:
-                tcfg = json.load(f)
-            if tcfg.get("enabled"):
-                def_name = tcfg.get("default_webhook")
-                url = tcfg.get("webhooks", {}).get(def_name, "")
+        tcfg = get_teams_config()
+        if tcfg and tcfg.get("enabled"):
+            def_name = tcfg.get("default_webhook")
+            url = tcfg.get("webhooks", {}).get(def_name, "")
         if not url:
-            url = CONFIG.get("Teams", {}).get("webhook_url", "").strip()
+            url = config.get("Teams", {}).get("webhook_url", "").strip()
     except Exception:
-        url = CONFIG.get("Teams", {}).get("webhook_url", "").strip()
+        url = config.get("Teams", {}).get("webhook_url", "").strip()
     if not url:
         log_message("Teams simple fallback 无URL", log_dir)
         return False
+    import requests
     payload = {"text": f"{subject}\n{markdown_content[:7000]}"}
     try:
         r = requests.post(url, json=payload, timeout=25)
@@ -812,6 +849,7 @@ def send_health_probe(log_dir):
     if not url:
         log_message("健康检测: 无URL", log_dir)
         return
+    import requests
     try:
         r = requests.post(url, json={"text": "健康探测"}, timeout=10)
         log_message(f"健康检测状态: {r.status_code}", log_dir)
@@ -825,17 +863,19 @@ def _trace_banner():
 
 _trace_banner()
 
-def send_report(report_data, reminder_dir, log_dir):
+def send_report(report_data, reminder_dir, log_dir, config=None):
     log_message(f"[DEBUG] send_report() 被调用, type={report_data.get('type')}, total_count={report_data.get('total_count')}", log_dir)
     log_message(f"[VER {SCRIPT_VERSION}] 开始发送报告: {report_data['type']}", log_dir)
     if report_data["total_count"] == 0:
         log_message(f"[VER {SCRIPT_VERSION}] {report_data['type']} 无数据跳过", log_dir)
         return
     now_str = datetime.now().strftime("%Y-%m-%d")
-    email_html, subject = generate_email_html(report_data["table"], now_str, report_data["total_count"],
-                                              report_data["type"], report_data["recipients"], report_data["cc"])
-    log_message(f"[VER {SCRIPT_VERSION}] 邮件HTML生成 subject={subject}", log_dir)
-    html_path, _ = save_email_contents(email_html, reminder_dir, report_data["type"])
+    with span("render"):
+        email_html, subject = generate_email_html(report_data["table"], now_str, report_data["total_count"],
+                                                  report_data["type"], report_data["recipients"], report_data["cc"],
+                                                  config)
+        log_message(f"[VER {SCRIPT_VERSION}] 邮件HTML生成 subject={subject}", log_dir)
+        html_path, _ = save_email_contents(email_html, reminder_dir, report_data["type"])
     log_message(f"[VER {SCRIPT_VERSION}] 保存邮件文件: {html_path}", log_dir)
 
     send_email_func = None
@@ -853,8 +893,7 @@ def send_report(report_data, reminder_dir, log_dir):
         try:
             log_message(f"[VER {SCRIPT_VERSION}] 邮件发送开始...", log_dir)
             ok = send_email_func(subject, email_html,
-                                 to_addrs=report_data["recipients"], cc_addrs=report_data["cc"],
-                                 use_public_mailbox=True)  # 【新增】使用公共邮箱发送
+                                 to_addrs=report_data["recipients"], cc_addrs=report_data["cc"])
             log_message(f"[VER {SCRIPT_VERSION}] 邮件发送结果={ok}", log_dir)
         except Exception as e:
             log_message(f"[VER {SCRIPT_VERSION}] 邮件发送异常: {e}", log_dir)
@@ -863,7 +902,8 @@ def send_report(report_data, reminder_dir, log_dir):
         log_message(f"[VER {SCRIPT_VERSION}] 邮件阶段跳过 ENABLED={email_enabled} to={len(report_data['recipients']) if report_data else 0} cc={len(report_data['cc']) if report_data else 0}", log_dir)
 
     log_message(f"[VER {SCRIPT_VERSION}] 准备进入Teams阶段", log_dir)
-    md = build_teams_markdown(report_data, subject)
+    with span("render_teams"):
+        md = build_teams_markdown(report_data, subject, config)
     urgent_flag = False
     rule_key = "normal_issues"
     if report_data["type"] == "Pending review任务提醒":
@@ -875,9 +915,7 @@ def send_report(report_data, reminder_dir, log_dir):
 
     teams_success = False
     try:
-        log_message(f"[VER {SCRIPT_VERSION}] 即将导入 teams_sender", log_dir)
-        if "teams_sender" in sys.modules:
-            del sys.modules["teams_sender"]
+        # teams_sender 只导入一次；配置热更新由 config_registry 按 mtime 处理
         import teams_sender
         log_message(f"[VER {SCRIPT_VERSION}] 已导入 teams_sender 路径={getattr(teams_sender,'__file__','?')}", log_dir)
         tc = teams_sender.load_teams_config()
@@ -898,80 +936,173 @@ def send_report(report_data, reminder_dir, log_dir):
 
     if not teams_success:
         log_message(f"[VER {SCRIPT_VERSION}] 尝试 fallback simple", log_dir)
-        fb = send_to_teams_simple_markdown(subject, md, log_dir)
+        with span("teams_fallback"):
+            fb = send_to_teams_simple_markdown(subject, md, log_dir, config)
         log_message(f"[VER {SCRIPT_VERSION}] fallback结果={fb}", log_dir)
         teams_success = teams_success or fb
 
     log_message(f"[VER {SCRIPT_VERSION}] 最终Teams状态={teams_success}", log_dir)
 
-def main(selected_csv_path=None):
+def resolve_config(config=None):
+    """
+    本次运行使用的配置: None 为 email_config.json (有变化时自动重新加载)；
+    路径按 email_config.json 读取，dict 按同样格式合并默认值。不修改模块级 CONFIG
+    """
+    if config is None:
+        return refresh_config()
+    return load_config(config) if isinstance(config, str) else _build_config(config)
+
+def run(csv_path=None, config=None, log_dir=None):
+    """
+    处理一份 CSV 并发送报告，返回 ReportResult (不抛异常，错误记录在 result.error)
+    csv_path: 为空时从 RawData 清单选取最新文件；已归档的文件会自动解压
+    config: None 使用 email_config.json (有变化时自动重新加载)；也可传配置文件路径或同格式的 dict
+    log_dir: 覆盖配置中的日志目录
+    同一进程内可重复调用(下载器/守护进程直接调用，避免每次启动解释器并重新导入 pandas)
+    阶段耗时与资源: 被下载器同进程调用时并入下载器的计时树，否则单独写入 Log/trace_<run_id>_pending_review_report.txt
+    """
+    t_start = time.perf_counter()
+    timings = {}
+    # 配置随调用传递，不替换模块级 CONFIG: 守护进程工作线程与其它调用方可同时使用本模块
+    config = resolve_config(config)
+    log_dir = log_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                      get_cfg("ITC_REPORT_DIR_NAME", config), get_cfg("LOG_DIR_NAME", config))
+    with trace_run("pending_review_report", log_dir, log_callback=lambda m: log_message(m, log_dir)) as sp:
+        result = _run(csv_path, log_dir, timings, t_start, config)
+        sp.set(exit_code=result.exit_code)
+    # 各阶段 CPU/内存/IO (subprocess 方式时随结果 JSON 传回下载器)
+    result.resources = sp.stage_resources()
+    return result
+
+def _run(selected_csv_path, log_dir, timings, t_start, config):
     base_dir = os.path.dirname(os.path.abspath(__file__))
-    itc_dir = os.path.join(base_dir, get_cfg("ITC_REPORT_DIR_NAME"))
-    raw_dir = os.path.join(itc_dir, get_cfg("RAW_DATA_DIR_NAME"))
-    reminder_dir = os.path.join(itc_dir, get_cfg("REMINDER_DIR_NAME"))
-    log_dir = os.path.join(itc_dir, get_cfg("LOG_DIR_NAME"))
+    itc_dir = os.path.join(base_dir, get_cfg("ITC_REPORT_DIR_NAME", config))
+    raw_dir = os.path.join(itc_dir, get_cfg("RAW_DATA_DIR_NAME", config))
+    reminder_dir = os.path.join(itc_dir, get_cfg("REMINDER_DIR_NAME", config))
+    log_dir = log_dir or os.path.join(itc_dir, get_cfg("LOG_DIR_NAME", config))
     for p in [raw_dir, reminder_dir, log_dir]: ensure_directory_exists(p)
-    log_message(f"目录初始化: ITC_DIR='{itc_dir}' RAW='RawData' REMINDER='Reminder' LOG='Log'", log_dir)
+    log_message(f"目录初始化: ITC_DIR='{itc_dir}' RAW='RawData' REMINDER='Reminder' LOG='{log_dir}'", log_dir)
     log_message("开始处理报告", log_dir)
+    result = ReportResult()
 
+    if selected_csv_path and not os.path.exists(selected_csv_path):
+        # 指定的文件可能已被归档(RawData/Archive)，解压到缓存后使用
+        archived = resolve_csv(selected_csv_path, raw_dir, log_callback=lambda m: log_message(m, log_dir))
+        if archived:
+            selected_csv_path = archived
     if selected_csv_path and os.path.exists(selected_csv_path):
         csv_path = selected_csv_path
         log_message(f"使用指定CSV: {csv_path}", log_dir)
     else:
-        csv_files = [(os.path.join(raw_dir, f), os.path.getmtime(os.path.join(raw_dir, f)))
-                     for f in os.listdir(raw_dir) if f.lower().endswith(".csv")]
-        if not csv_files:
+        # 从 RawData 清单选取最新的文件(解析异常时记录日志，不退回更早的文件)；清单不可用时按修改时间选取
+        csv_path = None
+        try:
+            csv_path = latest_csv(raw_dir, log_callback=lambda m: log_message(m, log_dir))
+        except Exception as e:
+            log_message(f"RawData 清单不可用: {e}", log_dir)
+            csv_files = [(os.path.join(raw_dir, f), os.path.getmtime(os.path.join(raw_dir, f)))
+                         for f in os.listdir(raw_dir) if f.lower().endswith(".csv")]
+            if csv_files:
+                csv_files.sort(key=lambda x: x[1], reverse=True)
+                csv_path = csv_files[0][0]
+        if not csv_path:
             log_message("未找到CSV文件", log_dir)
-            return 1
-        csv_files.sort(key=lambda x: x[1], reverse=True)
-        csv_path = csv_files[0][0]
+            result.error = "未找到CSV文件"
+            timings["total"] = time.perf_counter() - t_start
+            result.timings = timings
+            return result
         log_message(f"选取最新CSV: {csv_path}", log_dir)
 
+    result.csv_path = csv_path
     summary = {}
     try:
+        # pandas/numpy 首次导入计入启动开销 timings["import"] (调用方再加上模块本身的导入耗时)
+        with span("import_deps"):
+            timings["import"] = load_dependencies()
         log_message("读取数据开始", log_dir)
+        t0 = time.perf_counter()
         df = load_and_process_data(csv_path)
+        timings["load"] = time.perf_counter() - t0
         log_message("读取数据完成", log_dir)
         if "Category" in df.columns:
             cats = df["Category"].dropna().value_counts().to_dict()
             log_message(f"Category分布: {json.dumps(cats, ensure_ascii=False)}", log_dir)
         log_message("分析开始", log_dir)
-        results = analyze_requests(df)
+        t0 = time.perf_counter()
+        with span("analysis"):
+            results = analyze_requests(df, config)
+        timings["analyze"] = time.perf_counter() - t0
         log_message(f"分析完成 Pending={results['pending']['total_count']} Revoked={results['revoked']['total_count']}", log_dir)
         log_message(f"[DEBUG] 即将循环遍历结果 results.keys()={list(results.keys())}", log_dir)
+        t0 = time.perf_counter()
         for rpt in results.values():
             log_message(f"[DEBUG] 循环中: rpt type={rpt.get('type')}, total={rpt.get('total_count')}", log_dir)
-            send_report(rpt, reminder_dir, log_dir)
+            with span("send_report", report=rpt.get("type")):
+                send_report(rpt, reminder_dir, log_dir, config)
+        timings["send"] = time.perf_counter() - t0
+        pending_items = results["pending"].get("items", [])
+        revoked_items = results["revoked"].get("items", [])
         summary = {
             "pending_count": int(results["pending"]["total_count"]),
             "revoked_count": int(results["revoked"]["total_count"]),
-            "pending_review_items": results["pending"].get("items", []),
-            "revoked_items": results["revoked"].get("items", [])
+            "pending_review_items": pending_items,
+            "revoked_items": revoked_items,
+            "total_records": int(df["request_group"].nunique()) if "request_group" in df.columns else 0,
+            "excluded_long_term": int(results["pending"].get("excluded_count", 0)),
+            "urgency_counts": {lvl: sum(1 for it in pending_items if it.get("紧急程度") == lvl)
+                               for lvl in ("非常紧急", "紧急", "常规")},
+            "revoked_categories": sorted({str(it["Category"]) for it in revoked_items if it.get("Category")}),
         }
     except Exception as e:
         log_message(f"处理异常: {e}", log_dir)
         log_message(traceback.format_exc(), log_dir)
         summary = {"error": str(e)}
 
+    if "error" not in summary:
+        result.exit_code = 0
+        result.pending_count = summary["pending_count"]
+        result.revoked_count = summary["revoked_count"]
+        result.pending_items = make_json_safe(summary["pending_review_items"])
+        result.revoked_items = make_json_safe(summary["revoked_items"])
+        result.total_records = summary["total_records"]
+        result.excluded_long_term = summary["excluded_long_term"]
+        result.urgency_counts = summary["urgency_counts"]
+        result.revoked_categories = summary["revoked_categories"]
+        log_message(f"完成 Summary Pending={summary['pending_count']} Revoked={summary['revoked_count']}", log_dir)
+    else:
+        result.error = summary["error"]
+        log_message(f"完成但出错: {summary['error']}", log_dir)
+
+    # 结构化结果(带格式版本)，下载器等读取方通过 ReportResult.load_results 读取
     result_path = os.path.join(base_dir, "a_results.json")
+    result.result_path = result_path
+    timings["total"] = time.perf_counter() - t_start
+    result.timings = timings
     try:
-        with open(result_path, "w", encoding="utf-8") as f:
-            json.dump(make_json_safe(summary), f, ensure_ascii=False, indent=4)
+        result.save_results(result_path)
         log_message(f"结果写入: {result_path}", log_dir)
     except Exception as e:
         log_message(f"结果写入失败: {e}", log_dir)
+    return result
 
-# ...existing code...
-    if "error" not in summary:
-        log_message(f"完成 Summary Pending={summary['pending_count']} Revoked={summary['revoked_count']}", log_dir)
-        return 0
-    else:
-        log_message(f"完成但出错: {summary['error']}", log_dir)
-        return 1
+def main(selected_csv_path=None, log_dir=None, result_json=None):
+    result = run(selected_csv_path, log_dir=log_dir)
+    result.mode = "subprocess" if result_json else "cli"
+    result.timings["import"] = IMPORT_SECONDS + result.timings.get("import", 0.0)
+    if result_json:
+        result.save(result_json)
+    return result.exit_code
+
+# 模块导入耗时(配置加载等；pandas/numpy 由 run() 另行计时)，子进程调用时计入启动开销
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_T0
 
 if __name__ == "__main__":
+    import faulthandler
+    faulthandler.enable()
     parser = argparse.ArgumentParser()
     parser.add_argument("--csv-path", default=None)
+    parser.add_argument("--log-dir", default=None)
+    parser.add_argument("--result-json", default=None, help="把 ReportResult 写入该 JSON 文件")
     args = parser.parse_args()
-    code = main(args.csv_path)
+    code = main(args.csv_path, args.log_dir, args.result_json)
     sys.exit(code)
\ No newline at end of file
@@ -21,6 +21,7 @@
 import logging
 import os
 import json
+import time
 from typing import List, Optional
 
 class PublicMailboxAutoSender:
@@ -37,6 +38,93 @@ class PublicMailboxAutoSender:
         self.outlook = outlook
         self.logger = logger
         self.namespace = outlook.GetNamespace("MAPI")
+        
+        # 会话级缓存：个人Store / Drafts文件夹 / 公共邮箱地址条目
+        # 每次读取Store属性都是一次COM往返，共享邮箱较多时逐封遍历很慢
+        # 任意发送异常(通常为COM错误)时清空缓存，下次重新解析
+        self._personal_store = None
+        self._personal_store_name = None
+        self._personal_drafts = None
+        self._public_identities = {}
+        self.stats = {
+            "sends": 0,
+            "store_cache_hits": 0,
+            "store_cache_misses": 0,
+            "last_send_ms": None,
+            "total_send_ms": 0.0
+        }
+    
+    def invalidate_cache(self):
+        """清空会话缓存(COM对象失效或Outlook重启后调用)"""
+        self._personal_store = None
+        self._personal_store_name = None
+        self._personal_drafts = None
+        self._public_identities = {}
+    
+    def _get_personal_drafts(self):
+        """
+        解析并缓存个人账号Store及其Drafts文件夹
+        
+        Returns:
+            (store, store_name, drafts) 或 (None, None, None)
+        """
+        if self._personal_drafts is not None:
+            self.stats["store_cache_hits"] += 1
+            return self._personal_store, self._personal_store_name, self._personal_drafts
+        
+        self.stats["store_cache_misses"] += 1
+        for store in self.namespace.Stores:
+            # 查找默认的个人账号（不是共享邮箱）；DisplayName 只读取一次
+            name = store.DisplayName
+            if "shared" not in name.lower() and name != "SharePoint Lists":
+                # 必须明确在个人账号的Drafts中创建，不能用CreateItem(0)
+                self._personal_store = store
+                self._personal_store_name = name
+                self._personal_drafts = store.GetDefaultFolder(3)  # 3 = Drafts folder
+                self.logger.info(f"  🔍 使用个人账号: {name}")
+                return store, name, self._personal_drafts
+        return None, None, None
+    
+    def get_sent_folder(self):
+        """个人账号的已发送邮件文件夹(邮件从个人账号Drafts发出，也落在该账号)"""
+        store, _, _ = self._get_personal_drafts()
+        if store is not None:
+            return store.GetDefaultFolder(5)  # 5 = Sent Items
+        return self.namespace.GetDefaultFolder(5)
+    
+    def _get_public_identity(self, mailbox_name: str):
+        """
+        解析并缓存公共邮箱的地址条目
+        
+        Returns:
+            dict: {"name", "email", "address_entry"}
+        """
+        identity = self._public_identities.get(mailbox_name)
+        if identity is not None:
+            return identity
+        
+        address_entry = None
+        try:
+            recipient = self.namespace.CreateRecipient(mailbox_name)
+            if recipient.Resolve():
+                address_entry = recipient.AddressEntry
+            else:
+                self.logger.warning(f"  ⚠️ 公共邮箱地址无法解析: {mailbox_name}")
+        except Exception as e:
+            self.logger.warning(f"  ⚠️ 解析公共邮箱地址异常: {e}")
+        
+        identity = {
+            "name": mailbox_name,
+            "email": f"{mailbox_name}@shared.pg.com",
+            "address_entry": address_entry
+        }
+        self._public_identities[mailbox_name] = identity
+        return identity
+    
+    def prepare_public_mailbox(self, mailbox_name: str):
+        """批量发送前预先解析个人 Drafts 与公共邮箱身份，整批共用会话缓存"""
+        self._get_personal_drafts()
+        self._get_public_identity(mailbox_name)
     
     def send_from_public_mailbox(self, mailbox_name: str, 
                                  to_addresses: List[str],
@@ -63,31 +151,22 @@ class PublicMailboxAutoSender:
         Returns:
             bool: 是否成功
         """
+        t0 = time.perf_counter()
         try:
             self.logger.info(f"\n【从公共邮箱发送】{mailbox_name}")
             
             # 关键改进：从个人账号创建邮件，而不是从公共邮箱的Drafts
             # 这样mail.Send()才能正常工作
             
-            # 步骤1: 找到个人账号Store
-            personal_store = None
-            for store in self.namespace.Stores:
-                # 查找默认的个人账号（不是共享邮箱）
-                if "shared" not in store.DisplayName.lower() and store.DisplayName != "SharePoint Lists":
-                    personal_store = store
-                    self.logger.info(f"  🔍 使用个人账号: {store.DisplayName}")
-                    break
-            
+            # 步骤1: 找到个人账号Store及Drafts（会话内缓存）
+            personal_store, store_name, personal_drafts = self._get_personal_drafts()
             if not personal_store:
                 self.logger.error("  ❌ 找不到个人账号")
                 return False
             
             # 步骤2: 在个人账号的Drafts中创建邮件（这是关键！必须明确指定Drafts）
-            # 不能用CreateItem(0)，因为会默认使用当前活跃的邮箱
-            # 必须明确在个人账号的Drafts中创建
-            personal_drafts = personal_store.GetDefaultFolder(3)  # 3 = Drafts folder
             mail = personal_drafts.Items.Add()  # 在Drafts中创建
-            self.logger.info(f"  📧 邮件已在 {personal_store.DisplayName} 的Drafts中创建")
+            self.logger.info(f"  📧 邮件已在 {store_name} 的Drafts中创建")
             
             # 设置基本信息
             mail.Subject = subject
@@ -117,12 +196,19 @@ class PublicMailboxAutoSender:
                 mail.Send()
                 self.logger.info(f"  ✅ 邮件已发送")
             
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            self.stats["sends"] += 1
+            self.stats["last_send_ms"] = elapsed_ms
+            self.stats["total_send_ms"] += elapsed_ms
+            self.logger.info(f"  ⏱️ 单封耗时: {elapsed_ms:.1f} ms (Store缓存命中 {self.stats['store_cache_hits']} / 未命中 {self.stats['store_cache_misses']})")
             return True
             
         except Exception as e:
             self.logger.error(f"❌ 发送失败: {e}")
             import traceback
             self.logger.error(traceback.format_exc())
+            # COM对象可能已失效(Outlook重启/断开)，下次重新解析
+            self.invalidate_cache()
             return False
     
     def _apply_mapi_fixes_for_public_mailbox(self, mail, mailbox_name: str):
@@ -136,8 +222,8 @@ class PublicMailboxAutoSender:
             self.logger.info(f"  🔧 应用MAPI修复...")
             pa = mail.PropertyAccessor
             
-            # 公共邮箱的邮箱地址
-            public_email = f"{mailbox_name}@shared.pg.com"
+            # 公共邮箱的邮箱地址（会话内缓存）
+            public_email = self._get_public_identity(mailbox_name)["email"]
             
             # 修复1: 设置PR_SENDER_NAME (0x0C06001F) = 公共邮箱名称
             try:
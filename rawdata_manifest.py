@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+RawData 清单索引 (RawData/manifest.json)
+每个 CSV 记录: sha256、大小、mtime、行数、请求组数、表头签名、Requested Date 范围、解析状态、下载耗时、来源
+- 复用判定/最新文件选择/重复检测只查清单，不再读取文件内容
+- sync() 只 stat 目录内文件: 新增或 size/mtime 变化的文件才重新分析，已删除的文件移出清单
+- record() 在下载完成后登记，内容与已有文件相同时立即标记 duplicate_of
+只索引 RawData 根目录下的 .csv (增量/分区的中间目录不在内)
+"""
+
+import os
+import io
+import csv
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime
+
+from itc_csv import detect_encoding, REQUIRED_COLUMNS
+from incremental_export import DateParser
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+STATUS_OK = "ok"
+
+
+class _HashingReader(io.RawIOBase):
+    """读取时同步计算 sha256，使哈希与 CSV 统计只需读一遍文件"""
+
+    def __init__(self, f):
+        self._f = f
+        self.digest = hashlib.sha256()
+        self.head = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self._f.readinto(b)
+        if n:
+            chunk = bytes(b[:n])
+            self.digest.update(chunk)
+            if len(self.head) < 4096:
+                self.head += chunk[:4096 - len(self.head)]
+        return n
+
+
+def header_signature(columns):
+    return hashlib.sha1("\x1f".join(columns).encode("utf-8")).hexdigest()[:16]
+
+
+def analyze_csv(path):
+    """一次读取文件，返回清单条目的内容部分(sha256/行数/组数/表头/日期范围/解析状态)"""
+    with open(path, "rb") as f:
+        encoding = detect_encoding(f.read(4096))
+        f.seek(0)
+        hasher = _HashingReader(f)
+        info = {"encoding": encoding, "rows": 0, "groups": 0, "columns": 0, "header_signature": None,
+                "date_min": None, "date_max": None}
+        try:
+            text = io.TextIOWrapper(io.BufferedReader(hasher, 1024 * 1024), encoding=encoding,
+                                    errors="replace", newline="")
+            reader = csv.reader(text)
+            header = [h.strip() for h in next(reader, [])]
+            info["columns"] = len(header)
+            info["header_signature"] = header_signature(header) if header else None
+            requester_i = header.index("Requester") if "Requester" in header else None
+            date_i = header.index("Requested Date") if "Requested Date" in header else None
+            parse_date = DateParser()
+            dmin = dmax = None
+            for row in reader:
+                if not row:
+                    continue
+                info["rows"] += 1
+                if requester_i is not None and requester_i < len(row) and row[requester_i].strip():
+                    info["groups"] += 1
+                    if date_i is not None and date_i < len(row):
+                        d = parse_date(row[date_i])
+                        if d:
+                            dmin = d if dmin is None or d < dmin else dmin
+                            dmax = d if dmax is None or d > dmax else dmax
+            info["date_min"] = dmin.isoformat() if dmin else None
+            info["date_max"] = dmax.isoformat() if dmax else None
+            missing = [c for c in REQUIRED_COLUMNS if c not in header]
+            if not header:
+                info["parse_status"] = "error: 文件为空或缺少表头"
+            elif missing:
+                info["parse_status"] = f"error: 缺少必需列 {missing}"
+            else:
+                # 只有表头也是有效导出(当前没有待处理的请求)
+                info["parse_status"] = STATUS_OK
+        except (csv.Error, UnicodeError) as e:
+            info["parse_status"] = f"error: {e}"
+        # 解析失败时仍把剩余内容计入哈希
+        while hasher.readinto(bytearray(1024 * 1024)):
+            pass
+        info["sha256"] = hasher.digest.hexdigest()
+    return info
+
+
+class RawDataManifest:
+    """
+    manifest = RawDataManifest(RAW_DATA_DIR)
+    manifest.record(path, download_seconds=12.3, source="http")
+    path = manifest.latest(max_age_hours=8)
+    """
+
+    def __init__(self, raw_dir, log_callback=None):
+        self.raw_dir = os.path.abspath(raw_dir)
+        self.path = os.path.join(self.raw_dir, MANIFEST_NAME)
+        self.log_callback = log_callback
+        self._lock = threading.Lock()
+        self.entries = {}
+        self._load()
+
+    def log(self, message):
+        if self.log_callback:
+            try:
+                self.log_callback(message)
+            except Exception:
+                pass
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.entries = data.get("files", {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        os.makedirs(self.raw_dir, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with self._lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "files": self.entries}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+
+    def _analyze(self, name, st, download_seconds=None, source=None):
+        t0 = time.perf_counter()
+        entry = analyze_csv(os.path.join(self.raw_dir, name))
+        entry.update({
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "added_at": datetime.now().isoformat(timespec="seconds"),
+            "analyze_seconds": round(time.perf_counter() - t0, 3),
+            "download_seconds": round(download_seconds, 2) if download_seconds is not None else None,
+            "source": source,
+            "duplicate_of": None,
+        })
+        for other, e in self.entries.items():
+            if other != name and e.get("sha256") == entry["sha256"]:
+                entry["duplicate_of"] = other
+                break
+        self.entries[name] = entry
+        return entry
+
+    def sync(self, save=True):
+        """按目录列表对齐清单，返回 (新增/更新数, 移除数)"""
+        names = set()
+        changed = 0
+        try:
+            scan = list(os.scandir(self.raw_dir))
+        except OSError:
+            scan = []
+        for de in scan:
+            if not de.name.lower().endswith(".csv") or not de.is_file():
+                continue
+            names.add(de.name)
+            st = de.stat()
+            e = self.entries.get(de.name)
+            if e and e.get("size") == st.st_size and e.get("mtime") == st.st_mtime:
+                continue
+            prev = e or {}
+            self._analyze(de.name, st, prev.get("download_seconds"), prev.get("source"))
+            changed += 1
+        removed = [n for n in self.entries if n not in names]
+        for n in removed:
+            del self.entries[n]
+        if save and (changed or removed):
+            self.save()
+        return changed, len(removed)
+
+    def record(self, path, download_seconds=None, source=None):
+        """登记新下载的文件并返回条目；内容与已有文件相同时记录 duplicate_of"""
+        path = os.path.abspath(path)
+        if os.path.dirname(path) != self.raw_dir:
+            raise ValueError(f"文件不在 RawData 根目录: {path}")
+        name = os.path.basename(path)
+        entry = self._analyze(name, os.stat(path), download_seconds, source)
+        self.save()
+        if entry["duplicate_of"]:
+            self.log(f"♻️ 下载内容与已有文件完全相同: {name} == {entry['duplicate_of']}")
+        if entry["parse_status"] != STATUS_OK:
+            self.log(f"⚠️ 清单登记: {name} 解析状态 {entry['parse_status']}")
+        else:
+            self.log(f"🗂️ 清单登记: {name} 行数 {entry['rows']} 请求组 {entry['groups']} "
+                     f"日期 {entry['date_min']}~{entry['date_max']} sha256={entry['sha256'][:12]}…")
+        return entry
+
+    def get(self, path):
+        return self.entries.get(os.path.basename(path))
+
+    def find_by_hash(self, sha256):
+        return [os.path.join(self.raw_dir, n) for n, e in self.entries.items() if e.get("sha256") == sha256]
+
+    def candidates(self, max_age_hours=None, min_size_kb=0, require_ok=True):
+        """按 mtime 从新到旧返回 [(path, entry)]"""
+        cutoff = time.time() - max_age_hours * 3600 if max_age_hours is not None else None
+        items = []
+        for name, e in self.entries.items():
+            if require_ok and e.get("parse_status") != STATUS_OK:
+                continue
+            if cutoff is not None and e.get("mtime", 0) < cutoff:
+                continue
+            if e.get("size", 0) / 1024.0 < min_size_kb:
+                continue
+            items.append((os.path.join(self.raw_dir, name), e))
+        items.sort(key=lambda x: x[1].get("mtime", 0), reverse=True)
+        return items
+
+    def latest(self, max_age_hours=None, min_size_kb=0, require_ok=True):
+        items = self.candidates(max_age_hours, min_size_kb, require_ok)
+        return items[0][0] if items else None
+
+
+def latest_csv(raw_dir, max_age_hours=None, min_size_kb=0, log_callback=None):
+    """
+    同步清单后返回最新的 CSV；没有则返回 None
+    最新的文件解析异常时不退回到更早的文件(数据已过时)，记录异常文件后仍按修改时间返回最新文件，由后续处理报错
+    """
+    manifest = RawDataManifest(raw_dir, log_callback=log_callback)
+    manifest.sync()
+    items = manifest.candidates(max_age_hours=max_age_hours, min_size_kb=min_size_kb, require_ok=False)
+    if not items:
+        return None
+    skipped = []
+    for path, e in items:
+        if e.get("parse_status") == STATUS_OK:
+            break
+        skipped.append(f"{os.path.basename(path)} ({e.get('parse_status')})")
+    if skipped:
+        manifest.log(f"⚠️ 最新的 {len(skipped)} 个 CSV 解析异常，不退回更早的文件: {'; '.join(skipped)}")
+    return items[0][0]
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+RawData 保留与压缩
+- RawData 根目录只保留最近 keep_hot 个 CSV (以及增量模式当前的合并文件)，目录扫描量与历史长度无关
+- 更早的 CSV 按修改月份压入 RawData/Archive/ITC_raw_YYYY-MM.zip，索引写在 Archive/index.json
+  (沿用 manifest 中的 sha256/行数/日期范围，查询不需要解压)
+- dedupe=True 时内容(sha256)已存入同月归档或仍在热区的文件只在索引中记一个别名，不重复存储
+  (不指向更早月份的归档: 该月份过期删除时别名会失去内容)
+- keep_archive_months 限制归档月数，超出的月份整包删除，磁盘占用有上限
+- resolve_csv()/materialize() 让处理脚本透明读取已归档的文件(解压到 RawData/.materialized 缓存)
+"""
+
+import os
+import json
+import time
+import zipfile
+import hashlib
+from datetime import datetime
+
+from rawdata_manifest import RawDataManifest
+from incremental_export import STATE_DIR_NAME
+
+ARCHIVE_DIR_NAME = "Archive"
+INDEX_NAME = "index.json"
+MATERIALIZED_DIR_NAME = ".materialized"
+ARCHIVE_PATTERN = "ITC_raw_{month}.zip"
+MATERIALIZED_MAX_AGE_HOURS = 24
+
+
+class RawDataArchive:
+    def __init__(self, raw_dir, log_callback=None):
+        self.raw_dir = os.path.abspath(raw_dir)
+        self.archive_dir = os.path.join(self.raw_dir, ARCHIVE_DIR_NAME)
+        self.index_path = os.path.join(self.archive_dir, INDEX_NAME)
+        self.cache_dir = os.path.join(self.raw_dir, MATERIALIZED_DIR_NAME)
+        self.log_callback = log_callback
+        self.index = self._load_index()
+
+    def log(self, message):
+        if self.log_callback:
+            try:
+                self.log_callback(message)
+            except Exception:
+                pass
+
+    # ---------------- 索引 ----------------
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.index_path)
+
+    def _stored_by_hash(self, sha256, archive_name):
+        for name, e in self.index.items():
+            if e.get("sha256") == sha256 and e.get("member") and e.get("archive") == archive_name:
+                return name
+        return None
+
+    # ---------------- 压缩 ----------------
+    def _protected(self):
+        """增量模式的当前合并文件始终保留在热区"""
+        try:
+            with open(os.path.join(self.raw_dir, STATE_DIR_NAME, "state.json"), "r", encoding="utf-8") as f:
+                merged = json.load(f).get("merged_path")
+            return {os.path.basename(merged)} if merged else set()
+        except (OSError, ValueError):
+            return set()
+
+    def compact(self, keep_hot=10, dedupe=True, keep_archive_months=None):
+        """
+        归档热区之外的 CSV，返回统计 {"archived", "deduped", "bytes_before", "bytes_after", "expired_months"}
+        """
+        manifest = RawDataManifest(self.raw_dir, log_callback=self.log_callback)
+        manifest.sync(save=False)
+        protected = self._protected()
+        ordered = sorted(manifest.entries.items(), key=lambda kv: kv[1].get("mtime", 0), reverse=True)
+        hot = [n for n, _ in ordered if n not in protected][:max(0, int(keep_hot))]
+        cold = [(n, e) for n, e in ordered if n not in protected and n not in hot]
+        hot_hashes = {manifest.entries[n].get("sha256"): n for n in hot}
+        stats = {"archived": 0, "deduped": 0, "bytes_before": 0, "bytes_after": 0, "expired_months": []}
+        if cold:
+            os.makedirs(self.archive_dir, exist_ok=True)
+        by_month = {}
+        for name, entry in cold:
+            month = datetime.fromtimestamp(entry.get("mtime", time.time())).strftime("%Y-%m")
+            by_month.setdefault(month, []).append((name, entry))
+
+        for month, items in sorted(by_month.items()):
+            archive_name = ARCHIVE_PATTERN.format(month=month)
+            archive_path = os.path.join(self.archive_dir, archive_name)
+            before = os.path.getsize(archive_path) if os.path.exists(archive_path) else 0
+            archived_now = []
+            with zipfile.ZipFile(archive_path, "a", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+                members = set(zf.namelist())
+                for name, entry in items:
+                    src = os.path.join(self.raw_dir, name)
+                    record = {k: entry.get(k) for k in ("sha256", "size", "mtime", "rows", "groups", "columns",
+                                                         "header_signature", "date_min", "date_max",
+                                                         "parse_status", "download_seconds", "source")}
+                    record["archived_at"] = datetime.now().isoformat(timespec="seconds")
+                    same = None
+                    if dedupe:
+                        # 同内容已存入本月归档或仍在热区: 不存储，指向该文件(热区文件以后归档时会存入实体，
+                        # 且月份不早于本文件，不会先于别名过期)
+                        same = (self._stored_by_hash(entry.get("sha256"), archive_name)
+                                or hot_hashes.get(entry.get("sha256")))
+                    if same:
+                        record.update({"archive": None, "member": None, "duplicate_of": same})
+                        stats["deduped"] += 1
+                    else:
+                        member = name
+                        while member in members:
+                            member = "dup_" + member
+                        zf.write(src, member)
+                        members.add(member)
+                        record.update({"archive": archive_name, "member": member, "duplicate_of": None})
+                        stats["archived"] += 1
+                    stats["bytes_before"] += entry.get("size", 0)
+                    self.index[name] = record
+                    archived_now.append(name)
+            # 确认压缩包可读后再删除原文件
+            with zipfile.ZipFile(archive_path) as zf:
+                bad = zf.testzip()
+            if bad:
+                raise zipfile.BadZipFile(f"归档校验失败: {archive_name} / {bad}")
+            stats["bytes_after"] += os.path.getsize(archive_path) - before
+            self._save_index()
+            for name in archived_now:
+                try:
+                    os.remove(os.path.join(self.raw_dir, name))
+                except OSError as e:
+                    self.log(f"⚠️ 删除已归档文件失败: {name} {e}")
+                manifest.entries.pop(name, None)
+        manifest.save()
+
+        if keep_archive_months:
+            stats["expired_months"] = self._expire(int(keep_archive_months))
+        self.prune_materialized()
+        if stats["archived"] or stats["deduped"] or stats["expired_months"]:
+            self.log(f"🗜️ RawData 归档: {stats['archived']} 个文件压缩 "
+                     f"{stats['bytes_before'] / 1024 / 1024:.1f} MB -> {stats['bytes_after'] / 1024 / 1024:.1f} MB，"
+                     f"去重 {stats['deduped']}，热区保留 {len(hot) + len(protected)}，"
+                     f"删除过期归档 {stats['expired_months'] or '无'}")
+        return stats
+
+    def _expire(self, keep_months):
+        archives = sorted(f for f in os.listdir(self.archive_dir) if f.startswith("ITC_raw_") and f.endswith(".zip"))
+        expired = archives[:-keep_months] if len(archives) > keep_months else []
+        for archive_name in expired:
+            os.remove(os.path.join(self.archive_dir, archive_name))
+            for name in [n for n, e in self.index.items() if e.get("archive") == archive_name]:
+                del self.index[name]
+        # 指向已删除文件的别名一并移除
+        dangling = [n for n, e in self.index.items() if e.get("duplicate_of") and e["duplicate_of"] not in self.index
+                    and not os.path.exists(os.path.join(self.raw_dir, e["duplicate_of"]))]
+        for name in dangling:
+            del self.index[name]
+        if expired or dangling:
+            self._save_index()
+        return [a[len("ITC_raw_"):-len(".zip")] for a in expired]
+
+    # ---------------- 读取 ----------------
+    def materialize(self, name):
+        """把归档文件解压到缓存目录并返回路径；不在归档中返回 None"""
+        seen = set()
+        entry = self.index.get(name)
+        while entry and entry.get("duplicate_of") and name not in seen:
+            seen.add(name)
+            name = entry["duplicate_of"]
+            if os.path.exists(os.path.join(self.raw_dir, name)):
+                return os.path.join(self.raw_dir, name)
+            entry = self.index.get(name)
+        if not entry or not entry.get("member"):
+            return None
+        target = os.path.join(self.cache_dir, name)
+        if os.path.exists(target) and os.path.getsize(target) == entry.get("size"):
+            os.utime(target)
+            return target
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = target + ".tmp"
+        digest = hashlib.sha256()
+        with zipfile.ZipFile(os.path.join(self.archive_dir, entry["archive"])) as zf, \
+                zf.open(entry["member"]) as src, open(tmp, "wb") as dst:
+            while True:
+                chunk = src.read(1024 * 1024)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                dst.write(chunk)
+        if entry.get("sha256") and digest.hexdigest() != entry["sha256"]:
+            os.remove(tmp)
+            raise zipfile.BadZipFile(f"归档文件哈希不一致: {name}")
+        os.replace(tmp, target)
+        self.log(f"📂 已从归档读取: {name} ({entry['archive']})")
+        return target
+
+    def prune_materialized(self, max_age_hours=MATERIALIZED_MAX_AGE_HOURS):
+        if not os.path.isdir(self.cache_dir):
+            return
+        cutoff = time.time() - max_age_hours * 3600
+        for de in os.scandir(self.cache_dir):
+            try:
+                if de.stat().st_mtime < cutoff:
+                    os.remove(de.path)
+            except OSError:
+                pass
+
+    def find(self, date_on=None):
+        """按 Requested Date 覆盖范围查询归档条目(不解压)，返回 [(name, entry)] 新到旧"""
+        items = []
+        for name, e in self.index.items():
+            if date_on and not (e.get("date_min") and e.get("date_max") and e["date_min"] <= date_on <= e["date_max"]):
+                continue
+            items.append((name, e))
+        items.sort(key=lambda kv: kv[1].get("mtime") or 0, reverse=True)
+        return items
+
+
+def resolve_csv(path, raw_dir, log_callback=None):
+    """
+    返回可直接读取的 CSV 路径: 文件存在直接返回；已被归档则解压到缓存后返回；都没有返回 None
+    """
+    if path and os.path.exists(path):
+        return path
+    if not path or not os.path.isdir(os.path.join(raw_dir, ARCHIVE_DIR_NAME)):
+        return None
+    return RawDataArchive(raw_dir, log_callback=log_callback).materialize(os.path.basename(path))
+
+
+def compact_rawdata(raw_dir, keep_hot=10, dedupe=True, keep_archive_months=None, log_callback=None):
+    """下载器调用入口；失败只记录日志，不影响主流程"""
+    try:
+        return RawDataArchive(raw_dir, log_callback=log_callback).compact(keep_hot, dedupe, keep_archive_months)
+    except Exception as e:
+        if log_callback:
+            log_callback(f"⚠️ RawData 归档失败: {e}")
+        return None
+
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+就绪探测(替代固定 sleep)
+- wait_for_devtools: 启动 Chrome 后按退避间隔轮询 /json/version，调试接口应答即返回
+- wait_for_file_ready: 下载文件大小/修改时间在 stable_for 秒内不再变化、没有 .crdownload 等临时文件，
+  且 CSV 结尾完整(itc_csv.check_file) 即返回
+两者都记录耗时与探测次数；已经就绪时几乎不等待，超时返回 None
+"""
+
+import os
+import time
+
+from chrome_port_probe import probe_port
+from itc_csv import check_file, CsvIntegrityError
+
+INITIAL_INTERVAL = 0.05
+MAX_INTERVAL = 0.5
+BACKOFF = 1.5
+DEVTOOLS_TIMEOUT = 30
+FILE_READY_TIMEOUT = 30
+# 浏览器下载未完成时的临时文件后缀
+PARTIAL_SUFFIXES = (".crdownload", ".part", ".tmp")
+
+
+def _logger(log_callback):
+    def log(msg):
+        if log_callback:
+            try:
+                log_callback(msg)
+            except Exception:
+                pass
+    return log
+
+
+def wait_for_devtools(port, host="127.0.0.1", timeout=DEVTOOLS_TIMEOUT, process=None, log_callback=None):
+    """
+    等待 Chrome 调试接口可用，返回 {"port", "browser", "seconds", "probes"}；超时返回 None
+    传入 process(Popen) 时，进程以非零返回码退出立即放弃
+    (返回码 0 可能是把启动请求交给了已运行的 Chrome 实例，继续探测)
+    """
+    log = _logger(log_callback)
+    t0 = time.perf_counter()
+    deadline = t0 + timeout
+    interval = INITIAL_INTERVAL
+    probes = 0
+    while True:
+        if process is not None and process.poll() not in (None, 0):
+            log(f"❌ Chrome 进程已退出 (返回码 {process.returncode})，耗时 {time.perf_counter() - t0:.2f}s")
+            return None
+        probes += 1
+        info = probe_port(port, host, connect_timeout=0.2, http_timeout=1.0)
+        now = time.perf_counter()
+        if info and info["chrome"]:
+            elapsed = now - t0
+            log(f"⏱️ Chrome 调试接口就绪: 端口 {port} 耗时 {elapsed:.2f}s (探测 {probes} 次) {info['browser'] or ''}")
+            return {"port": port, "browser": info["browser"], "seconds": elapsed, "probes": probes}
+        if now >= deadline:
+            log(f"⚠️ 等待 Chrome 调试接口超时: 端口 {port} {timeout}s (探测 {probes} 次)")
+            return None
+        time.sleep(min(interval, deadline - now))
+        interval = min(interval * BACKOFF, MAX_INTERVAL)
+
+
+def _partial_exists(path):
+    return any(os.path.exists(path + suffix) for suffix in PARTIAL_SUFFIXES)
+
+
+def wait_for_file_ready(path, timeout=FILE_READY_TIMEOUT, stable_for=0.5, verify_csv=True, log_callback=None):
+    """
+    等待下载文件写入完成，返回 {"size", "seconds", "probes", "records"}；超时或 CSV 始终不完整返回 None
+    文件最后修改已超过 stable_for 秒(例如 HTTP 下载原子替换后)时只做一次 CSV 校验
+    """
+    log = _logger(log_callback)
+    t0 = time.perf_counter()
+    deadline = t0 + timeout
+    interval = INITIAL_INTERVAL
+    probes = 0
+    last = None
+    stable_since = t0
+    checked = None
+    error = None
+    while True:
+        probes += 1
+        try:
+            st = os.stat(path)
+            sig = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            st = sig = None
+        now = time.perf_counter()
+        if sig != last:
+            last = sig
+            stable_since = now
+            if st is not None:
+                # 已经静止的时间也算入稳定期
+                stable_since -= max(0.0, time.time() - st.st_mtime)
+        if sig and sig[0] > 0 and sig != checked and now - stable_since >= stable_for and not _partial_exists(path):
+            checked = sig
+            records = None
+            try:
+                if verify_csv:
+                    records = check_file(path)["records"]
+                elapsed = time.perf_counter() - t0
+                log(f"⏱️ 文件就绪: {os.path.basename(path)} {sig[0] / 1024:.1f} KB 耗时 {elapsed:.2f}s "
+                    f"(探测 {probes} 次{f'，{records} 条记录' if records is not None else ''})")
+                return {"size": sig[0], "seconds": elapsed, "probes": probes, "records": records}
+            except (CsvIntegrityError, OSError) as e:
+                # 可能仍在写入(文件被占用/结尾不完整)，大小变化后再校验
+                error = e
+        if now >= deadline:
+            reason = f"CSV 校验失败: {error}" if error else ("文件不存在" if sig is None else "文件仍在变化")
+            log(f"⚠️ 等待文件就绪超时 ({timeout}s): {os.path.basename(path)} {reason}")
+            return None
+        time.sleep(min(interval, deadline - now))
+        interval = min(interval * BACKOFF, MAX_INTERVAL)
+
+
+if __name__ == "__main__":
+    import json
+    import shutil
+    import socket
+    import tempfile
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class _Chrome(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            body = json.dumps({"Browser": "Chrome/130.0", "webSocketDebuggerUrl": "ws://x"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    # 调试接口 0.6s 后才开始监听
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    servers = []
+
+    def _start_later():
+        time.sleep(0.6)
+        srv = ThreadingHTTPServer(("127.0.0.1", port), _Chrome)
+        servers.append(srv)
+        srv.serve_forever()
+
+    threading.Thread(target=_start_later, daemon=True).start()
+    info = wait_for_devtools(port, timeout=5, log_callback=print)
+    assert info and 0.6 <= info["seconds"] < 1.5, info
+    servers[0].shutdown()
+    servers[0].server_close()
+
+    class _Exited:
+        returncode = 1
+
+        def poll(self):
+            return 1
+
+    t0 = time.perf_counter()
+    assert wait_for_devtools(port, timeout=5, process=_Exited(), log_callback=print) is None
+    assert time.perf_counter() - t0 < 0.1
+
+    tmp = tempfile.mkdtemp()
+    try:
+        header = "Request ID,Requester,Status,System/Solution,Request For,Category\n"
+        row = '1,Alice,Pending,"SAP, PRD",Bob,Access\n'
+        path = os.path.join(tmp, "report.csv")
+
+        def _slow_writer():
+            with open(path + ".crdownload", "w", encoding="utf-8") as f:
+                f.write(header)
+                for _ in range(5):
+                    f.write(row * 100)
+                    f.flush()
+                    time.sleep(0.1)
+                f.write('2,Carol,Revoked,"SAP')    # 结尾尚未写完
+                f.flush()
+                time.sleep(0.3)
+                f.write(', PRD",Dan,Access\n')
+            os.replace(path + ".crdownload", path)
+
+        threading.Thread(target=_slow_writer).start()
+        info = wait_for_file_ready(path, timeout=5, stable_for=0.2, log_callback=print)
+        assert info and info["records"] == 501, info
+        # 已写完的文件几乎不等待
+        time.sleep(0.3)
+        info = wait_for_file_ready(path, stable_for=0.2, log_callback=print)
+        assert info and info["seconds"] < 0.1, info
+        bad = os.path.join(tmp, "truncated.csv")
+        with open(bad, "w", encoding="utf-8") as f:
+            f.write(header + '1,Alice,Pending,"SAP')
+        assert wait_for_file_ready(bad, timeout=0.5, stable_for=0.1, log_callback=print) is None
+        print("✅ readiness 自测通过")
+    finally:
+        shutil.rmtree(tmp)
@@ -0,0 +1,526 @@
+# -*- coding: utf-8 -*-
+"""
+ITC 导出报表的直接 HTTP 下载
+登录完成后不再让 Chrome 导航到 REPORT_URL 并等待文件落盘，而是:
+1. 通过 CDP 从调试 Chrome 会话中取出已认证的 Cookie 与 User-Agent
+2. 使用连接池化的 requests.Session (gzip 传输压缩) 流式请求 GetRequestExportReport
+3. 分块写入 RawData(先写临时文件，完成后原子替换)，同时计算 sha256 并输出进度
+4. 断点续传: 中断后用 Range/If-Range 从已下载位置继续，完成后校验长度与 CSV 结尾完整性
+
+下载模式(DOWNLOAD_MODE):
+  browser: 原方式，由 Chrome 下载(见 download_watcher)
+  http:    本模块直接下载
+  auto:    先尝试 http，失败(如 Cookie 失效返回登录页)时回退 browser
+"""
+
+import os
+import re
+import json
+import time
+import zlib
+import hashlib
+import urllib.parse
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+from download_watcher import unique_target
+from itc_csv import CsvTrailerCheck, CsvIntegrityError
+
+DOWNLOAD_MODES = ("auto", "http", "browser")
+# 可续传的网络错误(resp.raw.stream 抛出的是 urllib3 异常)
+_TRANSIENT_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                     requests.exceptions.Timeout, ProtocolError, ReadTimeoutError, ConnectionError)
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_FILENAME_PREFIX = "ITC_RequestExportReport"
+
+
+class ReportFetchError(Exception):
+    """HTTP 下载失败(认证失效、非预期响应等)"""
+
+
+class FetchResult:
+    """一次下载的结果与指标"""
+
+    def __init__(self, path, size, wire_bytes, sha256, seconds, status_code, content_encoding=None):
+        self.resumed_from = None
+        self.transferred = wire_bytes
+        self.records = None
+        self.path = path
+        self.size = size
+        self.wire_bytes = wire_bytes
+        self.sha256 = sha256
+        self.seconds = seconds
+        self.status_code = status_code
+        self.content_encoding = content_encoding
+
+    @property
+    def mb_per_sec(self):
+        return (self.size / 1024 / 1024) / self.seconds if self.seconds > 0 else 0.0
+
+    def summary(self):
+        ratio = f", 传输 {self.wire_bytes / 1024 / 1024:.2f} MB ({self.content_encoding})" \
+            if self.content_encoding else ""
+        resumed = f", 续传自 {self.resumed_from / 1024 / 1024:.2f} MB" if self.resumed_from else ""
+        return (f"{os.path.basename(self.path)} {self.size / 1024 / 1024:.2f} MB{ratio}{resumed}, "
+                f"耗时 {self.seconds:.2f}s ({self.mb_per_sec:.2f} MB/s), sha256={self.sha256[:16]}…")
+
+
+# -------------------------- Cookie 获取 --------------------------
+def _domain_matches(cookie_domain, host):
+    cookie_domain = (cookie_domain or "").lstrip(".").lower()
+    host = host.lower()
+    return host == cookie_domain or host.endswith("." + cookie_domain)
+
+
+def get_browser_cookies(url, debug_port=None, driver=None, cdp=None):
+    """
+    从调试 Chrome 中获取适用于 url 的 Cookie 列表(CDP Cookie 对象)
+    优先使用 CDP WebSocket (Storage.getCookies，浏览器级，含 HttpOnly)，
+    其次使用 selenium driver.execute_cdp_cmd("Network.getAllCookies")
+    """
+    host = urllib.parse.urlparse(url).hostname or ""
+    cookies = None
+    if cdp is None and debug_port:
+        try:
+            from cdp_client import CDPClient
+            with CDPClient.from_debug_port(debug_port) as client:
+                cookies = client.send("Storage.getCookies").get("cookies", [])
+        except Exception:
+            cookies = None
+    elif cdp is not None:
+        cookies = cdp.send("Storage.getCookies").get("cookies", [])
+    if cookies is None and driver is not None:
+        cookies = driver.execute_cdp_cmd("Network.getAllCookies", {}).get("cookies", [])
+    if cookies is None:
+        raise ReportFetchError("无法从浏览器获取 Cookie (CDP 与 driver 均不可用)")
+    return [c for c in cookies if _domain_matches(c.get("domain"), host)]
+
+
+def get_browser_user_agent(debug_port=None, driver=None):
+    try:
+        if driver is not None:
+            return driver.execute_script("return navigator.userAgent")
+        if debug_port:
+            from cdp_client import CDPClient
+            with CDPClient.from_debug_port(debug_port) as client:
+                return client.send("Browser.getVersion").get("userAgent")
+    except Exception:
+        pass
+    return None
+
+
+# -------------------------- HTTP 会话 --------------------------
+def build_session(cookies=None, user_agent=None, verify=True, pool_size=4, retries=3):
+    """连接池化的 Session: keep-alive、gzip、对连接错误/5xx 自动重试"""
+    session = requests.Session()
+    retry = Retry(total=retries, connect=retries, read=retries, backoff_factor=0.5,
+                  status_forcelist=(502, 503, 504), allowed_methods=frozenset(["GET", "HEAD"]))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.verify = verify
+    session.headers.update({
+        "Accept-Encoding": "gzip, deflate",
+        "Accept": "text/csv,application/octet-stream,*/*;q=0.8",
+    })
+    if user_agent:
+        session.headers["User-Agent"] = user_agent
+    for c in cookies or []:
+        session.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path", "/"),
+                            secure=c.get("secure", False))
+    return session
+
+
+def filename_from_response(resp, default_prefix=DEFAULT_FILENAME_PREFIX):
+    """从 Content-Disposition 解析文件名，缺失时按时间生成"""
+    cd = resp.headers.get("Content-Disposition", "")
+    m = re.search(r"filename\*=(?:UTF-8'')?([^;]+)", cd, re.IGNORECASE)
+    if m:
+        name = urllib.parse.unquote(m.group(1).strip().strip('"'))
+    else:
+        m = re.search(r'filename="?([^";]+)"?', cd, re.IGNORECASE)
+        name = m.group(1).strip() if m else None
+    if not name:
+        name = f"{default_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    # 去掉路径分隔符等非法字符
+    return re.sub(r'[\\/:*?"<>|]+', "_", os.path.basename(name))
+
+
+def _check_response(resp):
+    if resp.status_code not in (200, 206):
+        raise ReportFetchError(f"HTTP {resp.status_code}: {resp.reason}")
+    ctype = resp.headers.get("Content-Type", "").lower()
+    if "text/html" in ctype and "attachment" not in resp.headers.get("Content-Disposition", "").lower():
+        # Cookie 失效时服务器返回登录页
+        raise ReportFetchError("服务器返回 HTML 页面(登录会话可能已失效)")
+
+
+# -------------------------- 断点续传 --------------------------
+# 未完成的下载保存在 <dest_dir>/.partial/<url摘要>.part (服务器原始字节，可能是 gzip)，
+# 旁边的 .json 记录 url / 校验器(ETag、Last-Modified) / 总长度 / 编码 / 文件名。
+# 同一 URL 再次下载时用 Range + If-Range 续传；服务器内容已变化时 If-Range 使其返回完整 200。
+PARTIAL_DIR_NAME = ".partial"
+
+
+def _partial_paths(dest_dir, url):
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    pdir = os.path.join(dest_dir, PARTIAL_DIR_NAME)
+    return os.path.join(pdir, key + ".part"), os.path.join(pdir, key + ".json")
+
+
+def _load_meta(meta_path, url):
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return meta if meta.get("url") == url else None
+    except (OSError, ValueError):
+        return None
+
+
+def _save_meta(meta_path, meta):
+    tmp = meta_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp, meta_path)
+
+
+def _discard_partial(part, meta_path):
+    for p in (part, meta_path):
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+
+
+def _resume_validator(meta):
+    """If-Range 只接受强校验器: 强 ETag 或 Last-Modified"""
+    etag = meta.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return meta.get("last_modified")
+
+
+def _new_meta(url, resp):
+    total = resp.headers.get("Content-Length")
+    if resp.status_code == 206:
+        m = re.search(r"/(\d+)$", resp.headers.get("Content-Range", ""))
+        total = m.group(1) if m else None
+    return {
+        "url": url,
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "accept_ranges": resp.headers.get("Accept-Ranges", "").lower() == "bytes",
+        "total": int(total) if total else None,
+        "encoding": (resp.headers.get("Content-Encoding") or "").lower() or None,
+        "filename": filename_from_response(resp),
+        "created": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def _decoder(encoding):
+    if encoding == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return zlib.decompressobj()
+    if encoding:
+        raise ReportFetchError(f"不支持的 Content-Encoding: {encoding}")
+    return None
+
+
+def _finalize(part, meta, dest_dir, filename, chunk_size, verify_csv):
+    """
+    校验长度 → 解压到临时文件(同时计算 sha256 与 CSV 结尾校验) → 原子替换进 dest_dir
+    返回 (target, size, sha256, csv_info)
+    """
+    wire_size = os.path.getsize(part)
+    if meta.get("total") is not None and wire_size != meta["total"]:
+        raise ReportFetchError(f"长度校验失败: 已下载 {wire_size} 字节，应为 {meta['total']} 字节")
+    target = unique_target(dest_dir, filename or meta.get("filename"))
+    tmp = target + ".tmp"
+    decoder = _decoder(meta.get("encoding"))
+    digest = hashlib.sha256()
+    check = CsvTrailerCheck() if verify_csv else None
+    size = 0
+    try:
+        with open(part, "rb") as src, open(tmp, "wb") as dst:
+            while True:
+                raw = src.read(chunk_size)
+                if not raw:
+                    break
+                data = decoder.decompress(raw) if decoder else raw
+                if data:
+                    dst.write(data)
+                    digest.update(data)
+                    size += len(data)
+                    if check:
+                        check.feed(data)
+            if decoder:
+                tail = decoder.flush()
+                if not decoder.eof:
+                    raise ReportFetchError("压缩数据不完整(下载可能被截断)")
+                if tail:
+                    dst.write(tail)
+                    digest.update(tail)
+                    size += len(tail)
+                    if check:
+                        check.feed(tail)
+        csv_info = check.finish() if check else None
+        os.replace(tmp, target)
+    except zlib.error as e:
+        _silent_remove(tmp)
+        raise ReportFetchError(f"解压失败: {e}")
+    except CsvIntegrityError as e:
+        _silent_remove(tmp)
+        raise ReportFetchError(f"CSV 完整性校验失败: {e}")
+    except BaseException:
+        _silent_remove(tmp)
+        raise
+    return target, size, digest.hexdigest(), csv_info
+
+
+def _silent_remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def prune_partials(dest_dir, max_age_hours=48):
+    """清理过期的未完成下载(URL 含日期范围，隔天后不会再被续传)"""
+    pdir = os.path.join(dest_dir, PARTIAL_DIR_NAME)
+    if not os.path.isdir(pdir):
+        return 0
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    with os.scandir(pdir) as it:
+        for entry in it:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                continue
+    return removed
+
+
+def _stream_attempt(url, session, part, meta_path, timeout, chunk_size, on_chunk, log):
+    """
+    一次 HTTP 请求: 有可续传的 .part 时发送 Range/If-Range，否则从头下载
+    返回 (meta, status_code, resumed_from)
+    """
+    meta = _load_meta(meta_path, url) if os.path.exists(part) else None
+    offset = os.path.getsize(part) if meta else 0
+    headers = {}
+    validator = _resume_validator(meta) if meta else None
+    if meta and offset and meta.get("accept_ranges") and validator:
+        if meta.get("total") is not None and offset >= meta["total"]:
+            return meta, 206, offset
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = validator
+    else:
+        offset = 0
+
+    with session.get(url, stream=True, timeout=timeout, headers=headers) as resp:
+        if resp.status_code == 416 and meta:
+            # 服务器认为范围无效: 已下载部分作废
+            _discard_partial(part, meta_path)
+            raise ReportFetchError("续传范围无效(416)，已丢弃未完成文件")
+        _check_response(resp)
+        if resp.status_code == 206:
+            m = re.match(r"bytes (\d+)-", resp.headers.get("Content-Range", ""))
+            if not m or int(m.group(1)) != offset:
+                _discard_partial(part, meta_path)
+                raise ReportFetchError(f"续传位置不一致: {resp.headers.get('Content-Range')}")
+            log(f"   断点续传: 从 {offset / 1024 / 1024:.2f} MB 处继续")
+            mode = "ab"
+        else:
+            if offset:
+                log("   服务器内容已变化或不支持续传，重新下载")
+            offset = 0
+            meta = _new_meta(url, resp)
+            os.makedirs(os.path.dirname(part), exist_ok=True)
+            _save_meta(meta_path, meta)
+            mode = "wb"
+        position = offset
+        with open(part, mode) as f:
+            # 保存服务器原始字节(不自动解压)，续传时字节位置才能与服务器一致
+            for chunk in resp.raw.stream(chunk_size, decode_content=False):
+                if not chunk:
+                    continue
+                f.write(chunk)
+                position += len(chunk)
+                on_chunk(len(chunk), position, meta.get("total"))
+        return meta, resp.status_code, offset
+
+
+def fetch_report(url, dest_dir, session, chunk_size=DEFAULT_CHUNK_SIZE, timeout=(10, 120),
+                 progress_interval=5.0, log_callback=None, filename=None, max_attempts=3,
+                 verify_csv=True):
+    """
+    可续传的流式下载，返回 FetchResult
+    - 原始字节写入 .partial/*.part，网络中断时在本次运行内自动续传(最多 max_attempts 次)，
+      运行失败后保留 .part，下次运行继续
+    - 完成后校验长度与 CSV 结尾完整性，再原子替换到 dest_dir
+    """
+    def log(msg):
+        if log_callback:
+            log_callback(msg)
+
+    os.makedirs(dest_dir, exist_ok=True)
+    prune_partials(dest_dir)
+    part, meta_path = _partial_paths(dest_dir, url)
+    t0 = time.perf_counter()
+    stats = {"received": 0, "next": t0 + progress_interval}
+
+    def on_chunk(n, position, total):
+        stats["received"] += n
+        now = time.perf_counter()
+        if now < stats["next"]:
+            return
+        stats["next"] = now + progress_interval
+        pct = f" {min(position / total, 1):.0%}" if total else ""
+        log(f"   下载中{pct} 已接收 {position / 1024 / 1024:.1f} MB "
+            f"({stats['received'] / 1024 / 1024 / (now - t0):.2f} MB/s)")
+
+    resumed_from = None
+    last_error = None
+    for attempt in range(1, max_attempts + 1):
+        try:
+            meta, status, offset = _stream_attempt(url, session, part, meta_path, timeout,
+                                                   chunk_size, on_chunk, log)
+            if offset:
+                resumed_from = offset
+            break
+        except _TRANSIENT_ERRORS as e:
+            last_error = e
+            kept = os.path.getsize(part) if os.path.exists(part) else 0
+            log(f"   下载中断(第{attempt}/{max_attempts}次): {type(e).__name__}，已保存 {kept / 1024 / 1024:.2f} MB")
+    else:
+        raise ReportFetchError(f"下载失败(已重试 {max_attempts} 次，未完成部分已保留供下次续传): {last_error}")
+
+    try:
+        target, size, sha256, csv_info = _finalize(part, meta, dest_dir, filename, chunk_size, verify_csv)
+    except ReportFetchError:
+        # 内容损坏无法续传，清除后下次从头下载
+        _discard_partial(part, meta_path)
+        raise
+    wire_bytes = os.path.getsize(part)
+    _discard_partial(part, meta_path)
+
+    result = FetchResult(target, size, wire_bytes, sha256, time.perf_counter() - t0, status,
+                         meta.get("encoding"))
+    result.resumed_from = resumed_from
+    result.transferred = stats["received"]
+    result.records = csv_info["records"] if csv_info else None
+    log(f"HTTP 下载完成: {result.summary()}")
+    return result
+
+
+def open_browser_session(url, debug_port=None, driver=None, verify=True, **kwargs):
+    """用调试 Chrome 的 Cookie/User-Agent 建立 requests 会话(可连续下载多个窗口)"""
+    cookies = get_browser_cookies(url, debug_port=debug_port, driver=driver)
+    if not cookies:
+        raise ReportFetchError("浏览器中没有 ITC 站点的 Cookie (未登录?)")
+    user_agent = get_browser_user_agent(debug_port=debug_port, driver=driver)
+    if not verify:
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    return build_session(cookies, user_agent, verify=verify, **kwargs)
+
+
+def download_via_http(url, dest_dir, debug_port=None, driver=None, verify=True, log_callback=None,
+                      **kwargs):
+    """从调试 Chrome 取 Cookie 后直接下载，返回 FetchResult；失败抛出 ReportFetchError"""
+    with open_browser_session(url, debug_port=debug_port, driver=driver, verify=verify) as session:
+        return fetch_report(url, dest_dir, session, log_callback=log_callback, **kwargs)
+
+
+if __name__ == "__main__":
+    import gzip
+    import tempfile
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    body = ("Request ID,Status,System/Solution,Request For,Category\n" +
+            "".join(f"R{i},Pending Review,Sys{i},\"User, {i}\",Cat\n" for i in range(200000))).encode("utf-8")
+    gz_body = gzip.compress(body, mtime=0)
+    state = {"cut_next": True, "requests": []}
+
+    class _Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            state["requests"].append(self.headers.get("Range"))
+            if "session=ok" not in (self.headers.get("Cookie") or ""):
+                page = b"<html>login</html>"
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(page)))
+                self.end_headers()
+                self.wfile.write(page)
+                return
+            data = gz_body if "gzip" in (self.headers.get("Accept-Encoding") or "") else body
+            start = 0
+            rng = self.headers.get("Range")
+            if rng and self.headers.get("If-Range") == '"v1"':
+                start = int(rng.split("=")[1].rstrip("-"))
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Content-Disposition", 'attachment; filename="Export.csv"')
+            self.send_header("ETag", '"v1"')
+            self.send_header("Accept-Ranges", "bytes")
+            if data is gz_body:
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(data) - start))
+            self.end_headers()
+            if state["cut_next"]:
+                # 模拟传输到一半连接中断
+                state["cut_next"] = False
+                self.wfile.write(data[start:start + (len(data) - start) // 2])
+                self.wfile.flush()
+                self.connection.shutdown(2)
+                return
+            self.wfile.write(data[start:])
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/RequestReport/GetRequestExportReport"
+    with tempfile.TemporaryDirectory() as tmp:
+        cookies = [{"name": "session", "value": "ok", "domain": "127.0.0.1", "path": "/"}]
+        # 1. 第一次运行只允许 1 次尝试: 中断后保留 .part
+        with build_session(cookies, retries=0) as s:
+            try:
+                fetch_report(url, tmp, s, log_callback=print, max_attempts=1)
+                raise AssertionError("应中断")
+            except ReportFetchError as e:
+                print(f"第一次运行: {e}")
+        part, _ = _partial_paths(tmp, url)
+        assert os.path.getsize(part) == len(gz_body) // 2
+        # 2. 第二次运行从断点续传
+        with build_session(cookies, retries=0) as s:
+            res = fetch_report(url, tmp, s, log_callback=print)
+        with open(res.path, "rb") as f:
+            assert f.read() == body
+        assert res.sha256 == hashlib.sha256(body).hexdigest()
+        assert res.resumed_from == len(gz_body) // 2 and res.transferred == len(gz_body) - len(gz_body) // 2
+        assert res.records == 200000
+        assert state["requests"][-1] == f"bytes={len(gz_body) // 2}-"
+        assert not os.path.exists(part)
+        # 3. 未登录
+        with build_session([]) as s:
+            try:
+                fetch_report(url, tmp, s)
+                raise AssertionError("未登录时应失败")
+            except ReportFetchError as e:
+                print(f"未登录检测: {e}")
+        assert [n for n in os.listdir(tmp) if n.endswith((".part", ".tmp"))] == []
+    server.shutdown()
+    print("✅ report_fetcher 断点续传自测通过")
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+pending_review_report 的结构化处理结果
+不依赖 pandas，下载器可在不导入处理脚本的情况下读取子进程写出的结果 JSON
+a_results.json 由 save_results() 写出，带 schema_version；读取方统一用 load_results()，不再解析日志文本
+"""
+
+import os
+import json
+from datetime import datetime
+
+# a_results.json 格式版本: 1 = 只有数量与明细(无版本号)；2 = 增加耗时、紧急程度分布、Revoked 类别等
+RESULT_SCHEMA_VERSION = 2
+URGENCY_LEVELS = ("非常紧急", "紧急", "常规")
+
+
+class ReportResult:
+    """
+    一次报表处理的结果
+        result = pending_review_report.run(csv_path)
+        if result: ...            # 等价于 result.ok
+        result.timings            # {"load": s, "analyze": s, "send": s, "total": s, ...}
+        result.urgency_counts     # {"非常紧急": n, "紧急": n, "常规": n} (按请求计)
+        result.resources          # {"pending_review_report/fill_down": {"cpu_user", "peak_rss_delta_mb", ...}}
+    """
+
+    FIELDS = ("exit_code", "csv_path", "pending_count", "revoked_count", "pending_items", "revoked_items",
+              "error", "timings", "result_path", "mode", "total_records", "excluded_long_term",
+              "urgency_counts", "revoked_categories", "resources")
+
+    def __init__(self, exit_code=1, csv_path=None, pending_count=0, revoked_count=0, pending_items=None,
+                 revoked_items=None, error=None, timings=None, result_path=None, mode="inprocess",
+                 total_records=0, excluded_long_term=0, urgency_counts=None, revoked_categories=None,
+                 resources=None):
+        self.exit_code = exit_code
+        self.csv_path = csv_path
+        self.pending_count = pending_count
+        self.revoked_count = revoked_count
+        self.pending_items = pending_items or []
+        self.revoked_items = revoked_items or []
+        self.error = error
+        self.timings = timings or {}
+        self.result_path = result_path
+        self.mode = mode
+        self.total_records = total_records
+        self.excluded_long_term = excluded_long_term
+        self.urgency_counts = dict(urgency_counts or {})
+        self.revoked_categories = list(revoked_categories or [])
+        self.resources = dict(resources or {})
+
+    @property
+    def ok(self):
+        return self.exit_code == 0
+
+    def __bool__(self):
+        return self.ok
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{k: data[k] for k in cls.FIELDS if k in data})
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2, default=str)
+
+    def to_results(self):
+        """a_results.json 内容(保留版本 1 的键名 pending_review_items)"""
+        data = {"schema_version": RESULT_SCHEMA_VERSION, "generated_at": datetime.now().isoformat(timespec="seconds")}
+        data.update(self.to_dict())
+        data["pending_review_items"] = data.pop("pending_items")
+        return data
+
+    def save_results(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_results(), f, ensure_ascii=False, indent=4, default=str)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load_results(cls, path):
+        """读取 a_results.json (兼容版本 1)；版本高于本模块支持的版本时抛出 ValueError"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        version = data.get("schema_version", 1)
+        if version > RESULT_SCHEMA_VERSION:
+            raise ValueError(f"不支持的结果格式版本: {version} (最高 {RESULT_SCHEMA_VERSION})")
+        if "pending_review_items" in data:
+            data["pending_items"] = data["pending_review_items"]
+        if version == 1:
+            data["exit_code"] = 1 if data.get("error") else 0
+        result = cls.from_dict(data)
+        result.result_path = path
+        return result
+
+    def processing_summary(self):
+        """下载器通知使用的计数: 非常紧急计为紧急待审核，其余待审核计为常规"""
+        urgent = int(self.urgency_counts.get("非常紧急", 0))
+        return {
+            "total_records": self.total_records,
+            "urgent_pending": urgent,
+            "normal_pending": max(0, self.pending_count - urgent),
+            "revoked_count": self.revoked_count,
+            "revoked_categories": list(self.revoked_categories),
+            "excluded_long_term": self.excluded_long_term,
+        }
+
+    def summary(self):
+        timing = " ".join(f"{k}={v:.2f}s" for k, v in self.timings.items() if isinstance(v, (int, float)))
+        if self.error:
+            return f"处理失败({self.mode}): {self.error} [{timing}]"
+        levels = " ".join(f"{k}={self.urgency_counts[k]}" for k in URGENCY_LEVELS if self.urgency_counts.get(k))
+        return (f"Pending={self.pending_count}{f' ({levels})' if levels else ''} Revoked={self.revoked_count} "
+                f"({self.mode}) [{timing}]")
+
+
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "a_results.json")
+        r = ReportResult(exit_code=0, csv_path="x.csv", pending_count=3, revoked_count=1,
+                         pending_items=[{"Request ID": "1", "紧急程度": "非常紧急"}], total_records=20,
+                         excluded_long_term=5, urgency_counts={"非常紧急": 1, "紧急": 0, "常规": 2},
+                         revoked_categories=["SAP"], timings={"total": 1.5})
+        r.save_results(path)
+        back = ReportResult.load_results(path)
+        assert back.ok and back.pending_items == r.pending_items and back.urgency_counts == r.urgency_counts
+        assert back.processing_summary() == {"total_records": 20, "urgent_pending": 1, "normal_pending": 2,
+                                             "revoked_count": 1, "revoked_categories": ["SAP"],
+                                             "excluded_long_term": 5}
+        print(back.summary())
+        # 版本 1 (无版本号) 的旧文件
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"pending_count": 2, "revoked_count": 0, "pending_review_items": [{}, {}],
+                       "revoked_items": []}, f)
+        old = ReportResult.load_results(path)
+        assert old.ok and old.pending_count == 2 and len(old.pending_items) == 2
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"error": "boom"}, f)
+        assert not ReportResult.load_results(path)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"schema_version": RESULT_SCHEMA_VERSION + 1}, f)
+        try:
+            ReportResult.load_results(path)
+            raise AssertionError("应拒绝更高版本")
+        except ValueError:
+            pass
+        print("✅ report_result 自测通过")
+    finally:
+        shutil.rmtree(tmp)
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+下载器调用 pending_review_report 的入口
+- inprocess: 同进程调用 pending_review_report.run()，只在首次调用时付出 pandas/numpy/requests 导入开销，
+  常驻进程(守护进程)后续调用零启动开销；无法强制超时
+- subprocess: 独立解释器运行脚本(隔离崩溃/内存)，支持超时；结果通过 --result-json 以结构化方式传回
+两种方式都返回 ReportResult，并在 timings 中记录启动开销(import / startup)
+"""
+
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+from report_result import ReportResult
+
+PROCESSOR_MODES = ("inprocess", "subprocess")
+# 处理失败时转发子进程标准输出的最后几行
+STDOUT_TAIL_LINES = 20
+DEFAULT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pending_review_report.py")
+
+
+def _run_inprocess(csv_path, log_dir, log):
+    t0 = time.perf_counter()
+    first = "pending_review_report" not in sys.modules
+    import pending_review_report
+    import_seconds = time.perf_counter() - t0 if first else 0.0
+    result = pending_review_report.run(csv_path, log_dir=log_dir)
+    result.mode = "inprocess"
+    # run() 只记录 pandas/numpy 的首次导入耗时，这里加上模块本身的导入耗时
+    import_seconds += result.timings.get("import", 0.0)
+    result.timings["import"] = import_seconds
+    log(f"启动开销: 导入处理模块 {import_seconds:.2f}s{' (首次)' if first else ' (已缓存)'}")
+    return result
+
+
+def _run_subprocess(csv_path, log_dir, timeout, script, log):
+    fd, result_json = tempfile.mkstemp(prefix="report_result_", suffix=".json")
+    os.close(fd)
+    cmd = [sys.executable, script, "--csv-path", csv_path, "--result-json", result_json]
+    if log_dir:
+        cmd += ["--log-dir", log_dir]
+    log("执行命令: " + " ".join(cmd))
+    t0 = time.perf_counter()
+    try:
+        r = subprocess.run(cmd, cwd=os.path.dirname(script), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                           text=True, encoding="utf-8", errors="replace", timeout=timeout,
+                           env=dict(os.environ, PYTHONIOENCODING="utf-8"))
+        wall = time.perf_counter() - t0
+        # 子进程的标准输出已写入它自己的处理日志(process_YYYYMMDD.log)，这里只在失败时转发末尾部分
+        out_lines = (r.stdout or "").splitlines()
+        if r.returncode != 0:
+            for ln in out_lines[-STDOUT_TAIL_LINES:]:
+                log(f"[OUT] {ln}")
+        else:
+            log(f"子进程输出 {len(out_lines)} 行 (见处理日志)")
+        for ln in (r.stderr or "").splitlines():
+            log(f"[ERR] {ln}")
+        try:
+            result = ReportResult.load(result_json)
+        except (OSError, ValueError):
+            result = ReportResult(exit_code=r.returncode, csv_path=csv_path,
+                                  error=f"处理脚本未返回结果 (返回码 {r.returncode})")
+        result.exit_code = r.returncode
+        result.mode = "subprocess"
+        result.timings["wall"] = wall
+        # 解释器启动 + 导入 + 配置加载 = 总耗时 - 处理本身耗时
+        result.timings["startup"] = max(0.0, wall - result.timings.get("total", 0.0))
+        log(f"启动开销: 子进程 {result.timings['startup']:.2f}s "
+            f"(其中导入 {result.timings.get('import', 0.0):.2f}s)，总耗时 {wall:.2f}s")
+        return result
+    except subprocess.TimeoutExpired:
+        return ReportResult(exit_code=-1, csv_path=csv_path, mode="subprocess",
+                            error=f"处理脚本执行超时 ({timeout}s)", timings={"wall": time.perf_counter() - t0})
+    finally:
+        try:
+            os.remove(result_json)
+        except OSError:
+            pass
+
+
+def run_report(csv_path, mode="inprocess", log_dir=None, timeout=900, log_callback=None, script=DEFAULT_SCRIPT):
+    """处理指定 CSV，返回 ReportResult (bool(result) 表示成功)"""
+    def log(msg):
+        if log_callback:
+            log_callback(msg)
+
+    if mode not in PROCESSOR_MODES:
+        raise ValueError(f"未知的处理方式: {mode} (可选 {PROCESSOR_MODES})")
+    try:
+        if mode == "subprocess":
+            result = _run_subprocess(csv_path, log_dir, timeout, script, log)
+        else:
+            result = _run_inprocess(csv_path, log_dir, log)
+    except Exception as e:
+        result = ReportResult(exit_code=1, csv_path=csv_path, mode=mode, error=f"{type(e).__name__}: {e}")
+    log(f"报表处理结果: {result.summary()}")
+    return result
+
+
+if __name__ == "__main__":
+    import json
+    import shutil
+
+    # 用一个不依赖 pandas 的替身脚本验证子进程结构化结果与超时
+    tmp = tempfile.mkdtemp()
+    try:
+        stub = os.path.join(tmp, "stub_report.py")
+        with open(stub, "w", encoding="utf-8") as f:
+            f.write(
+                "import sys, json, time, argparse\n"
+                "p = argparse.ArgumentParser(); p.add_argument('--csv-path'); p.add_argument('--log-dir')\n"
+                "p.add_argument('--result-json'); a = p.parse_args()\n"
+                "if a.csv_path == 'slow': time.sleep(5)\n"
+                "print('处理中 ' + a.csv_path)\n"
+                "if a.csv_path == 'bad': sys.exit(3)\n"
+                "json.dump({'exit_code': 0, 'csv_path': a.csv_path, 'pending_count': 3, 'revoked_count': 1,\n"
+                "           'timings': {'total': 0.01, 'import': 0.0}}, open(a.result_json, 'w'))\n")
+        lines = []
+        r = run_report("x.csv", mode="subprocess", script=stub, log_callback=lines.append)
+        assert r and r.pending_count == 3 and r.revoked_count == 1 and r.timings["startup"] > 0, r.to_dict()
+        assert "子进程输出 1 行 (见处理日志)" in lines and not any(ln.startswith("[OUT]") for ln in lines)
+        print(lines[-1])
+        lines = []
+        r = run_report("bad", mode="subprocess", script=stub, log_callback=lines.append)
+        assert not r and r.exit_code == 3 and "[OUT] 处理中 bad" in lines
+        r = run_report("slow", mode="subprocess", script=stub, timeout=1, log_callback=print)
+        assert not r and "超时" in r.error
+        rt = ReportResult.from_dict(json.loads(json.dumps(ReportResult(exit_code=0, pending_count=2).to_dict())))
+        assert rt.ok and rt.pending_count == 2
+        print("✅ report_runner 自测通过")
+    finally:
+        shutil.rmtree(tmp)
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+本地 SMTP 替身服务器(仅标准库，类似 aiosmtpd 的测试用法)
+用于在没有真实邮件服务器的环境中测试 smtp_transport:
+- 支持 EHLO/HELO、AUTH PLAIN/LOGIN、MAIL、RCPT、DATA、RSET、NOOP、QUIT
+- 收到的邮件保存在 server.messages (email.message.EmailMessage)
+- latency: 每条命令响应前的模拟延迟(秒)
+- drop_after: 每个连接投递 N 封后，下一条 MAIL 命令直接断开连接(模拟服务器断连)
+- drop_after_data: 每个连接收下第 N 封邮件正文后不回复直接断开(邮件已收到，客户端无法确认)
+
+用法:
+    with StandinSMTPServer(username="robot", password="secret") as server:
+        ... 连接 127.0.0.1:server.port ...
+"""
+
+import time
+import base64
+import socketserver
+import threading
+from email import message_from_bytes
+from email.policy import default as default_policy
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    timeout = 30
+
+    def reply(self, line):
+        owner = self.server.owner
+        if owner.latency:
+            time.sleep(owner.latency)
+        self.wfile.write((line + "\r\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def readline(self):
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("客户端已断开")
+        return line.rstrip(b"\r\n").decode("utf-8", "replace")
+
+    def _check_auth(self, username, password):
+        owner = self.server.owner
+        return username == owner.username and password == owner.password
+
+    def _auth(self, args):
+        parts = args.split()
+        mech = parts[0].upper() if parts else ""
+        try:
+            if mech == "PLAIN":
+                payload = parts[1] if len(parts) > 1 else None
+                if payload is None:
+                    self.reply("334 ")
+                    payload = self.readline()
+                _, user, pwd = base64.b64decode(payload).decode("utf-8").split("\0")
+            elif mech == "LOGIN":
+                self.reply("334 " + base64.b64encode(b"Username:").decode())
+                user = base64.b64decode(self.readline()).decode("utf-8")
+                self.reply("334 " + base64.b64encode(b"Password:").decode())
+                pwd = base64.b64decode(self.readline()).decode("utf-8")
+            else:
+                self.reply("504 5.5.4 Unrecognized authentication type")
+                return False
+        except (ValueError, IndexError):
+            self.reply("501 5.5.2 Cannot decode response")
+            return False
+        if self._check_auth(user, pwd):
+            self.reply("235 2.7.0 Authentication successful")
+            return True
+        self.reply("535 5.7.8 Authentication credentials invalid")
+        return False
+
+    def handle(self):
+        owner = self.server.owner
+        with owner._lock:
+            owner.connections += 1
+        authed = owner.username is None
+        mail_from, rcpts, delivered = None, [], 0
+        self.reply("220 standin ESMTP ready")
+        try:
+            while True:
+                line = self.readline()
+                cmd, _, args = line.partition(" ")
+                cmd = cmd.upper()
+                if cmd in ("EHLO", "HELO"):
+                    if cmd == "HELO":
+                        self.reply("250 standin")
+                    else:
+                        self.wfile.write(b"250-standin\r\n250-8BITMIME\r\n250-PIPELINING\r\n")
+                        self.reply("250 AUTH PLAIN LOGIN")
+                elif cmd == "AUTH":
+                    authed = self._auth(args) or authed
+                elif cmd == "NOOP":
+                    self.reply("250 2.0.0 OK")
+                elif cmd == "RSET":
+                    mail_from, rcpts = None, []
+                    self.reply("250 2.0.0 OK")
+                elif cmd == "QUIT":
+                    self.reply("221 2.0.0 Bye")
+                    return
+                elif cmd == "MAIL":
+                    if owner.drop_after and delivered >= owner.drop_after:
+                        with owner._lock:
+                            owner.dropped += 1
+                        return
+                    if not authed:
+                        self.reply("530 5.7.0 Authentication required")
+                        continue
+                    mail_from, rcpts = args.split(":", 1)[-1].strip().split()[0].strip("<>"), []
+                    self.reply("250 2.1.0 OK")
+                elif cmd == "RCPT":
+                    if mail_from is None:
+                        self.reply("503 5.5.1 Need MAIL first")
+                        continue
+                    rcpt = args.split(":", 1)[-1].strip().strip("<>")
+                    if rcpt in owner.reject_recipients:
+                        self.reply("550 5.1.1 User unknown")
+                        continue
+                    rcpts.append(rcpt)
+                    self.reply("250 2.1.5 OK")
+                elif cmd == "DATA":
+                    if not rcpts:
+                        self.reply("503 5.5.1 Need RCPT first")
+                        continue
+                    self.reply("354 End data with <CR><LF>.<CR><LF>")
+                    chunks = []
+                    while True:
+                        raw = self.rfile.readline()
+                        if not raw:
+                            raise ConnectionError("DATA 期间客户端断开")
+                        if raw in (b".\r\n", b".\n"):
+                            break
+                        if raw.startswith(b".."):
+                            raw = raw[1:]
+                        chunks.append(raw)
+                    msg = message_from_bytes(b"".join(chunks), policy=default_policy)
+                    with owner._lock:
+                        owner.messages.append(msg)
+                        owner.envelopes.append((mail_from, list(rcpts)))
+                    delivered += 1
+                    mail_from, rcpts = None, []
+                    if owner.drop_after_data and delivered == owner.drop_after_data:
+                        with owner._lock:
+                            owner.dropped += 1
+                        return
+                    self.reply("250 2.0.0 Queued")
+                else:
+                    self.reply("502 5.5.2 Command not implemented")
+        except (ConnectionError, OSError):
+            return
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class StandinSMTPServer:
+    """在后台线程运行的本地 SMTP 替身服务器"""
+
+    def __init__(self, host="127.0.0.1", port=0, username=None, password=None,
+                 latency=0.0, drop_after=None, drop_after_data=None, reject_recipients=None):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.drop_after = drop_after
+        self.drop_after_data = drop_after_data
+        self.reject_recipients = set(reject_recipients or [])
+        self.messages = []
+        self.envelopes = []
+        self.connections = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._server = _ThreadingServer((host, port), _SMTPHandler)
+        self._server.owner = self
+        self.port = self._server.server_address[1]
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地 SMTP 替身服务器")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--user")
+    parser.add_argument("--password")
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StandinSMTPServer(port=args.port, username=args.user, password=args.password,
+                               latency=args.latency).start()
+    print(f"SMTP 替身服务器已启动: {server.host}:{server.port} (Ctrl+C 停止)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+        print(f"已停止，共收到 {len(server.messages)} 封邮件")
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""
+SMTP 发送通道(连接池)
+替代"每封邮件新建 SMTP 连接 + STARTTLS + 登录"的做法:
+- 连接池保存已认证的连接，多封邮件复用同一连接
+- send_many 在一个连接上连续投递多封邮件，可选多连接并行
+- 连接空闲超过 SMTP_NOOP_AFTER_SECONDS 时先 NOOP 探活，失效则重建
+- 发送正文(DATA)之前连接断开/服务器 4xx 错误自动重连重试；正文发出后出错不重试(服务器可能已收下，重试会重复投递)
+- 单连接投递数达到上限后轮换(部分服务器限制每会话邮件数)
+
+email_config.json 的 system_config 配置项:
+  EMAIL_TRANSPORT = "smtp"
+  SMTP_HOST / SMTP_PORT (默认 587)
+  SMTP_USER / SMTP_PASSWORD (或 SMTP_PASSWORD_ENV: 存放密码的环境变量名)
+  SMTP_FROM (默认 SMTP_USER)
+  SMTP_STARTTLS (默认 True) / SMTP_SSL (默认 False)
+  SMTP_TIMEOUT (默认 30 秒)
+  SMTP_POOL_SIZE (默认 2)
+  SMTP_MAX_MESSAGES_PER_CONNECTION (默认 100)
+  SMTP_NOOP_AFTER_SECONDS (默认 30)
+  SMTP_RETRIES (默认 2)
+"""
+
+import io
+import os
+import ssl
+import time
+import smtplib
+import logging
+import threading
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from email.mime.application import MIMEApplication
+from email.generator import BytesGenerator
+from email.utils import formatdate, make_msgid
+from concurrent.futures import ThreadPoolExecutor
+
+from mail_transport import MailTransport
+
+# 可重连的错误: 连接断开、网络异常、服务器临时错误(4xx)
+_RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, OSError)
+
+
+class _AfterDataError(Exception):
+    """邮件正文发出后出现的错误: 服务器可能已收下邮件，不能重试"""
+
+    def __init__(self, cause):
+        super().__init__(f"{type(cause).__name__}: {cause}")
+        self.cause = cause
+
+
+def _is_transient(exc):
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    return isinstance(exc, _RECONNECT_ERRORS)
+
+
+class _PooledConnection:
+    __slots__ = ("smtp", "created", "last_used", "sent")
+
+    def __init__(self, smtp):
+        now = time.monotonic()
+        self.smtp = smtp
+        self.created = now
+        self.last_used = now
+        self.sent = 0
+
+
+class SMTPConnectionPool:
+    """线程安全的已认证 SMTP 连接池"""
+
+    def __init__(self, host, port=587, username=None, password=None,
+                 starttls=True, use_ssl=False, timeout=30, max_size=2,
+                 max_messages_per_connection=100, noop_after_seconds=30,
+                 smtp_factory=None, logger=None):
+        self.host = host
+        self.port = int(port)
+        self.username = username
+        self.password = password
+        self.starttls = bool(starttls) and not use_ssl
+        self.use_ssl = bool(use_ssl)
+        self.timeout = timeout
+        self.max_size = max(1, int(max_size))
+        self.max_messages_per_connection = max(1, int(max_messages_per_connection))
+        self.noop_after_seconds = noop_after_seconds
+        self.logger = logger or logging.getLogger(__name__)
+        self._smtp_factory = smtp_factory
+        self._idle = []
+        self._created = 0
+        self._cond = threading.Condition()
+        self.stats = {"connects": 0, "reuses": 0, "noops": 0, "discarded": 0}
+
+    def _connect(self):
+        if self._smtp_factory is not None:
+            smtp = self._smtp_factory(self.host, self.port, self.timeout)
+        elif self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout,
+                                    context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.starttls and smtp.has_extn("starttls"):
+                smtp.starttls(context=ssl.create_default_context())
+                smtp.ehlo()
+            if self.username:
+                smtp.login(self.username, self.password or "")
+        except Exception:
+            self._quit(smtp)
+            raise
+        self.stats["connects"] += 1
+        self.logger.info(f"SMTP 连接已建立: {self.host}:{self.port} (累计 {self.stats['connects']})")
+        return _PooledConnection(smtp)
+
+    @staticmethod
+    def _quit(smtp):
+        try:
+            smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+
+    def _healthy(self, conn):
+        if time.monotonic() - conn.last_used < self.noop_after_seconds:
+            return True
+        self.stats["noops"] += 1
+        try:
+            code, _ = conn.smtp.noop()
+            return code == 250
+        except Exception:
+            return False
+
+    def acquire(self):
+        """取出一个可用连接；池满时等待其他线程归还"""
+        while True:
+            with self._cond:
+                while not self._idle and self._created >= self.max_size:
+                    self._cond.wait()
+                if self._idle:
+                    conn = self._idle.pop()
+                else:
+                    conn = None
+                    self._created += 1
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._cond:
+                        self._created -= 1
+                        self._cond.notify()
+                    raise
+            if self._healthy(conn):
+                self.stats["reuses"] += 1
+                return conn
+            self.discard(conn)
+
+    def release(self, conn):
+        """归还连接；达到单连接投递上限时关闭"""
+        if conn.sent >= self.max_messages_per_connection:
+            self.discard(conn)
+            return
+        conn.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def discard(self, conn):
+        """关闭并丢弃连接(出错或失效时)"""
+        self._quit(conn.smtp)
+        self.stats["discarded"] += 1
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._quit(conn.smtp)
+
+
+def build_mime(message, sender):
+    """MailMessage -> MIME 邮件(HTML 正文 + 附件)"""
+    msg = MIMEMultipart()
+    msg["From"] = sender
+    msg["To"] = ", ".join(message.to_addrs)
+    if message.cc_addrs:
+        msg["Cc"] = ", ".join(message.cc_addrs)
+    msg["Subject"] = message.subject
+    msg["Date"] = formatdate(localtime=True)
+    msg["Message-ID"] = make_msgid()
+    msg.attach(MIMEText(message.html_body, "html", "utf-8"))
+    for path in message.attachments:
+        if not path or not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            part = MIMEApplication(f.read(), Name=os.path.basename(path))
+        part["Content-Disposition"] = f'attachment; filename="{os.path.basename(path)}"'
+        msg.attach(part)
+    return msg
+
+
+class SMTPTransport(MailTransport):
+    """基于连接池的 SMTP 发送通道"""
+
+    name = "smtp"
+
+    def __init__(self, host, port=587, username=None, password=None, sender=None,
+                 starttls=True, use_ssl=False, timeout=30, pool_size=2,
+                 max_messages_per_connection=100, noop_after_seconds=30,
+                 retries=2, logger=None, smtp_factory=None):
+        self.logger = logger or logging.getLogger(__name__)
+        self.sender = sender or username
+        if not self.sender:
+            raise ValueError("SMTP 发件人为空(需配置 SMTP_FROM 或 SMTP_USER)")
+        self.retries = max(0, int(retries))
+        self.pool = SMTPConnectionPool(
+            host, port, username, password, starttls=starttls, use_ssl=use_ssl,
+            timeout=timeout, max_size=pool_size,
+            max_messages_per_connection=max_messages_per_connection,
+            noop_after_seconds=noop_after_seconds, smtp_factory=smtp_factory,
+            logger=self.logger)
+
+    def _deliver(self, conn, message):
+        """
+        按 MAIL / RCPT / DATA 分步投递(等同 smtplib.send_message)，以便区分出错阶段:
+        DATA 命令被接受、正文开始发送之后的错误包装为 _AfterDataError
+        """
+        mime = build_mime(message, self.sender)
+        rcpts = message.to_addrs + message.cc_addrs
+        with io.BytesIO() as buf:
+            BytesGenerator(buf, policy=mime.policy.clone(linesep="\r\n")).flatten(mime)
+            payload = buf.getvalue()
+        smtp = conn.smtp
+        smtp.ehlo_or_helo_if_needed()
+        code, resp = smtp.mail(self.sender)
+        if code != 250:
+            smtp.rset()
+            raise smtplib.SMTPSenderRefused(code, resp, self.sender)
+        refused = {}
+        for rcpt in rcpts:
+            code, resp = smtp.rcpt(rcpt)
+            if code not in (250, 251):
+                refused[rcpt] = (code, resp)
+        if len(refused) == len(rcpts):
+            smtp.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+        try:
+            code, resp = smtp.data(payload)
+        except smtplib.SMTPDataError:
+            raise  # DATA 命令本身被拒绝，正文未发送
+        except Exception as e:
+            raise _AfterDataError(e) from e
+        conn.sent += 1
+        if code != 250:
+            self.logger.error(f"服务器拒收邮件: {message.subject} - {code} {resp!r}")
+            return False
+        if refused:
+            self.logger.warning(f"部分收件人被拒绝: {list(refused)}")
+        return True
+
+    def _send_on(self, conn, message):
+        """
+        在给定连接上投递；正文发出前的临时错误换新连接重试，正文发出后的错误不重试
+        返回 (ok, conn)，conn 为投递后仍可用的连接(可能已更换)或 None
+        """
+        attempt = 0
+        while True:
+            try:
+                if conn is None:
+                    conn = self.pool.acquire()
+                return self._deliver(conn, message), conn
+            except smtplib.SMTPRecipientsRefused as e:
+                self.logger.error(f"收件人全部被拒绝: {message.subject} - {e.recipients}")
+                return False, conn
+            except _AfterDataError as e:
+                self.pool.discard(conn)
+                self.logger.error(f"SMTP 正文发出后连接异常，邮件可能已投递，不重试: {message.subject} - {e}")
+                return False, None
+            except Exception as e:
+                if conn is not None:
+                    self.pool.discard(conn)
+                    conn = None
+                if not _is_transient(e) or attempt >= self.retries:
+                    self.logger.error(f"SMTP 发送失败: {message.subject} - {type(e).__name__}: {e}")
+                    return False, None
+                attempt += 1
+                self.logger.warning(f"SMTP 连接异常，重连重试({attempt}/{self.retries}): {e}")
+
+    def send(self, message):
+        ok, conn = self._send_on(None, message)
+        if conn is not None:
+            self.pool.release(conn)
+        return ok
+
+    def _send_chunk(self, messages):
+        results = []
+        conn = None
+        try:
+            for m in messages:
+                if conn is not None and conn.sent >= self.pool.max_messages_per_connection:
+                    self.pool.release(conn)
+                    conn = None
+                ok, conn = self._send_on(conn, m)
+                results.append(ok)
+        finally:
+            if conn is not None:
+                self.pool.release(conn)
+        return results
+
+    def send_many(self, messages, workers=None):
+        """
+        批量发送: 每个工作线程占用一个连接连续投递
+        workers 默认为连接池大小；返回与 messages 顺序对应的结果列表
+        """
+        messages = list(messages)
+        workers = min(workers or self.pool.max_size, self.pool.max_size, len(messages)) or 1
+        if workers == 1:
+            return self._send_chunk(messages)
+        chunks = [messages[i::workers] for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            chunk_results = list(ex.map(self._send_chunk, chunks))
+        results = [None] * len(messages)
+        for i, res in enumerate(chunk_results):
+            results[i::workers] = res
+        return results
+
+    def close(self):
+        self.pool.close()
+
+
+def from_config(system_config, logger=None, **overrides):
+    """根据 system_config 中的 SMTP_* 配置创建 SMTPTransport"""
+    scfg = dict(system_config or {})
+    host = overrides.pop("host", None) or scfg.get("SMTP_HOST")
+    if not host:
+        raise ValueError("未配置 SMTP_HOST")
+    password = scfg.get("SMTP_PASSWORD")
+    if not password and scfg.get("SMTP_PASSWORD_ENV"):
+        password = os.environ.get(scfg["SMTP_PASSWORD_ENV"])
+    kwargs = dict(
+        host=host,
+        port=scfg.get("SMTP_PORT", 587),
+        username=scfg.get("SMTP_USER"),
+        password=password,
+        sender=scfg.get("SMTP_FROM"),
+        starttls=scfg.get("SMTP_STARTTLS", True),
+        use_ssl=scfg.get("SMTP_SSL", False),
+        timeout=scfg.get("SMTP_TIMEOUT", 30),
+        pool_size=scfg.get("SMTP_POOL_SIZE", 2),
+        max_messages_per_connection=scfg.get("SMTP_MAX_MESSAGES_PER_CONNECTION", 100),
+        noop_after_seconds=scfg.get("SMTP_NOOP_AFTER_SECONDS", 30),
+        retries=scfg.get("SMTP_RETRIES", 2),
+        logger=logger,
+    )
+    kwargs.update(overrides)
+    return SMTPTransport(**kwargs)
+
+
+if __name__ == "__main__":
+    from mail_transport import MailMessage
+    from smtp_standin import StandinSMTPServer
+
+    with StandinSMTPServer(username="robot", password="secret", drop_after=4) as server:
+        transport = SMTPTransport("127.0.0.1", server.port, "robot", "secret",
+                                  starttls=False, pool_size=2, max_messages_per_connection=10)
+        msgs = [MailMessage(f"提醒 {i}", "<p>测试</p>", [f"u{i}@pg.com"], ["cc@pg.com"]) for i in range(20)]
+        t0 = time.perf_counter()
+        results = transport.send_many(msgs)
+        elapsed = time.perf_counter() - t0
+        assert all(results), results
+        assert transport.send(MailMessage("单封", "<p>x</p>", ["a@pg.com"]))
+        transport.close()
+        subjects = sorted(m["subject"] for m in server.messages)
+        assert len(server.messages) == 21, len(server.messages)
+        assert "提醒 0" in subjects
+        print(f"✅ SMTP 连接池自测通过: 21 封, 新建连接 {transport.pool.stats['connects']} 次, "
+              f"服务器断开 {server.dropped} 次, 批量耗时 {elapsed * 1000:.1f} ms")
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+合成 ITC 导出 CSV (GetRequestExportReport 格式)，用于规模测试与性能复现
+- 请求组: 第一行带 Requester 等请求字段，后续行只有 Log Actor / Log Actor Email / Log Status / Log Date
+- 状态分布: Pending Review (到期日覆盖 非常紧急/紧急/常规/超过 10 天)、Revoked (ExitForm / RoleChange) 及其他状态
+- Area 按 DC 站点加权分布，Category/System 按类别加权分布
+- 可选乱码 (UTF-8 按 latin1/cp1252 误解码，pending_review_report.fix_mojibake 可还原) 与输出编码
+- 相同参数与 seed 生成完全相同的文件
+    python synthetic_export.py --rows 200000 --seed 7 --out "ITC report/RawData"
+    python synthetic_export.py --rows 50000 --encoding gbk --mojibake 0.05
+"""
+
+import os
+import csv
+import time
+import random
+import argparse
+from datetime import date, datetime, timedelta
+
+FILENAME_PREFIX = "ITC_RequestExportReport_synthetic"
+
+COLUMNS = [
+    "Request ID", "Requester", "Requester Email", "Request For", "Request For Email", "Requested Date", "Area",
+    "Category", "Category Description", "System/Solution", "System/Solution Description", "Approval Text",
+    "Owner Guidelines", "Expiration Date", "Max Request Age (Days)", "Access Type", "Temporary Access?",
+    "Privileged?", "Status", "Confirmed?", "Reason", "Remark/Role", "Employee Status",
+    "Log Actor", "Log Actor Email", "Log Status", "Log Date",
+]
+
+# (站点, 权重)，与 email_config.json 中 cc1 的键一致
+AREAS = [("LGDC", 18), ("TCDC", 14), ("HPDC", 12), ("XQDC", 10), ("SYDC", 10), ("XADC", 8), ("WHDC", 8),
+         ("DCDC", 6), ("ITrade", 8), ("PSIC", 6)]
+# (类别, 权重, 系统列表)
+CATEGORIES = [
+    ("SAP", 25, ["SAP PRD", "SAP QAS", "SAP BW"]),
+    ("MES", 20, ["MES Line Control", "MES Reporting"]),
+    ("LIMS", 12, ["LabWare LIMS"]),
+    ("Historian", 10, ["PI Historian", "PI Vision"]),
+    ("Windows Server", 15, ["File Server", "Terminal Server", "Domain Joined Host"]),
+    ("Database", 10, ["SQL Server", "Oracle DB"]),
+    ("Network", 8, ["Firewall Console", "Switch Management"]),
+]
+# (状态, 权重)；Pending Review / Revoked 的比例由参数控制，其余按此分布
+OTHER_STATUSES = [("Completed", 50), ("Approved", 20), ("Rejected", 10), ("Cancelled", 10), ("Expired", 10)]
+REVOKED_STATUSES = ["Revoked - ExitForm", "Revoked - RoleChange"]
+ACCESS_TYPES = ["Read Only", "Read/Write", "Admin"]
+FIRST_NAMES = ["Wei", "Jing", "Lei", "Min", "Yan", "Tao", "Hui", "Qiang", "José", "Zoë", "Renée", "Björn",
+               "Anna", "David", "Maria", "Ming", "Xiao", "Li"]
+LAST_NAMES = ["Wang", "Li", "Zhang", "Liu", "Chen", "Yang", "Zhao", "Huang", "Müller", "García", "Smith",
+              "Dubois", "Nguyen", "Sun", "Zhou", "Wu"]
+REMARKS = ["生产线操作员", "质量工程师", "设备维护", "IT 支持", "Line Leader", "QA Reviewer", "临时项目访问",
+           "Data Steward", "离职交接", "岗位变动"]
+DATE_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+
+
+def _weighted(rng, items):
+    names = [i[0] for i in items]
+    weights = [i[1] for i in items]
+    return lambda: rng.choices(names, weights)[0]
+
+
+def mojibake(text):
+    """UTF-8 字节按 cp1252 (失败时 latin1) 解码得到的乱码，与 fix_mojibake 的还原方向相反"""
+    raw = text.encode("utf-8")
+    try:
+        return raw.decode("cp1252")
+    except UnicodeDecodeError:
+        return raw.decode("latin1")
+
+
+class _People:
+    """预生成的人员池，避免每行拼接字符串"""
+
+    def __init__(self, rng, size):
+        self.people = []
+        for i in range(size):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            email = f"{name.lower().replace(' ', '.')}.{i}@pg.com"
+            self.people.append((name, email))
+        self.rng = rng
+
+    def pick(self):
+        return self.people[self.rng.randrange(len(self.people))]
+
+
+def iter_rows(rows=10000, seed=0, today=None, pending_ratio=0.25, revoked_ratio=0.10, mojibake_ratio=0.0,
+              log_rows=(1, 6), stats=None):
+    """逐行产生数据(不含表头)，总行数为 rows (最后一个请求组可能被截短到剩余行数)"""
+    rng = random.Random(seed)
+    today = today or date.today()
+    pick_area = _weighted(rng, AREAS)
+    pick_other = _weighted(rng, OTHER_STATUSES)
+    cat_names = [c[0] for c in CATEGORIES]
+    cat_weights = [c[1] for c in CATEGORIES]
+    cat_systems = {c[0]: c[2] for c in CATEGORIES}
+    people = _People(rng, max(50, min(5000, rows // 20)))
+    approvers = _People(rng, max(10, min(500, rows // 200)))
+    stats = stats if stats is not None else {}
+    stats.update({"rows": 0, "groups": 0, "pending": 0, "revoked": 0, "mojibake": 0})
+    now = datetime.combine(today, datetime.min.time()) + timedelta(hours=9)
+    request_id = 100000
+    emitted = 0
+
+    def fmt(dt):
+        return dt.strftime(DATE_FORMAT)
+
+    while emitted < rows:
+        request_id += 1
+        r = rng.random()
+        if r < pending_ratio:
+            status = "Pending Review"
+            # 到期日: -2..+40 天，覆盖 非常紧急(≤2)/紧急(≤4)/常规(≤10)/超过 10 天
+            expiration = today + timedelta(days=rng.randint(-2, 40))
+            stats["pending"] += 1
+        elif r < pending_ratio + revoked_ratio:
+            status = rng.choice(REVOKED_STATUSES)
+            expiration = today + timedelta(days=rng.randint(1, 365))
+            stats["revoked"] += 1
+        else:
+            status = pick_other()
+            expiration = today + timedelta(days=rng.randint(-30, 365))
+        requester, requester_email = people.pick()
+        request_for, request_for_email = people.pick()
+        area = pick_area()
+        category = rng.choices(cat_names, cat_weights)[0]
+        system = rng.choice(cat_systems[category])
+        requested = now - timedelta(days=rng.randint(0, 120), minutes=rng.randint(0, 1440))
+        remark = rng.choice(REMARKS)
+        if mojibake_ratio and rng.random() < mojibake_ratio:
+            requester = mojibake(requester)
+            remark = mojibake(remark)
+            stats["mojibake"] += 1
+        temporary = rng.random() < 0.3
+        n_logs = min(rng.randint(*log_rows), rows - emitted)
+        log_time = requested
+        for i in range(n_logs):
+            approver, approver_email = approvers.pick()
+            log_time = log_time + timedelta(hours=rng.randint(1, 72))
+            if i == 0:
+                log_status, actor, actor_email = "Submitted", requester, requester_email
+            elif status.startswith("Revoked") and i == n_logs - 1:
+                log_status, actor, actor_email = "Revoke Confirmed", approver, approver_email
+            else:
+                log_status = rng.choice(["PartiallyApproved", "Approved"]) if i < n_logs - 1 else "Approved"
+                actor, actor_email = approver, approver_email
+            if i == 0:
+                yield [
+                    str(request_id) if rng.random() > 0.02 else "N/A",
+                    requester, requester_email, request_for, request_for_email, fmt(requested), area,
+                    category, f"{category} access", system, f"{system} ({area})",
+                    "Approve if the user's role requires it", "Review quarterly",
+                    fmt(datetime.combine(expiration, datetime.min.time())),
+                    "365" if not temporary else "90", rng.choice(ACCESS_TYPES),
+                    "Yes" if temporary else "No", "Yes" if rng.random() < 0.1 else "No", status,
+                    "Yes" if status in ("Completed", "Approved") else "No",
+                    "Business need", remark, "Active" if not status.endswith("ExitForm") else "Terminated",
+                    actor, actor_email, log_status, fmt(log_time),
+                ]
+            else:
+                yield [""] * 23 + [actor, actor_email, log_status, fmt(log_time)]
+        emitted += n_logs
+        stats["groups"] += 1
+    stats["rows"] = emitted
+
+
+def generate_export(path, rows=10000, seed=0, encoding="utf-8-sig", today=None, pending_ratio=0.25,
+                    revoked_ratio=0.10, mojibake_ratio=0.0, log_rows=(1, 6)):
+    """
+    写出合成 CSV，返回统计 {"path", "rows", "groups", "pending", "revoked", "mojibake", "bytes", "seconds"}
+    encoding 无法表示的字符(例如 gbk 下的乱码字符)写为 '?'
+    """
+    t0 = time.perf_counter()
+    stats = {}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding=encoding, errors="replace", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(COLUMNS)
+        batch = []
+        for row in iter_rows(rows, seed, today, pending_ratio, revoked_ratio, mojibake_ratio, log_rows, stats):
+            batch.append(row)
+            if len(batch) >= 5000:
+                w.writerows(batch)
+                batch = []
+        w.writerows(batch)
+    os.replace(tmp, path)
+    stats.update({"path": path, "bytes": os.path.getsize(path), "seconds": time.perf_counter() - t0})
+    return stats
+
+
+def default_name(rows, seed, encoding="utf-8-sig"):
+    suffix = "" if encoding == "utf-8-sig" else f"_{encoding.replace('-', '')}"
+    return f"{FILENAME_PREFIX}_{rows}_s{seed}{suffix}.csv"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成合成 ITC 导出 CSV")
+    parser.add_argument("--rows", type=int, default=10000, help="总行数(含日志行)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--encoding", default="utf-8-sig", help="utf-8-sig / utf-8 / gbk / latin1 ...")
+    parser.add_argument("--mojibake", type=float, default=0.0, help="带乱码的请求比例 0~1")
+    parser.add_argument("--pending-ratio", type=float, default=0.25)
+    parser.add_argument("--revoked-ratio", type=float, default=0.10)
+    parser.add_argument("--today", default=None, help="参考日期 YYYY-MM-DD (默认今天；固定后结果可复现)")
+    parser.add_argument("--out", default=".", help="输出目录或 .csv 文件路径")
+    args = parser.parse_args(argv)
+    today = datetime.strptime(args.today, "%Y-%m-%d").date() if args.today else None
+    path = args.out if args.out.lower().endswith(".csv") else \
+        os.path.join(args.out, default_name(args.rows, args.seed, args.encoding))
+    stats = generate_export(path, args.rows, args.seed, args.encoding, today, args.pending_ratio,
+                            args.revoked_ratio, args.mojibake)
+    print(f"已生成 {stats['path']}: {stats['rows']} 行 / {stats['groups']} 个请求 "
+          f"(Pending {stats['pending']} Revoked {stats['revoked']} 乱码 {stats['mojibake']})，"
+          f"{stats['bytes'] / 1048576:.1f} MB，耗时 {stats['seconds']:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1:
+        sys.exit(main())
+
+    import hashlib
+    import shutil
+    import tempfile
+    from itc_csv import check_file
+
+    tmp = tempfile.mkdtemp()
+    try:
+        ref = date(2026, 10, 18)
+        a = generate_export(os.path.join(tmp, "a.csv"), rows=20000, seed=7, today=ref, mojibake_ratio=0.05)
+        b = generate_export(os.path.join(tmp, "b.csv"), rows=20000, seed=7, today=ref, mojibake_ratio=0.05)
+        c = generate_export(os.path.join(tmp, "c.csv"), rows=20000, seed=8, today=ref)
+        digest = lambda p: hashlib.sha256(open(p, "rb").read()).hexdigest()
+        assert digest(a["path"]) == digest(b["path"]) != digest(c["path"])
+        assert a["rows"] == 20000 and check_file(a["path"])["records"] == 20000
+        print(f"20000 行 {a['bytes'] / 1048576:.1f} MB 耗时 {a['seconds']:.2f}s: {a['groups']} 组 "
+              f"Pending {a['pending']} Revoked {a['revoked']} 乱码 {a['mojibake']}")
+        with open(a["path"], encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == COLUMNS
+        firsts = [r for r in rows[1:] if r[1]]
+        assert len(firsts) == a["groups"] and all(r[COLUMNS.index("Log Status")] for r in rows[1:])
+        statuses = {r[COLUMNS.index("Status")] for r in firsts}
+        assert {"Pending Review", "Revoked - ExitForm", "Revoked - RoleChange"} <= statuses
+        assert any("Ã" in r[1] for r in firsts)
+        # 乱码可按 fix_mojibake 的方式还原
+        assert mojibake("José Müller").encode("cp1252").decode("utf-8") == "José Müller"
+        g = generate_export(os.path.join(tmp, "g.csv"), rows=2000, seed=1, encoding="gbk", today=ref)
+        with open(g["path"], "rb") as f:
+            f.read().decode("gbk")
+        print("✅ synthetic_export 自测通过")
+    finally:
+        shutil.rmtree(tmp)
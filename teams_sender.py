@@ -6,11 +6,11 @@ Teams消息发送模块
 
 import os
 import sys
-import requests
 import json
 import traceback
 from datetime import datetime
-import sys
+from config_registry import REGISTRY, EMAIL_CONFIG_PATH, get_email_config, get_teams_config
+from itc_trace import traced
 
 
 def debug_print(msg):
@@ -26,36 +26,24 @@ def debug_print(msg):
 
 
 def load_teams_config(config_path=None):
-    """加载Teams配置文件"""
-    if not config_path:
-        config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "teams_config.json")
-    
-    if not os.path.exists(config_path):
-        # 如果配置文件不存在，返回默认配置
-        return {
-            "enabled": False,
-            "webhooks": {},
-            "default_webhook": None
-        }
-    
-    with open(config_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """加载Teams配置文件(由 config_registry 缓存，文件变化时自动重新加载)"""
+    # 如果配置文件不存在，返回默认配置
+    return get_teams_config(config_path, default={
+        "enabled": False,
+        "webhooks": {},
+        "default_webhook": None
+    })
 
 
 def load_email_config(config_path=None):
     """加载邮件配置文件，获取DC人员信息"""
-    if not config_path:
-        config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "email_config.json")
-    
-    if not os.path.exists(config_path):
-        return {}
-    
-    try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        debug_print(f"读取邮件配置文件出错: {str(e)}")
+    cfg = get_email_config(config_path)
+    if cfg is None:
+        err = REGISTRY.last_error(config_path or EMAIL_CONFIG_PATH)
+        if err:
+            debug_print(f"读取邮件配置文件出错: {err}")
         return {}
+    return cfg
 
 
 def get_dc_contacts_for_revoked(revoked_categories, email_config=None):
@@ -107,6 +95,7 @@ def get_dc_contacts_for_revoked(revoked_categories, email_config=None):
     return unique_contacts, matched_dcs
 
 
+@traced("teams_post")
 def send_teams_message(title, content, webhook_name="default", urgent=False, teams_config=None):
     """
     发送消息到Teams频道
@@ -184,6 +173,7 @@ def send_teams_message(title, content, webhook_name="default", urgent=False, tea
         
         debug_print(f"[TeamsDebug] 准备发送消息 webhook_name={webhook_name} url={webhook_url}")
         debug_print(f"[TeamsDebug] 标题={activity_title} urgent={urgent}")
+        import requests
         response = requests.post(
             webhook_url,
             data=json.dumps(card_content),
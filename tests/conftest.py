@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import pytest
+
+# 被测模块位于仓库根目录
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+
+@pytest.fixture
+def quiet_email_log(monkeypatch):
+    """email_sender 的日志写入仓库内 ITC report/Log，测试中静默"""
+    import email_sender
+    messages = []
+    monkeypatch.setattr(email_sender, "log", messages.append)
+    return messages
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""下载完成检测: CDP 下载事件的重命名与文件系统兜底(模拟 CDP)"""
+
+import os
+
+import pytest
+
+from download_watcher import FALLBACK_PREFIX, DownloadWatcher
+
+GUID = "0f8fad5b-d9cb-469f-a165-70867728950e"
+
+
+class FakeCDP:
+    def __init__(self):
+        self.listeners = {}
+
+    def on(self, ev, cb):
+        self.listeners[ev] = cb
+
+    def off(self, ev, cb):
+        self.listeners.pop(ev, None)
+
+    def send(self, method, params=None, timeout=None):
+        return {}
+
+    def emit(self, ev, **params):
+        self.listeners[ev](params)
+
+
+@pytest.fixture
+def cdp():
+    return FakeCDP()
+
+
+@pytest.fixture
+def watcher(tmp_path, cdp):
+    w = DownloadWatcher(str(tmp_path), cdp=cdp, poll_interval=0.05).start()
+    yield w
+    w.stop()
+
+
+def _write(path, size=4096):
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return str(path)
+
+
+def test_completed_download_renamed_to_suggested_name(tmp_path, cdp, watcher):
+    _write(tmp_path / GUID)
+    cdp.emit("Browser.downloadWillBegin", guid=GUID, suggestedFilename="report.csv")
+    cdp.emit("Browser.downloadProgress", guid=GUID, state="completed", receivedBytes=4096, totalBytes=4096)
+    assert watcher.wait(timeout=2) == str(tmp_path / "report.csv")
+
+
+def test_missed_will_begin_falls_back_to_csv_name(tmp_path, cdp, watcher):
+    _write(tmp_path / GUID)
+    cdp.emit("Browser.downloadProgress", guid=GUID, state="completed", receivedBytes=4096, totalBytes=4096)
+    path = watcher.wait(timeout=2)
+    name = os.path.basename(path)
+    assert name.startswith(FALLBACK_PREFIX + "_") and name.endswith(".csv") and os.path.exists(path)
+    assert not os.path.exists(tmp_path / GUID)
+
+
+def test_file_event_waits_for_begun_download_without_progress(tmp_path, cdp, watcher):
+    cdp.emit("Browser.downloadWillBegin", guid=GUID, suggestedFilename="report.csv")
+    # 部分版本在 allowAndName 下仍使用建议文件名: 文件出现时还没有任何进度事件
+    path = _write(tmp_path / "report.csv")
+    watcher._on_fs_file(path)
+    assert watcher.wait(timeout=0.3) is None
+    # completed 事件丢失: 字节已收齐后由文件系统事件兜底
+    cdp.emit("Browser.downloadProgress", guid=GUID, state="inProgress", receivedBytes=4096, totalBytes=4096)
+    watcher._on_fs_file(path)
+    assert watcher.wait(timeout=2) == path
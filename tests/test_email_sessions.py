@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""发送通道复用: 各线程的通道登记在同一注册表，进程退出时全部释放；COM 反初始化只在初始化线程执行"""
+
+import threading
+
+import pytest
+
+import email_sender
+from mail_transport import OutlookTransport
+
+
+class FakeTransport:
+    def __init__(self, name):
+        self.name = name
+        self.closed_by = None
+
+    def close(self):
+        self.closed_by = threading.current_thread().name
+
+
+@pytest.fixture
+def transports(monkeypatch, quiet_email_log):
+    created = []
+
+    def create(name, system_config=None, logger=None):
+        created.append(FakeTransport(name))
+        return created[-1]
+
+    monkeypatch.setattr(email_sender, "create_transport", create)
+    monkeypatch.setattr(email_sender, "_SESSIONS", {})
+    return created
+
+
+def _in_thread(target, name, keep_alive=None):
+    t = threading.Thread(target=lambda: (target(), keep_alive and keep_alive.wait(5)), name=name)
+    t.start()
+    return t
+
+
+def test_transport_reused_per_thread(transports):
+    assert email_sender._get_transport("outlook") is email_sender._get_transport("outlook")
+    _in_thread(lambda: email_sender._get_transport("outlook"), "worker").join(5)
+    assert len(transports) == 2
+
+
+def test_close_all_threads_releases_worker_sessions(transports):
+    release = threading.Event()
+    workers = [_in_thread(lambda: email_sender._get_transport("outlook"), f"worker-{i}", release) for i in range(3)]
+    email_sender._get_transport("smtp")
+    # 只释放当前线程
+    email_sender.close_outlook_session()
+    assert [t.closed_by for t in transports if t.name == "smtp"] == ["MainThread"]
+    assert all(t.closed_by is None for t in transports if t.name == "outlook")
+    # 进程退出时(atexit，主线程)释放所有线程的通道
+    email_sender.close_outlook_session(all_threads=True)
+    assert len(transports) == 4 and all(t.closed_by == "MainThread" for t in transports)
+    assert email_sender._SESSIONS == {}
+    release.set()
+    for w in workers:
+        w.join(5)
+
+
+def test_sessions_of_finished_threads_are_released(transports):
+    _in_thread(lambda: email_sender._get_transport("outlook"), "finished").join(5)
+    assert transports[0].closed_by is None
+    email_sender._get_transport("outlook")
+    assert transports[0].closed_by == "MainThread"
+    assert list(email_sender._SESSIONS) == [threading.current_thread()]
+
+
+class FakePythoncom:
+    def __init__(self):
+        self.uninitialized = []
+
+    def CoUninitialize(self):
+        self.uninitialized.append(threading.get_ident())
+
+
+def test_outlook_close_uninitializes_only_on_owner_thread():
+    owned, foreign = OutlookTransport(), OutlookTransport()
+    for transport, owner in ((owned, threading.get_ident()), (foreign, -1)):
+        transport._pythoncom, transport._com_thread = FakePythoncom(), owner
+    com_owned, com_foreign = owned._pythoncom, foreign._pythoncom
+    owned.close()
+    foreign.close()
+    assert com_owned.uninitialized == [threading.get_ident()]
+    assert com_foreign.uninitialized == []
+    assert foreign._pythoncom is None
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""增量导出: 窗口合并、窗口内已处理请求的移除、完整下载的触发条件"""
+
+import csv
+import os
+import urllib.parse
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from incremental_export import IncrementalExporter, MERGE_VERSION, merge_groups, read_groups
+
+HEADER = ["Requester", "Request For", "Requested Date", "System/Solution", "Category", "Status",
+          "Log Actor", "Log Status", "Request ID"]
+TODAY = date(2026, 10, 18)
+
+
+def _group(rid, day, status):
+    d = day.strftime("%m/%d/%Y") if day else ""
+    return [[f"req{rid}", f"user{rid}", d, f"Sys{rid}", "Cat", status, "", "", str(rid)],
+            ["", "", "", "", "", "", "approver", "Approved", ""]]
+
+
+def _write(path, groups, header=HEADER):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(header)
+        for g in groups:
+            w.writerows(g)
+    return path
+
+
+class FakeITC:
+    """按 dateRange 与 requestStatus 过滤的导出接口；requestStatus=8 时只返回待处理(Pending Review / Revoked)的请求"""
+
+    def __init__(self, requests):
+        self.requests = dict(requests)
+        self.windows = []
+
+    def fetch(self, url, dest_dir):
+        q = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+        s, e = [datetime.strptime(x.strip(), "%m/%d/%Y").date() for x in q["dateRange"][0].split("-")]
+        only_open = q.get("requestStatus") == ["8"]
+        rows = [_group(rid, d, st) for rid, (d, st) in sorted(self.requests.items())
+                if s <= d <= e and (not only_open or st == "Pending Review" or "revoked" in st.lower())]
+        self.windows.append((s, e, len(rows)))
+        return _write(os.path.join(dest_dir, f"window_{len(self.windows)}.csv"), rows)
+
+
+@pytest.fixture
+def itc():
+    # 100 个请求，每 3 天一个；较早的大多已处理(不再出现在 requestStatus=8 的导出中)
+    requests = {rid: (TODAY - timedelta(days=rid * 3), "Pending Review" if rid <= 20 or rid == 41 else "Approved")
+                for rid in range(1, 101)}
+    requests[90] = (requests[90][0], "Revoked - ExitForm")
+    return FakeITC(requests)
+
+
+def _exporter(tmp_path, **kwargs):
+    return IncrementalExporter(str(tmp_path), "https://itc.example/GetRequestExportReport",
+                               {"siteId": "193", "requestStatus": "8", "dateRange": "x"},
+                               time_range_days=365, overlap_days=3, **kwargs)
+
+
+def _ids(path):
+    return sorted(int(k[3:]) for k, _ in read_groups(path)[1])
+
+
+def _assert_matches_full_export(exporter, itc, path, tmp_path):
+    full = itc.fetch(exporter.build_url(TODAY - timedelta(days=365), TODAY), str(tmp_path))
+    assert read_groups(path) == read_groups(full)
+
+
+def test_first_run_is_full_then_incremental(tmp_path, itc):
+    ex = _exporter(tmp_path)
+    assert ex.plan(TODAY)[0] == "full"
+    path = ex.run(itc.fetch, today=TODAY)
+    assert itc.windows[0][:2] == (TODAY - timedelta(days=365), TODAY)
+    assert _ids(path) == list(range(1, 21)) + [41, 90]
+    mode, start, end, _ = ex.plan(TODAY)
+    assert mode == "incremental" and end == TODAY
+    assert ex.load_state()["merge_version"] == MERGE_VERSION
+
+
+def test_requests_processed_inside_window_are_removed(tmp_path, itc):
+    ex = _exporter(tmp_path)
+    ex.run(itc.fetch, today=TODAY)
+    # 请求处理后从 requestStatus=8 的导出中消失，合并结果不能继续保留旧的 Pending Review
+    itc.requests[1] = (itc.requests[1][0], "Approved")
+    itc.requests[2] = (itc.requests[2][0], "Closed")
+    itc.requests[200] = (TODAY, "Pending Review")
+    path = ex.run(itc.fetch, today=TODAY)
+    ids = _ids(path)
+    assert 1 not in ids and 2 not in ids and 200 in ids
+    last = ex.load_state()["last_window"]
+    assert (last["removed"], last["added"]) == (2, 1)
+    _assert_matches_full_export(ex, itc, path, tmp_path)
+
+
+def test_window_covers_recent_days_only(tmp_path, itc):
+    ex = _exporter(tmp_path, recent_days=30)
+    ex.run(itc.fetch, today=TODAY)
+    # 未结请求最早在 270 天前，窗口不再因此退回到接近完整范围
+    mode, start, _, _ = ex.plan(TODAY)
+    assert (mode, start) == ("incremental", TODAY - timedelta(days=30))
+    later = TODAY + timedelta(days=5)
+    assert ex.plan(later)[1] == later - timedelta(days=30)
+    ex_short = _exporter(tmp_path, recent_days=0)
+    assert ex_short.plan(later)[1] == TODAY - timedelta(days=3)
+
+
+def test_old_requests_refreshed_by_full_download(tmp_path, itc):
+    ex = _exporter(tmp_path, recent_days=30, full_refresh_days=7)
+    ex.run(itc.fetch, today=TODAY)
+    # 窗口之外的请求被处理: 增量窗口看不到，保留到下一次完整下载
+    itc.requests[41] = (itc.requests[41][0], "Approved")
+    itc.requests[90] = (itc.requests[90][0], "Closed")
+    path = ex.run(itc.fetch, today=TODAY)
+    assert 41 in _ids(path) and 90 in _ids(path)
+    later = TODAY + timedelta(days=7)
+    assert ex.plan(later)[0] == "full"
+    path = ex.run(itc.fetch, today=later)
+    assert 41 not in _ids(path) and 90 not in _ids(path)
+
+
+def test_state_from_older_merge_rules_forces_full(tmp_path, itc):
+    ex = _exporter(tmp_path)
+    ex.run(itc.fetch, today=TODAY)
+    state = ex.load_state()
+    del state["merge_version"]
+    ex._save_state(state)
+    assert ex.plan(TODAY)[:1] == ("full",)
+
+
+def test_params_change_or_missing_merged_file_forces_full(tmp_path, itc):
+    ex = _exporter(tmp_path)
+    path = ex.run(itc.fetch, today=TODAY)
+    other = IncrementalExporter(str(tmp_path), ex.base_url, {"siteId": "194", "requestStatus": "8"})
+    assert other.plan(TODAY)[0] == "full"
+    os.remove(path)
+    assert ex.plan(TODAY)[0] == "full"
+
+
+def test_header_change_falls_back_to_full(tmp_path, itc):
+    ex = _exporter(tmp_path)
+    ex.run(itc.fetch, today=TODAY)
+    state = ex.load_state()
+    _write(state["merged_path"], [], header=HEADER + ["Extra"])
+    path = ex.run(itc.fetch, today=TODAY)
+    assert ex.load_state()["last_mode"] == "full"
+    _assert_matches_full_export(ex, itc, path, tmp_path)
+
+
+def _keyed(rid, day, status):
+    return f"id:{rid}", _group(rid, day, status)
+
+
+def test_merge_groups_window_range_and_expiry():
+    base = [_keyed(1, TODAY - timedelta(days=1), "Pending Review"),
+            _keyed(2, TODAY - timedelta(days=40), "Pending Review"),
+            _keyed(3, None, "Pending Review"),
+            _keyed(4, TODAY - timedelta(days=400), "Pending Review"),
+            _keyed(5, TODAY - timedelta(days=2), "Pending Review")]
+    window = [_keyed(5, TODAY - timedelta(days=2), "Revoked - ExitForm"), _keyed(6, TODAY, "Pending Review")]
+    merged, stats = merge_groups(HEADER, base, window, min_date=TODAY - timedelta(days=365),
+                                 window_range=(TODAY - timedelta(days=10), TODAY))
+    # 1: 窗口内未返回 -> 已处理；2: 窗口外保留；3: 无日期保留；4: 超出时间范围(先计入 unchanged)
+    assert [k for k, _ in merged] == ["id:2", "id:3", "id:5", "id:6"]
+    assert dict(merged)["id:5"][0][5] == "Revoked - ExitForm"
+    assert stats == {"updated": 1, "added": 1, "unchanged": 3, "removed": 1, "expired": 1}
+
+
+def test_read_groups_fallback_key_and_log_rows(tmp_path):
+    header = HEADER[:-1]
+    path = _write(str(tmp_path / "x.csv"), [[r[:-1] for r in _group(1, TODAY, "Pending Review")]], header=header)
+    got_header, groups = read_groups(path)
+    assert got_header == header
+    assert len(groups) == 1 and len(groups[0][1]) == 2
+    assert groups[0][0].startswith("k:req1\x1fuser1\x1f10/18/2026")
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""常驻服务: 运行请求排队/合并、运行序号、状态快照、HTTP 触发与令牌校验(下载器用替身)"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from itc_daemon import TOKEN_HEADER, ITCDaemon, next_run_time
+
+
+class FakeDownloader:
+    """替代 BatRun_ITCreport_downloader_rev2: run_once 可被阻塞，便于在运行中投递请求"""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.started = threading.Semaphore(0)
+        self.fail = False
+        self.messages = []
+
+    def log_message(self, msg):
+        self.messages.append(msg)
+
+    def close_chrome(self):
+        pass
+
+    def run_once(self, force_download=False, driver=None, keep_driver=False):
+        self.calls.append({"force": force_download, "driver": driver})
+        self.started.release()
+        assert self.gate.wait(5)
+        if self.fail:
+            raise RuntimeError("Chrome 已退出")
+        return {"exit_code": 0, "run": len(self.calls), "driver": "driver-1", "result": None}
+
+
+@pytest.fixture
+def daemon():
+    d = ITCDaemon(interval_minutes=24 * 60)
+    d.downloader = FakeDownloader()
+    worker = threading.Thread(target=d._worker, daemon=True)
+    worker.start()
+    try:
+        yield d
+    finally:
+        d.downloader.gate.set()
+        d._stop.set()
+        d._wake.set()
+        worker.join(5)
+        assert not worker.is_alive()
+
+
+def test_next_run_time():
+    now = datetime(2026, 10, 18, 9, 0)
+    assert next_run_time(now, interval_minutes=30) == datetime(2026, 10, 18, 9, 30)
+    assert next_run_time(now, ["08:30", "17:00"]) == datetime(2026, 10, 18, 17, 0)
+    assert next_run_time(now, ["08:30"]) == datetime(2026, 10, 19, 8, 30)
+
+
+def test_run_returns_record_and_keeps_driver(daemon):
+    seq = daemon.request_run(force=True)
+    assert seq == 1
+    record = daemon.wait_for_run(seq, timeout=5)
+    assert record["exit_code"] == 0 and record["force"] and record["reason"] == "trigger"
+    assert daemon.driver == "driver-1"
+    assert daemon.wait_for_run(daemon.request_run(), timeout=5)["run"] == 2
+    # 后续运行复用已有 driver
+    assert daemon.downloader.calls[1]["driver"] == "driver-1"
+
+
+def test_requests_during_run_queue_one_run_after_it(daemon):
+    dl = daemon.downloader
+    dl.gate.clear()
+    assert daemon.request_run(reason="first") == 1
+    assert dl.started.acquire(timeout=5)
+    status = daemon.status()
+    assert status["running"] and not status["pending"] and status["runs"] == 0
+    # 运行中的请求排在当前运行之后，多个请求合并为一次，force 取或
+    assert daemon.request_run(reason="second") == 2
+    assert daemon.request_run(force=True, reason="third") == 2
+    assert daemon.status()["pending"]
+    dl.gate.set()
+    record = daemon.wait_for_run(2, timeout=5)
+    assert record["reason"] == "second" and record["force"] is True
+    assert [c["force"] for c in dl.calls] == [False, True]
+    assert daemon.status()["runs"] == 2 and not daemon.status()["running"]
+
+
+def test_wait_for_run_timeout(daemon):
+    daemon.downloader.gate.clear()
+    seq = daemon.request_run()
+    assert daemon.wait_for_run(seq, timeout=0.05) is None
+
+
+def test_failed_run_drops_driver(daemon):
+    daemon.wait_for_run(daemon.request_run(), timeout=5)
+    daemon.downloader.fail = True
+    record = daemon.wait_for_run(daemon.request_run(), timeout=5)
+    assert record["exit_code"] == 1 and "Chrome 已退出" in record["error"]
+    assert daemon.driver is None and not daemon.status()["driver_warm"]
+
+
+def _request(server, method, path, token=None):
+    headers = {TOKEN_HEADER: token} if token else {}
+    req = urllib.request.Request(f"http://127.0.0.1:{server.server_address[1]}{path}", method=method,
+                                 headers=headers, data=b"" if method == "POST" else None)
+    try:
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            return resp.status, json.loads(resp.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read().decode("utf-8"))
+
+
+def test_http_trigger_requires_token(daemon):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), daemon._make_handler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        assert _request(server, "GET", "/status")[0] == 403
+        assert _request(server, "POST", "/run", token="wrong")[0] == 403
+        assert not daemon.downloader.calls
+        code, reply = _request(server, "POST", "/run?wait=1&force=1", token=daemon.token)
+        assert code == 200 and reply["run"] == 1 and reply["result"]["exit_code"] == 0
+        code, reply = _request(server, "GET", "/status", token=daemon.token)
+        assert code == 200 and reply["runs"] == 1 and reply["driver_warm"]
+        daemon.downloader.gate.clear()
+        code, reply = _request(server, "POST", "/run", token=daemon.token)
+        assert (code, reply) == (202, {"run": 2, "queued": True})
+        assert _request(server, "GET", "/nowhere", token=daemon.token)[0] == 404
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""分区并行导出: 分区切分、同一会话并发下载、按请求组拼接去重、分区失败时整体失败"""
+
+import csv
+import io
+import os
+import threading
+import urllib.parse
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from incremental_export import read_groups
+from partitioned_export import (PARTITION_DIR_NAME, _DATE_FMT, build_partitions, date_partitions,
+                                fetch_partitioned, parse_date_range)
+from report_fetcher import ReportFetchError, build_session, fetch_report
+
+HEADER = ["Requester", "Request For", "Requested Date", "System/Solution", "Category", "Status", "Request ID"]
+TODAY = date(2026, 10, 18)
+
+
+def _group(rid):
+    d = TODAY - timedelta(days=rid % 365)
+    return [[f"req{rid}", f"user{rid}", d.strftime(_DATE_FMT), f"Sys{rid % 40}", f"Cat{rid % 5}",
+             "Pending Review", str(rid)],
+            ["", "", "", "", "", "", ""]]
+
+
+GROUPS = {rid: _group(rid) for rid in range(1500)}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """按 dateRange / categoryId 过滤的导出；categoryId=2 同时返回 Cat1 的组(模拟分区间重复)"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        q = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        category = q.get("categoryId", ["-1"])[0]
+        if category in self.server.fail:
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        s, e = parse_date_range(q["dateRange"][0])
+        wanted = {"-1": None, "2": {"Cat1", "Cat2"}}.get(category, {f"Cat{category}"})
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow(HEADER)
+        for rid, rows in sorted(GROUPS.items()):
+            d = parse_date_range(f"{rows[0][2]} - {rows[0][2]}")[0]
+            if s <= d <= e and (wanted is None or rows[0][4] in wanted):
+                w.writerows(rows)
+        body = buf.getvalue().encode("utf-8-sig")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def itc():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.fail = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _base(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/RequestReport/GetRequestExportReport"
+
+
+PARAMS = {"siteId": "193", "categoryId": "-1", "areaId": "-1", "requestStatus": "8",
+          "dateRange": f"{(TODAY - timedelta(days=364)).strftime(_DATE_FMT)} - {TODAY.strftime(_DATE_FMT)}"}
+
+
+def test_date_partitions_are_contiguous():
+    assert date_partitions(date(2026, 1, 1), date(2026, 1, 10), 3) == [
+        (date(2026, 1, 1), date(2026, 1, 4)), (date(2026, 1, 5), date(2026, 1, 7)),
+        (date(2026, 1, 8), date(2026, 1, 10))]
+    # 分区数不超过天数
+    assert len(date_partitions(date(2026, 1, 1), date(2026, 1, 2), 8)) == 2
+
+
+def test_build_partitions_by_value():
+    parts = build_partitions(PARAMS, "categoryId", values=[1, 2])
+    assert [label for label, _ in parts] == ["categoryId=1", "categoryId=2"]
+    assert [p["categoryId"] for _, p in parts] == ["1", "2"]
+    with pytest.raises(ValueError):
+        build_partitions(PARAMS, "categoryId")
+    with pytest.raises(ValueError):
+        build_partitions(dict(PARAMS, areaId="7"), "areaId", values=[1])
+    with pytest.raises(ValueError):
+        build_partitions(PARAMS, "siteId")
+
+
+def test_date_partitions_match_single_download(itc, tmp_path):
+    with build_session(pool_size=6) as session:
+        single = fetch_report(f"{_base(itc)}?{urllib.parse.urlencode(PARAMS)}", str(tmp_path), session)
+        merged, timings = fetch_partitioned(_base(itc), PARAMS, str(tmp_path), session, parts=6, workers=6)
+    assert len(timings) == 6 and all(t.path and t.groups for t in timings)
+    assert sum(t.groups for t in timings) == len(GROUPS)
+    single_header, single_groups = read_groups(single.path)
+    merged_header, merged_groups = read_groups(merged)
+    assert single_header == merged_header and dict(single_groups) == dict(merged_groups)
+    assert len(merged_groups) == len(GROUPS)
+    # 分区中间文件已清理
+    assert [n for n in os.listdir(tmp_path / PARTITION_DIR_NAME) if n != ".partial"] == []
+
+
+def test_duplicate_groups_across_partitions_kept_once(itc, tmp_path):
+    messages = []
+    with build_session(pool_size=2) as session:
+        merged, timings = fetch_partitioned(_base(itc), PARAMS, str(tmp_path), session, partition_by="categoryId",
+                                            values=[1, 2], workers=2, log_callback=messages.append)
+    header, groups = read_groups(merged)
+    keys = [k for k, _ in groups]
+    expected = sorted(f"id:{rid}" for rid, rows in GROUPS.items() if rows[0][4] in ("Cat1", "Cat2"))
+    assert len(keys) == len(set(keys)) and sorted(keys) == expected
+    # 分区顺序拼接: Cat1 的组来自第一个分区，第二个分区中的重复被丢弃
+    assert keys[:timings[0].groups] == [f"id:{rid}" for rid in sorted(GROUPS) if GROUPS[rid][0][4] == "Cat1"]
+    assert any(f"重复 {timings[0].groups}" in m for m in messages)
+
+
+def test_failed_partition_fails_whole_export(itc, tmp_path):
+    itc.fail.add("3")
+    with build_session(pool_size=2, retries=0) as session:
+        with pytest.raises(ReportFetchError, match="categoryId=3"):
+            fetch_partitioned(_base(itc), PARAMS, str(tmp_path), session, partition_by="categoryId",
+                              values=[1, 3], workers=2, max_attempts=1)
+    assert not [n for n in os.listdir(tmp_path) if n.endswith(".csv")]
+    assert [n for n in os.listdir(tmp_path / PARTITION_DIR_NAME) if n.endswith(".csv")] == []
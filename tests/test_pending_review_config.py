@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Pending review 报告: 本次运行配置随调用传递，不替换模块级 CONFIG，多线程使用不同配置互不影响"""
+
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+import pending_review_report as prr
+
+PENDING = "Pending review任务提醒"
+
+
+@pytest.fixture(autouse=True)
+def quiet_log(monkeypatch, tmp_path):
+    monkeypatch.setattr(prr, "log_message", lambda msg, log_dir: None)
+    monkeypatch.chdir(tmp_path)
+
+
+def _requests(days_left):
+    exp = pd.Timestamp(date.today() + timedelta(days=days_left))
+    return pd.DataFrame([{
+        "Requester": "Alice", "Requester Email": "alice@pg.com", "Request For": "bob@pg.com",
+        "System/Solution": "SAP", "Category": "Site A", "Status": "Pending Review",
+        "Expiration Date": exp, "request_group": 1,
+    }])
+
+
+def _config(recipient, max_days):
+    return {"reports": {PENDING: {"recipients": [recipient], "cc": [], "cc1": {},
+                                  "system_config": {"MAX_REMAINING_DAYS_FOR_REPORT": max_days}}}}
+
+
+def test_resolve_config_does_not_replace_module_config():
+    before = prr.CONFIG
+    cfg = prr.resolve_config(_config("lead@pg.com", 3))
+    assert prr.CONFIG is before
+    assert prr.get_cfg("MAX_REMAINING_DAYS_FOR_REPORT", cfg) == 3
+    # 未给出的键使用默认值
+    assert prr.get_cfg("URGENCY_LEVELS", cfg) == {"非常紧急": 2, "紧急": 4, "常规": 10}
+
+
+def test_concurrent_runs_use_their_own_config():
+    configs = {"a": prr.resolve_config(_config("a@pg.com", 3)),
+               "b": prr.resolve_config(_config("b@pg.com", 10))}
+    results = {}
+    barrier = threading.Barrier(len(configs))
+
+    def worker(name):
+        barrier.wait()
+        for _ in range(20):
+            results.setdefault(name, []).append(prr.analyze_requests(_requests(5), configs[name])["pending"])
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in configs]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+    # 剩余 5 天: a 的上限为 3 天不提醒，b 的上限为 10 天提醒
+    assert all(r["total_count"] == 0 and r["recipients"] == ["a@pg.com"] for r in results["a"])
+    assert all(r["total_count"] == 1 and "b@pg.com" in r["recipients"] for r in results["b"])
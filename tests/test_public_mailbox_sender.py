@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""PublicMailboxAutoSender 会话缓存: 个人 Store/Drafts、公共邮箱地址与 invalidate_cache"""
+
+import logging
+
+import pytest
+
+from mail_transport import MailMessage, create_transport
+from outlook_fake import FakeOutlookApplication
+from public_mailbox_sender import PublicMailboxAutoSender
+
+MAILBOX = "ChinaPD_Cybersecurity_Robot"
+SHARED = [f"Team_{i:02d} (shared)" for i in range(5)] + ["SharePoint Lists"]
+
+
+@pytest.fixture
+def app():
+    return FakeOutlookApplication(shared_stores=SHARED)
+
+
+@pytest.fixture
+def sender(app):
+    return PublicMailboxAutoSender(app, logging.getLogger("test_public_mailbox_sender"))
+
+
+def _send(sender, subject="提醒", to=("a@pg.com",)):
+    return sender.send_from_public_mailbox(MAILBOX, list(to), subject, "<p>x</p>", cc_addresses=["cc@pg.com"])
+
+
+def test_drafts_resolved_once_per_session(app, sender):
+    for i in range(5):
+        assert _send(sender, f"提醒 {i}")
+    # 共享邮箱排在个人账号之前: 只在第一次遍历 Store
+    assert app.latency.calls["property_read"] == len(SHARED) + 1
+    assert sender.stats["store_cache_misses"] == 1
+    assert sender.stats["store_cache_hits"] == 4
+    assert app.sent_items.Count == 5
+    assert all(it.To == "a@pg.com" and it.CC == "cc@pg.com" for it in app.sent_items)
+
+
+def test_public_identity_resolved_once(app, sender):
+    _send(sender)
+    _send(sender)
+    assert app.latency.calls["resolve"] == 1
+    identity = sender._get_public_identity(MAILBOX)
+    assert identity["email"] == f"{MAILBOX}@shared.pg.com" and identity["address_entry"].Name == MAILBOX
+    props = app.sent_items.Item(1).PropertyAccessor.properties
+    assert props["http://schemas.microsoft.com/mapi/proptag/0x0C1F001F"] == identity["email"]
+    assert props["http://schemas.microsoft.com/mapi/proptag/0x0E070003"] & 64
+
+
+def test_unresolvable_mailbox_keeps_default_address(app, sender, monkeypatch):
+    ns = app.GetNamespace("MAPI")
+    original = ns.CreateRecipient
+
+    def unresolvable(name):
+        recipient = original(name)
+        recipient._resolvable = False
+        return recipient
+
+    monkeypatch.setattr(ns, "CreateRecipient", unresolvable)
+    identity = sender._get_public_identity(MAILBOX)
+    assert identity["email"] == f"{MAILBOX}@shared.pg.com" and identity["address_entry"] is None
+
+
+def test_invalidate_cache_forces_new_lookup(app, sender):
+    _send(sender)
+    sender.invalidate_cache()
+    assert sender._personal_drafts is None and sender._public_identities == {}
+    _send(sender)
+    assert sender.stats["store_cache_misses"] == 2
+    assert app.latency.calls["resolve"] == 2
+
+
+def test_send_failure_invalidates_cache(app, sender):
+    assert _send(sender)
+    # 收件人为空时 FakeMailItem.Send 抛异常(类似 COM 错误)
+    assert not _send(sender, to=())
+    assert sender._personal_drafts is None
+    assert _send(sender)
+    assert sender.stats["store_cache_misses"] == 2
+
+
+def test_get_sent_folder_uses_cached_store(app, sender):
+    _send(sender)
+    reads = app.latency.calls["property_read"]
+    assert sender.get_sent_folder().Items.Count == 1
+    assert app.latency.calls["property_read"] == reads
+
+
+def test_transport_send_many_shares_session(app):
+    transport = create_transport("fake", application=app, logger=logging.getLogger("test_public_mailbox_sender"))
+    messages = [MailMessage(f"批量 {i}", "<p>x</p>", [f"u{i}@pg.com"]) for i in range(10)]
+    assert transport.send_many(messages) == [True] * 10
+    assert transport.sender.stats["store_cache_misses"] == 1
+    assert app.latency.calls["resolve"] == 1
+    assert app.sent_items.Count == 10
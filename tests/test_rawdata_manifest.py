@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""RawData 清单: sync/record 的增量分析、重复检测、解析状态与 latest_csv 的最新文件选取"""
+
+import csv
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from rawdata_manifest import STATUS_OK, RawDataManifest, analyze_csv, latest_csv
+
+HEADER = ["Requester", "Request For", "Requested Date", "System/Solution", "Category", "Status"]
+
+
+def _write(raw_dir, name, rows, age_hours=0, header=HEADER):
+    path = os.path.join(str(raw_dir), name)
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(header)
+        for i in range(rows):
+            day = (datetime(2026, 1, 1) + timedelta(days=i % 90)).strftime("%m/%d/%Y")
+            w.writerow([f"r{i}", f"u{i}", day, "S", "C", "Pending Review"][:len(header)])
+            w.writerow([""] * len(header))
+    t = time.time() - age_hours * 3600
+    os.utime(path, (t, t))
+    return path
+
+
+def test_header_only_export_is_ok(tmp_path):
+    # 当前没有待处理请求时导出只有表头，是有效数据
+    info = analyze_csv(_write(tmp_path, "ITC_empty.csv", 0))
+    assert info["parse_status"] == STATUS_OK
+    assert (info["rows"], info["groups"], info["date_min"]) == (0, 0, None)
+
+
+def test_missing_column_is_error(tmp_path):
+    info = analyze_csv(_write(tmp_path, "ITC_bad.csv", 3, header=HEADER[:-1]))
+    assert info["parse_status"].startswith("error") and "Status" in info["parse_status"]
+
+
+def test_latest_csv_picks_newest_header_only_export(tmp_path):
+    _write(tmp_path, "ITC_old.csv", 50, age_hours=30)
+    newest = _write(tmp_path, "ITC_new.csv", 0)
+    assert latest_csv(str(tmp_path)) == newest
+
+
+def test_latest_csv_does_not_fall_back_to_older_file(tmp_path):
+    _write(tmp_path, "ITC_old.csv", 50, age_hours=30)
+    broken = _write(tmp_path, "ITC_new.csv", 5, header=HEADER[:-1])
+    messages = []
+    # 不使用更早(过时)的数据，记录被跳过的文件
+    assert latest_csv(str(tmp_path), log_callback=messages.append) == broken
+    assert any("ITC_new.csv" in m and "缺少必需列" in m for m in messages)
+
+
+def test_latest_csv_empty_dir(tmp_path):
+    assert latest_csv(str(tmp_path)) is None
+    assert latest_csv(str(tmp_path / "missing")) is None
+
+
+@pytest.mark.parametrize("require_ok,expected", [(True, "ITC_old.csv"), (False, "ITC_new.csv")])
+def test_manifest_latest_require_ok(tmp_path, require_ok, expected):
+    _write(tmp_path, "ITC_old.csv", 50, age_hours=30)
+    _write(tmp_path, "ITC_new.csv", 5, header=HEADER[:-1])
+    m = RawDataManifest(str(tmp_path))
+    m.sync()
+    assert os.path.basename(m.latest(require_ok=require_ok)) == expected
+
+
+def test_sync_analyzes_new_and_changed_files_only(tmp_path):
+    _write(tmp_path, "ITC_old.csv", 500, age_hours=30)
+    _write(tmp_path, "ITC_mid.csv", 800, age_hours=5)
+    (tmp_path / "ITC_bad.csv").write_text("foo,bar\n1,2\n")
+    (tmp_path / "notes.txt").write_text("x")
+    m = RawDataManifest(str(tmp_path))
+    assert m.sync() == (3, 0)
+    mid = m.entries["ITC_mid.csv"]
+    assert (mid["groups"], mid["rows"]) == (800, 1600)
+    assert (mid["date_min"], mid["date_max"]) == ("2026-01-01", "2026-03-31")
+    assert m.entries["ITC_bad.csv"]["parse_status"].startswith("error")
+    assert m.latest().endswith("ITC_mid.csv")
+    assert m.latest(max_age_hours=2) is None
+    # 清单已保存，未变化的文件不重新分析
+    assert RawDataManifest(str(tmp_path)).sync() == (0, 0)
+    _write(tmp_path, "ITC_mid.csv", 10, age_hours=5)
+    assert RawDataManifest(str(tmp_path)).sync() == (1, 0)
+    os.remove(tmp_path / "ITC_old.csv")
+    m = RawDataManifest(str(tmp_path))
+    assert m.sync() == (0, 1) and "ITC_old.csv" not in m.entries
+
+
+def test_record_detects_duplicate_download(tmp_path):
+    old = _write(tmp_path, "ITC_old.csv", 500, age_hours=30)
+    m = RawDataManifest(str(tmp_path))
+    m.sync()
+    dup = str(tmp_path / "ITC_new.csv")
+    shutil.copy(old, dup)
+    messages = []
+    m.log_callback = messages.append
+    e = m.record(dup, download_seconds=3.2, source="http")
+    assert e["duplicate_of"] == "ITC_old.csv" and e["source"] == "http" and e["download_seconds"] == 3.2
+    assert any("完全相同" in msg for msg in messages)
+    assert sorted(m.find_by_hash(e["sha256"])) == sorted([old, dup])
+    assert latest_csv(str(tmp_path), max_age_hours=1) == dup
+    with pytest.raises(ValueError):
+        m.record(str(tmp_path.parent / "elsewhere.csv"))
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""RawData 保留与压缩: 热区保留、按月归档、去重别名、过期归档删除、透明读取已归档文件"""
+
+import csv
+import json
+import os
+import time
+
+import pytest
+
+from incremental_export import STATE_DIR_NAME
+from rawdata_manifest import RawDataManifest
+from rawdata_retention import ARCHIVE_DIR_NAME, RawDataArchive, compact_rawdata, resolve_csv
+
+NOW = time.time()
+
+
+def _write(raw_dir, i, months_ago, content_id=None):
+    name = f"ITC_RequestExportReport_{i:03d}.csv"
+    path = os.path.join(str(raw_dir), name)
+    cid = i if content_id is None else content_id
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["Requester", "Request For", "Requested Date", "System/Solution", "Category", "Status"])
+        for r in range(200):
+            w.writerow([f"r{r}", f"user{r}@pg.com", "01/15/2026", f"System {r % 30}", "Cat", f"Pending Review {cid}"])
+    t = NOW - months_ago * 31 * 86400 - i
+    os.utime(path, (t, t))
+    return name
+
+
+def _read(path):
+    with open(path, encoding="utf-8-sig") as f:
+        return f.read()
+
+
+@pytest.fixture
+def raw(tmp_path):
+    # 20 个文件，每 5 个相隔一个月；020 与同月的 012 内容相同
+    names = [_write(tmp_path, i, months_ago=i // 5) for i in range(20)]
+    dup = _write(tmp_path, 20, months_ago=2, content_id=12)
+    return tmp_path, names, dup
+
+
+def _csvs(raw_dir):
+    return sorted(f for f in os.listdir(raw_dir) if f.endswith(".csv"))
+
+
+def test_compact_keeps_hot_files_and_archives_by_month(raw):
+    tmp, names, dup = raw
+    stats = RawDataArchive(str(tmp)).compact(keep_hot=5, dedupe=True)
+    assert _csvs(tmp) == sorted(names[:5])
+    assert stats["archived"] == 15 and stats["deduped"] == 1
+    index = json.loads((tmp / ARCHIVE_DIR_NAME / "index.json").read_text(encoding="utf-8"))
+    assert {e["archive"] for e in index.values() if e["archive"]} == \
+        {f for f in os.listdir(tmp / ARCHIVE_DIR_NAME) if f.endswith(".zip")}
+    aliases = {n: e["duplicate_of"] for n, e in index.items() if e["duplicate_of"]}
+    assert aliases in ({dup: names[12]}, {names[12]: dup})
+    assert index[names[17]]["rows"] == 200 and index[names[17]]["date_min"] == "2026-01-15"
+    # 清单只保留热区文件
+    assert sorted(RawDataManifest(str(tmp)).entries) == sorted(names[:5])
+
+
+def test_archived_files_resolve_transparently(raw):
+    tmp, names, dup = raw
+    RawDataArchive(str(tmp)).compact(keep_hot=5)
+    path = resolve_csv(os.path.join(str(tmp), names[17]), str(tmp))
+    assert "Pending Review 17" in _read(path)
+    assert "Pending Review 12" in _read(resolve_csv(dup, str(tmp)))
+    assert resolve_csv(os.path.join(str(tmp), names[0]), str(tmp)) == os.path.join(str(tmp), names[0])
+    assert resolve_csv("missing.csv", str(tmp)) is None
+
+
+def test_compact_is_idempotent_and_expires_old_months(raw):
+    tmp, names, _ = raw
+    RawDataArchive(str(tmp)).compact(keep_hot=5)
+    assert RawDataArchive(str(tmp)).compact(keep_hot=5)["archived"] == 0
+    stats = RawDataArchive(str(tmp)).compact(keep_hot=5, keep_archive_months=2)
+    assert len(stats["expired_months"]) == 1
+    # 最早月份的归档与其索引条目一并删除；较新月份中的去重别名仍可读取
+    assert resolve_csv(names[17], str(tmp)) is None
+    assert "Pending Review 12" in _read(resolve_csv(names[12], str(tmp)))
+
+
+def test_dedupe_does_not_alias_into_older_month(tmp_path):
+    old = _write(tmp_path, 10, months_ago=3, content_id=1)
+    new = _write(tmp_path, 5, months_ago=1, content_id=1)
+    _write(tmp_path, 0, months_ago=0)
+    arc = RawDataArchive(str(tmp_path))
+    assert arc.compact(keep_hot=1)["deduped"] == 0
+    assert arc.compact(keep_hot=1, keep_archive_months=1)["expired_months"]
+    assert resolve_csv(old, str(tmp_path)) is None
+    assert "Pending Review 1" in _read(resolve_csv(new, str(tmp_path)))
+
+
+def test_without_dedupe_duplicates_are_stored(raw):
+    tmp, _, dup = raw
+    stats = RawDataArchive(str(tmp)).compact(keep_hot=5, dedupe=False)
+    assert stats["archived"] == 16 and stats["deduped"] == 0
+    assert RawDataArchive(str(tmp)).index[dup]["member"] == dup
+
+
+def test_incremental_merged_file_stays_hot(raw):
+    tmp, names, _ = raw
+    os.makedirs(tmp / STATE_DIR_NAME)
+    merged = os.path.join(str(tmp), names[19])
+    (tmp / STATE_DIR_NAME / "state.json").write_text(json.dumps({"merged_path": merged}), encoding="utf-8")
+    RawDataArchive(str(tmp)).compact(keep_hot=2)
+    assert _csvs(tmp) == sorted(names[:2] + [names[19]])
+
+
+def test_find_by_requested_date(raw):
+    tmp, names, _ = raw
+    arc = RawDataArchive(str(tmp))
+    arc.compact(keep_hot=5)
+    found = [n for n, _ in arc.find("2026-01-15")]
+    assert len(found) == 16 and found[0] == names[5]
+    assert arc.find("2025-01-01") == []
+
+
+def test_compact_rawdata_logs_failure(tmp_path, monkeypatch):
+    messages = []
+
+    def broken(self, *args):
+        raise OSError("磁盘已满")
+
+    monkeypatch.setattr(RawDataArchive, "compact", broken)
+    assert compact_rawdata(str(tmp_path), log_callback=messages.append) is None
+    assert messages and "磁盘已满" in messages[0]
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""已发送邮件确认: outlook_fake 的 Items.Restrict(Jet 过滤) 与 email_sender._find_sent_item / _verify_sent"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import email_sender
+from outlook_fake import (FakeNamespace, FakeSentItem, FakeOutlookApplication, OL_FOLDER_SENT_MAIL,
+                          parse_jet_filter)
+
+NOW = datetime(2026, 10, 18, 9, 30, 15)
+
+
+@pytest.fixture
+def sent_folder():
+    folder = FakeNamespace().GetDefaultFolder(OL_FOLDER_SENT_MAIL)
+    for i in range(200):
+        folder.Items.append(FakeSentItem(f"历史邮件 {i}", NOW - timedelta(days=1 + i % 30)))
+    return folder
+
+
+def test_parse_jet_filter_and_quotes():
+    clauses = parse_jet_filter("[SentOn] >= '10/18/2026 09:25 AM' AND [Subject] = 'O''Brien 报告'")
+    assert clauses == [("SentOn", ">=", datetime(2026, 10, 18, 9, 25)), ("Subject", "=", "O'Brien 报告")]
+
+
+@pytest.mark.parametrize("text", ["[Subject] = 'a' OR [Subject] = 'b'", "Subject = 'a'", "[Subject] LIKE 'a'"])
+def test_parse_jet_filter_rejects_unsupported(text):
+    with pytest.raises(ValueError):
+        parse_jet_filter(text)
+
+
+def test_restrict_time_window_minute_precision(sent_folder):
+    sent_folder.Items.append(FakeSentItem("窗口内", NOW.replace(second=59)))
+    # Jet 日期比较精度为分钟: 同一分钟内的秒数不影响 >= 比较
+    matches = sent_folder.Items.Restrict(f"[SentOn] >= '{email_sender._outlook_filter_time(NOW)}'")
+    assert [it.Subject for it in matches] == ["窗口内"]
+
+
+def test_build_sent_filter_escapes_subject():
+    text = email_sender._build_sent_filter("O'Brien 报告", NOW)
+    assert text == "[SentOn] >= '10/18/2026 09:30 AM' AND [Subject] = 'O''Brien 报告'"
+    assert parse_jet_filter(text)[1] == ("Subject", "=", "O'Brien 报告")
+
+
+def test_find_sent_item_uses_single_restrict(sent_folder, quiet_email_log):
+    sent_folder.Items.append(FakeSentItem("O'Brien 报告", NOW - timedelta(seconds=30)))
+    sent_folder.Items.append(FakeSentItem("O'Brien 报告", NOW - timedelta(seconds=5)))
+    found = email_sender._find_sent_item(sent_folder.Items, "O'Brien 报告", NOW, 300)
+    assert found is not None and found.SentOn == NOW - timedelta(seconds=5)  # 最新的一封
+    assert sent_folder.Items.restrict_calls == 1
+
+
+def test_find_sent_item_outside_window(sent_folder, quiet_email_log):
+    sent_folder.Items.append(FakeSentItem("旧报告", NOW - timedelta(hours=1)))
+    assert email_sender._find_sent_item(sent_folder.Items, "旧报告", NOW, 300) is None
+    assert email_sender._find_sent_item(sent_folder.Items, "不存在", NOW, 300) is None
+
+
+def test_find_sent_item_query_error_returns_none(quiet_email_log):
+    class BrokenItems:
+        def Restrict(self, text):
+            raise RuntimeError("COM error")
+
+    assert email_sender._find_sent_item(BrokenItems(), "x", NOW, 300) is None
+    assert any("异常" in m for m in quiet_email_log)
+
+
+def test_verify_sent_found_and_timeout(sent_folder, quiet_email_log):
+    sent_folder.Items.append(FakeSentItem("提醒", NOW))
+    assert email_sender._verify_sent(sent_folder, "提醒", NOW, max_wait=1, interval=0.05)
+    assert sent_folder.Items.restrict_calls == 1
+    assert not email_sender._verify_sent(sent_folder, "未发送", NOW, max_wait=0.15, interval=0.05)
+    assert sent_folder.Items.restrict_calls >= 3
+
+
+def test_verify_sent_batch_counts_duplicate_subjects(sent_folder, quiet_email_log):
+    for s in ("A", "A", "B"):
+        sent_folder.Items.append(FakeSentItem(s, NOW))
+    calls = sent_folder.Items.restrict_calls
+    result = email_sender._verify_sent_batch(sent_folder, ["A", "B", "A", "A", "C"], NOW, max_wait=0, interval=0)
+    assert result == [True, True, True, False, False]
+    assert sent_folder.Items.restrict_calls == calls + 1
+
+
+def test_send_emails_verifies_batch_once(monkeypatch, quiet_email_log):
+    from mail_transport import create_transport
+    monkeypatch.setattr(email_sender, "load_email_config", lambda path=None: {"system_config": {
+        "EMAIL_VERIFY_SENT": True, "EMAIL_MAX_WAIT_SECONDS": 1, "EMAIL_RETRY_INTERVAL_SECONDS": 1}})
+    app = FakeOutlookApplication()
+    transport = create_transport("fake", application=app)
+    messages = [{"subject": f"提醒 {i}", "html_content": "<p>x</p>", "to_addrs": [f"u{i}@pg.com"]} for i in range(5)]
+    assert email_sender.send_emails(messages, transport=transport) == [True] * 5
+    assert app.sent_items.Count == 5
+    assert app.latency.calls["restrict"] == 1
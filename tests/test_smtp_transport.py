@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""SMTPTransport 连接池: 复用、轮换、断线重试(仅限正文发出前)，使用本地 smtp_standin 服务器"""
+
+import logging
+
+import pytest
+
+from mail_transport import MailMessage
+from smtp_standin import StandinSMTPServer
+from smtp_transport import SMTPTransport, from_config
+
+USER, PASSWORD = "robot", "secret"
+
+
+def _transport(server, **kwargs):
+    kwargs.setdefault("starttls", False)
+    return SMTPTransport("127.0.0.1", server.port, USER, PASSWORD,
+                         logger=logging.getLogger("test_smtp_transport"), **kwargs)
+
+
+def _messages(n, prefix="提醒"):
+    return [MailMessage(f"{prefix} {i}", "<p>测试</p>", [f"u{i}@pg.com"], ["cc@pg.com"]) for i in range(n)]
+
+
+@pytest.fixture
+def server():
+    with StandinSMTPServer(username=USER, password=PASSWORD) as s:
+        yield s
+
+
+def test_connection_reused_across_sends(server):
+    transport = _transport(server, pool_size=1)
+    for m in _messages(5):
+        assert transport.send(m)
+    transport.close()
+    assert server.connections == 1
+    assert transport.pool.stats["connects"] == 1 and transport.pool.stats["reuses"] == 4
+    assert [m["subject"] for m in server.messages] == [f"提醒 {i}" for i in range(5)]
+    assert server.envelopes[0] == (USER, ["u0@pg.com", "cc@pg.com"])
+
+
+def test_pool_rotates_after_message_limit(server):
+    transport = _transport(server, pool_size=1, max_messages_per_connection=3)
+    assert transport.send_many(_messages(7)) == [True] * 7
+    transport.close()
+    assert len(server.messages) == 7
+    # 每条连接最多 3 封: 3 + 3 + 1
+    assert transport.pool.stats["connects"] == 3
+
+
+def test_send_many_parallel(server):
+    transport = _transport(server, pool_size=3)
+    messages = _messages(12)
+    assert transport.send_many(messages) == [True] * 12
+    transport.close()
+    assert sorted(m["subject"] for m in server.messages) == sorted(m.subject for m in messages)
+    assert server.connections <= 3
+
+
+def test_retry_on_disconnect_before_data():
+    # 每条连接投递 2 封后，下一条 MAIL 命令时服务器断开
+    with StandinSMTPServer(username=USER, password=PASSWORD, drop_after=2) as server:
+        transport = _transport(server, pool_size=1, retries=2)
+        assert transport.send_many(_messages(5)) == [True] * 5
+        transport.close()
+        assert len(server.messages) == 5
+        assert server.dropped == 2
+        assert transport.pool.stats["discarded"] == 2
+
+
+def test_no_retry_after_data():
+    # 第 1 封正文收下后服务器不回复就断开: 邮件已投递，不能重试(否则重复)
+    with StandinSMTPServer(username=USER, password=PASSWORD, drop_after_data=1) as server:
+        transport = _transport(server, pool_size=1, retries=3)
+        assert transport.send(_messages(1)[0]) is False
+        transport.close()
+        assert len(server.messages) == 1
+        assert transport.pool.stats["connects"] == 1
+
+
+def test_retries_exhausted():
+    with StandinSMTPServer(username=USER, password=PASSWORD, drop_after=1) as server:
+        transport = _transport(server, pool_size=1, retries=0)
+        assert transport.send_many(_messages(2)) == [True, False]
+        transport.close()
+        assert len(server.messages) == 1
+
+
+def test_all_recipients_refused_keeps_connection():
+    with StandinSMTPServer(username=USER, password=PASSWORD, reject_recipients={"bad@pg.com"}) as server:
+        transport = _transport(server, pool_size=1)
+        assert not transport.send(MailMessage("拒收", "<p>x</p>", ["bad@pg.com"]))
+        assert transport.send(MailMessage("部分拒收", "<p>x</p>", ["bad@pg.com", "ok@pg.com"]))
+        transport.close()
+        assert server.connections == 1
+        assert server.envelopes == [(USER, ["ok@pg.com"])]
+
+
+def test_wrong_password_fails_without_retry():
+    with StandinSMTPServer(username=USER, password=PASSWORD) as server:
+        transport = SMTPTransport("127.0.0.1", server.port, USER, "wrong", starttls=False, retries=2,
+                                  logger=logging.getLogger("test_smtp_transport"))
+        assert transport.send(_messages(1)[0]) is False
+        assert server.connections == 1
+        assert not server.messages
+
+
+def test_from_config_password_env(monkeypatch, server):
+    monkeypatch.setenv("ITC_TEST_SMTP_PASSWORD", PASSWORD)
+    transport = from_config({"SMTP_HOST": "127.0.0.1", "SMTP_PORT": server.port, "SMTP_USER": USER,
+                             "SMTP_PASSWORD_ENV": "ITC_TEST_SMTP_PASSWORD", "SMTP_STARTTLS": False,
+                             "SMTP_FROM": "robot@pg.com"})
+    assert transport.send(_messages(1)[0])
+    transport.close()
+    assert server.envelopes[0][0] == "robot@pg.com"
+    with pytest.raises(ValueError):
+        from_config({})